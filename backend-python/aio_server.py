@@ -0,0 +1,579 @@
+"""
+asyncio serving mode for the gRPC API (GRPC_MODE=async)
+
+The servicers mirror the threaded ones in server.py but run as coroutines
+on one event loop over AsyncDatabase (motor), so in-flight RPCs are not
+capped by a thread pool. bcrypt still runs in the password process pool
+and is awaited without blocking the loop.
+"""
+import signal
+import asyncio
+import logging
+from datetime import datetime, timedelta
+import grpc
+from grpc_reflection.v1alpha import reflection
+from bson import ObjectId
+
+import domunity_pb2
+import domunity_pb2_grpc
+from async_db import AsyncDatabase
+from auth import JWT_EXPIRATION_HOURS, encode_token, decode_token, AsyncAuthInterceptor, resolve_user_id
+from cache import AsyncReadThroughCache
+from messages import (building_message, apartment_message, masked_message, profile_message, event_message,
+                      payment_message)
+from passwords import PasswordPoolBusy
+from singleflight import AsyncSingleFlight
+from grpc_config import MethodLimits, AsyncMethodLimitInterceptor, AsyncMetricsInterceptor
+from queries import (QueryError, parse_payment_options, load_payment_history_async, load_profile_async,
+                     STREAM_DEFAULT_BATCH_SIZE, stream_batch_size, apartments_cursor,
+                     financial_report_cursor, financial_report_fields,
+                     BATCH_EVENTS_DEFAULT_LIMIT, BATCH_EVENTS_MAX_LIMIT, parse_batch_ids, in_request_order,
+                     load_buildings_async, load_profiles_async, load_events_for_buildings_async,
+                     parse_field_mask, PROFILE_MASK_FIELDS, BUILDING_MASK_FIELDS, APARTMENT_MASK_FIELDS,
+                     building_projection, apartment_projection)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAuthServicer(domunity_pb2_grpc.AuthServiceServicer):
+    def __init__(self, db, password_hasher):
+        self.db = db
+        self.password_hasher = password_hasher
+        logger.info("AsyncAuthServicer initialized")
+
+    async def Login(self, request, context):
+        logger.debug("LOGIN REQUEST for: %s", request.email)
+
+        try:
+            user = await self.db.db.users.find_one({"email": request.email})
+
+            if not user or not await self.password_hasher.verify_async(request.password, user['password_hash']):
+                logger.warning(f"Invalid login for: {request.email}")
+                return domunity_pb2.LoginResponse(
+                    success=False,
+                    message="Invalid email or password"
+                )
+
+            access_token = encode_token({
+                'user_id': str(user['_id']),
+                'email': user['email'],
+                'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
+            })
+
+            refresh_token = encode_token({
+                'user_id': str(user['_id']),
+                'exp': datetime.utcnow() + timedelta(days=30)
+            })
+
+            logger.debug("✓ Login successful for user: %s", user['email'])
+
+            return domunity_pb2.LoginResponse(
+                success=True,
+                message="Login successful",
+                access_token=access_token,
+                refresh_token=refresh_token,
+                user=domunity_pb2.User(
+                    id=str(user['_id']),
+                    email=user['email'],
+                    full_name=user['full_name'] or '',
+                    phone=user['phone'] or '',
+                    created_at=str(user.get('created_at', ''))
+                )
+            )
+
+        except PasswordPoolBusy as e:
+            logger.warning(f"Login rejected, password pool busy: {e}")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many concurrent logins, please retry")
+        except Exception as e:
+            logger.error(f"✗ Login error: {e}", exc_info=True)
+            return domunity_pb2.LoginResponse(
+                success=False,
+                message=f"Login failed: {str(e)}"
+            )
+
+    async def Register(self, request, context):
+        logger.debug("REGISTER REQUEST for: %s", request.email)
+
+        try:
+            password_hash = await self.password_hasher.hash_async(request.password)
+
+            result = await self.db.db.users.insert_one({
+                "email": request.email,
+                "password_hash": password_hash,
+                "full_name": request.full_name,
+                "phone": request.phone,
+                "role": "user",
+                "is_active": True,
+                "created_at": datetime.utcnow()
+            })
+
+            logger.debug("✓ User registered successfully: %s (ID: %s)", request.email, result.inserted_id)
+
+            return domunity_pb2.RegisterResponse(
+                success=True,
+                message="Registration successful",
+                user_id=str(result.inserted_id)
+            )
+
+        except PasswordPoolBusy as e:
+            logger.warning(f"Registration rejected, password pool busy: {e}")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many concurrent requests, please retry")
+        except Exception as e:
+            logger.error(f"✗ Registration error: {e}", exc_info=True)
+            return domunity_pb2.RegisterResponse(
+                success=False,
+                message=f"Registration failed: {str(e)}"
+            )
+
+    async def RefreshToken(self, request, context):
+        logger.debug("REFRESH TOKEN REQUEST")
+
+        try:
+            payload = decode_token(request.refresh_token)
+
+            access_token = encode_token({
+                'user_id': payload['user_id'],
+                'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
+            })
+
+            logger.debug("✓ Token refreshed for user_id: %s", payload['user_id'])
+            return domunity_pb2.RefreshTokenResponse(success=True, access_token=access_token)
+
+        except Exception as e:
+            logger.error(f"✗ Token refresh error: {e}")
+            return domunity_pb2.RefreshTokenResponse(success=False)
+
+    async def ForgotPassword(self, request, context):
+        logger.debug("FORGOT PASSWORD REQUEST for: %s", request.email)
+
+        # In production, send password reset email
+        return domunity_pb2.ForgotPasswordResponse(
+            success=True,
+            message="Password reset instructions sent to your email"
+        )
+
+
+async def _resolve_user_id(request_user_id, context):
+    try:
+        return resolve_user_id(request_user_id)
+    except PermissionError as e:
+        await context.abort(grpc.StatusCode.PERMISSION_DENIED, str(e))
+
+
+class AsyncUserServicer(domunity_pb2_grpc.UserServiceServicer):
+    def __init__(self, db, cache, grid=None):
+        self.db = db
+        self.cache = cache
+        self.grid = grid
+        logger.info("AsyncUserServicer initialized")
+
+    async def GetProfile(self, request, context):
+        logger.debug("GET PROFILE REQUEST for user_id: %s", request.user_id)
+        user_id = await _resolve_user_id(request.user_id, context)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, PROFILE_MASK_FIELDS)
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        try:
+            bundle = await load_profile_async(self.db, user_id, cache=self.cache, fields=fields)
+        except Exception as e:
+            logger.error(f"✗ GetProfile error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        if not bundle:
+            logger.warning(f"User not found: {user_id}")
+            await context.abort(grpc.StatusCode.NOT_FOUND, "User not found")
+
+        logger.debug("✓ Profile retrieved for user_id: %s", user_id)
+        return masked_message(profile_message(bundle), request.read_mask.paths)
+
+    async def UpdateProfile(self, request, context):
+        logger.debug("UPDATE PROFILE REQUEST for user_id: %s", request.user_id)
+        user_id = await _resolve_user_id(request.user_id, context)
+
+        try:
+            await self.db.db.users.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": {"full_name": request.full_name, "phone": request.phone}}
+            )
+            if self.grid:
+                self.grid.invalidate_user(user_id)
+            logger.debug("✓ Profile updated for user_id: %s", user_id)
+            return domunity_pb2.UpdateProfileResponse(success=True, message="Profile updated successfully")
+
+        except Exception as e:
+            logger.error(f"✗ UpdateProfile error: {e}", exc_info=True)
+            return domunity_pb2.UpdateProfileResponse(success=False, message=str(e))
+
+    async def GetProfiles(self, request, context):
+        logger.debug("GET PROFILES REQUEST for %s users", len(request.user_ids))
+        try:
+            user_ids, invalid = parse_batch_ids(request.user_ids, 'user_ids')
+            fields = parse_field_mask(request.read_mask.paths, PROFILE_MASK_FIELDS)
+            for user_id in user_ids:
+                resolve_user_id(str(user_id))
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except PermissionError as e:
+            await context.abort(grpc.StatusCode.PERMISSION_DENIED, str(e))
+
+        try:
+            bundles, missing = in_request_order(user_ids, invalid, await load_profiles_async(self.db, user_ids, fields))
+        except Exception as e:
+            logger.error(f"✗ GetProfiles error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved %s profiles, %s missing", len(bundles), len(missing))
+        return domunity_pb2.GetProfilesResponse(
+            profiles=[masked_message(profile_message(bundle), request.read_mask.paths) for bundle in bundles],
+            missing_ids=missing)
+
+
+class AsyncBuildingServicer(domunity_pb2_grpc.BuildingServiceServicer):
+    def __init__(self, db, cache, stream_batch_size=STREAM_DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.cache = cache
+        self.stream_batch_size = stream_batch_size
+        logger.info("AsyncBuildingServicer initialized")
+
+    async def GetBuilding(self, request, context):
+        logger.debug("GET BUILDING REQUEST for building_id: %s", request.building_id)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, BUILDING_MASK_FIELDS)
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        try:
+            building = await self.cache.get_building(request.building_id, building_projection(fields))
+        except Exception as e:
+            logger.error(f"✗ GetBuilding error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        if not building:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Building not found")
+
+        return masked_message(building_message(building), request.read_mask.paths)
+
+    async def GetBuildings(self, request, context):
+        logger.debug("GET BUILDINGS REQUEST for %s buildings", len(request.building_ids))
+        try:
+            building_ids, invalid = parse_batch_ids(request.building_ids, 'building_ids')
+            fields = parse_field_mask(request.read_mask.paths, BUILDING_MASK_FIELDS)
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        try:
+            buildings, missing = in_request_order(
+                building_ids, invalid, await load_buildings_async(self.db, building_ids, self.cache, fields))
+        except Exception as e:
+            logger.error(f"✗ GetBuildings error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved %s buildings, %s missing", len(buildings), len(missing))
+        return domunity_pb2.GetBuildingsResponse(
+            buildings=[masked_message(building_message(building), request.read_mask.paths) for building in buildings],
+            missing_ids=missing)
+
+    async def ListApartments(self, request, context):
+        logger.debug("LIST APARTMENTS REQUEST for building_id: %s", request.building_id)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, APARTMENT_MASK_FIELDS)
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        try:
+            projection = apartment_projection(fields)
+            apartments = [masked_message(apartment_message(apt), request.read_mask.paths)
+                          for apt in await self.cache.get_apartments(request.building_id, projection)]
+        except Exception as e:
+            logger.error(f"✗ ListApartments error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved %s apartments", len(apartments))
+        return domunity_pb2.ListApartmentsResponse(apartments=apartments)
+
+    async def StreamApartments(self, request, context):
+        """Yield apartments as the cursor produces them, then a summary"""
+        logger.debug("STREAM APARTMENTS REQUEST for building_id: %s", request.building_id)
+
+        count = 0
+        residents = 0
+        try:
+            batch_size = stream_batch_size(request.batch_size, self.stream_batch_size)
+            async for apt in apartments_cursor(self.db, request.building_id, batch_size):
+                count += 1
+                residents += apt['residents'] or 0
+                yield domunity_pb2.ApartmentStreamMessage(apartment=apartment_message(apt))
+        except Exception as e:
+            logger.error(f"✗ StreamApartments error after {count} apartments: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Streamed %s apartments", count)
+        yield domunity_pb2.ApartmentStreamMessage(
+            summary=domunity_pb2.ApartmentStreamSummary(count=count, total_residents=residents))
+
+
+class AsyncFinancialServicer(domunity_pb2_grpc.FinancialServiceServicer):
+    def __init__(self, db, stream_batch_size=STREAM_DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.stream_batch_size = stream_batch_size
+        logger.info("AsyncFinancialServicer initialized")
+
+    async def GetFinancialReport(self, request, context):
+        logger.debug("GET FINANCIAL REPORT REQUEST for building_id: %s", request.building_id)
+
+        try:
+            rows = [
+                financial_report_fields(row)
+                async for row in financial_report_cursor(self.db, request.building_id)
+            ]
+        except Exception as e:
+            logger.error(f"✗ GetFinancialReport error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved financial report with %s entries", len(rows))
+        return domunity_pb2.FinancialReport(
+            entries=[domunity_pb2.FinancialReportEntry(**fields) for fields in rows],
+            total_balance=sum(fields['total_due'] for fields in rows)
+        )
+
+    async def StreamFinancialReport(self, request, context):
+        """Yield report entries as the cursor produces them, then the total"""
+        logger.debug("STREAM FINANCIAL REPORT REQUEST for building_id: %s", request.building_id)
+
+        count = 0
+        total = 0.0
+        try:
+            batch_size = stream_batch_size(request.batch_size, self.stream_batch_size)
+            async for row in financial_report_cursor(self.db, request.building_id, batch_size):
+                fields = financial_report_fields(row)
+                count += 1
+                total += fields['total_due']
+                yield domunity_pb2.FinancialReportMessage(entry=domunity_pb2.FinancialReportEntry(**fields))
+        except Exception as e:
+            logger.error(f"✗ StreamFinancialReport error after {count} entries: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Streamed financial report with %s entries", count)
+        yield domunity_pb2.FinancialReportMessage(
+            summary=domunity_pb2.FinancialReportSummary(entries=count, total_balance=total))
+
+    async def GetPaymentHistory(self, request, context):
+        logger.debug("GET PAYMENT HISTORY REQUEST for user_id: %s", request.user_id)
+        user_id = await _resolve_user_id(request.user_id, context)
+
+        try:
+            options = parse_payment_options(request.page_size, request.page_token, request.statuses,
+                                            request.from_date, request.to_date)
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        try:
+            payments, next_page_token = await load_payment_history_async(self.db, user_id, **options)
+        except Exception as e:
+            logger.error(f"✗ GetPaymentHistory error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved %s payments", len(payments))
+        return domunity_pb2.PaymentHistory(
+            payments=[payment_message(p) for p in payments],
+            next_page_token=next_page_token or ''
+        )
+
+
+class AsyncEventServicer(domunity_pb2_grpc.EventServiceServicer):
+    def __init__(self, db, flights=None, cache=None):
+        self.db = db
+        self.flights = flights or AsyncSingleFlight()
+        # Resolves the ids of ListEventsForBuildings (without one, a $in query on buildings)
+        self.cache = cache
+        logger.info("AsyncEventServicer initialized")
+
+    async def ListEvents(self, request, context):
+        logger.debug("LIST EVENTS REQUEST for building_id: %s", request.building_id)
+
+        try:
+            limit = request.limit if request.limit > 0 else 10
+            building_id = ObjectId(request.building_id)
+
+            async def load():
+                cursor = self.db.db.events.find({"building_id": building_id}).sort("date", -1).limit(limit)
+                return [event async for event in cursor]
+
+            events = [event_message(event) for event in await self.flights.do(('ListEvents', building_id, limit), load)]
+        except Exception as e:
+            logger.error(f"✗ ListEvents error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        logger.debug("✓ Retrieved %s events", len(events))
+        return domunity_pb2.ListEventsResponse(events=events)
+
+    async def ListEventsForBuildings(self, request, context):
+        logger.debug("LIST EVENTS FOR BUILDINGS REQUEST for %s buildings", len(request.building_ids))
+        try:
+            building_ids, invalid = parse_batch_ids(request.building_ids, 'building_ids')
+        except QueryError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        limit = min(request.limit, BATCH_EVENTS_MAX_LIMIT) if request.limit > 0 else BATCH_EVENTS_DEFAULT_LIMIT
+
+        try:
+            events = await load_events_for_buildings_async(self.db, building_ids, limit, self.cache)
+        except Exception as e:
+            logger.error(f"✗ ListEventsForBuildings error: {e}", exc_info=True)
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+        missing = invalid + [str(building_id) for building_id in building_ids if building_id not in events]
+        logger.debug("✓ Retrieved events for %s buildings, %s missing", len(events), len(missing))
+        return domunity_pb2.ListEventsForBuildingsResponse(
+            buildings=[
+                domunity_pb2.BuildingEvents(
+                    building_id=str(building_id),
+                    events=[event_message(event) for event in events[building_id]]
+                )
+                for building_id in building_ids if building_id in events
+            ],
+            missing_ids=missing
+        )
+
+    async def CreateEvent(self, request, context):
+        logger.debug("CREATE EVENT REQUEST for building_id: %s", request.building_id)
+
+        try:
+            result = await self.db.db.events.insert_one({
+                "building_id": ObjectId(request.building_id),
+                "date": datetime.strptime(request.date, '%Y-%m-%d') if '-' in request.date else datetime.utcnow(),
+                "title": request.title,
+                "description": request.description,
+                "created_at": datetime.utcnow()
+            })
+
+            logger.debug("✓ Event created with ID: %s", result.inserted_id)
+            return domunity_pb2.CreateEventResponse(
+                success=True,
+                message="Event created successfully",
+                event_id=str(result.inserted_id)
+            )
+
+        except Exception as e:
+            logger.error(f"✗ CreateEvent error: {e}", exc_info=True)
+            return domunity_pb2.CreateEventResponse(success=False, message=str(e))
+
+
+class AsyncContactServicer(domunity_pb2_grpc.ContactServiceServicer):
+    def __init__(self, db):
+        self.db = db
+        logger.info("AsyncContactServicer initialized")
+
+    async def _save(self, request_type, name, phone, email, message):
+        await self.db.db.contact_requests.insert_one({
+            "name": name,
+            "phone": phone,
+            "email": email,
+            "message": message,
+            "type": request_type,
+            "created_at": datetime.utcnow()
+        })
+
+    async def SendContactForm(self, request, context):
+        logger.debug("CONTACT FORM REQUEST from: %s", request.email)
+
+        try:
+            await self._save("contact", request.name, request.phone, request.email, request.message)
+            logger.debug("✓ Contact form saved")
+            return domunity_pb2.ContactFormResponse(success=True, message="Your message has been sent successfully")
+        except Exception as e:
+            logger.error(f"✗ SendContactForm error: {e}", exc_info=True)
+            return domunity_pb2.ContactFormResponse(success=False, message=str(e))
+
+    async def RequestOffer(self, request, context):
+        logger.debug("OFFER REQUEST from: %s", request.email)
+
+        try:
+            await self._save("offer", "", request.phone, request.email,
+                             f"City: {request.city}, Properties: {request.num_properties}, Address: {request.address}")
+            logger.debug("✓ Offer request saved")
+            return domunity_pb2.OfferResponse(success=True, message="Your offer request has been received")
+        except Exception as e:
+            logger.error(f"✗ RequestOffer error: {e}", exc_info=True)
+            return domunity_pb2.OfferResponse(success=False, message=str(e))
+
+    async def RequestPresentation(self, request, context):
+        logger.debug("PRESENTATION REQUEST from: %s", request.email)
+
+        try:
+            await self._save("presentation", "", request.phone, request.email,
+                             f"Date: {request.date}, Type: {request.building_type}, Address: {request.address}")
+            logger.debug("✓ Presentation request saved")
+            return domunity_pb2.PresentationResponse(success=True, message="Your presentation request has been received")
+        except Exception as e:
+            logger.error(f"✗ RequestPresentation error: {e}", exc_info=True)
+            return domunity_pb2.PresentationResponse(success=False, message=str(e))
+
+
+class AsyncHealthServicer(domunity_pb2_grpc.HealthServiceServicer):
+    def __init__(self, db):
+        self.db = db
+        logger.info("AsyncHealthServicer initialized")
+
+    async def Check(self, request, context):
+        logger.debug("HEALTH CHECK REQUEST")
+
+        db_status = "healthy"
+        try:
+            await self.db.ping()
+        except Exception:
+            db_status = "unhealthy"
+
+        return domunity_pb2.HealthCheckResponse(
+            healthy=True,
+            version="1.0.0",
+            database_status=db_status
+        )
+
+
+def add_async_servicers(server, db, password_hasher, cache, grid=None,
+                        stream_batch_size=STREAM_DEFAULT_BATCH_SIZE):
+    """Register every async servicer on a grpc.aio server"""
+    domunity_pb2_grpc.add_AuthServiceServicer_to_server(AsyncAuthServicer(db, password_hasher), server)
+    domunity_pb2_grpc.add_UserServiceServicer_to_server(AsyncUserServicer(db, cache, grid), server)
+    domunity_pb2_grpc.add_BuildingServiceServicer_to_server(AsyncBuildingServicer(db, cache, stream_batch_size), server)
+    domunity_pb2_grpc.add_FinancialServiceServicer_to_server(AsyncFinancialServicer(db, stream_batch_size), server)
+    domunity_pb2_grpc.add_EventServiceServicer_to_server(AsyncEventServicer(db, cache.flights, cache), server)
+    domunity_pb2_grpc.add_ContactServiceServicer_to_server(AsyncContactServicer(db), server)
+    domunity_pb2_grpc.add_HealthServiceServicer_to_server(AsyncHealthServicer(db), server)
+
+
+async def serve_async(config, service_names, password_hasher, token_verifier, cache_store,
+                      grid=None, method_limits=None):
+    """Run the gRPC API on grpc.aio until cancelled, as set up by a GrpcServerConfig"""
+    db = AsyncDatabase()
+    cache = AsyncReadThroughCache(db, cache_store)
+    method_limits = method_limits or MethodLimits(config.method_limits)
+
+    interceptors = [AsyncMetricsInterceptor()]
+    if config.auth_required:
+        interceptors.append(AsyncAuthInterceptor(token_verifier))
+    interceptors.append(AsyncMethodLimitInterceptor(method_limits))
+    server = grpc.aio.server(
+        interceptors=interceptors,
+        options=config.options(),
+        maximum_concurrent_rpcs=config.max_concurrent_rpcs,
+        compression=config.compression_algorithm
+    )
+    add_async_servicers(server, db, password_hasher, cache, grid, config.stream_batch_size)
+    reflection.enable_server_reflection(service_names, server)
+
+    server.add_insecure_port(f'0.0.0.0:{config.port}')
+    await server.start()
+    logger.info(f"✓ gRPC server running in async mode (max concurrent RPCs: {config.max_concurrent_rpcs or 'unbounded'})")
+
+    # SIGTERM (supervisor, container stop) drains in-flight RPCs like Ctrl+C
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    try:
+        await stopping.wait()
+    finally:
+        logger.info(f"Shutting down gRPC server (grace {config.shutdown_grace}s)...")
+        await server.stop(config.shutdown_grace)
+        db.close()
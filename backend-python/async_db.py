@@ -0,0 +1,40 @@
+import logging
+from motor.motor_asyncio import AsyncIOMotorClient
+from db import get_mongodb_uri
+from tracing import CommandTracer
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """asyncio counterpart of Database for the grpc.aio server (motor).
+
+    Exposes the same ``.client`` / ``.db`` attributes, but every collection
+    call is awaited. Indexes and sample data are still set up by the sync
+    Database at startup, so this only opens the connection pool.
+    """
+
+    def __init__(self, mongodb_uri=None):
+        mongodb_uri = mongodb_uri or get_mongodb_uri()
+        if not mongodb_uri:
+            raise ValueError("MONGODB_URI not configured")
+
+        # motor binds to the running event loop on first use
+        self.client = AsyncIOMotorClient(mongodb_uri, event_listeners=[CommandTracer()])
+        self.db = self.client.get_default_database(default='domunity')
+        logger.info(f"✓ Async database client created for: {self.db.name}")
+
+    async def ping(self):
+        await self.client.admin.command('ping')
+
+    def commit(self):
+        """No-op for MongoDB (unless using sessions)"""
+        pass
+
+    def rollback(self):
+        """No-op for MongoDB (unless using sessions)"""
+        pass
+
+    def close(self):
+        self.client.close()
+        logger.info("Async MongoDB connection closed")
@@ -0,0 +1,353 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+import grpc
+import jwt
+from bson import ObjectId
+
+from metrics import JWT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# JWT Configuration
+JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
+JWT_ALGORITHM = 'HS256'
+JWT_EXPIRATION_HOURS = 24
+
+# Identity of the caller for the request being handled on this thread/task
+_current_identity = contextvars.ContextVar('current_identity', default=None)
+
+# gRPC methods callable without a token
+PUBLIC_GRPC_METHODS = frozenset([
+    '/domunity.AuthService/Login',
+    '/domunity.AuthService/Register',
+    '/domunity.AuthService/RefreshToken',
+    '/domunity.AuthService/ForgotPassword',
+    '/domunity.ContactService/SendContactForm',
+    '/domunity.ContactService/RequestOffer',
+    '/domunity.ContactService/RequestPresentation',
+    '/domunity.HealthService/Check',
+])
+
+# Prefixes of framework services that never carry user tokens
+PUBLIC_GRPC_PREFIXES = (
+    '/grpc.reflection.',
+)
+
+
+class Identity:
+    """Verified caller: user id from the token plus the user's role"""
+
+    __slots__ = ('user_id', 'email', 'role', 'expires_at')
+
+    def __init__(self, user_id, email, role, expires_at):
+        self.user_id = user_id
+        self.email = email
+        self.role = role
+        self.expires_at = expires_at
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+def encode_token(payload):
+    """Sign a JWT with the server secret"""
+    with JWT_SECONDS.time(('encode',)):
+        return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def decode_token(token):
+    """Verify a JWT signed with the server secret and return its payload"""
+    with JWT_SECONDS.time(('decode',)):
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+
+
+def current_identity():
+    """Identity attached to the current request, or None"""
+    return _current_identity.get()
+
+
+def resolve_user_id(requested_user_id, identity=None):
+    """Pick the user a request acts on.
+
+    An empty requested id means "me". Asking for another user's data is only
+    allowed for admins; otherwise PermissionError is raised. Without an
+    identity (auth disabled) the requested id is returned unchanged.
+    """
+    identity = identity or current_identity()
+    if identity is None:
+        return requested_user_id
+    if not requested_user_id or requested_user_id == identity.user_id:
+        return identity.user_id
+    if identity.is_admin:
+        return requested_user_id
+    raise PermissionError("Not allowed to access another user's data")
+
+
+def resolve_user_id_or_abort(requested_user_id, context):
+    """resolve_user_id for gRPC servicers: aborts with PERMISSION_DENIED"""
+    try:
+        return resolve_user_id(requested_user_id)
+    except PermissionError as e:
+        context.abort(grpc.StatusCode.PERMISSION_DENIED, str(e))
+
+
+class TokenVerifier:
+    """Verifies access tokens and caches the result until the token expires.
+
+    Entries are keyed by a SHA-256 digest of the token (the token itself is
+    never stored), bounded in number with LRU eviction, and dropped once
+    their ``exp`` has passed. The user's role is looked up once per token
+    and cached with it, so handlers don't need to re-fetch the user.
+
+    The role is therefore read when a token is first verified: a user
+    given another role in the database keeps the cached identity until the
+    token expires, up to JWT_EXPIRATION_HOURS after login (or until LRU
+    eviction or a restart). No API changes roles today.
+    """
+
+    def __init__(self, db, secret, algorithm, max_entries=10000):
+        self.db = db
+        self.secret = secret
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._failures = 0
+        self._evictions = 0
+
+    def cached(self, token):
+        """Return the cached Identity for a token without any verification work, or None"""
+        if not token:
+            return None
+        return self._lookup(hashlib.sha256(token.encode('utf-8')).digest(), time.time())
+
+    def _lookup(self, key, now):
+        with self._lock:
+            identity = self._entries.get(key)
+            if identity is not None:
+                if identity.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return identity
+                del self._entries[key]
+            return None
+
+    def verify(self, token):
+        """Return the Identity for a valid token, or None.
+
+        A failing user lookup raises rather than returning None, so a
+        database outage surfaces as a server error instead of an invalid
+        token.
+        """
+        if not token:
+            return None
+
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        identity = self._lookup(key, now)
+        if identity is not None:
+            return identity
+        with self._lock:
+            self._misses += 1
+
+        try:
+            with JWT_SECONDS.time(('decode',)):
+                payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            user_id = payload['user_id']
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+            logger.warning(f"Token verification failed: {e}")
+            return None
+
+        user = self._load_user(user_id)
+        if user is None:
+            with self._lock:
+                self._failures += 1
+            return None
+
+        identity = Identity(
+            user_id=user_id,
+            email=user.get('email', payload.get('email', '')),
+            role=user.get('role', 'user'),
+            # Tokens without exp are still re-verified periodically
+            expires_at=float(payload.get('exp', now + 300)),
+        )
+        with self._lock:
+            self._entries[key] = identity
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return identity
+
+    def _load_user(self, user_id):
+        """The token's user, or None when it doesn't exist (database errors propagate)"""
+        try:
+            user_oid = ObjectId(user_id)
+        except Exception:
+            return None
+        return self.db.db.users.find_one({"_id": user_oid}, {"email": 1, "role": 1})
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'failures': self._failures,
+                'evictions': self._evictions,
+            }
+
+
+def bearer_token(header_value):
+    """Extract the token from an 'Authorization: Bearer ...' value"""
+    if header_value and header_value.startswith('Bearer '):
+        return header_value[7:]
+    return None
+
+
+def wrap_rpc_handler(handler, wrap):
+    """Rebuild an RPC method handler with wrap(behavior, streaming) applied.
+
+    ``streaming`` is True for server-streaming methods, whose behaviour
+    returns an iterator that runs after the wrapper itself has returned.
+    """
+    if handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(
+            wrap(handler.unary_unary, False), handler.request_deserializer, handler.response_serializer)
+    if handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(
+            wrap(handler.unary_stream, True), handler.request_deserializer, handler.response_serializer)
+    if handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(
+            wrap(handler.stream_unary, False), handler.request_deserializer, handler.response_serializer)
+    return grpc.stream_stream_rpc_method_handler(
+        wrap(handler.stream_stream, True), handler.request_deserializer, handler.response_serializer)
+
+
+class AuthInterceptor(grpc.ServerInterceptor):
+    """Verifies the 'authorization' metadata once per call.
+
+    Public methods pass straight through. For everything else a missing or
+    invalid token aborts with UNAUTHENTICATED before the servicer runs;
+    a valid one is exposed to the servicer through current_identity().
+
+    The token is verified in the wrapped behaviour, on the worker thread:
+    intercept_service runs on the server's polling thread, where a cache
+    miss (JWT decode plus the user lookup) would hold up every other call.
+    """
+
+    def __init__(self, verifier, public_methods=PUBLIC_GRPC_METHODS):
+        self.verifier = verifier
+        self.public_methods = public_methods
+
+    def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = continuation(handler_call_details)
+        if handler is None or method in self.public_methods or method.startswith(PUBLIC_GRPC_PREFIXES):
+            return handler
+
+        metadata = dict(handler_call_details.invocation_metadata or ())
+        access_token = bearer_token(metadata.get('authorization'))
+
+        def wrap(behavior, streaming):
+            def authenticated(request_or_iterator, context):
+                identity = self._verify(access_token, context)
+                if identity is None:
+                    context.abort(grpc.StatusCode.UNAUTHENTICATED, "Missing or invalid access token")
+                token = _current_identity.set(identity)
+                try:
+                    return behavior(request_or_iterator, context)
+                finally:
+                    _current_identity.reset(token)
+
+            def authenticated_stream(request_or_iterator, context):
+                identity = self._verify(access_token, context)
+                if identity is None:
+                    context.abort(grpc.StatusCode.UNAUTHENTICATED, "Missing or invalid access token")
+                token = _current_identity.set(identity)
+                try:
+                    yield from behavior(request_or_iterator, context)
+                finally:
+                    _current_identity.reset(token)
+
+            return authenticated_stream if streaming else authenticated
+
+        return wrap_rpc_handler(handler, wrap)
+
+    def _verify(self, access_token, context):
+        """verifier.verify, aborting with INTERNAL when the user lookup fails"""
+        try:
+            return self.verifier.verify(access_token)
+        except Exception as e:
+            logger.error(f"Token verification error: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+
+
+class AsyncAuthInterceptor(grpc.aio.ServerInterceptor):
+    """AuthInterceptor for the grpc.aio server.
+
+    Cached tokens are resolved on the event loop; a cache miss (JWT decode
+    plus the user lookup) runs in the default executor so it never blocks
+    other RPCs.
+    """
+
+    def __init__(self, verifier, public_methods=PUBLIC_GRPC_METHODS):
+        self.verifier = verifier
+        self.public_methods = public_methods
+
+    async def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = await continuation(handler_call_details)
+        if handler is None or method in self.public_methods or method.startswith(PUBLIC_GRPC_PREFIXES):
+            return handler
+
+        metadata = dict(handler_call_details.invocation_metadata or ())
+        access_token = bearer_token(metadata.get('authorization'))
+        identity = self.verifier.cached(access_token)
+        error = None
+        if identity is None and access_token:
+            try:
+                identity = await asyncio.get_running_loop().run_in_executor(None, self.verifier.verify, access_token)
+            except Exception as e:
+                logger.error(f"Token verification error: {e}", exc_info=True)
+                error = e
+
+        def wrap(behavior, streaming):
+            async def authenticated(request_or_iterator, context):
+                if error is not None:
+                    await context.abort(grpc.StatusCode.INTERNAL, str(error))
+                if identity is None:
+                    await context.abort(grpc.StatusCode.UNAUTHENTICATED, "Missing or invalid access token")
+                token = _current_identity.set(identity)
+                try:
+                    return await behavior(request_or_iterator, context)
+                finally:
+                    _current_identity.reset(token)
+
+            async def authenticated_stream(request_or_iterator, context):
+                if error is not None:
+                    await context.abort(grpc.StatusCode.INTERNAL, str(error))
+                if identity is None:
+                    await context.abort(grpc.StatusCode.UNAUTHENTICATED, "Missing or invalid access token")
+                token = _current_identity.set(identity)
+                try:
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+                finally:
+                    _current_identity.reset(token)
+
+            return authenticated_stream if streaming else authenticated
+
+        return wrap_rpc_handler(handler, wrap)
@@ -0,0 +1,173 @@
+"""
+Materialized per-apartment payment summary (apartment_balances)
+
+One document per apartment holds what the read paths used to recompute by
+scanning payments on every request:
+
+    {_id: apartment_id, user_id, amount_due, pending_amount, overdue_amount,
+     total_amount, pending_count, overdue_count, payments_count,
+     last_paid_date, status, updated_at}
+
+``status`` is 'overdue' if any payment is overdue, else 'pending' if any is
+pending, else 'paid'. Writers keep it current through record_payment /
+update_payment_status, which apply the change as one atomic pipeline
+update and drop the BuildingGrid snapshot that shows it.
+rebuild_balances recomputes the whole collection from payments.
+
+Usage:
+    python balances.py rebuild
+"""
+import sys
+import logging
+from datetime import datetime
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+BALANCES_COLLECTION = 'apartment_balances'
+
+# Statuses with their own amount/count buckets
+_BUCKETED_STATUSES = ('pending', 'overdue')
+
+# Recomputed from the counters after every change
+_DERIVED_FIELDS = {
+    "amount_due": {"$add": ["$pending_amount", "$overdue_amount"]},
+    "status": {"$switch": {
+        "branches": [
+            {"case": {"$gt": ["$overdue_count", 0]}, "then": "overdue"},
+            {"case": {"$gt": ["$pending_count", 0]}, "then": "pending"},
+        ],
+        "default": "paid",
+    }},
+    "updated_at": "$$NOW",
+}
+
+_COUNTERS = ('pending_amount', 'overdue_amount', 'total_amount', 'pending_count', 'overdue_count', 'payments_count')
+
+
+def _payment_delta(status, amount, sign):
+    """Counter increments for adding (sign=1) or removing (sign=-1) one payment"""
+    delta = {'total_amount': sign * amount, 'payments_count': sign}
+    if status in _BUCKETED_STATUSES:
+        delta[f'{status}_amount'] = sign * amount
+        delta[f'{status}_count'] = sign
+    return delta
+
+
+def _merge(*deltas):
+    merged = {}
+    for delta in deltas:
+        for field, value in delta.items():
+            merged[field] = merged.get(field, 0) + value
+    return merged
+
+
+def _balance_update(delta, user_id=None, paid_date=None):
+    """Pipeline update applying counter deltas and re-deriving amount_due/status"""
+    counters = {
+        field: {"$add": [{"$ifNull": [f"${field}", 0]}, delta.get(field, 0)]}
+        for field in _COUNTERS
+    }
+    if user_id is not None:
+        counters['user_id'] = {"$ifNull": ["$user_id", user_id]}
+    if paid_date is not None:
+        # $max ignores null, so the first paid payment also sets it
+        counters['last_paid_date'] = {"$max": ["$last_paid_date", paid_date]}
+    return [
+        {"$set": counters},
+        {"$set": _DERIVED_FIELDS},
+    ]
+
+
+def record_payment(db, payment, grid=None):
+    """Insert a payment and fold it into its apartment's balance"""
+    result = db.db.payments.insert_one(payment)
+    amount = float(payment.get('amount') or 0)
+    db.db[BALANCES_COLLECTION].update_one(
+        {"_id": payment['apartment_id']},
+        _balance_update(
+            _payment_delta(payment.get('status'), amount, 1),
+            user_id=payment.get('user_id'),
+            paid_date=payment.get('paid_date') if payment.get('status') == 'paid' else None,
+        ),
+        upsert=True,
+    )
+    if grid is not None:
+        grid.invalidate_payment(payment['apartment_id'])
+    return result.inserted_id
+
+
+def update_payment_status(db, payment_id, status, paid_date=None, grid=None):
+    """Change a payment's status and move its amount between balance buckets.
+
+    Returns the payment as it was before the change, or None if not found.
+    """
+    changes = {"status": status}
+    if status == 'paid':
+        changes["paid_date"] = paid_date or datetime.utcnow()
+    before = db.db.payments.find_one_and_update(
+        {"_id": payment_id}, {"$set": changes}, return_document=ReturnDocument.BEFORE)
+    if before is None or before.get('status') == status:
+        return before
+
+    amount = float(before.get('amount') or 0)
+    delta = _merge(_payment_delta(before.get('status'), amount, -1), _payment_delta(status, amount, 1))
+    db.db[BALANCES_COLLECTION].update_one(
+        {"_id": before['apartment_id']},
+        _balance_update(delta, user_id=before.get('user_id'), paid_date=changes.get('paid_date')),
+        upsert=True,
+    )
+    if grid is not None:
+        grid.invalidate_payment(before['apartment_id'])
+    return before
+
+
+def build_rebuild_pipeline():
+    """Aggregation over payments that writes a fresh apartment_balances with $out"""
+    def status_sum(status, value):
+        return {"$sum": {"$cond": [{"$eq": ["$status", status]}, value, 0]}}
+
+    return [
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": "$apartment_id",
+            "user_id": {"$first": "$user_id"},
+            "pending_amount": status_sum("pending", "$amount"),
+            "overdue_amount": status_sum("overdue", "$amount"),
+            "total_amount": {"$sum": "$amount"},
+            "pending_count": status_sum("pending", 1),
+            "overdue_count": status_sum("overdue", 1),
+            "payments_count": {"$sum": 1},
+            "last_paid_date": {"$max": {"$cond": [{"$eq": ["$status", "paid"]}, "$paid_date", None]}},
+        }},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$set": _DERIVED_FIELDS},
+        # $out swaps the collection in atomically and keeps its indexes
+        {"$out": BALANCES_COLLECTION},
+    ]
+
+
+def rebuild_balances(db):
+    """Recompute every apartment balance from payments in one server-side pass"""
+    db.db.payments.aggregate(build_rebuild_pipeline(), allowDiskUse=True)
+    count = db.db[BALANCES_COLLECTION].estimated_document_count()
+    logger.info(f"✓ Rebuilt {count} apartment balances")
+    return count
+
+
+def main(argv):
+    if argv[1:] != ['rebuild']:
+        sys.exit(__doc__)
+
+    from db import Database
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)8s] %(message)s')
+    database = Database()
+    try:
+        rebuild_balances(database)
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,656 @@
+"""
+End-to-end benchmark of every REST route and RPC
+
+Seeds a scratch database with sample_data's generator (--buildings
+buildings with --apartments apartments each, most of them with a resident,
+and --months months of payments), starts server.py against it as a separate
+process, and drives each REST route and gRPC method at every
+--concurrency level from client processes. For each endpoint and
+concurrency it reports requests per second, p50/p95/p99 latency, errors
+and MongoDB round trips per call, the latter read from the server's
+domunity_mongo_round_trips_per_request histogram on /metrics (so the
+server runs with SERVER_PROCESSES=1).
+
+The results are printed as JSON and, with --output, saved; --compare
+adds the change against an earlier results file, endpoint by endpoint.
+
+Needs MongoDB: MONGODB_URI points at the server, --database names the
+scratch database (default domunity_bench). An empty database is seeded;
+--reseed drops and reseeds it. The admin profiling endpoints are left
+out, since they hold a worker for seconds and run one at a time.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --only rest --concurrency 1 8 32 --output after.json --compare before.json
+    python benchmarks/bench_endpoints.py --endpoints Login /api/auth/login --server-env GRPC_MODE=async
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_http_concurrency import percentile
+from bench_multiprocess import free_port, wait_for_port
+from sample_data import DatasetSpec, insert_dataset
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'bench-password'
+JWT_SECRET = 'bench-secret'
+# Users, buildings and residents handed to the clients (ids are picked from these)
+FIXTURE_SAMPLE = 500
+BATCH_IDS = 20
+
+
+
+def with_database(uri, name):
+    """``uri`` with its default database replaced by ``name``"""
+    parts = urlsplit(uri)
+    return urlunsplit((parts.scheme, parts.netloc, '/' + name, parts.query, parts.fragment))
+
+
+# ==================== Dataset ====================
+
+def build_fixture(database):
+    """Ids of a sample of the seeded residents and buildings, and the admin"""
+    admin = database.users.find_one({'role': 'admin'}, {'email': 1})
+    apartments = list(database.apartments.aggregate([
+        {'$match': {'user_id': {'$ne': None}}},
+        {'$sample': {'size': FIXTURE_SAMPLE}},
+        {'$lookup': {'from': 'users', 'localField': 'user_id', 'foreignField': '_id', 'as': 'user'}},
+        {'$unwind': '$user'},
+    ]))
+    residents = [{'user_id': str(apartment['user_id']), 'email': apartment['user']['email'],
+                  'building_id': str(apartment['building_id'])} for apartment in apartments]
+    return {
+        'admin': {'user_id': str(admin['_id']), 'email': admin['email']},
+        'residents': residents,
+        'building_ids': sorted({resident['building_id'] for resident in residents}),
+    }
+
+
+# ==================== Endpoints ====================
+
+# name -> (transport, metrics handler label, call(client) returning the status)
+ENDPOINTS = {}
+
+
+def endpoint(name, transport, handler=None):
+    def register(call):
+        ENDPOINTS[name] = (transport, handler or name, call)
+        return call
+    return register
+
+
+def rest(method, path, handler=None):
+    return endpoint(f'{method} {path}', 'rest', handler or path)
+
+
+def rpc(service, method):
+    return endpoint(method, 'grpc', f'/domunity.{service}/{method}')
+
+
+class Client:
+    """One load thread's keep-alive HTTP connection, gRPC stubs and tokens"""
+
+    def __init__(self, http_port, channel, fixture, rng):
+        import domunity_pb2
+        import domunity_pb2_grpc
+        self.http_port = http_port
+        self.conn = http.client.HTTPConnection('127.0.0.1', http_port, timeout=60)
+        self.pb = domunity_pb2
+        self.stubs = {name: getattr(domunity_pb2_grpc, f'{name}Stub')(channel)
+                      for name in ('AuthService', 'UserService', 'BuildingService', 'FinancialService',
+                                   'EventService', 'ContactService', 'HealthService')}
+        self.fixture = fixture
+        self.rng = rng
+        self._tokens = {}
+
+    def resident(self):
+        return self.rng.choice(self.fixture['residents'])
+
+    def admin(self):
+        return self.fixture['admin']
+
+    def token(self, user, refresh=False):
+        import jwt
+        key = (user['user_id'], refresh)
+        if key not in self._tokens:
+            payload = {'user_id': user['user_id'], 'exp': datetime.utcnow() + timedelta(days=1)}
+            if not refresh:
+                payload['email'] = user['email']
+            self._tokens[key] = jwt.encode(payload, JWT_SECRET, algorithm='HS256')
+        return self._tokens[key]
+
+    def ids(self, key):
+        values = [resident['user_id'] for resident in self.fixture['residents']] if key == 'user_ids' \
+            else self.fixture['building_ids']
+        return self.rng.sample(values, min(BATCH_IDS, len(values)))
+
+    def http(self, method, path, body=None, user=None):
+        """Status code of one request on the keep-alive connection"""
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if user is not None:
+            headers['Authorization'] = f'Bearer {self.token(user)}'
+        try:
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException) as e:
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.http_port, timeout=60)
+            return type(e).__name__
+
+    def rpc(self, service, method, request, user=None):
+        """'OK' or the status code name of one call (streams are read to the end)"""
+        import grpc
+        metadata = [('authorization', f'Bearer {self.token(user)}')] if user is not None else None
+        try:
+            reply = getattr(self.stubs[service], method)(request, metadata=metadata, timeout=60)
+            if not hasattr(reply, 'ListFields'):
+                for _ in reply:
+                    pass
+            return 'OK'
+        except grpc.RpcError as e:
+            return e.code().name
+
+
+def _email():
+    return f'bench-{uuid.uuid4().hex}@bench.domunity.test'
+
+
+@rest('GET', '/health')
+def _health(client):
+    return client.http('GET', '/health')
+
+
+@rest('GET', '/metrics')
+def _metrics(client):
+    return client.http('GET', '/metrics')
+
+
+@rest('POST', '/api/auth/login')
+def _login(client):
+    return client.http('POST', '/api/auth/login', {'email': client.resident()['email'], 'password': PASSWORD})
+
+
+@rest('POST', '/api/auth/register')
+def _register(client):
+    return client.http('POST', '/api/auth/register',
+                       {'email': _email(), 'password': PASSWORD, 'full_name': 'Нов Потребител', 'phone': ''})
+
+
+@rest('POST', '/api/auth/refresh')
+def _refresh(client):
+    return client.http('POST', '/api/auth/refresh', {'refresh_token': client.token(client.resident(), refresh=True)})
+
+
+@rest('GET', '/api/user/profile')
+def _profile(client):
+    return client.http('GET', '/api/user/profile', user=client.resident())
+
+
+@rest('GET', '/api/user/apartment')
+def _apartment(client):
+    return client.http('GET', '/api/user/apartment', user=client.resident())
+
+
+@rest('GET', '/api/user/payments')
+def _payments(client):
+    return client.http('GET', '/api/user/payments', user=client.resident())
+
+
+@rest('GET', '/api/profiles')
+def _profiles(client):
+    return client.http('GET', '/api/profiles?ids=' + ','.join(client.ids('user_ids')), user=client.admin())
+
+
+@rest('GET', '/api/buildings')
+def _buildings(client):
+    return client.http('GET', '/api/buildings?ids=' + ','.join(client.ids('building_ids')), user=client.resident())
+
+
+@rest('GET', '/api/buildings/events')
+def _buildings_events(client):
+    return client.http('GET', '/api/buildings/events?ids=' + ','.join(client.ids('building_ids')),
+                       user=client.resident())
+
+
+@rest('GET', '/api/building/me/apartments')
+def _my_apartments(client):
+    return client.http('GET', '/api/building/me/apartments', user=client.resident())
+
+
+@rest('GET', '/api/building/me/maintenance')
+def _my_maintenance(client):
+    return client.http('GET', '/api/building/me/maintenance', user=client.resident())
+
+
+@rest('GET', '/api/building/{id}/apartments', '/api/building/{building_id:objectid}/apartments')
+def _building_apartments(client):
+    resident = client.resident()
+    return client.http('GET', f"/api/building/{resident['building_id']}/apartments", user=resident)
+
+
+@rest('GET', '/api/building/{id}/maintenance', '/api/building/{building_id:objectid}/maintenance')
+def _building_maintenance(client):
+    resident = client.resident()
+    return client.http('GET', f"/api/building/{resident['building_id']}/maintenance", user=resident)
+
+
+@rest('GET', '/api/admin/residents')
+def _residents(client):
+    return client.http('GET', '/api/admin/residents?limit=50', user=client.admin())
+
+
+@rest('GET', '/api/admin/config')
+def _admin_config(client):
+    return client.http('GET', '/api/admin/config', user=client.admin())
+
+
+@rest('GET', '/api/admin/slow-aggregations')
+def _slow_aggregations(client):
+    return client.http('GET', '/api/admin/slow-aggregations', user=client.admin())
+
+
+@rest('POST', '/api/contact/form')
+def _contact_form(client):
+    return client.http('POST', '/api/contact/form',
+                       {'name': 'Иван Иванов', 'phone': '+359 888 123 456', 'email': _email(), 'message': 'Здравейте'})
+
+
+@rest('POST', '/api/contact/offer')
+def _offer(client):
+    return client.http('POST', '/api/contact/offer',
+                       {'phone': '+359 888 123 456', 'email': _email(), 'city': 'София', 'num_properties': 2,
+                        'address': 'ж.к. Младост 3'})
+
+
+@rest('POST', '/api/contact/presentation')
+def _presentation(client):
+    return client.http('POST', '/api/contact/presentation',
+                       {'date': '2026-01-15', 'building_type': 'residential', 'phone': '+359 888 123 456',
+                        'email': _email(), 'address': 'ж.к. Младост 3'})
+
+
+@rpc('AuthService', 'Login')
+def _rpc_login(client):
+    return client.rpc('AuthService', 'Login',
+                      client.pb.LoginRequest(email=client.resident()['email'], password=PASSWORD))
+
+
+@rpc('AuthService', 'Register')
+def _rpc_register(client):
+    return client.rpc('AuthService', 'Register',
+                      client.pb.RegisterRequest(email=_email(), password=PASSWORD, full_name='Нов Потребител'))
+
+
+@rpc('AuthService', 'RefreshToken')
+def _rpc_refresh(client):
+    return client.rpc('AuthService', 'RefreshToken', client.pb.RefreshTokenRequest(
+        refresh_token=client.token(client.resident(), refresh=True)))
+
+
+@rpc('AuthService', 'ForgotPassword')
+def _rpc_forgot_password(client):
+    return client.rpc('AuthService', 'ForgotPassword',
+                      client.pb.ForgotPasswordRequest(email=client.resident()['email']))
+
+
+@rpc('UserService', 'GetProfile')
+def _rpc_profile(client):
+    resident = client.resident()
+    return client.rpc('UserService', 'GetProfile', client.pb.GetProfileRequest(user_id=resident['user_id']),
+                      resident)
+
+
+@rpc('UserService', 'UpdateProfile')
+def _rpc_update_profile(client):
+    resident = client.resident()
+    return client.rpc('UserService', 'UpdateProfile', client.pb.UpdateProfileRequest(
+        user_id=resident['user_id'], full_name='Обновен Живущ', phone='+359 888 765 432'), resident)
+
+
+@rpc('UserService', 'GetProfiles')
+def _rpc_profiles(client):
+    return client.rpc('UserService', 'GetProfiles', client.pb.GetProfilesRequest(user_ids=client.ids('user_ids')),
+                      client.admin())
+
+
+@rpc('BuildingService', 'GetBuilding')
+def _rpc_building(client):
+    resident = client.resident()
+    return client.rpc('BuildingService', 'GetBuilding',
+                      client.pb.GetBuildingRequest(building_id=resident['building_id']), resident)
+
+
+@rpc('BuildingService', 'GetBuildings')
+def _rpc_buildings(client):
+    return client.rpc('BuildingService', 'GetBuildings',
+                      client.pb.GetBuildingsRequest(building_ids=client.ids('building_ids')), client.resident())
+
+
+@rpc('BuildingService', 'ListApartments')
+def _rpc_apartments(client):
+    resident = client.resident()
+    return client.rpc('BuildingService', 'ListApartments',
+                      client.pb.ListApartmentsRequest(building_id=resident['building_id']), resident)
+
+
+@rpc('BuildingService', 'StreamApartments')
+def _rpc_stream_apartments(client):
+    resident = client.resident()
+    return client.rpc('BuildingService', 'StreamApartments',
+                      client.pb.StreamApartmentsRequest(building_id=resident['building_id']), resident)
+
+
+@rpc('FinancialService', 'GetFinancialReport')
+def _rpc_report(client):
+    resident = client.resident()
+    return client.rpc('FinancialService', 'GetFinancialReport', client.pb.GetFinancialReportRequest(
+        user_id=resident['user_id'], building_id=resident['building_id']), resident)
+
+
+@rpc('FinancialService', 'StreamFinancialReport')
+def _rpc_stream_report(client):
+    resident = client.resident()
+    return client.rpc('FinancialService', 'StreamFinancialReport', client.pb.StreamFinancialReportRequest(
+        user_id=resident['user_id'], building_id=resident['building_id']), resident)
+
+
+@rpc('FinancialService', 'GetPaymentHistory')
+def _rpc_payment_history(client):
+    resident = client.resident()
+    return client.rpc('FinancialService', 'GetPaymentHistory',
+                      client.pb.GetPaymentHistoryRequest(user_id=resident['user_id']), resident)
+
+
+@rpc('EventService', 'ListEvents')
+def _rpc_events(client):
+    resident = client.resident()
+    return client.rpc('EventService', 'ListEvents',
+                      client.pb.ListEventsRequest(building_id=resident['building_id'], limit=10), resident)
+
+
+@rpc('EventService', 'ListEventsForBuildings')
+def _rpc_events_for_buildings(client):
+    return client.rpc('EventService', 'ListEventsForBuildings', client.pb.ListEventsForBuildingsRequest(
+        building_ids=client.ids('building_ids'), limit=10), client.resident())
+
+
+@rpc('EventService', 'CreateEvent')
+def _rpc_create_event(client):
+    resident = client.resident()
+    return client.rpc('EventService', 'CreateEvent', client.pb.CreateEventRequest(
+        building_id=resident['building_id'], date=datetime.utcnow().strftime('%Y-%m-%d'),
+        title='Почистване', description='Почистване на входа'), resident)
+
+
+@rpc('ContactService', 'SendContactForm')
+def _rpc_contact_form(client):
+    return client.rpc('ContactService', 'SendContactForm', client.pb.ContactFormRequest(
+        name='Иван Иванов', phone='+359 888 123 456', email=_email(), message='Здравейте'))
+
+
+@rpc('ContactService', 'RequestOffer')
+def _rpc_offer(client):
+    return client.rpc('ContactService', 'RequestOffer', client.pb.OfferRequest(
+        phone='+359 888 123 456', email=_email(), city='София', num_properties=2, address='ж.к. Младост 3'))
+
+
+@rpc('ContactService', 'RequestPresentation')
+def _rpc_presentation(client):
+    return client.rpc('ContactService', 'RequestPresentation', client.pb.PresentationRequest(
+        date='2026-01-15', building_type='residential', phone='+359 888 123 456', email=_email(),
+        address='ж.к. Младост 3'))
+
+
+@rpc('HealthService', 'Check')
+def _rpc_health(client):
+    return client.rpc('HealthService', 'Check', client.pb.HealthCheckRequest())
+
+
+# ==================== Load ====================
+
+def _ok(status):
+    return status == 'OK' or (isinstance(status, int) and 200 <= status < 300)
+
+
+def client_worker(name, http_port, grpc_port, fixture, connections, duration, seed_value, results):
+    """One load process: `connections` closed-loop clients calling `name` for `duration` seconds"""
+    import grpc
+    call = ENDPOINTS[name][2]
+    channel = grpc.insecure_channel(f'127.0.0.1:{grpc_port}')
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def run(index):
+        client = Client(http_port, channel, fixture, random.Random(seed_value * 1000 + index))
+        own_latencies = []
+        own_errors = {}
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            status = call(client)
+            if _ok(status):
+                own_latencies.append(time.perf_counter() - started)
+            else:
+                own_errors[str(status)] = own_errors.get(str(status), 0) + 1
+        client.conn.close()
+        with lock:
+            latencies.extend(own_latencies)
+            for status, count in own_errors.items():
+                errors[status] = errors.get(status, 0) + count
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    channel.close()
+    results.put({'latencies': latencies, 'errors': errors})
+
+
+def scrape_round_trips(http_port):
+    """{handler: (round trips, requests)} from the server's /metrics"""
+    conn = http.client.HTTPConnection('127.0.0.1', http_port, timeout=30)
+    conn.request('GET', '/metrics')
+    text = conn.getresponse().read().decode()
+    conn.close()
+    totals = {}
+    for line in text.splitlines():
+        for suffix, index in (('_sum', 0), ('_count', 1)):
+            prefix = f'domunity_mongo_round_trips_per_request{suffix}{{handler="'
+            if line.startswith(prefix):
+                handler, value = line[len(prefix):].rsplit('"} ', 1)
+                entry = totals.setdefault(handler.replace('\\"', '"').replace('\\\\', '\\'), [0.0, 0])
+                entry[index] = float(value)
+    return totals
+
+
+def bench(name, concurrency, duration, ports, fixture, args, context, seed_value):
+    transport, handler, _ = ENDPOINTS[name]
+    before = scrape_round_trips(ports['http']).get(handler, (0.0, 0))
+    results = context.SimpleQueue()
+    processes = max(1, min(args.client_processes, concurrency))
+    shares = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    clients = [context.Process(target=client_worker,
+                               args=(name, ports['http'], ports['grpc'], fixture, share, duration,
+                                     seed_value + i, results))
+               for i, share in enumerate(shares)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    outcomes = [results.get() for _ in clients]
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - started
+    after = scrape_round_trips(ports['http']).get(handler, (0.0, 0))
+
+    latencies = sorted(latency for outcome in outcomes for latency in outcome['latencies'])
+    errors = {}
+    for outcome in outcomes:
+        for status, count in outcome['errors'].items():
+            errors[status] = errors.get(status, 0) + count
+    calls = after[1] - before[1]
+    return {
+        'endpoint': name,
+        'transport': transport,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mongo_round_trips_per_call': round((after[0] - before[0]) / calls, 2) if calls else None,
+    }
+
+
+def compare(runs, baseline):
+    """Relative change of throughput and latency for every endpoint/concurrency in both runs"""
+    previous = {(run['endpoint'], run['concurrency']): run for run in baseline['runs']}
+    changes = []
+    for run in runs:
+        old = previous.get((run['endpoint'], run['concurrency']))
+        if old is None:
+            continue
+        change = {'endpoint': run['endpoint'], 'concurrency': run['concurrency']}
+        for key in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change[f'{key}_ratio'] = round(run[key] / old[key], 3) if old[key] else None
+        change['mongo_round_trips_per_call'] = [old['mongo_round_trips_per_call'], run['mongo_round_trips_per_call']]
+        changes.append(change)
+    return changes
+
+
+# ==================== Server ====================
+
+def start_server(uri, ports, server_env, log_file):
+    env = {**os.environ, 'MONGODB_URI': uri, 'HTTP_PORT': str(ports['http']), 'GRPC_PORT': str(ports['grpc']),
+           'JWT_SECRET': JWT_SECRET, 'SERVER_PROCESSES': '1', 'LOG_LEVEL': 'WARNING',
+           # Every client thread may wait on bcrypt: queue logins instead of answering 429
+           'PASSWORD_MAX_PENDING': '1024', **server_env}
+    process = subprocess.Popen([sys.executable, 'server.py'], cwd=BACKEND_DIR, env=env,
+                               stdout=log_file, stderr=subprocess.STDOUT)
+    try:
+        wait_for_port(ports['http'], timeout=120)
+        wait_for_port(ports['grpc'], timeout=30)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='domunity_bench', help='scratch database on MONGODB_URI')
+    parser.add_argument('--reseed', action='store_true', help='drop the database and seed it again')
+    parser.add_argument('--buildings', type=int, default=50)
+    parser.add_argument('--apartments', type=int, default=40, help='apartments per building')
+    parser.add_argument('--months', type=int, default=24, help='months of payments per apartment')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the dataset and the clients')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='cost of the seeded password hash (production hashes use 12)')
+    parser.add_argument('--only', choices=('rest', 'grpc'), help='benchmark one transport')
+    parser.add_argument('--endpoints', nargs='+', help='endpoint names (default: all), e.g. Login "GET /health"')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of load per endpoint and concurrency')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds of unmeasured load per endpoint')
+    parser.add_argument('--client-processes', type=int, default=2)
+    parser.add_argument('--server-env', nargs='*', default=[], metavar='NAME=VALUE',
+                        help='extra environment of the server (e.g. GRPC_MODE=async)')
+    parser.add_argument('--output', help='also write the results JSON here')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare against')
+    args = parser.parse_args()
+
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        parser.error('MONGODB_URI is not set')
+    names = args.endpoints or [name for name, (transport, _, _) in ENDPOINTS.items()
+                               if args.only in (None, transport)]
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints {unknown}; known: {list(ENDPOINTS)}")
+    server_env = dict(item.split('=', 1) for item in args.server_env)
+
+    from pymongo import MongoClient
+    mongo = MongoClient(uri)
+    database = mongo[args.database]
+    if args.reseed:
+        mongo.drop_database(args.database)
+    seeded_at = time.perf_counter()
+    if database.buildings.estimated_document_count() == 0:
+        insert_dataset(database, DatasetSpec(args.buildings, args.apartments, args.months, args.seed,
+                                             password=PASSWORD, bcrypt_rounds=args.bcrypt_rounds))
+        fixture = build_fixture(database)
+        seed_seconds = round(time.perf_counter() - seeded_at, 1)
+    else:
+        fixture = build_fixture(database)
+        seed_seconds = None
+    dataset = {name: database[name].estimated_document_count()
+               for name in ('buildings', 'apartments', 'users', 'payments', 'events')}
+    mongo.close()
+
+    ports = {'http': free_port(), 'grpc': free_port()}
+    context = multiprocessing.get_context('spawn')
+    server_log = os.path.join(tempfile.mkdtemp(prefix='bench-endpoints-'), 'server.log')
+    with open(server_log, 'w') as log_file:
+        server = start_server(with_database(uri, args.database), ports, server_env, log_file)
+        runs = []
+        try:
+            for index, name in enumerate(names):
+                print(f'{name} ...', file=sys.stderr)
+                bench(name, args.concurrency[0], args.warmup, ports, fixture, args, context, args.seed)
+                for concurrency in args.concurrency:
+                    runs.append(bench(name, concurrency, args.duration, ports, fixture, args, context,
+                                      args.seed + 100 * index))
+        finally:
+            stop_server(server)
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'cpu_count': os.cpu_count(),
+        'dataset': {'database': args.database, 'seed': args.seed, 'seed_seconds': seed_seconds, **dataset},
+        'server_env': server_env,
+        'server_log': server_log,
+        'duration': args.duration,
+        'runs': runs,
+    }
+    if args.compare:
+        with open(args.compare) as stream:
+            report['comparison'] = compare(runs, json.load(stream))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            stream.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+gRPC serving mode benchmark: threaded grpc.server vs grpc.aio
+
+Serves EventService.ListEvents from both the threaded EventServicer and the
+AsyncEventServicer over an in-memory events collection that adds a fixed
+latency per query (time.sleep vs asyncio.sleep), emulating the MongoDB round
+trip. A grpc.aio client keeps --concurrency calls in flight per mode.
+
+Usage:
+    python benchmarks/bench_grpc_modes.py --concurrency 10 100 500 --db-latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent import futures
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+logging.disable(logging.INFO)
+
+import grpc
+from bson import ObjectId
+
+import domunity_pb2
+import domunity_pb2_grpc
+from server import EventServicer
+from aio_server import AsyncEventServicer
+
+BUILDING_ID = ObjectId()
+EVENTS = [
+    {'_id': ObjectId(), 'building_id': BUILDING_ID, 'date': datetime(2025, 1, i + 1),
+     'title': f'Събитие {i}', 'description': 'Общо събрание'}
+    for i in range(10)
+]
+
+
+class _Cursor:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def __iter__(self):
+        time.sleep(self.delay)
+        return iter(EVENTS)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.delay)
+        for event in EVENTS:
+            yield event
+
+
+class LatencyDatabase:
+    """Exposes .db.events.find() with a fixed per-query latency"""
+
+    def __init__(self, delay):
+        cursor = _Cursor(delay)
+
+        class _Events:
+            def find(self, *args):
+                return cursor
+
+        class _Db:
+            events = _Events()
+
+        self.db = _Db()
+
+    def get_cursor(self):
+        return None
+
+
+async def drive(port, concurrency, duration):
+    request = domunity_pb2.ListEventsRequest(building_id=str(BUILDING_ID), limit=10)
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+        stub = domunity_pb2_grpc.EventServiceStub(channel)
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await stub.ListEvents(request)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+async def bench_async(concurrency, duration, delay):
+    server = grpc.aio.server()
+    domunity_pb2_grpc.add_EventServiceServicer_to_server(AsyncEventServicer(LatencyDatabase(delay)), server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    await server.start()
+    try:
+        return await drive(port, concurrency, duration)
+    finally:
+        await server.stop(None)
+
+
+def bench_threaded(concurrency, duration, delay, workers):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    domunity_pb2_grpc.add_EventServiceServicer_to_server(EventServicer(LatencyDatabase(delay)), server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    try:
+        return asyncio.run(drive(port, concurrency, duration))
+    finally:
+        server.stop(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--db-latency-ms', type=float, default=20.0)
+    parser.add_argument('--grpc-workers', type=int, default=10, help='thread pool size of the threaded mode')
+    args = parser.parse_args()
+
+    delay = args.db_latency_ms / 1000.0
+    results = []
+    for concurrency in args.concurrency:
+        results.append({
+            'concurrency': concurrency,
+            'threaded': bench_threaded(concurrency, args.duration, delay, args.grpc_workers),
+            'async': asyncio.run(bench_async(concurrency, args.duration, delay)),
+        })
+
+    print(json.dumps({'db_latency_ms': args.db_latency_ms, 'grpc_workers': args.grpc_workers,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
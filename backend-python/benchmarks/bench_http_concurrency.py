@@ -0,0 +1,221 @@
+"""
+HTTP concurrency benchmark for the REST front-end
+
+Compares the stock single-threaded HTTPServer with PooledHTTPServer under
+many concurrent clients. Each request sleeps for --work-ms to stand in for a
+Mongo round trip or a bcrypt check, so the numbers show how well the server
+overlaps blocking work rather than raw parsing speed.
+
+--idle-clients opens that many extra keep-alive connections before the
+load, each sending one request and then sitting idle (a browser tab left
+open), and sends one more request on each afterwards. With idle
+connections parked outside the worker pool the load is unaffected; if
+they held workers it would queue behind them or get 503s. In-process
+runs keep both ends of every connection in this process, so raise
+`ulimit -n` for a few hundred idle clients.
+
+Usage:
+    python benchmarks/bench_http_concurrency.py --clients 128 --requests 2000
+    python benchmarks/bench_http_concurrency.py --clients 128 --requests 2000 --keep-alive
+    python benchmarks/bench_http_concurrency.py --clients 32 --requests 2000 --keep-alive --idle-clients 200
+    python benchmarks/bench_http_concurrency.py --url http://localhost:8080/health
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent import futures
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_server import PooledHTTPServer, KeepAliveRequestHandler, DEFAULT_HTTP_IDLE_TIMEOUT
+
+
+class LegacySlowHandler(BaseHTTPRequestHandler):
+    """Minimal HTTP/1.0 JSON handler that simulates blocking I/O (the old setup)"""
+
+    work_seconds = 0.01
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.work_seconds)
+        body = json.dumps({'status': 'ok'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SlowHandler(KeepAliveRequestHandler):
+    """Same handler on HTTP/1.1 with keep-alive"""
+
+    work_seconds = 0.01
+    log_message = LegacySlowHandler.log_message
+    do_GET = LegacySlowHandler.do_GET
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(host, port, path, clients, total_requests, timeout, keep_alive=False):
+    """Drive total_requests GETs from `clients` threads.
+
+    Without keep_alive every request opens a new connection; with it each
+    client thread reuses its connection and reconnects only when the server
+    closes it.
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker():
+        conn = None
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if not keep_alive or response.will_close:
+                    conn.close()
+                    conn = None
+            except Exception as e:
+                status = type(e).__name__
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+        if conn is not None:
+            conn.close()
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total_requests,
+        'clients': clients,
+        'wall_seconds': round(wall, 3),
+        'requests_per_second': round(total_requests / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'statuses': {str(k): v for k, v in statuses.items()},
+    }
+
+
+def _request_each(connections, path):
+    """One GET on every connection; returns the count of each status (or exception name)"""
+    statuses = {}
+    for conn in connections:
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except Exception as e:
+            status = type(e).__name__
+            conn.close()
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return statuses
+
+
+def run_with_idle_clients(host, port, path, args):
+    """run_load while ``args.idle_clients`` keep-alive connections sit idle, then reuse each of them"""
+    idle = [http.client.HTTPConnection(host, port, timeout=args.timeout) for _ in range(args.idle_clients)]
+    try:
+        opened = _request_each(idle, path)
+        result = run_load(host, port, path, args.clients, args.requests, args.timeout, args.keep_alive)
+        if idle:
+            result['idle_clients'] = {'count': len(idle), 'first_request': opened,
+                                      'after_load': _request_each(idle, path)}
+        return result
+    finally:
+        for conn in idle:
+            conn.close()
+
+
+def bench_in_process(server_factory, args):
+    server = server_factory()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        result = run_with_idle_clients('127.0.0.1', port, '/', args)
+        if hasattr(server, 'stats'):
+            result['server'] = server.stats()
+        return result
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=128)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--work-ms', type=float, default=10.0, help='simulated blocking work per request')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--backlog', type=int, default=256)
+    parser.add_argument('--max-queue', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--keep-alive', action='store_true', help='reuse one connection per client')
+    parser.add_argument('--idle-clients', type=int, default=0,
+                        help='extra keep-alive connections left idle during the load')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_HTTP_IDLE_TIMEOUT,
+                        help='idle timeout of the pooled server (keep it above the load duration)')
+    parser.add_argument('--url', help='benchmark a running server instead of in-process ones')
+    args = parser.parse_args()
+
+    if args.url:
+        parsed = urlparse(args.url)
+        result = run_with_idle_clients(parsed.hostname, parsed.port or 80, parsed.path or '/', args)
+        print(json.dumps({'target': args.url, **result}, indent=2))
+        return
+
+    LegacySlowHandler.work_seconds = SlowHandler.work_seconds = args.work_ms / 1000.0
+
+    def single():
+        # listen() happens in the constructor, so the backlog must be a class attribute
+        server_class = type('SingleThreadedHTTPServer', (HTTPServer,), {'request_queue_size': args.backlog})
+        return server_class(('127.0.0.1', 0), LegacySlowHandler)
+
+    def pooled():
+        return PooledHTTPServer(('127.0.0.1', 0), SlowHandler, max_workers=args.workers,
+                                backlog=args.backlog, max_queue=args.max_queue, idle_timeout=args.idle_timeout)
+
+    results = {
+        'single_threaded': bench_in_process(single, args),
+        'pooled': bench_in_process(pooled, args),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
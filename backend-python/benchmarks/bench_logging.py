@@ -0,0 +1,179 @@
+"""
+Logging overhead benchmark (LOG_LEVEL, LOG_QUEUE_SIZE, ACCESS_LOG_SAMPLE_RATE)
+
+Serves the real REST login handler (user lookup, bcrypt verify in the
+password pool, two JWTs) or GET /health from this process and drives it
+with keep-alive clients in separate processes, once per logging mode:
+
+    off            LOG_LEVEL=WARNING, no access log
+    queue          INFO through the background queue, every request in the access log
+    queue-sampled  INFO through the queue, 1% of requests in the access log
+    sync           INFO written by the request threads, every request in the access log
+    debug-sync     DEBUG written by the request threads: the per-request detail
+                   lines as well (closest to the old logging.DEBUG setup)
+
+Logs go to a real file (--log-file, default a temporary file), since
+writing to /dev/null would hide the I/O cost. The users collection is in
+memory, so the numbers measure the server, not Mongo.
+
+Usage:
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --route health --duration 10 --clients 16
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_multiprocess import EMAIL, PASSWORD, InMemoryDatabase, free_port
+
+MODES = {
+    'off': dict(level='WARNING', queue_size=10000, access_sample_rate=0.0),
+    'queue': dict(level='INFO', queue_size=10000, access_sample_rate=1.0),
+    'queue-sampled': dict(level='INFO', queue_size=10000, access_sample_rate=0.01),
+    'sync': dict(level='INFO', queue_size=0, access_sample_rate=1.0),
+    'debug-sync': dict(level='DEBUG', queue_size=0, access_sample_rate=1.0),
+}
+
+ROUTES = {
+    'login': ('POST', '/api/auth/login', json.dumps({'email': EMAIL, 'password': PASSWORD})),
+    'health': ('GET', '/health', None),
+}
+
+
+class _Admin:
+    def command(self, name):
+        return {'ok': 1}
+
+
+def client_worker(port, route, connections, duration, results):
+    """One load process: `connections` keep-alive clients for `duration` seconds"""
+    method, path, body = ROUTES[route]
+    headers = {'Content-Type': 'application/json'} if body else {}
+    deadline = time.monotonic() + duration
+    counts = {}
+    lock = threading.Lock()
+
+    def run():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except Exception as e:
+                status = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            with lock:
+                counts[status] = counts.get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({str(k): v for k, v in counts.items()})
+
+
+def bench(mode, server, log_file, args, context):
+    from log_config import LoggingConfig, configure_logging
+    from metrics import LOG_RECORDS_DROPPED
+
+    with open(log_file, 'w') as stream:
+        configure_logging(LoggingConfig(**MODES[mode]), stream=stream)
+        dropped = LOG_RECORDS_DROPPED.value()
+        results = context.SimpleQueue()
+        per_client = max(1, args.clients // args.client_processes)
+        clients = [context.Process(target=client_worker,
+                                   args=(server.server_address[1], args.route, per_client, args.duration, results))
+                   for _ in range(args.client_processes)]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        wall = time.perf_counter() - started
+        # Detach the file; queued records are written out before this returns
+        configure_logging(LoggingConfig(level='WARNING', queue_size=0, access_sample_rate=0.0), stream=sys.stderr)
+        dropped = LOG_RECORDS_DROPPED.value() - dropped
+    with open(log_file) as stream:
+        lines = sum(1 for _ in stream)
+
+    statuses = {}
+    for _ in clients:
+        for status, count in results.get().items():
+            statuses[status] = statuses.get(status, 0) + count
+    ok = statuses.get('200', 0)
+    return {
+        'mode': mode,
+        'requests': ok,
+        'requests_per_second': round(ok / wall, 1) if wall else 0.0,
+        'log_lines': lines,
+        'log_records_dropped': dropped,
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--route', choices=list(ROUTES), default='login')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of load per mode')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent keep-alive connections')
+    parser.add_argument('--client-processes', type=int, default=2)
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='cost of the stored hash (production hashes use 12)')
+    parser.add_argument('--log-file', help='where the server logs go (default: a temporary file)')
+    args = parser.parse_args()
+
+    # server.py configures logging on import: keep stdout for the results
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    import bcrypt
+    from bson import ObjectId
+    from http_server import PooledHTTPServer
+    from passwords import PasswordHasher
+    from server import APIHandler
+
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=args.bcrypt_rounds)).decode()
+    database = InMemoryDatabase([{
+        '_id': ObjectId(), 'email': EMAIL, 'password_hash': password_hash,
+        'full_name': 'Bench User', 'phone': '',
+    }])
+    database.client = type('Client', (), {'admin': _Admin()})()
+    APIHandler.db = database
+    password_hasher = PasswordHasher(max_pending=args.clients)
+    APIHandler.password_hasher = password_hasher
+    server = PooledHTTPServer(('127.0.0.1', free_port()), APIHandler, max_workers=args.clients + 4)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    context = multiprocessing.get_context('spawn')
+    log_file = args.log_file or os.path.join(tempfile.mkdtemp(prefix='bench-logging-'), 'server.log')
+    try:
+        # Warm up the password pool and the handler code paths
+        bench('off', server, log_file, argparse.Namespace(**{**vars(args), 'duration': 1.0}), context)
+        runs = [bench(mode, server, log_file, args, context) for mode in args.modes]
+    finally:
+        server.shutdown()
+        server.server_close()
+        password_hasher.shutdown()
+
+    baseline = next((run['requests_per_second'] for run in runs if run['mode'] == 'off'), None)
+    for run in runs:
+        if baseline:
+            run['relative_to_off'] = round(run['requests_per_second'] / baseline, 3)
+    print(json.dumps({'route': args.route, 'cpu_count': os.cpu_count(), 'log_file': log_file, 'runs': runs},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
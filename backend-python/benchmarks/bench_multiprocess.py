@@ -0,0 +1,199 @@
+"""
+Multi-process serving benchmark (SERVER_PROCESSES)
+
+Runs the real REST login handler (POST /api/auth/login: user lookup, bcrypt
+verify in the password pool, two JWTs, JSON response) in 1, 2, 4, ...
+worker processes under the Supervisor, all sharing one port through
+SO_REUSEPORT, and drives it from several client processes. The users
+collection is in memory so the numbers measure the server, not Mongo.
+
+Each worker gets cpu_count // processes password workers, as main() in
+server.py does, so the total bcrypt capacity stays the same and the
+speedup comes from running the HTTP, JWT and JSON work outside one GIL.
+Scaling is bounded by the cores on the machine: run it on a host with at
+least as many cores as the largest --processes value (plus the clients).
+
+Usage:
+    python benchmarks/bench_multiprocess.py
+    python benchmarks/bench_multiprocess.py --processes 1 2 4 8 --duration 10 --clients 64
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supervisor import Supervisor
+
+EMAIL = 'bench@domunity.test'
+PASSWORD = 'bench-password'
+
+
+class InMemoryUsers:
+    def __init__(self, users):
+        self.users = {user['email']: user for user in users}
+
+    def find_one(self, query):
+        return self.users.get(query.get('email'))
+
+
+class InMemoryDatabase:
+    def __init__(self, users):
+        self.db = type('Collections', (), {'users': InMemoryUsers(users)})()
+
+
+def serve_worker(port, password_hash, password_workers, max_pending):
+    """One worker process: the login handler on a SO_REUSEPORT listener"""
+    logging.disable(logging.CRITICAL)
+    from bson import ObjectId
+    from http_server import PooledHTTPServer
+    from passwords import PasswordHasher
+    from server import APIHandler
+
+    APIHandler.db = InMemoryDatabase([{
+        '_id': ObjectId(), 'email': EMAIL, 'password_hash': password_hash,
+        'full_name': 'Bench User', 'phone': '',
+    }])
+    password_hasher = PasswordHasher(max_workers=password_workers, max_pending=max_pending)
+    APIHandler.password_hasher = password_hasher
+    server = PooledHTTPServer(('127.0.0.1', port), APIHandler, reuse_port=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Drain on SIGTERM from the supervisor, like serve() in server.py
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    stopping.wait()
+    server.drain(5)
+    password_hasher.shutdown()
+
+
+def client_worker(port, connections, duration, results):
+    """One load process: `connections` keep-alive clients posting logins for `duration` seconds"""
+    body = json.dumps({'email': EMAIL, 'password': PASSWORD})
+    headers = {'Content-Type': 'application/json'}
+    deadline = time.monotonic() + duration
+    counts = {}
+    lock = threading.Lock()
+
+    def run():
+        conn = None
+        while time.monotonic() < deadline:
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.request('POST', '/api/auth/login', body, headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except Exception as e:
+                status = type(e).__name__
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            with lock:
+                counts[status] = counts.get(status, 0) + 1
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({str(k): v for k, v in counts.items()})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"workers did not start listening on port {port}")
+
+
+def bench(processes, password_hash, args):
+    context = multiprocessing.get_context('spawn')
+    port = free_port()
+    password_workers = max(1, (os.cpu_count() or 1) // processes)
+    # Queue every client's login rather than answering 429: this measures throughput
+    supervisor = Supervisor(processes, serve_worker, args=(port, password_hash, password_workers, args.clients),
+                            drain_seconds=10, context=context)
+    supervisor.start()
+    try:
+        wait_for_port(port)
+        # Warm up every worker's password pool before measuring
+        client_worker(port, processes * 2, 1.0, context.SimpleQueue())
+
+        results = context.SimpleQueue()
+        per_client = max(1, args.clients // args.client_processes)
+        clients = [context.Process(target=client_worker, args=(port, per_client, args.duration, results))
+                   for _ in range(args.client_processes)]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        wall = time.perf_counter() - started
+    finally:
+        supervisor.shutdown()
+
+    statuses = {}
+    for _ in clients:
+        for status, count in results.get().items():
+            statuses[status] = statuses.get(status, 0) + count
+    ok = statuses.get('200', 0)
+    return {
+        'processes': processes,
+        'password_workers_per_process': password_workers,
+        'wall_seconds': round(wall, 3),
+        'logins': ok,
+        'logins_per_second': round(ok / wall, 1) if wall else 0.0,
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of load per run')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent keep-alive connections')
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--bcrypt-rounds', type=int, default=8,
+                        help='cost of the stored hash (production hashes use 12)')
+    args = parser.parse_args()
+
+    import bcrypt
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=args.bcrypt_rounds)).decode()
+
+    runs = [bench(processes, password_hash, args) for processes in args.processes]
+    baseline = runs[0]['logins_per_second'] / runs[0]['processes'] if runs[0]['logins_per_second'] else 0.0
+    for run in runs:
+        if baseline:
+            run['speedup'] = round(run['logins_per_second'] / (baseline * runs[0]['processes']), 2)
+            run['efficiency'] = round(run['logins_per_second'] / (baseline * run['processes']), 2)
+    print(json.dumps({'cpu_count': os.cpu_count(), 'runs': runs}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
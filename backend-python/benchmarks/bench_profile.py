@@ -0,0 +1,116 @@
+"""
+Profile assembly benchmark: sequential find_one chain vs single aggregation
+
+Runs against a real MongoDB (MONGODB_URI) seeded with the sample data and
+adds an artificial delay to every database command, emulating the network
+round trip between the app and a hosted cluster. The legacy path reproduces
+the old user -> apartment -> building -> profile -> events -> payments chain.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017/domunity python benchmarks/bench_profile.py --delay-ms 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database
+from queries import load_profile
+
+
+class DelayedCollection:
+    """Collection proxy that sleeps before every command"""
+
+    def __init__(self, collection, delay, counter):
+        self._collection = collection
+        self._delay = delay
+        self._counter = counter
+
+    def _wrap(self, name):
+        method = getattr(self._collection, name)
+
+        def call(*args, **kwargs):
+            self._counter[0] += 1
+            time.sleep(self._delay)
+            return method(*args, **kwargs)
+        return call
+
+    def __getattr__(self, name):
+        if name in ('find', 'find_one', 'aggregate'):
+            return self._wrap(name)
+        return getattr(self._collection, name)
+
+
+class DelayedDatabase:
+    """Exposes .db.<collection> like Database, with injected latency"""
+
+    def __init__(self, database, delay):
+        self.counter = [0]
+        outer = self
+
+        class _Db:
+            def __getattr__(self, name):
+                return DelayedCollection(database.db[name], delay, outer.counter)
+
+        self.db = _Db()
+
+
+def legacy_load_profile(db, user_id):
+    """The pre-aggregation REST profile path: one query per entity"""
+    user = db.db.users.find_one({"_id": user_id})
+    apartment = db.db.apartments.find_one({"user_id": user_id})
+    building = db.db.buildings.find_one({"_id": apartment['building_id']}) if apartment else None
+    profile = db.db.user_profiles.find_one({"user_id": user_id})
+    events = list(db.db.events.find({"building_id": building['_id']}).sort("date", -1).limit(10)) if building else []
+    payments = list(db.db.payments.find({"user_id": user_id}).sort("created_at", -1))
+    return user, apartment, building, profile, events, payments
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': round(statistics.mean(samples), 2),
+        'p50_ms': round(samples[len(samples) // 2], 2),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay-ms', type=float, default=5.0, help='latency injected per database command')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--email', default='ivan.ivanov@example.com', help='profile to load')
+    args = parser.parse_args()
+
+    database = Database()
+    user = database.db.users.find_one({"email": args.email}, {"_id": 1})
+    if not user:
+        sys.exit(f"No user with email {args.email}")
+
+    delayed = DelayedDatabase(database, args.delay_ms / 1000.0)
+
+    results = {}
+    for name, fn in (
+        ('legacy_sequential', lambda: legacy_load_profile(delayed, user['_id'])),
+        ('single_aggregation', lambda: load_profile(delayed, user['_id'], include_activity=True)),
+    ):
+        delayed.counter[0] = 0
+        stats = measure(fn, args.iterations)
+        stats['queries_per_call'] = delayed.counter[0] / args.iterations
+        results[name] = stats
+
+    print(json.dumps({'delay_ms': args.delay_ms, 'iterations': args.iterations, **results}, indent=2))
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import json
+import time
+import logging
+import threading
+from bson import ObjectId
+from balances import BALANCES_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+def build_grid_pipeline(building_id):
+    """Apartments of a building with resident name and balance, top floor first"""
+    return [
+        {"$match": {"building_id": building_id}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"full_name": 1}}],
+            "as": "user"
+        }},
+        {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": BALANCES_COLLECTION,
+            "localField": "_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"amount_due": 1, "status": 1}}],
+            "as": "balance"
+        }},
+        {"$project": {"number": 1, "floor": 1, "user_id": 1, "user": 1, "balance": 1}},
+        {"$sort": {"floor": -1, "number": 1}}
+    ]
+
+
+def family_label(full_name):
+    """Entrance-page label for a resident's apartment"""
+    return full_name.split(' ')[0] + 'и' if full_name else 'Неизвестни'
+
+
+class _Snapshot:
+    __slots__ = ('body', 'apartment_ids', 'user_ids', 'expires_at')
+
+    def __init__(self, body, apartment_ids, user_ids, expires_at):
+        self.body = body
+        self.apartment_ids = apartment_ids
+        self.user_ids = user_ids
+        self.expires_at = expires_at
+
+
+class BuildingGrid:
+    """Precomputed Entrance-page floor grid per building, kept as JSON bytes.
+
+    The grid (floors -> apartments -> family/amount/status) is built with
+    one aggregation and serialized once; requests are then answered with the
+    stored bytes. Writers invalidate through invalidate_payment /
+    invalidate_apartment / invalidate_user, and the next request rebuilds.
+    Each snapshot remembers the apartments and users it was built from, so
+    invalidation needs no database lookup.
+
+    Concurrent misses for a building share one rebuild through the cache's
+    SingleFlight. A snapshot whose build overlapped an invalidation is
+    served to the callers waiting on it but not stored.
+    The TTL bounds staleness for writes made outside this process.
+    """
+
+    def __init__(self, database, cache, ttl=300.0):
+        self.database = database
+        self.cache = cache
+        self.ttl = ttl
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._builds = 0
+        self._invalidations = 0
+        # Apartment writes made through the read-through cache drop grids too
+        cache.apartment_listeners.append(self.invalidate_apartment)
+
+    def _fresh(self, building_id):
+        with self._lock:
+            snapshot = self._snapshots.get(building_id)
+            if snapshot is not None and snapshot.expires_at > time.monotonic():
+                return snapshot.body
+            return None
+
+    def get_json(self, building_id):
+        """Serialized grid for a building"""
+        building_id = ObjectId(building_id)
+        body = self._fresh(building_id)
+        if body is not None:
+            with self._lock:
+                self._hits += 1
+            return body
+        return self.cache.flights.do(('building_grid', building_id), lambda: self._rebuild(building_id))
+
+    def _rebuild(self, building_id):
+        with self._lock:
+            generation = self._generation
+
+        started = time.perf_counter()
+        building = self.cache.get_building(building_id)
+        floors_dict = {}
+        apartment_ids = set()
+        user_ids = set()
+        for apt in self.database.db.apartments.aggregate(build_grid_pipeline(building_id)):
+            apartment_ids.add(apt['_id'])
+            if apt.get('user_id') is not None:
+                user_ids.add(apt['user_id'])
+
+            # Apartments without payments have no balance document
+            balance = (apt.get('balance') or [{}])[0]
+            floor_num = apt.get('floor') or 1
+            floors_dict.setdefault(floor_num, []).append({
+                'number': apt['number'],
+                'family': family_label(apt.get('user', {}).get('full_name', '')),
+                'amount': float(balance.get('amount_due', 0)),
+                'status': balance.get('status', 'paid'),
+            })
+
+        body = json.dumps({
+            'building': {
+                'address': building['address'] if building else '',
+                'entrance': building['entrance'] if building else '',
+            },
+            'floors': [{'floor': f, 'apartments': apts} for f, apts in sorted(floors_dict.items(), reverse=True)],
+        }).encode()
+
+        with self._lock:
+            self._builds += 1
+            if generation == self._generation:
+                self._snapshots[building_id] = _Snapshot(
+                    body, frozenset(apartment_ids), frozenset(user_ids), time.monotonic() + self.ttl)
+        logger.info(f"✓ Building grid {building_id} rebuilt in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return body
+
+    def _drop(self, matches):
+        with self._lock:
+            self._generation += 1
+            for building_id in [b for b, snapshot in self._snapshots.items() if matches(b, snapshot)]:
+                del self._snapshots[building_id]
+                self._invalidations += 1
+
+    def invalidate_building(self, building_id):
+        building_id = ObjectId(building_id)
+        self._drop(lambda b, snapshot: b == building_id)
+
+    def invalidate_apartment(self, apartment):
+        """Drop the grids an apartment document is (or is moving) in"""
+        apartment_id = apartment.get('_id')
+        building_id = apartment.get('building_id')
+        self._drop(lambda b, snapshot: b == building_id or apartment_id in snapshot.apartment_ids)
+
+    def invalidate_payment(self, apartment_id):
+        """A payment of this apartment changed its balance"""
+        self._drop(lambda b, snapshot: apartment_id in snapshot.apartment_ids)
+
+    def invalidate_user(self, user_id):
+        """A resident's name changed"""
+        user_id = ObjectId(user_id)
+        self._drop(lambda b, snapshot: user_id in snapshot.user_ids)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'snapshots': len(self._snapshots),
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'builds': self._builds,
+                'invalidations': self._invalidations,
+            }
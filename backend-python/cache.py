@@ -0,0 +1,281 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from bson import ObjectId
+from pymongo import ReturnDocument
+from singleflight import SingleFlight, AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe size-bounded LRU with a per-entry time to live"""
+
+    def __init__(self, max_entries=4096, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value, or default when missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+            self._misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+def _cached_buildings(store, building_ids):
+    """Split ids into ({id: cached building}, ids to fetch)"""
+    found, missing = {}, []
+    for building_id in building_ids:
+        value = store.get(('building', building_id), _MISSING)
+        if value is _MISSING:
+            missing.append(building_id)
+        elif value is not None:
+            found[building_id] = value
+    return found, missing
+
+
+def _projection_key(projection):
+    """Flight key suffix of a partial read, so it never shares a flight with a whole-document one"""
+    return tuple(sorted(projection.items()))
+
+
+def _store_buildings(store, building_ids, docs):
+    """Cache fetched buildings (and misses, like get_building) and return the found ones"""
+    for building_id in building_ids:
+        store.put(('building', building_id), docs.get(building_id))
+    return docs
+
+
+class ReadThroughCache:
+    """Read-through cache in front of Database for buildings and apartments.
+
+    Buildings and apartment layouts are read on almost every request but
+    change rarely, so lookups are served from an LRU with a TTL and only a
+    miss goes to MongoDB. Writes to these collections should go through
+    update_building / update_apartment (or call the invalidate_* methods),
+    which drop the affected keys so other readers see the change at once;
+    the TTL bounds staleness for writes made outside this process.
+    Concurrent misses for the same key share one query through ``flights``.
+
+    Readers that need only some fields (a field mask) pass a ``projection``:
+    a hit still returns the whole cached document, but a miss reads just
+    those fields and is not cached.
+
+    Cached documents are shared between threads and must not be mutated.
+    """
+
+    def __init__(self, database, max_entries=4096, ttl=300.0, store=None, flights=None):
+        self.database = database
+        # Pass another cache's .store to share entries (and invalidations) with it
+        self.store = store or LRUCache(max_entries, ttl)
+        self.flights = flights or SingleFlight()
+        # Called with every invalidated apartment document (e.g. BuildingGrid)
+        self.apartment_listeners = []
+
+    @classmethod
+    def from_env(cls, database, flights=None):
+        """Build a cache from CACHE_MAX_ENTRIES / CACHE_TTL"""
+        return cls(
+            database,
+            max_entries=int(os.getenv('CACHE_MAX_ENTRIES', '4096')),
+            ttl=float(os.getenv('CACHE_TTL', '300')),
+            flights=flights,
+        )
+
+    def _read_through(self, key, load, projection=None):
+        """Cached value of ``key``, or load(projection); only whole documents are cached"""
+        value = self.store.get(key, _MISSING)
+        if value is _MISSING:
+            if projection is not None:
+                return self.flights.do(key + _projection_key(projection), lambda: load(projection))
+            value = self.flights.do(key, lambda: self._load(key, lambda: load(None)))
+        return value
+
+    def _load(self, key, load):
+        value = load()
+        self.store.put(key, value)
+        return value
+
+    def get_building(self, building_id, projection=None):
+        """Building document, or None"""
+        building_id = ObjectId(building_id)
+        return self._read_through(
+            ('building', building_id),
+            lambda projection: self.database.db.buildings.find_one({"_id": building_id}, projection),
+            projection)
+
+    def get_buildings(self, building_ids, projection=None):
+        """{building_id: building} for the ids that exist; misses share one $in query"""
+        found, missing = _cached_buildings(self.store, building_ids)
+        if missing:
+            cursor = self.database.db.buildings.find({"_id": {"$in": missing}}, projection)
+            docs = {doc['_id']: doc for doc in cursor}
+            found.update(docs if projection is not None else _store_buildings(self.store, missing, docs))
+        return found
+
+    def get_apartments(self, building_id, projection=None):
+        """All apartments of a building, ordered by number"""
+        building_id = ObjectId(building_id)
+        return self._read_through(
+            ('apartments', building_id),
+            lambda projection: list(
+                self.database.db.apartments.find({"building_id": building_id}, projection).sort("number", 1)),
+            projection)
+
+    def get_user_apartment(self, user_id):
+        """The apartment a user lives in, or None"""
+        user_id = ObjectId(user_id)
+        return self._read_through(
+            ('user_apartment', user_id),
+            lambda _: self.database.db.apartments.find_one({"user_id": user_id}))
+
+    def invalidate_building(self, building_id):
+        self.store.invalidate(('building', ObjectId(building_id)))
+
+    def invalidate_apartment(self, apartment):
+        """Drop every key an apartment document appears under"""
+        if apartment.get('building_id') is not None:
+            self.store.invalidate(('apartments', apartment['building_id']))
+        if apartment.get('user_id') is not None:
+            self.store.invalidate(('user_apartment', apartment['user_id']))
+        for listener in self.apartment_listeners:
+            listener(apartment)
+
+    def update_building(self, building_id, update):
+        """Apply an update to a building and invalidate it"""
+        building_id = ObjectId(building_id)
+        result = self.database.db.buildings.update_one({"_id": building_id}, update)
+        self.invalidate_building(building_id)
+        return result
+
+    def update_apartment(self, apartment_id, update):
+        """Apply an update to an apartment and invalidate its old and new keys"""
+        before = self.database.db.apartments.find_one_and_update(
+            {"_id": ObjectId(apartment_id)}, update, return_document=ReturnDocument.BEFORE)
+        if before is None:
+            return None
+        self.invalidate_apartment(before)
+        self.invalidate_apartment(dict(update.get('$set', {}), _id=before['_id']))
+        return before
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        return self.store.stats()
+
+
+class AsyncReadThroughCache:
+    """ReadThroughCache for the grpc.aio servicers over an AsyncDatabase.
+
+    Built on the sync cache's store, so both serving paths see the same
+    entries and an invalidation from either one applies to both.
+    """
+
+    def __init__(self, database, store, flights=None):
+        self.database = database
+        self.store = store
+        self.flights = flights or AsyncSingleFlight()
+
+    async def _read_through(self, key, load, projection=None):
+        value = self.store.get(key, _MISSING)
+        if value is _MISSING:
+            if projection is not None:
+                return await self.flights.do(key + _projection_key(projection), lambda: load(projection))
+            value = await self.flights.do(key, lambda: self._load(key, lambda: load(None)))
+        return value
+
+    async def _load(self, key, load):
+        value = await load()
+        self.store.put(key, value)
+        return value
+
+    async def get_building(self, building_id, projection=None):
+        """Building document, or None"""
+        building_id = ObjectId(building_id)
+        return await self._read_through(
+            ('building', building_id),
+            lambda projection: self.database.db.buildings.find_one({"_id": building_id}, projection),
+            projection)
+
+    async def get_buildings(self, building_ids, projection=None):
+        """{building_id: building} for the ids that exist; misses share one $in query"""
+        found, missing = _cached_buildings(self.store, building_ids)
+        if missing:
+            cursor = self.database.db.buildings.find({"_id": {"$in": missing}}, projection)
+            docs = {doc['_id']: doc async for doc in cursor}
+            found.update(docs if projection is not None else _store_buildings(self.store, missing, docs))
+        return found
+
+    async def get_apartments(self, building_id, projection=None):
+        """All apartments of a building, ordered by number"""
+        building_id = ObjectId(building_id)
+        return await self._read_through(
+            ('apartments', building_id),
+            lambda projection: self.database.db.apartments.find(
+                {"building_id": building_id}, projection).sort("number", 1).to_list(None),
+            projection)
+
+    async def get_user_apartment(self, user_id):
+        """The apartment a user lives in, or None"""
+        user_id = ObjectId(user_id)
+        return await self._read_through(
+            ('user_apartment', user_id),
+            lambda _: self.database.db.apartments.find_one({"user_id": user_id}))
+
+    def stats(self):
+        return self.store.stats()
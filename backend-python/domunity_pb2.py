@@ -22,9 +22,10 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x64omunity.proto\x12\x08\x64omunity\"/\n\x0cLoginRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"|\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x03 \x01(\t\x12\x15\n\rrefresh_token\x18\x04 \x01(\t\x12\x1c\n\x04user\x18\x05 \x01(\x0b\x32\x0e.domunity.User\"T\n\x0fRegisterRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\"E\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0f\n\x07user_id\x18\x03 \x01(\t\",\n\x13RefreshTokenRequest\x12\x15\n\rrefresh_token\x18\x01 \x01(\t\"=\n\x14RefreshTokenResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x02 \x01(\t\"&\n\x15\x46orgotPasswordRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\":\n\x16\x46orgotPasswordResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"$\n\x11GetProfileRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"W\n\x04User\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\t\"\xd5\x01\n\x0bUserProfile\x12\x1c\n\x04user\x18\x01 \x01(\x0b\x32\x0e.domunity.User\x12$\n\x08\x62uilding\x18\x02 \x01(\x0b\x32\x12.domunity.Building\x12&\n\tapartment\x18\x03 \x01(\x0b\x32\x13.domunity.Apartment\x12\x17\n\x0f\x61\x63\x63ount_manager\x18\x04 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x05 \x01(\x01\x12\x15\n\rclient_number\x18\x06 \x01(\t\x12\x19\n\x11\x63ontract_end_date\x18\x07 \x01(\t\"I\n\x14UpdateProfileRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x11\n\tfull_name\x18\x02 \x01(\t\x12\r\n\x05phone\x18\x03 \x01(\t\"9\n\x15UpdateProfileResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\")\n\x12GetBuildingRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\"l\n\x08\x42uilding\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x10\n\x08\x65ntrance\x18\x03 \x01(\t\x12\x18\n\x10total_apartments\x18\x04 \x01(\x05\x12\x17\n\x0ftotal_residents\x18\x05 \x01(\x05\"l\n\tApartment\x12\n\n\x02id\x18\x01 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x02 \x01(\t\x12\x0e\n\x06number\x18\x03 \x01(\x05\x12\r\n\x05\x66loor\x18\x04 \x01(\x05\x12\x0c\n\x04type\x18\x05 \x01(\t\x12\x11\n\tresidents\x18\x06 \x01(\x05\",\n\x15ListApartmentsRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\"A\n\x16ListApartmentsResponse\x12\'\n\napartments\x18\x01 \x03(\x0b\x32\x13.domunity.Apartment\"A\n\x19GetFinancialReportRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x02 \x01(\t\"\xa8\x02\n\x14\x46inancialReportEntry\x12\x18\n\x10\x61partment_number\x18\x01 \x01(\x05\x12\x0c\n\x04type\x18\x02 \x01(\t\x12\r\n\x05\x66loor\x18\x03 \x01(\x05\x12\x13\n\x0b\x63lient_name\x18\x04 \x01(\t\x12\x11\n\tresidents\x18\x05 \x01(\x05\x12\x14\n\x0c\x65levator_gtp\x18\x06 \x01(\x01\x12\x1c\n\x14\x65levator_electricity\x18\x07 \x01(\x01\x12\x1f\n\x17\x63ommon_area_electricity\x18\x08 \x01(\x01\x12\x1c\n\x14\x65levator_maintenance\x18\t \x01(\x01\x12\x16\n\x0emanagement_fee\x18\n \x01(\x01\x12\x13\n\x0brepair_fund\x18\x0b \x01(\x01\x12\x11\n\ttotal_due\x18\x0c \x01(\x01\"Y\n\x0f\x46inancialReport\x12/\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x1e.domunity.FinancialReportEntry\x12\x15\n\rtotal_balance\x18\x02 \x01(\x01\"+\n\x18GetPaymentHistoryRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"X\n\x07Payment\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x0e\n\x06status\x18\x05 \x01(\t\"5\n\x0ePaymentHistory\x12#\n\x08payments\x18\x01 \x03(\x0b\x32\x11.domunity.Payment\"7\n\x11ListEventsRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"Z\n\x05\x45vent\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\r\n\x05title\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x05 \x01(\t\"5\n\x12ListEventsResponse\x12\x1f\n\x06\x65vents\x18\x01 \x03(\x0b\x32\x0f.domunity.Event\"[\n\x12\x43reateEventRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\r\n\x05title\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\"I\n\x13\x43reateEventResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x10\n\x08\x65vent_id\x18\x03 \x01(\t\"Q\n\x12\x43ontactFormRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05phone\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\"7\n\x13\x43ontactFormResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"|\n\x0cOfferRequest\x12\r\n\x05phone\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x0c\n\x04\x63ity\x18\x03 \x01(\t\x12\x16\n\x0enum_properties\x18\x04 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x17\n\x0f\x61\x64\x64itional_info\x18\x06 \x01(\t\"1\n\rOfferResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x82\x01\n\x13PresentationRequest\x12\x0c\n\x04\x64\x61te\x18\x01 \x01(\t\x12\x15\n\rbuilding_type\x18\x02 \x01(\t\x12\r\n\x05phone\x18\x03 \x01(\t\x12\r\n\x05\x65mail\x18\x04 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x17\n\x0f\x61\x64\x64itional_info\x18\x06 \x01(\t\"8\n\x14PresentationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x14\n\x12HealthCheckRequest\"P\n\x13HealthCheckResponse\x12\x0f\n\x07healthy\x18\x01 \x01(\x08\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x17\n\x0f\x64\x61tabase_status\x18\x03 \x01(\t2\xb6\x02\n\x0b\x41uthService\x12:\n\x05Login\x12\x16.domunity.LoginRequest\x1a\x17.domunity.LoginResponse\"\x00\x12\x43\n\x08Register\x12\x19.domunity.RegisterRequest\x1a\x1a.domunity.RegisterResponse\"\x00\x12O\n\x0cRefreshToken\x12\x1d.domunity.RefreshTokenRequest\x1a\x1e.domunity.RefreshTokenResponse\"\x00\x12U\n\x0e\x46orgotPassword\x12\x1f.domunity.ForgotPasswordRequest\x1a .domunity.ForgotPasswordResponse\"\x00\x32\xa5\x01\n\x0bUserService\x12\x42\n\nGetProfile\x12\x1b.domunity.GetProfileRequest\x1a\x15.domunity.UserProfile\"\x00\x12R\n\rUpdateProfile\x12\x1e.domunity.UpdateProfileRequest\x1a\x1f.domunity.UpdateProfileResponse\"\x00\x32\xab\x01\n\x0f\x42uildingService\x12\x41\n\x0bGetBuilding\x12\x1c.domunity.GetBuildingRequest\x1a\x12.domunity.Building\"\x00\x12U\n\x0eListApartments\x12\x1f.domunity.ListApartmentsRequest\x1a .domunity.ListApartmentsResponse\"\x00\x32\xbf\x01\n\x10\x46inancialService\x12V\n\x12GetFinancialReport\x12#.domunity.GetFinancialReportRequest\x1a\x19.domunity.FinancialReport\"\x00\x12S\n\x11GetPaymentHistory\x12\".domunity.GetPaymentHistoryRequest\x1a\x18.domunity.PaymentHistory\"\x00\x32\xa7\x01\n\x0c\x45ventService\x12I\n\nListEvents\x12\x1b.domunity.ListEventsRequest\x1a\x1c.domunity.ListEventsResponse\"\x00\x12L\n\x0b\x43reateEvent\x12\x1c.domunity.CreateEventRequest\x1a\x1d.domunity.CreateEventResponse\"\x00\x32\xfd\x01\n\x0e\x43ontactService\x12P\n\x0fSendContactForm\x12\x1c.domunity.ContactFormRequest\x1a\x1d.domunity.ContactFormResponse\"\x00\x12\x41\n\x0cRequestOffer\x12\x16.domunity.OfferRequest\x1a\x17.domunity.OfferResponse\"\x00\x12V\n\x13RequestPresentation\x12\x1d.domunity.PresentationRequest\x1a\x1e.domunity.PresentationResponse\"\x00\x32W\n\rHealthService\x12\x46\n\x05\x43heck\x12\x1c.domunity.HealthCheckRequest\x1a\x1d.domunity.HealthCheckResponse\"\x00\x42#Z!github.com/domunity/backend/protob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x64omunity.proto\x12\x08\x64omunity\x1a google/protobuf/field_mask.proto\"/\n\x0cLoginRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"|\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x03 \x01(\t\x12\x15\n\rrefresh_token\x18\x04 \x01(\t\x12\x1c\n\x04user\x18\x05 \x01(\x0b\x32\x0e.domunity.User\"T\n\x0fRegisterRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\"E\n\x10RegisterResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0f\n\x07user_id\x18\x03 \x01(\t\",\n\x13RefreshTokenRequest\x12\x15\n\rrefresh_token\x18\x01 \x01(\t\"=\n\x14RefreshTokenResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x02 \x01(\t\"&\n\x15\x46orgotPasswordRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\":\n\x16\x46orgotPasswordResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"S\n\x11GetProfileRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"W\n\x04User\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x11\n\tfull_name\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\t\"\xd5\x01\n\x0bUserProfile\x12\x1c\n\x04user\x18\x01 \x01(\x0b\x32\x0e.domunity.User\x12$\n\x08\x62uilding\x18\x02 \x01(\x0b\x32\x12.domunity.Building\x12&\n\tapartment\x18\x03 \x01(\x0b\x32\x13.domunity.Apartment\x12\x17\n\x0f\x61\x63\x63ount_manager\x18\x04 \x01(\t\x12\x0f\n\x07\x62\x61lance\x18\x05 \x01(\x01\x12\x15\n\rclient_number\x18\x06 \x01(\t\x12\x19\n\x11\x63ontract_end_date\x18\x07 \x01(\t\"U\n\x12GetProfilesRequest\x12\x10\n\x08user_ids\x18\x01 \x03(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"S\n\x13GetProfilesResponse\x12\'\n\x08profiles\x18\x01 \x03(\x0b\x32\x15.domunity.UserProfile\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\t\"I\n\x14UpdateProfileRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x11\n\tfull_name\x18\x02 \x01(\t\x12\r\n\x05phone\x18\x03 \x01(\t\"9\n\x15UpdateProfileResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"X\n\x12GetBuildingRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"l\n\x08\x42uilding\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x10\n\x08\x65ntrance\x18\x03 \x01(\t\x12\x18\n\x10total_apartments\x18\x04 \x01(\x05\x12\x17\n\x0ftotal_residents\x18\x05 \x01(\x05\"Z\n\x13GetBuildingsRequest\x12\x14\n\x0c\x62uilding_ids\x18\x01 \x03(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"R\n\x14GetBuildingsResponse\x12%\n\tbuildings\x18\x01 \x03(\x0b\x32\x12.domunity.Building\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\t\"l\n\tApartment\x12\n\n\x02id\x18\x01 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x02 \x01(\t\x12\x0e\n\x06number\x18\x03 \x01(\x05\x12\r\n\x05\x66loor\x18\x04 \x01(\x05\x12\x0c\n\x04type\x18\x05 \x01(\t\x12\x11\n\tresidents\x18\x06 \x01(\x05\"[\n\x15ListApartmentsRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"A\n\x16ListApartmentsResponse\x12\'\n\napartments\x18\x01 \x03(\x0b\x32\x13.domunity.Apartment\"B\n\x17StreamApartmentsRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\x12\n\nbatch_size\x18\x02 \x01(\x05\"@\n\x16\x41partmentStreamSummary\x12\r\n\x05\x63ount\x18\x01 \x01(\x05\x12\x17\n\x0ftotal_residents\x18\x02 \x01(\x05\"\x7f\n\x16\x41partmentStreamMessage\x12(\n\tapartment\x18\x01 \x01(\x0b\x32\x13.domunity.ApartmentH\x00\x12\x33\n\x07summary\x18\x02 \x01(\x0b\x32 .domunity.ApartmentStreamSummaryH\x00\x42\x06\n\x04item\"A\n\x19GetFinancialReportRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x02 \x01(\t\"\xa8\x02\n\x14\x46inancialReportEntry\x12\x18\n\x10\x61partment_number\x18\x01 \x01(\x05\x12\x0c\n\x04type\x18\x02 \x01(\t\x12\r\n\x05\x66loor\x18\x03 \x01(\x05\x12\x13\n\x0b\x63lient_name\x18\x04 \x01(\t\x12\x11\n\tresidents\x18\x05 \x01(\x05\x12\x14\n\x0c\x65levator_gtp\x18\x06 \x01(\x01\x12\x1c\n\x14\x65levator_electricity\x18\x07 \x01(\x01\x12\x1f\n\x17\x63ommon_area_electricity\x18\x08 \x01(\x01\x12\x1c\n\x14\x65levator_maintenance\x18\t \x01(\x01\x12\x16\n\x0emanagement_fee\x18\n \x01(\x01\x12\x13\n\x0brepair_fund\x18\x0b \x01(\x01\x12\x11\n\ttotal_due\x18\x0c \x01(\x01\"Y\n\x0f\x46inancialReport\x12/\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x1e.domunity.FinancialReportEntry\x12\x15\n\rtotal_balance\x18\x02 \x01(\x01\"X\n\x1cStreamFinancialReportRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x02 \x01(\t\x12\x12\n\nbatch_size\x18\x03 \x01(\x05\"@\n\x16\x46inancialReportSummary\x12\x0f\n\x07\x65ntries\x18\x01 \x01(\x05\x12\x15\n\rtotal_balance\x18\x02 \x01(\x01\"\x86\x01\n\x16\x46inancialReportMessage\x12/\n\x05\x65ntry\x18\x01 \x01(\x0b\x32\x1e.domunity.FinancialReportEntryH\x00\x12\x33\n\x07summary\x18\x02 \x01(\x0b\x32 .domunity.FinancialReportSummaryH\x00\x42\x06\n\x04item\"\x88\x01\n\x18GetPaymentHistoryRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x11\n\tpage_size\x18\x02 \x01(\x05\x12\x12\n\npage_token\x18\x03 \x01(\t\x12\x10\n\x08statuses\x18\x04 \x03(\t\x12\x11\n\tfrom_date\x18\x05 \x01(\t\x12\x0f\n\x07to_date\x18\x06 \x01(\t\"{\n\x07Payment\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x0e\n\x06status\x18\x05 \x01(\t\x12\x0e\n\x06period\x18\x06 \x01(\t\x12\x11\n\tpaid_date\x18\x07 \x01(\t\"N\n\x0ePaymentHistory\x12#\n\x08payments\x18\x01 \x03(\x0b\x32\x11.domunity.Payment\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"7\n\x11ListEventsRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"Z\n\x05\x45vent\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\r\n\x05title\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x13\n\x0b\x62uilding_id\x18\x05 \x01(\t\"5\n\x12ListEventsResponse\x12\x1f\n\x06\x65vents\x18\x01 \x03(\x0b\x32\x0f.domunity.Event\"[\n\x12\x43reateEventRequest\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61te\x18\x02 \x01(\t\x12\r\n\x05title\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\"I\n\x13\x43reateEventResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x10\n\x08\x65vent_id\x18\x03 \x01(\t\"D\n\x1dListEventsForBuildingsRequest\x12\x14\n\x0c\x62uilding_ids\x18\x01 \x03(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"F\n\x0e\x42uildingEvents\x12\x13\n\x0b\x62uilding_id\x18\x01 \x01(\t\x12\x1f\n\x06\x65vents\x18\x02 \x03(\x0b\x32\x0f.domunity.Event\"b\n\x1eListEventsForBuildingsResponse\x12+\n\tbuildings\x18\x01 \x03(\x0b\x32\x18.domunity.BuildingEvents\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\t\"Q\n\x12\x43ontactFormRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05phone\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\"7\n\x13\x43ontactFormResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"|\n\x0cOfferRequest\x12\r\n\x05phone\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\x12\x0c\n\x04\x63ity\x18\x03 \x01(\t\x12\x16\n\x0enum_properties\x18\x04 \x01(\x05\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x17\n\x0f\x61\x64\x64itional_info\x18\x06 \x01(\t\"1\n\rOfferResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x82\x01\n\x13PresentationRequest\x12\x0c\n\x04\x64\x61te\x18\x01 \x01(\t\x12\x15\n\rbuilding_type\x18\x02 \x01(\t\x12\r\n\x05phone\x18\x03 \x01(\t\x12\r\n\x05\x65mail\x18\x04 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x05 \x01(\t\x12\x17\n\x0f\x61\x64\x64itional_info\x18\x06 \x01(\t\"8\n\x14PresentationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x14\n\x12HealthCheckRequest\"P\n\x13HealthCheckResponse\x12\x0f\n\x07healthy\x18\x01 \x01(\x08\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x17\n\x0f\x64\x61tabase_status\x18\x03 \x01(\t2\xb6\x02\n\x0b\x41uthService\x12:\n\x05Login\x12\x16.domunity.LoginRequest\x1a\x17.domunity.LoginResponse\"\x00\x12\x43\n\x08Register\x12\x19.domunity.RegisterRequest\x1a\x1a.domunity.RegisterResponse\"\x00\x12O\n\x0cRefreshToken\x12\x1d.domunity.RefreshTokenRequest\x1a\x1e.domunity.RefreshTokenResponse\"\x00\x12U\n\x0e\x46orgotPassword\x12\x1f.domunity.ForgotPasswordRequest\x1a .domunity.ForgotPasswordResponse\"\x00\x32\xf3\x01\n\x0bUserService\x12\x42\n\nGetProfile\x12\x1b.domunity.GetProfileRequest\x1a\x15.domunity.UserProfile\"\x00\x12R\n\rUpdateProfile\x12\x1e.domunity.UpdateProfileRequest\x1a\x1f.domunity.UpdateProfileResponse\"\x00\x12L\n\x0bGetProfiles\x12\x1c.domunity.GetProfilesRequest\x1a\x1d.domunity.GetProfilesResponse\"\x00\x32\xd9\x02\n\x0f\x42uildingService\x12\x41\n\x0bGetBuilding\x12\x1c.domunity.GetBuildingRequest\x1a\x12.domunity.Building\"\x00\x12O\n\x0cGetBuildings\x12\x1d.domunity.GetBuildingsRequest\x1a\x1e.domunity.GetBuildingsResponse\"\x00\x12U\n\x0eListApartments\x12\x1f.domunity.ListApartmentsRequest\x1a .domunity.ListApartmentsResponse\"\x00\x12[\n\x10StreamApartments\x12!.domunity.StreamApartmentsRequest\x1a .domunity.ApartmentStreamMessage\"\x00\x30\x01\x32\xa6\x02\n\x10\x46inancialService\x12V\n\x12GetFinancialReport\x12#.domunity.GetFinancialReportRequest\x1a\x19.domunity.FinancialReport\"\x00\x12\x65\n\x15StreamFinancialReport\x12&.domunity.StreamFinancialReportRequest\x1a .domunity.FinancialReportMessage\"\x00\x30\x01\x12S\n\x11GetPaymentHistory\x12\".domunity.GetPaymentHistoryRequest\x1a\x18.domunity.PaymentHistory\"\x00\x32\x96\x02\n\x0c\x45ventService\x12I\n\nListEvents\x12\x1b.domunity.ListEventsRequest\x1a\x1c.domunity.ListEventsResponse\"\x00\x12m\n\x16ListEventsForBuildings\x12\'.domunity.ListEventsForBuildingsRequest\x1a(.domunity.ListEventsForBuildingsResponse\"\x00\x12L\n\x0b\x43reateEvent\x12\x1c.domunity.CreateEventRequest\x1a\x1d.domunity.CreateEventResponse\"\x00\x32\xfd\x01\n\x0e\x43ontactService\x12P\n\x0fSendContactForm\x12\x1c.domunity.ContactFormRequest\x1a\x1d.domunity.ContactFormResponse\"\x00\x12\x41\n\x0cRequestOffer\x12\x16.domunity.OfferRequest\x1a\x17.domunity.OfferResponse\"\x00\x12V\n\x13RequestPresentation\x12\x1d.domunity.PresentationRequest\x1a\x1e.domunity.PresentationResponse\"\x00\x32W\n\rHealthService\x12\x46\n\x05\x43heck\x12\x1c.domunity.HealthCheckRequest\x1a\x1d.domunity.HealthCheckResponse\"\x00\x42#Z!github.com/domunity/backend/protob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,92 +33,118 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'domunity_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z!github.com/domunity/backend/proto'
-  _globals['_LOGINREQUEST']._serialized_start=28
-  _globals['_LOGINREQUEST']._serialized_end=75
-  _globals['_LOGINRESPONSE']._serialized_start=77
-  _globals['_LOGINRESPONSE']._serialized_end=201
-  _globals['_REGISTERREQUEST']._serialized_start=203
-  _globals['_REGISTERREQUEST']._serialized_end=287
-  _globals['_REGISTERRESPONSE']._serialized_start=289
-  _globals['_REGISTERRESPONSE']._serialized_end=358
-  _globals['_REFRESHTOKENREQUEST']._serialized_start=360
-  _globals['_REFRESHTOKENREQUEST']._serialized_end=404
-  _globals['_REFRESHTOKENRESPONSE']._serialized_start=406
-  _globals['_REFRESHTOKENRESPONSE']._serialized_end=467
-  _globals['_FORGOTPASSWORDREQUEST']._serialized_start=469
-  _globals['_FORGOTPASSWORDREQUEST']._serialized_end=507
-  _globals['_FORGOTPASSWORDRESPONSE']._serialized_start=509
-  _globals['_FORGOTPASSWORDRESPONSE']._serialized_end=567
-  _globals['_GETPROFILEREQUEST']._serialized_start=569
-  _globals['_GETPROFILEREQUEST']._serialized_end=605
-  _globals['_USER']._serialized_start=607
-  _globals['_USER']._serialized_end=694
-  _globals['_USERPROFILE']._serialized_start=697
-  _globals['_USERPROFILE']._serialized_end=910
-  _globals['_UPDATEPROFILEREQUEST']._serialized_start=912
-  _globals['_UPDATEPROFILEREQUEST']._serialized_end=985
-  _globals['_UPDATEPROFILERESPONSE']._serialized_start=987
-  _globals['_UPDATEPROFILERESPONSE']._serialized_end=1044
-  _globals['_GETBUILDINGREQUEST']._serialized_start=1046
-  _globals['_GETBUILDINGREQUEST']._serialized_end=1087
-  _globals['_BUILDING']._serialized_start=1089
-  _globals['_BUILDING']._serialized_end=1197
-  _globals['_APARTMENT']._serialized_start=1199
-  _globals['_APARTMENT']._serialized_end=1307
-  _globals['_LISTAPARTMENTSREQUEST']._serialized_start=1309
-  _globals['_LISTAPARTMENTSREQUEST']._serialized_end=1353
-  _globals['_LISTAPARTMENTSRESPONSE']._serialized_start=1355
-  _globals['_LISTAPARTMENTSRESPONSE']._serialized_end=1420
-  _globals['_GETFINANCIALREPORTREQUEST']._serialized_start=1422
-  _globals['_GETFINANCIALREPORTREQUEST']._serialized_end=1487
-  _globals['_FINANCIALREPORTENTRY']._serialized_start=1490
-  _globals['_FINANCIALREPORTENTRY']._serialized_end=1786
-  _globals['_FINANCIALREPORT']._serialized_start=1788
-  _globals['_FINANCIALREPORT']._serialized_end=1877
-  _globals['_GETPAYMENTHISTORYREQUEST']._serialized_start=1879
-  _globals['_GETPAYMENTHISTORYREQUEST']._serialized_end=1922
-  _globals['_PAYMENT']._serialized_start=1924
-  _globals['_PAYMENT']._serialized_end=2012
-  _globals['_PAYMENTHISTORY']._serialized_start=2014
-  _globals['_PAYMENTHISTORY']._serialized_end=2067
-  _globals['_LISTEVENTSREQUEST']._serialized_start=2069
-  _globals['_LISTEVENTSREQUEST']._serialized_end=2124
-  _globals['_EVENT']._serialized_start=2126
-  _globals['_EVENT']._serialized_end=2216
-  _globals['_LISTEVENTSRESPONSE']._serialized_start=2218
-  _globals['_LISTEVENTSRESPONSE']._serialized_end=2271
-  _globals['_CREATEEVENTREQUEST']._serialized_start=2273
-  _globals['_CREATEEVENTREQUEST']._serialized_end=2364
-  _globals['_CREATEEVENTRESPONSE']._serialized_start=2366
-  _globals['_CREATEEVENTRESPONSE']._serialized_end=2439
-  _globals['_CONTACTFORMREQUEST']._serialized_start=2441
-  _globals['_CONTACTFORMREQUEST']._serialized_end=2522
-  _globals['_CONTACTFORMRESPONSE']._serialized_start=2524
-  _globals['_CONTACTFORMRESPONSE']._serialized_end=2579
-  _globals['_OFFERREQUEST']._serialized_start=2581
-  _globals['_OFFERREQUEST']._serialized_end=2705
-  _globals['_OFFERRESPONSE']._serialized_start=2707
-  _globals['_OFFERRESPONSE']._serialized_end=2756
-  _globals['_PRESENTATIONREQUEST']._serialized_start=2759
-  _globals['_PRESENTATIONREQUEST']._serialized_end=2889
-  _globals['_PRESENTATIONRESPONSE']._serialized_start=2891
-  _globals['_PRESENTATIONRESPONSE']._serialized_end=2947
-  _globals['_HEALTHCHECKREQUEST']._serialized_start=2949
-  _globals['_HEALTHCHECKREQUEST']._serialized_end=2969
-  _globals['_HEALTHCHECKRESPONSE']._serialized_start=2971
-  _globals['_HEALTHCHECKRESPONSE']._serialized_end=3051
-  _globals['_AUTHSERVICE']._serialized_start=3054
-  _globals['_AUTHSERVICE']._serialized_end=3364
-  _globals['_USERSERVICE']._serialized_start=3367
-  _globals['_USERSERVICE']._serialized_end=3532
-  _globals['_BUILDINGSERVICE']._serialized_start=3535
-  _globals['_BUILDINGSERVICE']._serialized_end=3706
-  _globals['_FINANCIALSERVICE']._serialized_start=3709
-  _globals['_FINANCIALSERVICE']._serialized_end=3900
-  _globals['_EVENTSERVICE']._serialized_start=3903
-  _globals['_EVENTSERVICE']._serialized_end=4070
-  _globals['_CONTACTSERVICE']._serialized_start=4073
-  _globals['_CONTACTSERVICE']._serialized_end=4326
-  _globals['_HEALTHSERVICE']._serialized_start=4328
-  _globals['_HEALTHSERVICE']._serialized_end=4415
+  _globals['_LOGINREQUEST']._serialized_start=62
+  _globals['_LOGINREQUEST']._serialized_end=109
+  _globals['_LOGINRESPONSE']._serialized_start=111
+  _globals['_LOGINRESPONSE']._serialized_end=235
+  _globals['_REGISTERREQUEST']._serialized_start=237
+  _globals['_REGISTERREQUEST']._serialized_end=321
+  _globals['_REGISTERRESPONSE']._serialized_start=323
+  _globals['_REGISTERRESPONSE']._serialized_end=392
+  _globals['_REFRESHTOKENREQUEST']._serialized_start=394
+  _globals['_REFRESHTOKENREQUEST']._serialized_end=438
+  _globals['_REFRESHTOKENRESPONSE']._serialized_start=440
+  _globals['_REFRESHTOKENRESPONSE']._serialized_end=501
+  _globals['_FORGOTPASSWORDREQUEST']._serialized_start=503
+  _globals['_FORGOTPASSWORDREQUEST']._serialized_end=541
+  _globals['_FORGOTPASSWORDRESPONSE']._serialized_start=543
+  _globals['_FORGOTPASSWORDRESPONSE']._serialized_end=601
+  _globals['_GETPROFILEREQUEST']._serialized_start=603
+  _globals['_GETPROFILEREQUEST']._serialized_end=686
+  _globals['_USER']._serialized_start=688
+  _globals['_USER']._serialized_end=775
+  _globals['_USERPROFILE']._serialized_start=778
+  _globals['_USERPROFILE']._serialized_end=991
+  _globals['_GETPROFILESREQUEST']._serialized_start=993
+  _globals['_GETPROFILESREQUEST']._serialized_end=1078
+  _globals['_GETPROFILESRESPONSE']._serialized_start=1080
+  _globals['_GETPROFILESRESPONSE']._serialized_end=1163
+  _globals['_UPDATEPROFILEREQUEST']._serialized_start=1165
+  _globals['_UPDATEPROFILEREQUEST']._serialized_end=1238
+  _globals['_UPDATEPROFILERESPONSE']._serialized_start=1240
+  _globals['_UPDATEPROFILERESPONSE']._serialized_end=1297
+  _globals['_GETBUILDINGREQUEST']._serialized_start=1299
+  _globals['_GETBUILDINGREQUEST']._serialized_end=1387
+  _globals['_BUILDING']._serialized_start=1389
+  _globals['_BUILDING']._serialized_end=1497
+  _globals['_GETBUILDINGSREQUEST']._serialized_start=1499
+  _globals['_GETBUILDINGSREQUEST']._serialized_end=1589
+  _globals['_GETBUILDINGSRESPONSE']._serialized_start=1591
+  _globals['_GETBUILDINGSRESPONSE']._serialized_end=1673
+  _globals['_APARTMENT']._serialized_start=1675
+  _globals['_APARTMENT']._serialized_end=1783
+  _globals['_LISTAPARTMENTSREQUEST']._serialized_start=1785
+  _globals['_LISTAPARTMENTSREQUEST']._serialized_end=1876
+  _globals['_LISTAPARTMENTSRESPONSE']._serialized_start=1878
+  _globals['_LISTAPARTMENTSRESPONSE']._serialized_end=1943
+  _globals['_STREAMAPARTMENTSREQUEST']._serialized_start=1945
+  _globals['_STREAMAPARTMENTSREQUEST']._serialized_end=2011
+  _globals['_APARTMENTSTREAMSUMMARY']._serialized_start=2013
+  _globals['_APARTMENTSTREAMSUMMARY']._serialized_end=2077
+  _globals['_APARTMENTSTREAMMESSAGE']._serialized_start=2079
+  _globals['_APARTMENTSTREAMMESSAGE']._serialized_end=2206
+  _globals['_GETFINANCIALREPORTREQUEST']._serialized_start=2208
+  _globals['_GETFINANCIALREPORTREQUEST']._serialized_end=2273
+  _globals['_FINANCIALREPORTENTRY']._serialized_start=2276
+  _globals['_FINANCIALREPORTENTRY']._serialized_end=2572
+  _globals['_FINANCIALREPORT']._serialized_start=2574
+  _globals['_FINANCIALREPORT']._serialized_end=2663
+  _globals['_STREAMFINANCIALREPORTREQUEST']._serialized_start=2665
+  _globals['_STREAMFINANCIALREPORTREQUEST']._serialized_end=2753
+  _globals['_FINANCIALREPORTSUMMARY']._serialized_start=2755
+  _globals['_FINANCIALREPORTSUMMARY']._serialized_end=2819
+  _globals['_FINANCIALREPORTMESSAGE']._serialized_start=2822
+  _globals['_FINANCIALREPORTMESSAGE']._serialized_end=2956
+  _globals['_GETPAYMENTHISTORYREQUEST']._serialized_start=2959
+  _globals['_GETPAYMENTHISTORYREQUEST']._serialized_end=3095
+  _globals['_PAYMENT']._serialized_start=3097
+  _globals['_PAYMENT']._serialized_end=3220
+  _globals['_PAYMENTHISTORY']._serialized_start=3222
+  _globals['_PAYMENTHISTORY']._serialized_end=3300
+  _globals['_LISTEVENTSREQUEST']._serialized_start=3302
+  _globals['_LISTEVENTSREQUEST']._serialized_end=3357
+  _globals['_EVENT']._serialized_start=3359
+  _globals['_EVENT']._serialized_end=3449
+  _globals['_LISTEVENTSRESPONSE']._serialized_start=3451
+  _globals['_LISTEVENTSRESPONSE']._serialized_end=3504
+  _globals['_CREATEEVENTREQUEST']._serialized_start=3506
+  _globals['_CREATEEVENTREQUEST']._serialized_end=3597
+  _globals['_CREATEEVENTRESPONSE']._serialized_start=3599
+  _globals['_CREATEEVENTRESPONSE']._serialized_end=3672
+  _globals['_LISTEVENTSFORBUILDINGSREQUEST']._serialized_start=3674
+  _globals['_LISTEVENTSFORBUILDINGSREQUEST']._serialized_end=3742
+  _globals['_BUILDINGEVENTS']._serialized_start=3744
+  _globals['_BUILDINGEVENTS']._serialized_end=3814
+  _globals['_LISTEVENTSFORBUILDINGSRESPONSE']._serialized_start=3816
+  _globals['_LISTEVENTSFORBUILDINGSRESPONSE']._serialized_end=3914
+  _globals['_CONTACTFORMREQUEST']._serialized_start=3916
+  _globals['_CONTACTFORMREQUEST']._serialized_end=3997
+  _globals['_CONTACTFORMRESPONSE']._serialized_start=3999
+  _globals['_CONTACTFORMRESPONSE']._serialized_end=4054
+  _globals['_OFFERREQUEST']._serialized_start=4056
+  _globals['_OFFERREQUEST']._serialized_end=4180
+  _globals['_OFFERRESPONSE']._serialized_start=4182
+  _globals['_OFFERRESPONSE']._serialized_end=4231
+  _globals['_PRESENTATIONREQUEST']._serialized_start=4234
+  _globals['_PRESENTATIONREQUEST']._serialized_end=4364
+  _globals['_PRESENTATIONRESPONSE']._serialized_start=4366
+  _globals['_PRESENTATIONRESPONSE']._serialized_end=4422
+  _globals['_HEALTHCHECKREQUEST']._serialized_start=4424
+  _globals['_HEALTHCHECKREQUEST']._serialized_end=4444
+  _globals['_HEALTHCHECKRESPONSE']._serialized_start=4446
+  _globals['_HEALTHCHECKRESPONSE']._serialized_end=4526
+  _globals['_AUTHSERVICE']._serialized_start=4529
+  _globals['_AUTHSERVICE']._serialized_end=4839
+  _globals['_USERSERVICE']._serialized_start=4842
+  _globals['_USERSERVICE']._serialized_end=5085
+  _globals['_BUILDINGSERVICE']._serialized_start=5088
+  _globals['_BUILDINGSERVICE']._serialized_end=5433
+  _globals['_FINANCIALSERVICE']._serialized_start=5436
+  _globals['_FINANCIALSERVICE']._serialized_end=5730
+  _globals['_EVENTSERVICE']._serialized_start=5733
+  _globals['_EVENTSERVICE']._serialized_end=6011
+  _globals['_CONTACTSERVICE']._serialized_start=6014
+  _globals['_CONTACTSERVICE']._serialized_end=6267
+  _globals['_HEALTHSERVICE']._serialized_start=6269
+  _globals['_HEALTHSERVICE']._serialized_end=6356
 # @@protoc_insertion_point(module_scope)
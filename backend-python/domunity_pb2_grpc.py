@@ -249,6 +249,11 @@ class UserServiceStub(object):
                 request_serializer=domunity__pb2.UpdateProfileRequest.SerializeToString,
                 response_deserializer=domunity__pb2.UpdateProfileResponse.FromString,
                 _registered_method=True)
+        self.GetProfiles = channel.unary_unary(
+                '/domunity.UserService/GetProfiles',
+                request_serializer=domunity__pb2.GetProfilesRequest.SerializeToString,
+                response_deserializer=domunity__pb2.GetProfilesResponse.FromString,
+                _registered_method=True)
 
 
 class UserServiceServicer(object):
@@ -267,6 +272,13 @@ class UserServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetProfiles(self, request, context):
+        """Many profiles in one call; other users' profiles require an admin token
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_UserServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -280,6 +292,11 @@ def add_UserServiceServicer_to_server(servicer, server):
                     request_deserializer=domunity__pb2.UpdateProfileRequest.FromString,
                     response_serializer=domunity__pb2.UpdateProfileResponse.SerializeToString,
             ),
+            'GetProfiles': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetProfiles,
+                    request_deserializer=domunity__pb2.GetProfilesRequest.FromString,
+                    response_serializer=domunity__pb2.GetProfilesResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'domunity.UserService', rpc_method_handlers)
@@ -346,6 +363,33 @@ class UserService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetProfiles(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/domunity.UserService/GetProfiles',
+            domunity__pb2.GetProfilesRequest.SerializeToString,
+            domunity__pb2.GetProfilesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class BuildingServiceStub(object):
     """==================== Building Service ====================
@@ -362,11 +406,21 @@ class BuildingServiceStub(object):
                 request_serializer=domunity__pb2.GetBuildingRequest.SerializeToString,
                 response_deserializer=domunity__pb2.Building.FromString,
                 _registered_method=True)
+        self.GetBuildings = channel.unary_unary(
+                '/domunity.BuildingService/GetBuildings',
+                request_serializer=domunity__pb2.GetBuildingsRequest.SerializeToString,
+                response_deserializer=domunity__pb2.GetBuildingsResponse.FromString,
+                _registered_method=True)
         self.ListApartments = channel.unary_unary(
                 '/domunity.BuildingService/ListApartments',
                 request_serializer=domunity__pb2.ListApartmentsRequest.SerializeToString,
                 response_deserializer=domunity__pb2.ListApartmentsResponse.FromString,
                 _registered_method=True)
+        self.StreamApartments = channel.unary_stream(
+                '/domunity.BuildingService/StreamApartments',
+                request_serializer=domunity__pb2.StreamApartmentsRequest.SerializeToString,
+                response_deserializer=domunity__pb2.ApartmentStreamMessage.FromString,
+                _registered_method=True)
 
 
 class BuildingServiceServicer(object):
@@ -379,12 +433,25 @@ class BuildingServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetBuildings(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ListApartments(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamApartments(self, request, context):
+        """Apartments one message each as the cursor yields them, then a summary
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_BuildingServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -393,11 +460,21 @@ def add_BuildingServiceServicer_to_server(servicer, server):
                     request_deserializer=domunity__pb2.GetBuildingRequest.FromString,
                     response_serializer=domunity__pb2.Building.SerializeToString,
             ),
+            'GetBuildings': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetBuildings,
+                    request_deserializer=domunity__pb2.GetBuildingsRequest.FromString,
+                    response_serializer=domunity__pb2.GetBuildingsResponse.SerializeToString,
+            ),
             'ListApartments': grpc.unary_unary_rpc_method_handler(
                     servicer.ListApartments,
                     request_deserializer=domunity__pb2.ListApartmentsRequest.FromString,
                     response_serializer=domunity__pb2.ListApartmentsResponse.SerializeToString,
             ),
+            'StreamApartments': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamApartments,
+                    request_deserializer=domunity__pb2.StreamApartmentsRequest.FromString,
+                    response_serializer=domunity__pb2.ApartmentStreamMessage.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'domunity.BuildingService', rpc_method_handlers)
@@ -437,6 +514,33 @@ class BuildingService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetBuildings(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/domunity.BuildingService/GetBuildings',
+            domunity__pb2.GetBuildingsRequest.SerializeToString,
+            domunity__pb2.GetBuildingsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ListApartments(request,
             target,
@@ -464,6 +568,33 @@ class BuildingService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamApartments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/domunity.BuildingService/StreamApartments',
+            domunity__pb2.StreamApartmentsRequest.SerializeToString,
+            domunity__pb2.ApartmentStreamMessage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class FinancialServiceStub(object):
     """==================== Financial Service ====================
@@ -480,6 +611,11 @@ class FinancialServiceStub(object):
                 request_serializer=domunity__pb2.GetFinancialReportRequest.SerializeToString,
                 response_deserializer=domunity__pb2.FinancialReport.FromString,
                 _registered_method=True)
+        self.StreamFinancialReport = channel.unary_stream(
+                '/domunity.FinancialService/StreamFinancialReport',
+                request_serializer=domunity__pb2.StreamFinancialReportRequest.SerializeToString,
+                response_deserializer=domunity__pb2.FinancialReportMessage.FromString,
+                _registered_method=True)
         self.GetPaymentHistory = channel.unary_unary(
                 '/domunity.FinancialService/GetPaymentHistory',
                 request_serializer=domunity__pb2.GetPaymentHistoryRequest.SerializeToString,
@@ -497,6 +633,13 @@ class FinancialServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamFinancialReport(self, request, context):
+        """Report entries one message each, then the running total as a summary
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetPaymentHistory(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -511,6 +654,11 @@ def add_FinancialServiceServicer_to_server(servicer, server):
                     request_deserializer=domunity__pb2.GetFinancialReportRequest.FromString,
                     response_serializer=domunity__pb2.FinancialReport.SerializeToString,
             ),
+            'StreamFinancialReport': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamFinancialReport,
+                    request_deserializer=domunity__pb2.StreamFinancialReportRequest.FromString,
+                    response_serializer=domunity__pb2.FinancialReportMessage.SerializeToString,
+            ),
             'GetPaymentHistory': grpc.unary_unary_rpc_method_handler(
                     servicer.GetPaymentHistory,
                     request_deserializer=domunity__pb2.GetPaymentHistoryRequest.FromString,
@@ -555,6 +703,33 @@ class FinancialService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamFinancialReport(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/domunity.FinancialService/StreamFinancialReport',
+            domunity__pb2.StreamFinancialReportRequest.SerializeToString,
+            domunity__pb2.FinancialReportMessage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetPaymentHistory(request,
             target,
@@ -598,6 +773,11 @@ class EventServiceStub(object):
                 request_serializer=domunity__pb2.ListEventsRequest.SerializeToString,
                 response_deserializer=domunity__pb2.ListEventsResponse.FromString,
                 _registered_method=True)
+        self.ListEventsForBuildings = channel.unary_unary(
+                '/domunity.EventService/ListEventsForBuildings',
+                request_serializer=domunity__pb2.ListEventsForBuildingsRequest.SerializeToString,
+                response_deserializer=domunity__pb2.ListEventsForBuildingsResponse.FromString,
+                _registered_method=True)
         self.CreateEvent = channel.unary_unary(
                 '/domunity.EventService/CreateEvent',
                 request_serializer=domunity__pb2.CreateEventRequest.SerializeToString,
@@ -615,6 +795,12 @@ class EventServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListEventsForBuildings(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateEvent(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -629,6 +815,11 @@ def add_EventServiceServicer_to_server(servicer, server):
                     request_deserializer=domunity__pb2.ListEventsRequest.FromString,
                     response_serializer=domunity__pb2.ListEventsResponse.SerializeToString,
             ),
+            'ListEventsForBuildings': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListEventsForBuildings,
+                    request_deserializer=domunity__pb2.ListEventsForBuildingsRequest.FromString,
+                    response_serializer=domunity__pb2.ListEventsForBuildingsResponse.SerializeToString,
+            ),
             'CreateEvent': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateEvent,
                     request_deserializer=domunity__pb2.CreateEventRequest.FromString,
@@ -673,6 +864,33 @@ class EventService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ListEventsForBuildings(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/domunity.EventService/ListEventsForBuildings',
+            domunity__pb2.ListEventsForBuildingsRequest.SerializeToString,
+            domunity__pb2.ListEventsForBuildingsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CreateEvent(request,
             target,
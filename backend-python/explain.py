@@ -0,0 +1,254 @@
+"""
+Slow-aggregation detector (EXPLAIN_BUDGET_MS)
+
+CommandTracer times every aggregate. One slower than the budget is handed
+to PlanCapture when its request finishes, sampled by EXPLAIN_SAMPLE_RATE
+and at most once per pipeline shape every EXPLAIN_COOLDOWN_SECONDS. A
+background thread runs it again with explain("executionStats") and stores
+a summary in the slow_aggregations collection: documents and keys
+examined, documents returned, their ratio and the collections read by a
+collection scan. Scans of the EXPLAIN_FLAG_COLLSCANS collections
+(financial_records and payments by default) are flagged and logged.
+
+explain executes the pipeline again, so it never runs on the request
+path, runs one at a time, and skips pipelines that write ($out, $merge).
+"""
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from datetime import datetime
+from bson import json_util
+from pymongo import DESCENDING
+
+from metrics import AGGREGATION_PLANS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPLAIN_BUDGET_MS = 0.0                # 0: detector off
+DEFAULT_EXPLAIN_SAMPLE_RATE = 1.0
+DEFAULT_EXPLAIN_COOLDOWN_SECONDS = 600.0
+DEFAULT_FLAG_COLLSCANS = ('financial_records', 'payments')
+# Slow pipelines waiting for explain; more are dropped
+MAX_PENDING_EXPLAINS = 8
+# Shapes remembered for the cooldown before the table is cleared
+MAX_REMEMBERED_SHAPES = 1000
+
+# Options of the original command that change the plan
+_PLAN_OPTIONS = ('allowDiskUse', 'collation', 'hint', 'let')
+# SBE $lookup strategies that read the whole foreign collection
+_SCANNING_JOINS = ('NestedLoopJoin', 'HashJoin')
+
+
+def _shape(value):
+    """The pipeline with every literal replaced by '?', for the cooldown"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shape(item) for item in value]
+    return '?'
+
+
+def pipeline_shape(collection, pipeline):
+    return collection + json.dumps(_shape(pipeline), sort_keys=True)
+
+
+def _collection_of(namespace):
+    return namespace.split('.', 1)[1] if '.' in namespace else namespace
+
+
+def summarize_plan(explain):
+    """Documents/keys examined, documents returned and scanned collections of an explain document.
+
+    Handles both explain layouts: the classic one (a ``$cursor`` stage
+    followed by ``$lookup`` stages with their own counters) and plans run
+    entirely by the slot-based engine (``EQ_LOOKUP`` nodes in the
+    winning plan).
+    """
+    totals = {'docs_examined': 0, 'keys_examined': 0}
+    scans = set()
+
+    def walk(node, namespace):
+        if isinstance(node, list):
+            for item in node:
+                walk(item, namespace)
+            return
+        if not isinstance(node, dict):
+            return
+        planner = node.get('queryPlanner')
+        if isinstance(planner, dict):
+            namespace = planner.get('namespace', namespace)
+        stage = node.get('stage')
+        if stage == 'COLLSCAN':
+            scans.add(_collection_of(namespace))
+        elif stage == 'EQ_LOOKUP' and node.get('strategy') in _SCANNING_JOINS:
+            scans.add(_collection_of(node.get('foreignCollection', '')))
+        lookup = node.get('$lookup')
+        if isinstance(lookup, dict):
+            if node.get('collectionScans'):
+                scans.add(lookup.get('from', ''))
+            totals['docs_examined'] += node.get('totalDocsExamined', 0)
+            totals['keys_examined'] += node.get('totalKeysExamined', 0)
+        stats = node.get('executionStats')
+        if isinstance(stats, dict):
+            totals['docs_examined'] += stats.get('totalDocsExamined', 0)
+            totals['keys_examined'] += stats.get('totalKeysExamined', 0)
+        for key, value in node.items():
+            if key != 'executionStats' and isinstance(value, (dict, list)):
+                walk(value, namespace)
+
+    walk(explain, '')
+    stages = explain.get('stages')
+    if stages and 'nReturned' in stages[-1]:
+        returned = stages[-1]['nReturned']
+    else:
+        returned = explain.get('executionStats', {}).get('nReturned', 0)
+    totals['docs_returned'] = returned
+    totals['examined_ratio'] = round(totals['docs_examined'] / max(returned, 1), 2)
+    totals['collscans'] = sorted(scan for scan in scans if scan)
+    return totals
+
+
+class PlanCapture:
+    """Explains sampled slow aggregates in the background and stores the plans"""
+
+    def __init__(self, database, budget_ms=DEFAULT_EXPLAIN_BUDGET_MS, sample_rate=DEFAULT_EXPLAIN_SAMPLE_RATE,
+                 cooldown=DEFAULT_EXPLAIN_COOLDOWN_SECONDS, flag_collscans=DEFAULT_FLAG_COLLSCANS):
+        if budget_ms < 0 or cooldown < 0:
+            raise ValueError("EXPLAIN_BUDGET_MS and EXPLAIN_COOLDOWN_SECONDS must not be negative")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"EXPLAIN_SAMPLE_RATE must be between 0 and 1, got {sample_rate}")
+        self.database = database
+        self.budget_ms = budget_ms
+        self.sample_rate = sample_rate
+        self.cooldown = cooldown
+        self.flag_collscans = frozenset(flag_collscans)
+        self._pending = queue.Queue(MAX_PENDING_EXPLAINS)
+        self._explained_at = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._dropped = 0
+
+    @classmethod
+    def from_env(cls, database):
+        """Build the detector from the EXPLAIN_* environment"""
+        flagged = os.getenv('EXPLAIN_FLAG_COLLSCANS')
+        return cls(
+            database,
+            budget_ms=float(os.getenv('EXPLAIN_BUDGET_MS', DEFAULT_EXPLAIN_BUDGET_MS)),
+            sample_rate=float(os.getenv('EXPLAIN_SAMPLE_RATE', DEFAULT_EXPLAIN_SAMPLE_RATE)),
+            cooldown=float(os.getenv('EXPLAIN_COOLDOWN_SECONDS', DEFAULT_EXPLAIN_COOLDOWN_SECONDS)),
+            flag_collscans=DEFAULT_FLAG_COLLSCANS if flagged is None
+            else [name.strip() for name in flagged.split(',') if name.strip()],
+        )
+
+    @property
+    def enabled(self):
+        return self.budget_ms > 0
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.budget_ms
+
+    def offer(self, database_name, command, seconds, handler):
+        """Queue a slow aggregate for explain unless it is sampled out, cooling down or writes"""
+        pipeline = command.get('pipeline') or []
+        if pipeline and ('$out' in pipeline[-1] or '$merge' in pipeline[-1]):
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        collection = command.get('aggregate')
+        if not isinstance(collection, str):
+            return False
+        shape = pipeline_shape(collection, pipeline)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(shape, -self.cooldown) < self.cooldown:
+                return False
+            if len(self._explained_at) >= MAX_REMEMBERED_SHAPES:
+                self._explained_at.clear()
+            self._explained_at[shape] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='plan-capture', daemon=True)
+                self._thread.start()
+        try:
+            self._pending.put_nowait((database_name, collection, command, seconds, handler))
+        except queue.Full:
+            self._dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            try:
+                self.capture(*item)
+            except Exception as e:
+                logger.error(f"✗ Explain of slow aggregate on {item[1]} failed: {e}")
+
+    def capture(self, database_name, collection, command, seconds, handler):
+        """Explain one aggregate and store the summary; returns the stored document"""
+        explained = {'aggregate': collection, 'pipeline': command.get('pipeline', []), 'cursor': {}}
+        for option in _PLAN_OPTIONS:
+            if option in command:
+                explained[option] = command[option]
+        database = self.database.client[database_name]
+        plan = database.command({'explain': explained, 'verbosity': 'executionStats'})
+        for noise in ('command', 'serverInfo', 'serverParameters', 'ok', '$clusterTime', 'operationTime'):
+            plan.pop(noise, None)
+
+        summary = summarize_plan(plan)
+        flagged = sorted(self.flag_collscans.intersection(summary['collscans']))
+        record = {
+            'captured_at': datetime.utcnow(),
+            'collection': collection,
+            'handler': handler,
+            'duration_ms': round(seconds * 1000, 2),
+            **summary,
+            'flagged': flagged,
+            # Stored as JSON: pipelines and plans have '$'-prefixed field names
+            'pipeline': json_util.dumps(explained['pipeline']),
+            'plan': json_util.dumps(plan),
+        }
+        database.slow_aggregations.insert_one(record)
+        AGGREGATION_PLANS.inc((collection, 'true' if flagged else 'false'))
+        if flagged:
+            logger.warning(f"✗ Slow aggregate on {collection} ({handler}) scans {', '.join(flagged)}: "
+                           f"{summary['docs_examined']} docs examined for {summary['docs_returned']} returned "
+                           f"in {record['duration_ms']} ms")
+        else:
+            logger.info(f"Slow aggregate on {collection} ({handler}) explained: "
+                        f"{summary['docs_examined']} docs examined for {summary['docs_returned']} returned")
+        return record
+
+    def recent(self, limit=20, with_plan=False):
+        """Latest stored summaries, newest first"""
+        projection = None if with_plan else {'plan': 0}
+        rows = self.database.db.slow_aggregations.find({}, projection).sort('captured_at', DESCENDING).limit(limit)
+        return list(rows)
+
+    def stats(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'sample_rate': self.sample_rate,
+            'cooldown_seconds': self.cooldown,
+            'flag_collscans': sorted(self.flag_collscans),
+            'pending': self._pending.qsize(),
+            'dropped': self._dropped,
+        }
+
+    def shutdown(self, timeout=5.0):
+        """Let the explain in progress finish and drop the queued ones"""
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._pending.get_nowait()
+            except queue.Empty:
+                break
+        self._pending.put(None, timeout=timeout)
+        self._thread.join(timeout)
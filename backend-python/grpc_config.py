@@ -0,0 +1,380 @@
+import os
+import logging
+import threading
+import grpc
+
+from auth import wrap_rpc_handler
+from metrics import GRPC_IN_FLIGHT, observe_rpc
+from tracing import RequestTracker
+from log_config import ACCESS_LOG
+from queries import STREAM_DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the gRPC server (overridable through the GRPC_* environment)
+DEFAULT_GRPC_PORT = '50051'
+DEFAULT_GRPC_WORKERS = 10
+DEFAULT_GRPC_KEEPALIVE_TIME_MS = 7200000       # grpc core default: ping idle connections every 2 h
+DEFAULT_GRPC_KEEPALIVE_TIMEOUT_MS = 20000
+DEFAULT_GRPC_MIN_PING_INTERVAL_MS = 300000     # client pings closer together than this are abuse
+DEFAULT_GRPC_MAX_RECEIVE_MESSAGE_BYTES = 4 * 1024 * 1024
+DEFAULT_GRPC_MAX_SEND_MESSAGE_BYTES = -1       # unlimited
+DEFAULT_SHUTDOWN_GRACE_SECONDS = 10.0          # in-flight calls get this long on shutdown
+
+# Expensive calls get a slice of the worker pool instead of all of it
+DEFAULT_GRPC_METHOD_LIMITS = {
+    '/domunity.FinancialService/GetFinancialReport': 4,
+    '/domunity.FinancialService/StreamFinancialReport': 4,
+}
+
+COMPRESSION_ALGORITHMS = {
+    'none': grpc.Compression.NoCompression,
+    'deflate': grpc.Compression.Deflate,
+    'gzip': grpc.Compression.Gzip,
+}
+
+
+def parse_method_limits(value, package='domunity'):
+    """Parse 'Service/Method=N,...' into {'/package.Service/Method': N}.
+
+    Fully qualified names ('/pkg.Service/Method') are taken as they are.
+    A limit of 0 removes the method's limit.
+    """
+    limits = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        method, sep, limit = item.partition('=')
+        method = method.strip()
+        if not sep or '/' not in method:
+            raise ValueError(f"Invalid method limit {item!r}, expected Service/Method=N")
+        if not method.startswith('/'):
+            method = f'/{package}.{method}'
+        try:
+            limits[method] = int(limit)
+        except ValueError:
+            raise ValueError(f"Invalid method limit {item!r}, expected Service/Method=N")
+    return limits
+
+
+def _env_bool(name, default):
+    return os.getenv(name, 'true' if default else 'false').lower() not in ('false', '0', 'no')
+
+
+class GrpcServerConfig:
+    """Serving mode, capacity and transport settings of the gRPC server.
+
+    One object for both serving modes: ``workers`` sizes the threaded
+    server's pool, everything else applies to grpc.server and
+    grpc.aio.server alike. ``method_limits`` caps in-flight calls per
+    method (see MethodLimits).
+    """
+
+    def __init__(self, port=DEFAULT_GRPC_PORT, mode='threaded', auth_required=True,
+                 workers=DEFAULT_GRPC_WORKERS, max_concurrent_rpcs=None,
+                 keepalive_time_ms=DEFAULT_GRPC_KEEPALIVE_TIME_MS,
+                 keepalive_timeout_ms=DEFAULT_GRPC_KEEPALIVE_TIMEOUT_MS,
+                 keepalive_permit_without_calls=False,
+                 min_ping_interval_ms=DEFAULT_GRPC_MIN_PING_INTERVAL_MS,
+                 max_receive_message_bytes=DEFAULT_GRPC_MAX_RECEIVE_MESSAGE_BYTES,
+                 max_send_message_bytes=DEFAULT_GRPC_MAX_SEND_MESSAGE_BYTES,
+                 compression='none', stream_batch_size=STREAM_DEFAULT_BATCH_SIZE, method_limits=None,
+                 shutdown_grace=DEFAULT_SHUTDOWN_GRACE_SECONDS, reuse_port=False):
+        if mode not in ('threaded', 'async'):
+            raise ValueError(f"Invalid gRPC mode {mode!r}, expected 'threaded' or 'async'")
+        if compression not in COMPRESSION_ALGORITHMS:
+            raise ValueError(f"Invalid gRPC compression {compression!r}, expected one of {', '.join(COMPRESSION_ALGORITHMS)}")
+        self.port = port
+        self.mode = mode
+        self.auth_required = auth_required
+        self.workers = workers
+        self.max_concurrent_rpcs = max_concurrent_rpcs
+        self.keepalive_time_ms = keepalive_time_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.keepalive_permit_without_calls = keepalive_permit_without_calls
+        self.min_ping_interval_ms = min_ping_interval_ms
+        self.max_receive_message_bytes = max_receive_message_bytes
+        self.max_send_message_bytes = max_send_message_bytes
+        self.compression = compression
+        self.stream_batch_size = stream_batch_size
+        limits = DEFAULT_GRPC_METHOD_LIMITS if method_limits is None else method_limits
+        self.method_limits = {method: limit for method, limit in limits.items() if limit > 0}
+        self.shutdown_grace = shutdown_grace
+        # Set for the workers of a multi-process server, which share the port
+        self.reuse_port = reuse_port
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from the GRPC_* (plus STREAM_BATCH_SIZE, SHUTDOWN_GRACE_SECONDS) environment"""
+        max_rpcs = os.getenv('GRPC_MAX_CONCURRENT_RPCS')
+        method_limits = dict(DEFAULT_GRPC_METHOD_LIMITS)
+        method_limits.update(parse_method_limits(os.getenv('GRPC_METHOD_LIMITS', '')))
+        return cls(
+            port=os.getenv('GRPC_PORT', DEFAULT_GRPC_PORT),
+            mode=os.getenv('GRPC_MODE', 'threaded').lower(),
+            auth_required=_env_bool('GRPC_AUTH_REQUIRED', True),
+            workers=int(os.getenv('GRPC_WORKERS', DEFAULT_GRPC_WORKERS)),
+            max_concurrent_rpcs=int(max_rpcs) if max_rpcs else None,
+            keepalive_time_ms=int(os.getenv('GRPC_KEEPALIVE_TIME_MS', DEFAULT_GRPC_KEEPALIVE_TIME_MS)),
+            keepalive_timeout_ms=int(os.getenv('GRPC_KEEPALIVE_TIMEOUT_MS', DEFAULT_GRPC_KEEPALIVE_TIMEOUT_MS)),
+            keepalive_permit_without_calls=_env_bool('GRPC_KEEPALIVE_PERMIT_WITHOUT_CALLS', False),
+            min_ping_interval_ms=int(os.getenv('GRPC_MIN_PING_INTERVAL_MS', DEFAULT_GRPC_MIN_PING_INTERVAL_MS)),
+            max_receive_message_bytes=int(os.getenv('GRPC_MAX_RECEIVE_MESSAGE_BYTES',
+                                                    DEFAULT_GRPC_MAX_RECEIVE_MESSAGE_BYTES)),
+            max_send_message_bytes=int(os.getenv('GRPC_MAX_SEND_MESSAGE_BYTES', DEFAULT_GRPC_MAX_SEND_MESSAGE_BYTES)),
+            compression=os.getenv('GRPC_COMPRESSION', 'none').lower(),
+            stream_batch_size=int(os.getenv('STREAM_BATCH_SIZE', STREAM_DEFAULT_BATCH_SIZE)),
+            method_limits=method_limits,
+            shutdown_grace=float(os.getenv('SHUTDOWN_GRACE_SECONDS', DEFAULT_SHUTDOWN_GRACE_SECONDS)),
+        )
+
+    def options(self):
+        """Channel arguments for grpc.server / grpc.aio.server"""
+        return [
+            ('grpc.keepalive_time_ms', self.keepalive_time_ms),
+            ('grpc.keepalive_timeout_ms', self.keepalive_timeout_ms),
+            ('grpc.keepalive_permit_without_calls', int(self.keepalive_permit_without_calls)),
+            ('grpc.http2.min_ping_interval_without_data_ms', self.min_ping_interval_ms),
+            ('grpc.max_receive_message_length', self.max_receive_message_bytes),
+            ('grpc.max_send_message_length', self.max_send_message_bytes),
+            ('grpc.so_reuseport', int(self.reuse_port)),
+        ]
+
+    @property
+    def compression_algorithm(self):
+        return COMPRESSION_ALGORITHMS[self.compression]
+
+    def as_dict(self):
+        """Effective settings, for the startup log and the admin config endpoint"""
+        return {
+            'port': self.port,
+            'mode': self.mode,
+            'auth_required': self.auth_required,
+            'workers': self.workers if self.mode == 'threaded' else None,
+            'max_concurrent_rpcs': self.max_concurrent_rpcs,
+            'keepalive_time_ms': self.keepalive_time_ms,
+            'keepalive_timeout_ms': self.keepalive_timeout_ms,
+            'keepalive_permit_without_calls': self.keepalive_permit_without_calls,
+            'min_ping_interval_ms': self.min_ping_interval_ms,
+            'max_receive_message_bytes': self.max_receive_message_bytes,
+            'max_send_message_bytes': self.max_send_message_bytes,
+            'compression': self.compression,
+            'stream_batch_size': self.stream_batch_size,
+            'method_limits': dict(self.method_limits),
+            'shutdown_grace': self.shutdown_grace,
+            'reuse_port': self.reuse_port,
+        }
+
+
+class MethodLimits:
+    """In-flight call counters and caps per gRPC method.
+
+    A call over its method's cap is rejected straight away rather than
+    queued, so a burst of one slow method (GetFinancialReport) cannot hold
+    every worker thread or event-loop slot while cheap calls wait.
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._lock = threading.Lock()
+        self._in_flight = dict.fromkeys(self.limits, 0)
+        self._peak = dict.fromkeys(self.limits, 0)
+        self._rejected = dict.fromkeys(self.limits, 0)
+
+    def try_acquire(self, method):
+        with self._lock:
+            if self._in_flight[method] >= self.limits[method]:
+                self._rejected[method] += 1
+                return False
+            self._in_flight[method] += 1
+            self._peak[method] = max(self._peak[method], self._in_flight[method])
+            return True
+
+    def release(self, method):
+        with self._lock:
+            self._in_flight[method] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                method: {
+                    'limit': limit,
+                    'in_flight': self._in_flight[method],
+                    'peak_in_flight': self._peak[method],
+                    'rejected': self._rejected[method],
+                }
+                for method, limit in self.limits.items()
+            }
+
+
+def _rejected_message(method):
+    return f"Too many concurrent {method.rsplit('/', 1)[-1]} calls, retry later"
+
+
+class MethodLimitInterceptor(grpc.ServerInterceptor):
+    """Enforces MethodLimits: calls over a method's cap end with RESOURCE_EXHAUSTED"""
+
+    def __init__(self, limits):
+        self.limits = limits
+
+    def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = continuation(handler_call_details)
+        if handler is None or method not in self.limits.limits:
+            return handler
+
+        limits = self.limits
+
+        def wrap(behavior, streaming):
+            def limited(request_or_iterator, context):
+                if not limits.try_acquire(method):
+                    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rejected_message(method))
+                try:
+                    return behavior(request_or_iterator, context)
+                finally:
+                    limits.release(method)
+
+            def limited_stream(request_or_iterator, context):
+                if not limits.try_acquire(method):
+                    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rejected_message(method))
+                try:
+                    yield from behavior(request_or_iterator, context)
+                finally:
+                    limits.release(method)
+
+            return limited_stream if streaming else limited
+
+        return wrap_rpc_handler(handler, wrap)
+
+
+class AsyncMethodLimitInterceptor(grpc.aio.ServerInterceptor):
+    """MethodLimitInterceptor for the grpc.aio server"""
+
+    def __init__(self, limits):
+        self.limits = limits
+
+    async def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = await continuation(handler_call_details)
+        if handler is None or method not in self.limits.limits:
+            return handler
+
+        limits = self.limits
+
+        def wrap(behavior, streaming):
+            async def limited(request_or_iterator, context):
+                if not limits.try_acquire(method):
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rejected_message(method))
+                try:
+                    return await behavior(request_or_iterator, context)
+                finally:
+                    limits.release(method)
+
+            async def limited_stream(request_or_iterator, context):
+                if not limits.try_acquire(method):
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, _rejected_message(method))
+                try:
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+                finally:
+                    limits.release(method)
+
+            return limited_stream if streaming else limited
+
+        return wrap_rpc_handler(handler, wrap)
+
+
+# Status code numbers (grpc.aio contexts report ints) -> names
+_STATUS_NAMES = {code.value[0]: code.name for code in grpc.StatusCode}
+
+
+def _status_name(context, failed):
+    """Final status of a call: the code set on the context, else OK/UNKNOWN"""
+    code = context.code()
+    if code is None:
+        return 'UNKNOWN' if failed else 'OK'
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    return _STATUS_NAMES.get(code, str(code))
+
+
+def _record_rpc(method, tracker, context, failed):
+    code = _status_name(context, failed)
+    elapsed = tracker.stop(method)
+    observe_rpc(method, code, elapsed)
+    ACCESS_LOG.rpc(method, code, elapsed, tracker)
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records latency, status codes, in-flight calls and Mongo round trips per method.
+
+    Also writes each call's access log line. Put it first so it also sees
+    the calls rejected by the interceptors after it (authentication, method
+    limits).
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return handler
+
+        def wrap(behavior, streaming):
+            def observed(request_or_iterator, context):
+                tracker = RequestTracker(GRPC_IN_FLIGHT, (method,)).start()
+                failed = True
+                try:
+                    response = behavior(request_or_iterator, context)
+                    failed = False
+                    return response
+                finally:
+                    _record_rpc(method, tracker, context, failed)
+
+            def observed_stream(request_or_iterator, context):
+                tracker = RequestTracker(GRPC_IN_FLIGHT, (method,)).start()
+                failed = True
+                try:
+                    yield from behavior(request_or_iterator, context)
+                    failed = False
+                finally:
+                    _record_rpc(method, tracker, context, failed)
+
+            return observed_stream if streaming else observed
+
+        return wrap_rpc_handler(handler, wrap)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """MetricsInterceptor for the grpc.aio server"""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return handler
+
+        def wrap(behavior, streaming):
+            async def observed(request_or_iterator, context):
+                tracker = RequestTracker(GRPC_IN_FLIGHT, (method,)).start()
+                failed = True
+                try:
+                    response = await behavior(request_or_iterator, context)
+                    failed = False
+                    return response
+                finally:
+                    _record_rpc(method, tracker, context, failed)
+
+            async def observed_stream(request_or_iterator, context):
+                tracker = RequestTracker(GRPC_IN_FLIGHT, (method,)).start()
+                failed = True
+                try:
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+                    failed = False
+                finally:
+                    _record_rpc(method, tracker, context, failed)
+
+            return observed_stream if streaming else observed
+
+        return wrap_rpc_handler(handler, wrap)
@@ -0,0 +1,438 @@
+import os
+import json
+import time
+import socket
+import logging
+import selectors
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the pooled HTTP front-end (overridable through the environment)
+DEFAULT_HTTP_WORKERS = 32
+DEFAULT_HTTP_BACKLOG = 128
+DEFAULT_HTTP_MAX_QUEUE = 64
+DEFAULT_HTTP_IDLE_TIMEOUT = 10
+DEFAULT_HTTP_MAX_REQUESTS_PER_CONNECTION = 100
+DEFAULT_HTTP_MAX_IDLE_CONNECTIONS = 1024
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands accepted connections to a bounded worker pool.
+
+    The accept loop never blocks on a handler: connections are queued to a
+    ThreadPoolExecutor, and once ``max_workers + max_queue`` connections are
+    in flight new ones are answered with 503 straight from the accept thread.
+
+    A keep-alive connection with no request pending is parked instead of
+    holding a worker: one thread waits on all parked sockets with a selector
+    and queues a connection for a worker again when its next request
+    arrives. Parked connections don't count as in flight; at most
+    ``max_idle_connections`` are kept, and one idle for ``idle_timeout``
+    seconds is closed.
+    """
+
+    allow_reuse_address = True
+    # KeepAliveRequestHandler hands idle connections back instead of blocking on them
+    parks_idle_connections = True
+
+    def __init__(self, server_address, handler_class, max_workers=DEFAULT_HTTP_WORKERS,
+                 backlog=DEFAULT_HTTP_BACKLOG, max_queue=DEFAULT_HTTP_MAX_QUEUE,
+                 idle_timeout=DEFAULT_HTTP_IDLE_TIMEOUT,
+                 max_requests_per_connection=DEFAULT_HTTP_MAX_REQUESTS_PER_CONNECTION,
+                 max_idle_connections=DEFAULT_HTTP_MAX_IDLE_CONNECTIONS,
+                 reuse_port=False, bind_and_activate=True):
+        # listen() reads request_queue_size during server_activate()
+        self.request_queue_size = backlog
+        self.reuse_port = reuse_port
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.max_idle_connections = max_idle_connections
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._accepted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._requests = 0
+        self._reused_requests = 0
+        self._limit_closes = 0
+        self._idle = 0
+        self._idle_timeouts = 0
+        # Handlers waiting to be registered with the parking thread's selector
+        self._parking = []
+        self._parking_closed = False
+        self._parker = None
+        self._wakeup = None
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='http-worker'
+        )
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    def server_bind(self):
+        if self.reuse_port:
+            # Several worker processes accept on this port (SERVER_PROCESSES)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        """Queue the connection for a worker or reject it when saturated"""
+        with self._lock:
+            saturated = self._in_flight >= self.max_workers + self.max_queue
+            if saturated:
+                self._rejected += 1
+            else:
+                self._in_flight += 1
+                self._accepted += 1
+
+        if saturated:
+            logger.warning(f"HTTP server saturated, rejecting connection from {client_address[0]}")
+            self._reject_request(request)
+            return
+
+        self._executor.submit(self._process_request_worker, request, client_address)
+
+    def finish_request(self, request, client_address):
+        """Run the handler for a new connection and return it (a parked one is resumed later)"""
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def _process_request_worker(self, request, client_address, handler=None):
+        """Run the handler for one connection, or resume a parked one, on a pool thread"""
+        with self._lock:
+            self._active += 1
+        parked = False
+        try:
+            if handler is None:
+                handler = self.finish_request(request, client_address)
+            else:
+                handler.resume()
+            if getattr(handler, 'parked', False):
+                parked = self._park(handler)
+                if not parked:
+                    handler.close_idle()
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            if not parked:
+                self.shutdown_request(request)
+            with self._lock:
+                self._active -= 1
+                self._in_flight -= 1
+                if not parked:
+                    self._completed += 1
+
+    def _park(self, handler):
+        """Hand an idle keep-alive connection to the parking thread; False when it must be closed"""
+        with self._lock:
+            if self._parking_closed or self._idle >= self.max_idle_connections:
+                return False
+            self._idle += 1
+            self._parking.append(handler)
+            if self._parker is None:
+                self._wakeup = socket.socketpair()
+                self._wakeup[1].setblocking(False)
+                self._parker = threading.Thread(target=self._park_loop, name='http-keepalive', daemon=True)
+                self._parker.start()
+        self._wake()
+        return True
+
+    def _wake(self):
+        try:
+            self._wakeup[1].send(b'\0')
+        except OSError:
+            # A full socket buffer means a wake-up is already pending
+            pass
+
+    def _park_loop(self):
+        """Wait for parked connections to send their next request; close the ones idle too long"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakeup[0], selectors.EVENT_READ)
+        # handler -> idle deadline, oldest first (every connection gets the same timeout)
+        idle = OrderedDict()
+        try:
+            while True:
+                with self._lock:
+                    parking, self._parking = self._parking, []
+                    if self._parking_closed:
+                        idle.update((handler, 0) for handler in parking)
+                        break
+                now = time.monotonic()
+                for handler in parking:
+                    idle[handler] = now + self.idle_timeout if self.idle_timeout else None
+                    selector.register(handler.connection, selectors.EVENT_READ, handler)
+
+                deadline = next(iter(idle.values())) if idle else None
+                timeout = None if deadline is None else max(0.0, deadline - now)
+                for key, _ in selector.select(timeout):
+                    if key.data is None:
+                        try:
+                            self._wakeup[0].recv(4096)
+                        except OSError:
+                            pass
+                        continue
+                    selector.unregister(key.fileobj)
+                    del idle[key.data]
+                    self._dispatch(key.data)
+
+                now = time.monotonic()
+                while idle:
+                    handler, deadline = next(iter(idle.items()))
+                    if deadline is None or deadline > now:
+                        break
+                    del idle[handler]
+                    selector.unregister(handler.connection)
+                    self._close_parked(handler, timed_out=True)
+        finally:
+            for handler in idle:
+                self._close_parked(handler)
+            selector.close()
+
+    def _dispatch(self, handler):
+        """Queue a parked connection whose next request has arrived, or reject it when saturated"""
+        with self._lock:
+            self._idle -= 1
+            saturated = self._in_flight >= self.max_workers + self.max_queue
+            if saturated:
+                self._rejected += 1
+                self._completed += 1
+            else:
+                self._in_flight += 1
+
+        if saturated:
+            logger.warning(f"HTTP server saturated, rejecting keep-alive request from {handler.client_address[0]}")
+            try:
+                handler.close_idle()
+            except Exception:
+                pass
+            self._reject_request(handler.connection)
+            return
+
+        try:
+            self._executor.submit(self._process_request_worker, handler.connection, handler.client_address, handler)
+        except RuntimeError:
+            # Executor shut down by server_close()
+            with self._lock:
+                self._idle += 1
+                self._in_flight -= 1
+            self._close_parked(handler)
+
+    def _close_parked(self, handler, timed_out=False):
+        with self._lock:
+            self._idle -= 1
+            self._completed += 1
+            if timed_out:
+                self._idle_timeouts += 1
+        try:
+            handler.close_idle()
+        except Exception:
+            pass
+        self.shutdown_request(handler.connection)
+
+    def _stop_parking(self):
+        """Close every parked connection and park no more"""
+        with self._lock:
+            self._parking_closed = True
+            parker = self._parker
+        if parker is not None:
+            self._wake()
+            parker.join(5)
+            for end in self._wakeup:
+                end.close()
+
+    def _reject_request(self, request):
+        """Answer with 503 without reading the request through a handler"""
+        body = json.dumps({'error': 'Server busy, please retry'}).encode()
+        head = (
+            'HTTP/1.1 503 Service Unavailable\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Retry-After: 1\r\n'
+            'Access-Control-Allow-Origin: *\r\n'
+            'Connection: close\r\n'
+            '\r\n'
+        ).encode()
+        try:
+            # Drain whatever the client already sent so close() doesn't RST
+            request.setblocking(False)
+            try:
+                request.recv(65536)
+            except (BlockingIOError, OSError):
+                pass
+            request.setblocking(True)
+            request.sendall(head + body)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def record_connection(self, requests_handled, hit_request_limit):
+        """Account for a finished keep-alive connection"""
+        with self._lock:
+            self._requests += requests_handled
+            self._reused_requests += max(0, requests_handled - 1)
+            if hit_request_limit:
+                self._limit_closes += 1
+
+    def server_close(self):
+        super().server_close()
+        self._stop_parking()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def drain(self, timeout):
+        """Stop accepting, give open connections up to ``timeout`` seconds, then close.
+
+        Idle keep-alive connections are closed right away and busy ones
+        after their current response. Must be called from another thread
+        than serve_forever().
+        """
+        self.shutdown()
+        self._stop_parking()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._in_flight:
+                    break
+            time.sleep(0.05)
+        self.server_close()
+
+    def stats(self):
+        """Snapshot of pool utilisation counters"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'active': self._active,
+                'queued': self._in_flight - self._active,
+                'idle': self._idle,
+                'max_idle_connections': self.max_idle_connections,
+                'idle_timeouts': self._idle_timeouts,
+                'max_queue': self.max_queue,
+                'backlog': self.request_queue_size,
+                'accepted': self._accepted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'requests': self._requests,
+                'reused_requests': self._reused_requests,
+                'connection_reuse_ratio': round(self._reused_requests / self._requests, 3) if self._requests else 0.0,
+                'closed_at_request_limit': self._limit_closes,
+                'idle_timeout': self.idle_timeout,
+                'max_requests_per_connection': self.max_requests_per_connection,
+            }
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 request handler that serves several requests per connection.
+
+    Idle connections are dropped after the server's ``idle_timeout`` and a
+    connection is closed once it has served ``max_requests_per_connection``
+    responses. Every response must carry Content-Length (or chunked framing)
+    for the client to find the end of the body. Under PooledHTTPServer a
+    connection with no request pending is parked and releases its worker;
+    other servers keep the classic blocking loop.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes: with Nagle on, the body waits for
+    # the client's delayed ACK (~40 ms) on every keep-alive response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # StreamRequestHandler applies self.timeout to the socket in setup()
+        self.timeout = getattr(self.server, 'idle_timeout', None)
+        super().setup()
+        self.requests_handled = 0
+        self.hit_request_limit = False
+        self.parked = False
+
+    def handle(self):
+        """Serve the requests the client has sent, then park the connection when the server can"""
+        self.parked = False
+        self.close_connection = True
+        self.handle_one_request()
+        parks = getattr(self.server, 'parks_idle_connections', False)
+        while not self.close_connection:
+            if parks and not self._request_pending():
+                self.parked = True
+                return
+            self.handle_one_request()
+
+    def _request_pending(self):
+        """Whether the client already sent (part of) another request, without blocking"""
+        self.connection.settimeout(0)
+        try:
+            # Pipelined requests may already sit in rfile's buffer, where the selector can't see them
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def finish(self):
+        if self.parked:
+            # Keep the files (and rfile's buffer) for resume()
+            return
+        super().finish()
+        record = getattr(self.server, 'record_connection', None)
+        if record:
+            record(self.requests_handled, self.hit_request_limit)
+
+    def resume(self):
+        """Serve a parked connection whose next request has arrived"""
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def close_idle(self):
+        """Release a parked connection's files before its socket is closed"""
+        self.parked = False
+        self.finish()
+
+    def end_headers(self):
+        # Every response passes through here, so this is where the per-connection budget is enforced
+        self.requests_handled += 1
+        limit = getattr(self.server, 'max_requests_per_connection', 0)
+        if limit and self.requests_handled >= limit and not self.close_connection:
+            self.hit_request_limit = True
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def send_chunk(self, data):
+        """Write one chunk of a Transfer-Encoding: chunked body"""
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def end_chunks(self):
+        """Terminate a chunked body"""
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def create_http_server(port, handler_class, reuse_port=False):
+    """Build a PooledHTTPServer configured from the HTTP_* environment variables"""
+    max_workers = int(os.getenv('HTTP_WORKERS', DEFAULT_HTTP_WORKERS))
+    backlog = int(os.getenv('HTTP_BACKLOG', DEFAULT_HTTP_BACKLOG))
+    max_queue = int(os.getenv('HTTP_MAX_QUEUE', DEFAULT_HTTP_MAX_QUEUE))
+    idle_timeout = float(os.getenv('HTTP_IDLE_TIMEOUT', DEFAULT_HTTP_IDLE_TIMEOUT))
+    max_requests = int(os.getenv('HTTP_MAX_REQUESTS_PER_CONNECTION', DEFAULT_HTTP_MAX_REQUESTS_PER_CONNECTION))
+    max_idle = int(os.getenv('HTTP_MAX_IDLE_CONNECTIONS', DEFAULT_HTTP_MAX_IDLE_CONNECTIONS))
+
+    server = PooledHTTPServer(
+        ('0.0.0.0', port),
+        handler_class,
+        max_workers=max_workers,
+        backlog=backlog,
+        max_queue=max_queue,
+        idle_timeout=idle_timeout,
+        max_requests_per_connection=max_requests,
+        max_idle_connections=max_idle,
+        reuse_port=reuse_port
+    )
+    logger.info(f"  HTTP workers: {max_workers}, backlog: {backlog}, max queued connections: {max_queue}")
+    logger.info(f"  HTTP keep-alive: idle timeout {idle_timeout}s, max {max_requests} requests per connection, "
+                f"max {max_idle} idle connections")
+    return server
@@ -0,0 +1,158 @@
+"""
+Logging setup (LOG_LEVEL, LOG_QUEUE_SIZE, ACCESS_LOG_SAMPLE_RATE)
+
+Request threads and the event loop never write to stdout themselves: log
+records go through a bounded queue to one background thread that formats
+and writes them. When the queue is full (stdout cannot keep up) a record
+is dropped and counted in domunity_log_records_dropped_total instead of
+stalling the request that logged it.
+
+Per-request detail is logged at DEBUG with lazy %-style arguments, so at
+the default INFO level the hot path only pays for the access log: one
+line per REST request or RPC, written for a sample of them.
+"""
+import os
+import sys
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+
+from metrics import LOG_RECORDS_DROPPED
+
+DEFAULT_LOG_LEVEL = 'INFO'
+DEFAULT_LOG_QUEUE_SIZE = 10000                 # 0: write synchronously from the thread that logs
+DEFAULT_ACCESS_LOG_SAMPLE_RATE = 1.0
+
+LOG_FORMAT = '%(asctime)s [%(levelname)8s] [%(name)20s] %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+access_logger = logging.getLogger('access')
+_MONGO_FIELDS = 'mongo=%d mongo_ms=%.2f docs=%d slow=%s'
+
+
+class LoggingConfig:
+    """Level, queueing and access-log sampling of the server's logging"""
+
+    def __init__(self, level=DEFAULT_LOG_LEVEL, queue_size=DEFAULT_LOG_QUEUE_SIZE,
+                 access_sample_rate=DEFAULT_ACCESS_LOG_SAMPLE_RATE):
+        level = str(level).upper()
+        if not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"Invalid LOG_LEVEL {level!r}, expected DEBUG, INFO, WARNING, ERROR or CRITICAL")
+        if not 0.0 <= access_sample_rate <= 1.0:
+            raise ValueError(f"ACCESS_LOG_SAMPLE_RATE must be between 0 and 1, got {access_sample_rate}")
+        self.level = level
+        self.queue_size = queue_size
+        self.access_sample_rate = access_sample_rate
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from LOG_LEVEL / LOG_QUEUE_SIZE / ACCESS_LOG_SAMPLE_RATE"""
+        return cls(
+            level=os.getenv('LOG_LEVEL', DEFAULT_LOG_LEVEL),
+            queue_size=int(os.getenv('LOG_QUEUE_SIZE', DEFAULT_LOG_QUEUE_SIZE)),
+            access_sample_rate=float(os.getenv('ACCESS_LOG_SAMPLE_RATE', DEFAULT_ACCESS_LOG_SAMPLE_RATE)),
+        )
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full.
+
+    Records are queued unformatted: the message, its arguments and any
+    traceback are rendered on the listener thread. The queue never leaves
+    the process, so nothing has to be pickled.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _LogListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Blocking: the listener is still draining, so a full queue makes room
+        self.queue.put(self._sentinel)
+
+
+class AccessLog:
+    """One structured line per REST request or RPC, for a sample of them.
+
+    Failures (HTTP 5xx, RPCs that did not end OK) and slow requests are
+    always logged; the rest are logged with probability ``sample_rate``.
+    The Mongo fields come from the request's tracing.RequestTracker.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_ACCESS_LOG_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def _sampled(self):
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    def http(self, method, path, route, code, seconds, tracker):
+        if (code >= 500 or tracker.slow or self._sampled()) and access_logger.isEnabledFor(logging.INFO):
+            access_logger.info('http method=%s path=%s route=%s code=%s ms=%.2f ' + _MONGO_FIELDS,
+                               method, path.split('?', 1)[0], route, code, seconds * 1000,
+                               tracker.mongo_round_trips, tracker.mongo_seconds * 1000, tracker.mongo_documents,
+                               tracker.slow)
+
+    def rpc(self, method, code, seconds, tracker):
+        if (code != 'OK' or tracker.slow or self._sampled()) and access_logger.isEnabledFor(logging.INFO):
+            access_logger.info('grpc method=%s code=%s ms=%.2f ' + _MONGO_FIELDS,
+                               method, code, seconds * 1000,
+                               tracker.mongo_round_trips, tracker.mongo_seconds * 1000, tracker.mongo_documents,
+                               tracker.slow)
+
+
+ACCESS_LOG = AccessLog()
+
+_listener = None
+_handler = None
+
+
+def configure_logging(config=None, stream=None):
+    """Install the root handler for ``config`` (default: from the environment).
+
+    With a queue size above 0 the handler is a DroppingQueueHandler drained
+    by a background thread; with 0 records are written synchronously.
+    Calling it again replaces the previous setup.
+    """
+    global _listener, _handler
+    config = config or LoggingConfig.from_env()
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    if config.queue_size > 0:
+        records = queue.Queue(config.queue_size)
+        handler = DroppingQueueHandler(records)
+        _listener = _LogListener(records, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+
+    _handler = handler
+    root.addHandler(handler)
+    root.setLevel(config.level)
+    ACCESS_LOG.sample_rate = config.access_sample_rate
+    return config
+
+
+def stop_logging():
+    """Write out every queued record and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
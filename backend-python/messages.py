@@ -0,0 +1,95 @@
+"""
+MongoDB documents -> domunity_pb2 messages
+
+Shared by the threaded servicers (server.py) and the asyncio ones
+(aio_server.py), so both serving modes answer with the same messages.
+"""
+from google.protobuf import field_mask_pb2
+
+import domunity_pb2
+
+
+def building_message(building):
+    """Building document -> domunity_pb2.Building"""
+    return domunity_pb2.Building(
+        id=str(building['_id']),
+        address=building.get('address') or '',
+        entrance=building.get('entrance') or '',
+        total_apartments=building.get('total_apartments') or 0,
+        total_residents=building.get('total_residents') or 0
+    )
+
+
+def apartment_message(apt):
+    """Apartment document -> domunity_pb2.Apartment"""
+    return domunity_pb2.Apartment(
+        id=str(apt['_id']),
+        building_id=str(apt.get('building_id') or ''),
+        number=apt.get('number') or 0,
+        floor=apt.get('floor') or 0,
+        type=apt.get('type') or '',
+        residents=apt.get('residents') or 0
+    )
+
+
+def masked_message(message, paths):
+    """Keep only the FieldMask paths of a response message (all of it when empty)"""
+    if not paths:
+        return message
+    trimmed = type(message)()
+    field_mask_pb2.FieldMask(paths=list(paths)).MergeMessage(message, trimmed)
+    return trimmed
+
+
+def profile_message(bundle):
+    """load_profile bundle -> domunity_pb2.UserProfile"""
+    user = bundle['user']
+    apartment_doc = bundle['apartment']
+    building_doc = bundle['building']
+    profile = bundle['profile'] or {}
+
+    building = None
+    apartment = None
+    if apartment_doc and building_doc:
+        building = building_message(building_doc)
+        apartment = apartment_message(apartment_doc)
+
+    return domunity_pb2.UserProfile(
+        user=domunity_pb2.User(
+            id=str(user['_id']),
+            email=user.get('email') or '',
+            full_name=user.get('full_name') or '',
+            phone=user.get('phone') or '',
+            created_at=str(user['created_at']) if user.get('created_at') else ''
+        ),
+        building=building,
+        apartment=apartment,
+        account_manager=profile.get('account_manager') or '',
+        balance=float(profile['balance']) if profile.get('balance') else 0.0,
+        client_number=profile.get('client_number') or '',
+        contract_end_date=str(profile['contract_end_date']) if profile.get('contract_end_date') else ''
+    )
+
+
+def event_message(event):
+    """Event document -> domunity_pb2.Event"""
+    return domunity_pb2.Event(
+        id=str(event['_id']),
+        date=str(event['date']),
+        title=event['title'] or '',
+        description=event['description'] or '',
+        building_id=str(event['building_id'])
+    )
+
+
+def payment_message(payment):
+    """Payment document -> domunity_pb2.Payment"""
+    return domunity_pb2.Payment(
+        id=str(payment['_id']),
+        date=str(payment.get('created_at', '')),
+        amount=float(payment.get('amount') or 0),
+        description=payment.get('period') or '',
+        status=payment.get('status', ''),
+        period=payment.get('period') or '',
+        paid_date=payment['paid_date'].strftime('%Y-%m-%d') if payment.get('paid_date') else ''
+    )
@@ -0,0 +1,277 @@
+"""
+Request metrics in the Prometheus text format
+
+Counters, gauges and histograms are kept in process memory and rendered by
+GET /metrics on the HTTP port. Recording is lock-free: every thread
+updates its own shard of each metric and a scrape merges them.
+
+The numbers are per process: with SERVER_PROCESSES > 1 a scrape is
+answered by whichever worker accepts the connection.
+"""
+import time
+import bisect
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers cached reads (~1ms) up to slow reports and bcrypt under load
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# JWT signing/verification takes tens of microseconds
+JWT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+# Single Mongo commands: an indexed lookup on a warm server is well under a millisecond
+COMMAND_BUCKETS = (0.0001, 0.00025, 0.0005) + LATENCY_BUCKETS
+DOCUMENT_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for metrics recorded into per-thread shards.
+
+    Each thread updates only its own dict, so recording takes no lock; a
+    scrape sums copies of all the shards. Shards outlive their threads, so
+    nothing recorded is lost when a worker thread exits.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _collect(self):
+        """{labels: value} summed over every thread"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            # dict.copy() runs without releasing the GIL, so it is a consistent snapshot
+            for labels, value in shard.copy().items():
+                merged[labels] = self._merge(merged.get(labels), value)
+        return merged
+
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else total + value
+
+    def _labels(self, labels, extra=()):
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _samples(self, labels, value):
+        yield f'{self.name}{self._labels(labels)} {_format_value(value)}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self._collect().items()):
+            lines.extend(self._samples(labels, value))
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._collect().get(labels, 0)
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. requests in flight)"""
+
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    """Bucketed observations per label set, rendered as cumulative 'le' buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        values = self._shard()
+        state = values.get(labels)
+        if state is None:
+            # Per-bucket counts (the last one is +Inf) followed by the sum
+            state = values[labels] = [0] * (len(self.buckets) + 2)
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, labels=()):
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self, labels)
+
+    def count(self, labels=()):
+        state = self._collect().get(labels)
+        return sum(state[:-1]) if state else 0
+
+    @staticmethod
+    def _merge(total, value):
+        value = list(value)
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def _samples(self, labels, value):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), value):
+            cumulative += bucket_count
+            yield f'{self.name}_bucket{self._labels(labels, [("le", _format_value(float(bound)))])} {cumulative}'
+        yield f'{self.name}_sum{self._labels(labels)} {_format_value(value[-1])}'
+        # From the buckets rather than a separate count, so the two always agree
+        yield f'{self.name}_count{self._labels(labels)} {cumulative}'
+
+
+class _HistogramCount(_Metric):
+    """Counter rendered from a histogram's observation counts.
+
+    Lets a request record one observation and still expose both the
+    latency histogram and a ``*_total`` counter of the same requests.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, histogram):
+        super().__init__(name, help_text, histogram.labelnames)
+        self.histogram = histogram
+
+    def _collect(self):
+        return {labels: sum(state[:-1]) for labels, state in self.histogram._collect().items()}
+
+    def value(self, labels=()):
+        return self._collect().get(labels, 0)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+
+
+class MetricsRegistry:
+    """Ordered set of metrics rendered together by /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def count_of(self, histogram, name, help_text):
+        """Counter of the observations recorded into ``histogram``"""
+        return self._register(_HistogramCount(name, help_text, histogram))
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_DURATION = REGISTRY.histogram(
+    'domunity_http_request_duration_seconds', 'REST request latency', ('method', 'route', 'code'))
+HTTP_REQUESTS = REGISTRY.count_of(
+    HTTP_DURATION, 'domunity_http_requests_total', 'REST requests by route and status code')
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'domunity_http_requests_in_flight', 'REST requests being handled', ('method',))
+GRPC_DURATION = REGISTRY.histogram(
+    'domunity_grpc_request_duration_seconds', 'RPC latency (streams: until the last message)', ('method', 'code'))
+GRPC_REQUESTS = REGISTRY.count_of(
+    GRPC_DURATION, 'domunity_grpc_requests_total', 'RPCs by method and status code')
+GRPC_IN_FLIGHT = REGISTRY.gauge(
+    'domunity_grpc_requests_in_flight', 'RPCs being handled', ('method',))
+MONGO_COMMANDS = REGISTRY.counter(
+    'domunity_mongo_commands_total', 'MongoDB commands sent, by command name', ('command',))
+MONGO_ROUND_TRIPS = REGISTRY.histogram(
+    'domunity_mongo_round_trips_per_request', 'MongoDB commands sent while handling one REST route or RPC',
+    ('handler',), buckets=ROUND_TRIP_BUCKETS)
+MONGO_COMMAND_SECONDS = REGISTRY.histogram(
+    'domunity_mongo_command_seconds', 'MongoDB command latency as seen by the driver', ('command',),
+    buckets=COMMAND_BUCKETS)
+MONGO_SECONDS = REGISTRY.histogram(
+    'domunity_mongo_seconds_per_request', 'Time spent in MongoDB commands by requests that sent any',
+    ('handler',), buckets=COMMAND_BUCKETS)
+MONGO_DOCUMENTS = REGISTRY.histogram(
+    'domunity_mongo_documents_per_request', 'Documents returned by MongoDB to requests that sent any command',
+    ('handler',), buckets=DOCUMENT_BUCKETS)
+MONGO_BYTES = REGISTRY.histogram(
+    'domunity_mongo_reply_bytes_per_request', 'BSON bytes of the MongoDB replies of one request (MONGO_TRACE_BYTES)',
+    ('handler',), buckets=BYTE_BUCKETS)
+AGGREGATION_PLANS = REGISTRY.counter(
+    'domunity_slow_aggregations_explained_total', 'Slow aggregates explained, by collection and COLLSCAN flag',
+    ('collection', 'flagged'))
+SLOW_REQUESTS = REGISTRY.counter(
+    'domunity_slow_requests_total', 'REST requests and RPCs slower than SLOW_REQUEST_MS', ('handler',))
+PASSWORD_SECONDS = REGISTRY.histogram(
+    'domunity_password_seconds', 'bcrypt hash/verify time in the password pool, including queueing',
+    ('operation',))
+JWT_SECONDS = REGISTRY.histogram(
+    'domunity_jwt_seconds', 'JWT signing and verification time', ('operation',), buckets=JWT_BUCKETS)
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'domunity_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+
+def observe_http(method, route, code, seconds):
+    # One observation feeds both the histogram and domunity_http_requests_total
+    HTTP_DURATION.observe(seconds, (method, route, str(code)))
+
+
+def observe_rpc(method, code, seconds):
+    GRPC_DURATION.observe(seconds, (method, code))
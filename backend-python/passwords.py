@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent import futures
+import bcrypt
+
+from metrics import PASSWORD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool has no free slot for another request"""
+
+
+def _hash_password(password):
+    """Runs in a worker process"""
+    return bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
+
+
+def _check_password(password, password_hash):
+    """Runs in a worker process"""
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _timed(fn, *args):
+    """Runs in a worker process: fn's result and how long it ran"""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+# Label of each pool function in domunity_password_seconds
+_OPERATIONS = {_hash_password: 'hash', _check_password: 'verify'}
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool with admission control.
+
+    At most ``max_workers + max_pending`` hash/verify calls may be queued or
+    running; any call beyond that fails immediately with PasswordPoolBusy so
+    a login burst cannot pile up behind the RPC and HTTP worker threads.
+    Worker processes are started with 'spawn' because forking a process that
+    already runs gRPC threads is unsafe.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, timeout=10.0, executor=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = self.max_workers * 4 if max_pending is None else max_pending
+        self.timeout = timeout
+        self._executor = executor
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._started_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        """Build a hasher from PASSWORD_WORKERS / PASSWORD_MAX_PENDING / PASSWORD_TIMEOUT"""
+        workers = os.getenv('PASSWORD_WORKERS')
+        pending = os.getenv('PASSWORD_MAX_PENDING')
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_pending=int(pending) if pending else None,
+            timeout=float(os.getenv('PASSWORD_TIMEOUT', '10')),
+        )
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = futures.ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    logger.info(f"✓ Password pool started with {self.max_workers} worker processes")
+        return self._executor
+
+    def _start(self, fn, *args):
+        """Admit a call and submit it to the pool, returning its future.
+
+        The future resolves to ``(result, run_seconds)``; the run time is
+        measured in the worker so time spent queued for a worker doesn't
+        count as busy.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise PasswordPoolBusy("Password pool is saturated")
+
+        with self._stats_lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        started = time.monotonic()
+        try:
+            future = self._get_executor().submit(_timed, fn, *args)
+        except Exception:
+            self._release(started)
+            raise
+        # The slot is held until the worker finishes, even if the caller times out
+        future.add_done_callback(lambda done: self._release(started, _OPERATIONS.get(fn, 'other'), done))
+        return future
+
+    def _submit(self, fn, *args):
+        future = self._start(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)[0]
+        except futures.TimeoutError:
+            self._timed_out()
+
+    async def _submit_async(self, fn, *args):
+        # Awaits the worker process without parking a thread
+        future = self._start(fn, *args)
+        try:
+            return (await asyncio.wait_for(asyncio.wrap_future(future), self.timeout))[0]
+        except asyncio.TimeoutError:
+            self._timed_out()
+
+    def _timed_out(self):
+        with self._stats_lock:
+            self._timeouts += 1
+        raise PasswordPoolBusy("Password check timed out")
+
+    def _release(self, started, operation=None, future=None):
+        elapsed = time.monotonic() - started
+        # Calls that failed or never ran report no run time; all of it counts as waiting
+        ran = future.result()[1] if future and not future.cancelled() and future.exception() is None else 0.0
+        with self._stats_lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._busy_seconds += ran
+            self._wait_seconds += max(0.0, elapsed - ran)
+        self._slots.release()
+        if operation:
+            PASSWORD_SECONDS.observe(elapsed, (operation,))
+
+    def hash(self, password):
+        """Return a bcrypt hash (str) of password"""
+        return self._submit(_hash_password, password.encode('utf-8'))
+
+    def verify(self, password, password_hash):
+        """Check password against a stored bcrypt hash"""
+        return self._submit(_check_password, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    async def hash_async(self, password):
+        """hash() for coroutines"""
+        return await self._submit_async(_hash_password, password.encode('utf-8'))
+
+    async def verify_async(self, password, password_hash):
+        """verify() for coroutines"""
+        return await self._submit_async(_check_password, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def stats(self):
+        """Pool utilisation counters"""
+        with self._stats_lock:
+            uptime = max(time.monotonic() - self._started_at, 1e-9)
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - self.max_workers),
+                'peak_in_flight': self._peak_in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'avg_call_ms': round(self._busy_seconds / self._completed * 1000, 2) if self._completed else 0.0,
+                'avg_wait_ms': round(self._wait_seconds / self._completed * 1000, 2) if self._completed else 0.0,
+                'utilization': round(min(1.0, self._busy_seconds / (uptime * self.max_workers)), 4),
+            }
+
+    def shutdown(self):
+        """Cancel queued calls and wait for the running ones to finish"""
+        if self._executor is not None:
+            # wait=False races interpreter exit: the pool processes can miss
+            # their stop sentinel and outlive this process
+            self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,189 @@
+"""
+On-demand profiling of a live server process
+
+POST /api/admin/profile/cpu samples the Python stack of every thread for a
+few seconds and returns collapsed stacks ("frame;frame;frame count"), the
+input of flamegraph.pl, speedscope and inferno. POST
+/api/admin/profile/memory runs tracemalloc for a few seconds and returns
+the source lines that allocated the most memory still alive at the end.
+
+Nothing is installed while no profile is running: the sampler is a loop
+in the request thread that asked for it, and tracemalloc is stopped again
+afterwards. Only one profile runs at a time per process; with
+SERVER_PROCESSES > 1 the profile covers the worker that accepted the
+connection.
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+DEFAULT_PROFILE_SECONDS = 10.0
+MAX_PROFILE_SECONDS = 60.0
+DEFAULT_SAMPLE_INTERVAL_MS = 10.0             # 100 Hz
+MIN_SAMPLE_INTERVAL_MS = 1.0
+DEFAULT_TOP_ALLOCATIONS = 25
+MAX_TRACEBACK_FRAMES = 25
+
+# Leaf frames of threads waiting for work: left out unless idle samples are asked for
+_IDLE_FRAMES = frozenset([
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto'),
+    ('socketserver.py', 'serve_forever'),
+    ('base_events.py', '_run_once'),
+])
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_name(code):
+    # ';' separates the frames of a collapsed stack
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def collapse(frame, idle=False):
+    """Root-first frame names of ``frame``'s stack joined by ';', or None for an idle thread"""
+    code = frame.f_code
+    if not idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+        return None
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def render_collapsed(stacks):
+    """Collapsed stacks, one 'stack count' line each, most sampled first"""
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def _check_seconds(seconds):
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise ValueError(f"seconds must be between 0 and {MAX_PROFILE_SECONDS:g}, got {seconds}")
+
+
+class Profiler:
+    """Runs one CPU or memory profile of this process at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running in this process")
+
+    def sample_cpu(self, seconds=DEFAULT_PROFILE_SECONDS, interval_ms=DEFAULT_SAMPLE_INTERVAL_MS,
+                   idle=False, by_thread=False):
+        """Sample every other thread's stack each ``interval_ms`` for ``seconds``.
+
+        Returns a dict with the collapsed stacks (a Counter), the number of
+        sampling rounds and the functions most often on top of a stack.
+        """
+        _check_seconds(seconds)
+        if interval_ms < MIN_SAMPLE_INTERVAL_MS:
+            raise ValueError(f"interval_ms must be at least {MIN_SAMPLE_INTERVAL_MS:g}, got {interval_ms}")
+        self._acquire()
+        try:
+            own = threading.get_ident()
+            interval = interval_ms / 1000
+            stacks = Counter()
+            names = {}
+            rounds = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            while True:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = collapse(frame, idle)
+                    if stack is None:
+                        continue
+                    if by_thread:
+                        if ident not in names:
+                            names = {thread.ident: thread.name.replace(' ', '_') for thread in threading.enumerate()}
+                        stack = f'{names.get(ident, ident)};{stack}'
+                    stacks[stack] += 1
+                del frame
+                rounds += 1
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                time.sleep(min(interval, deadline - now))
+            elapsed = time.perf_counter() - started
+        finally:
+            self._lock.release()
+
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return {
+            'seconds': round(elapsed, 3),
+            'interval_ms': interval_ms,
+            'rounds': rounds,
+            'samples': sum(stacks.values()),
+            'stacks': stacks,
+            'top_functions': [{'function': name, 'samples': count} for name, count in leaves.most_common(20)],
+        }
+
+    def trace_memory(self, seconds=DEFAULT_PROFILE_SECONDS, top=DEFAULT_TOP_ALLOCATIONS, frames=1):
+        """Trace allocations for ``seconds`` and return the ``top`` sites of the memory still allocated.
+
+        With ``frames`` > 1 sites are grouped by traceback instead of line.
+        If tracemalloc was already running (PYTHONTRACEMALLOC) it is left on.
+        """
+        _check_seconds(seconds)
+        frames = max(1, min(int(frames), MAX_TRACEBACK_FRAMES))
+        self._acquire()
+        try:
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start(frames)
+            try:
+                before = tracemalloc.take_snapshot() if was_tracing else None
+                tracemalloc.reset_peak()
+                time.sleep(seconds)
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+        finally:
+            self._lock.release()
+
+        exclude = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        snapshot = snapshot.filter_traces(exclude)
+        group = 'traceback' if frames > 1 else 'lineno'
+        if before is not None:
+            statistics = [stat for stat in snapshot.compare_to(before.filter_traces(exclude), group)
+                          if stat.size_diff > 0]
+            statistics.sort(key=lambda stat: stat.size_diff, reverse=True)
+            sites = [{'size_bytes': stat.size_diff, 'count': stat.count_diff, 'traceback': stat.traceback}
+                     for stat in statistics[:top]]
+        else:
+            sites = [{'size_bytes': stat.size, 'count': stat.count, 'traceback': stat.traceback}
+                     for stat in snapshot.statistics(group)[:top]]
+        for site in sites:
+            traceback = site.pop('traceback')
+            site['site'] = f'{traceback[0].filename}:{traceback[0].lineno}'
+            if frames > 1:
+                site['traceback'] = [f'{frame.filename}:{frame.lineno}' for frame in traceback]
+        return {
+            'seconds': seconds,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'top': sites,
+        }
+
+
+PROFILER = Profiler()
@@ -0,0 +1,873 @@
+import json
+import base64
+import logging
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from balances import BALANCES_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(ValueError):
+    """Raised for invalid client-supplied query parameters"""
+
+
+def encode_cursor(values):
+    """Encode keyset values into an opaque URL-safe page cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise QueryError(f"Invalid cursor: {e}")
+
+
+def parse_object_id(value, name):
+    """Convert a client-supplied id to ObjectId or raise QueryError"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise QueryError(f"Invalid {name}: {value!r}")
+
+
+def parse_bool(value, name):
+    """Parse 'true'/'false'/'1'/'0' query values"""
+    lowered = str(value).lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    raise QueryError(f"Invalid {name}: {value!r}")
+
+
+def parse_limit(value, default, maximum):
+    """Parse a page size, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid limit: {value!r}")
+    return max(1, min(limit, maximum))
+
+
+# ==================== Field masks ====================
+
+# Paths a client may select (gRPC FieldMask / REST fields=), per response type:
+# top-level field -> its selectable subfields
+USER_MASK_FIELDS = ('id', 'email', 'full_name', 'phone', 'created_at')
+BUILDING_MASK_FIELDS = ('id', 'address', 'entrance', 'total_apartments', 'total_residents')
+APARTMENT_MASK_FIELDS = ('id', 'building_id', 'number', 'floor', 'type', 'residents')
+PROFILE_MASK_FIELDS = {
+    'user': USER_MASK_FIELDS,
+    'building': BUILDING_MASK_FIELDS,
+    'apartment': APARTMENT_MASK_FIELDS,
+    'account_manager': (),
+    'balance': (),
+    'client_number': (),
+    'contract_end_date': (),
+}
+# The REST profile page also carries the user's activity
+PROFILE_PAGE_MASK_FIELDS = dict(PROFILE_MASK_FIELDS, events=(), payments=(), last_payment=(), financial_summary=())
+
+
+def parse_field_mask(paths, allowed):
+    """Parse field mask paths into {field: None (whole) or {subfield: None}}.
+
+    ``paths`` is a FieldMask's paths or a comma-separated ``fields=``
+    value; ``allowed`` is a {field: subfields} table or a flat tuple of
+    fields. No paths means no mask: None, i.e. every field.
+    """
+    if not isinstance(allowed, dict):
+        allowed = dict.fromkeys(allowed, ())
+    if isinstance(paths, str):
+        paths = paths.split(',')
+    paths = [path.strip() for path in paths if path and path.strip()]
+    if not paths:
+        return None
+
+    fields = {}
+    for path in paths:
+        name, _, subfield = path.partition('.')
+        if name not in allowed or (subfield and subfield not in allowed[name]):
+            raise QueryError(f"Invalid field: {path!r}")
+        if not subfield:
+            fields[name] = None
+        elif fields.get(name, {}) is not None:
+            fields.setdefault(name, {})[subfield] = None
+    return fields
+
+
+def mask_wants(fields, name):
+    """True if the mask selects ``name`` (or any of its subfields)"""
+    return fields is None or name in fields
+
+
+def mask_subfields(fields, name):
+    """The part of the mask below ``name``: None for all of it, {} for none"""
+    return None if fields is None else fields.get(name, {})
+
+
+def mask_projection(fields, projection, keep=()):
+    """Narrow a $project to the fields the mask selects (plus ``keep``)"""
+    if fields is None:
+        return projection
+    narrowed = {field: value for field, value in projection.items() if field in fields or field in keep}
+    return narrowed or {"_id": 1}
+
+
+def trim_fields(data, fields):
+    """Drop the keys of a REST response the mask does not select"""
+    if fields is None:
+        return data
+    trimmed = {}
+    for name, subfields in fields.items():
+        if name in data:
+            value = data[name]
+            trimmed[name] = trim_fields(value, subfields) if isinstance(value, dict) else value
+    return trimmed
+
+
+# ==================== Admin residents ====================
+
+RESIDENTS_DEFAULT_LIMIT = 200
+RESIDENTS_MAX_LIMIT = 1000
+
+# Public sort key -> document field produced by the residents pipeline
+RESIDENTS_SORT_FIELDS = {
+    'id': '_id',
+    'name': 'full_name',
+    'email': 'email',
+    'debt': 'total_debt',
+}
+
+# Sort fields that live on the users document itself
+_USER_SORT_FIELDS = {'_id', 'full_name', 'email'}
+
+
+def _keyset_match(field, value, last_id, descending):
+    """$match that resumes a (field, _id) ordered scan after the given row"""
+    op = '$lt' if descending else '$gt'
+    if field == '_id':
+        return {"$match": {"_id": {op: last_id}}}
+    return {"$match": {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: last_id}},
+    ]}}
+
+
+def build_residents_pipeline(building_id=None, is_active=None, min_debt=None,
+                             sort='id', descending=False, after=None, limit=RESIDENTS_DEFAULT_LIMIT):
+    """Build the single aggregation behind the admin residents list.
+
+    Apartment, building, profile and outstanding debt (from the
+    apartment_balances summary) are all joined inside the pipeline
+    (concise localField + pipeline $lookup, MongoDB 5.0+), so one page
+    costs one round trip no matter how many residents it holds. ``after``
+    is the decoded keyset cursor ``[sort_value, id]``; the pipeline
+    returns ``limit + 1`` rows so the caller can tell whether another page
+    exists.
+    """
+    if sort not in RESIDENTS_SORT_FIELDS:
+        raise QueryError(f"Invalid sort: {sort!r}")
+    sort_field = RESIDENTS_SORT_FIELDS[sort]
+    direction = -1 if descending else 1
+
+    keyset = None
+    if after is not None:
+        try:
+            after_value, after_id = after
+            after_id = parse_object_id(after_id, 'cursor')
+        except (TypeError, ValueError):
+            raise QueryError("Invalid cursor")
+        if sort_field == '_id':
+            after_value = after_id
+        keyset = _keyset_match(sort_field, after_value, after_id, descending)
+
+    sort_stage = {"$sort": {sort_field: direction, "_id": direction}} if sort_field != '_id' \
+        else {"$sort": {"_id": direction}}
+
+    pipeline = []
+    if is_active is True:
+        # Documents without the flag are treated as active, as in the response mapping
+        pipeline.append({"$match": {"is_active": {"$ne": False}}})
+    elif is_active is False:
+        pipeline.append({"$match": {"is_active": False}})
+
+    # When nothing downstream filters or sorts on joined data, page first and
+    # join only the rows being returned
+    page_early = sort_field in _USER_SORT_FIELDS and building_id is None and min_debt is None
+    if page_early:
+        if keyset:
+            pipeline.append(keyset)
+        pipeline.extend([sort_stage, {"$limit": limit + 1}])
+
+    pipeline.extend([
+        {"$lookup": {
+            "from": "apartments",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [
+                {"$project": {"_id": 0, "number": 1, "residents": 1, "building_id": 1}},
+                {"$limit": 1},
+            ],
+            "as": "apartment_data"
+        }},
+        {"$unwind": {"path": "$apartment_data", "preserveNullAndEmptyArrays": True}},
+    ])
+    if building_id is not None:
+        pipeline.append({"$match": {"apartment_data.building_id": building_id}})
+
+    pipeline.extend([
+        {"$lookup": {
+            "from": "buildings",
+            "localField": "apartment_data.building_id",
+            "foreignField": "_id",
+            "pipeline": [
+                {"$project": {"_id": 0, "address": 1, "entrance": 1}},
+            ],
+            "as": "building_data"
+        }},
+        {"$unwind": {"path": "$building_data", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "user_profiles",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [
+                {"$project": {"_id": 0, "client_number": 1, "balance": 1}},
+            ],
+            "as": "profile_data"
+        }},
+        {"$unwind": {"path": "$profile_data", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": BALANCES_COLLECTION,
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [
+                {"$group": {"_id": None, "total": {"$sum": "$amount_due"}}},
+            ],
+            "as": "debt_data"
+        }},
+        {"$addFields": {"total_debt": {"$ifNull": [{"$first": "$debt_data.total"}, 0]}}},
+    ])
+    if min_debt is not None:
+        pipeline.append({"$match": {"total_debt": {"$gt": min_debt}}})
+
+    if not page_early:
+        if keyset:
+            pipeline.append(keyset)
+        pipeline.extend([sort_stage, {"$limit": limit + 1}])
+
+    pipeline.append({"$project": {
+        "full_name": 1, "email": 1, "role": 1, "is_active": 1, "total_debt": 1,
+        "apartment_data": 1, "building_data": 1, "profile_data": 1,
+    }})
+    return pipeline
+
+
+def parse_residents_query(query):
+    """Translate REST query parameters into build_residents_pipeline kwargs"""
+    options = {
+        'sort': query.get('sort', 'id'),
+        'limit': parse_limit(query.get('limit'), RESIDENTS_DEFAULT_LIMIT, RESIDENTS_MAX_LIMIT),
+    }
+    order = query.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise QueryError(f"Invalid order: {order!r}")
+    options['descending'] = order == 'desc'
+    if query.get('building'):
+        options['building_id'] = parse_object_id(query['building'], 'building')
+    if query.get('active', '') != '':
+        options['is_active'] = parse_bool(query['active'], 'active')
+    if query.get('min_debt', '') != '':
+        try:
+            options['min_debt'] = float(query['min_debt'])
+        except ValueError:
+            raise QueryError(f"Invalid min_debt: {query['min_debt']!r}")
+    if query.get('cursor'):
+        options['after'] = decode_cursor(query['cursor'])
+    return options
+
+
+def format_resident(row):
+    """Map a residents pipeline row to the REST response shape"""
+    apartment = row.get('apartment_data', {})
+    building = row.get('building_data', {})
+    profile = row.get('profile_data', {})
+    return {
+        'id': str(row['_id']),
+        'name': row.get('full_name', ''),
+        'email': row['email'],
+        'building': building.get('address', ''),
+        'entrance': building.get('entrance', ''),
+        'apartment': str(apartment.get('number', '')),
+        'clientNumber': profile.get('client_number', ''),
+        'residentsCount': apartment.get('residents', 0),
+        'balance': float(profile.get('balance', 0.0)),
+        'totalDebt': float(row.get('total_debt', 0.0)),
+        'role': row.get('role', 'user'),
+        'isActive': row.get('is_active', True),
+    }
+
+
+class ResidentsPage:
+    """Iterates one page of residents from a single aggregation cursor.
+
+    Rows are formatted as they arrive so the HTTP layer can stream them;
+    ``next_cursor`` is known once iteration has finished.
+    """
+
+    def __init__(self, db, sort='id', limit=RESIDENTS_DEFAULT_LIMIT, **filters):
+        self.db = db
+        self.sort_field = RESIDENTS_SORT_FIELDS.get(sort, '_id')
+        self.limit = limit
+        self.pipeline = build_residents_pipeline(sort=sort, limit=limit, **filters)
+        self.next_cursor = None
+
+    def __iter__(self):
+        count = 0
+        last = None
+        for row in self.db.db.users.aggregate(self.pipeline, batchSize=min(self.limit + 1, 500)):
+            if count == self.limit:
+                # The extra row only signals that another page exists
+                sort_value = last.get(self.sort_field) if self.sort_field != '_id' else None
+                self.next_cursor = encode_cursor([sort_value, str(last['_id'])])
+                break
+            count += 1
+            last = row
+            yield format_resident(row)
+
+
+# ==================== Payment history ====================
+
+PAYMENTS_DEFAULT_PAGE_SIZE = 24
+PAYMENTS_MAX_PAGE_SIZE = 120
+PAYMENT_STATUSES = ("paid", "pending", "overdue")
+
+PAYMENT_FIELDS = {"period": 1, "amount": 1, "status": 1, "paid_date": 1, "created_at": 1}
+
+# Newest first; _id breaks ties. Served by the payments
+# (user_id, created_at, _id) index, so no page ever sorts in memory.
+PAYMENTS_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def parse_date(value, name):
+    """Parse a YYYY-MM-DD (or full ISO) date, or raise QueryError"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid {name}: {value!r}")
+
+
+def encode_payment_token(payment):
+    """Page token pointing just past this payment"""
+    return encode_cursor([payment['created_at'].isoformat(), str(payment['_id'])])
+
+
+def decode_payment_token(token):
+    try:
+        created_at, payment_id = decode_cursor(token)
+    except (TypeError, ValueError):
+        raise QueryError("Invalid page_token")
+    return parse_date(created_at, 'page_token'), parse_object_id(payment_id, 'page_token')
+
+
+def parse_payment_options(page_size=None, page_token=None, statuses=(), date_from=None, date_to=None):
+    """Validate raw payment-history parameters from either transport.
+
+    Returns load_payment_history kwargs. Dates filter created_at: date_from
+    is inclusive, date_to exclusive.
+    """
+    options = {'page_size': parse_limit(page_size or None, PAYMENTS_DEFAULT_PAGE_SIZE, PAYMENTS_MAX_PAGE_SIZE)}
+    if page_token:
+        options['after'] = decode_payment_token(page_token)
+    statuses = [status for status in statuses if status]
+    for status in statuses:
+        if status not in PAYMENT_STATUSES:
+            raise QueryError(f"Invalid status: {status!r}")
+    if statuses:
+        options['statuses'] = statuses
+    if date_from:
+        options['date_from'] = parse_date(date_from, 'from')
+    if date_to:
+        options['date_to'] = parse_date(date_to, 'to')
+    return options
+
+
+def parse_payments_query(query):
+    """Translate REST query parameters (status is comma-separated) into load_payment_history kwargs"""
+    return parse_payment_options(
+        page_size=query.get('page_size'),
+        page_token=query.get('page_token'),
+        statuses=query.get('status', '').split(','),
+        date_from=query.get('from'),
+        date_to=query.get('to'),
+    )
+
+
+def build_payments_filter(user_id, statuses=None, date_from=None, date_to=None, after=None):
+    """Filter for one user's payments, optionally resuming after a page token"""
+    query = {"user_id": user_id}
+    if statuses:
+        query["status"] = {"$in": list(statuses)}
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from
+        if date_to:
+            query["created_at"]["$lt"] = date_to
+    if after:
+        created_at, payment_id = after
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": payment_id}},
+        ]
+    return query
+
+
+def _payments_page(rows, page_size):
+    if len(rows) > page_size:
+        return rows[:page_size], encode_payment_token(rows[page_size - 1])
+    return rows, None
+
+
+def load_payment_history(db, user_id, page_size=PAYMENTS_DEFAULT_PAGE_SIZE, after=None, **filters):
+    """One page of a user's payments, newest first: (payments, next_page_token)"""
+    if not isinstance(user_id, ObjectId):
+        user_id = ObjectId(user_id)
+    cursor = db.db.payments.find(build_payments_filter(user_id, after=after, **filters), PAYMENT_FIELDS)
+    return _payments_page(list(cursor.sort(PAYMENTS_SORT).limit(page_size + 1)), page_size)
+
+
+async def load_payment_history_async(db, user_id, page_size=PAYMENTS_DEFAULT_PAGE_SIZE, after=None, **filters):
+    """load_payment_history over an AsyncDatabase"""
+    if not isinstance(user_id, ObjectId):
+        user_id = ObjectId(user_id)
+    cursor = db.db.payments.find(build_payments_filter(user_id, after=after, **filters), PAYMENT_FIELDS)
+    return _payments_page(await cursor.sort(PAYMENTS_SORT).limit(page_size + 1).to_list(None), page_size)
+
+
+def format_payment(payment):
+    """Map a payment document to the REST response shape"""
+    return {
+        'id': str(payment['_id']),
+        'period': payment.get('period') or '',
+        'amount': float(payment.get('amount') or 0),
+        'status': payment.get('status', ''),
+        'paid_date': payment['paid_date'].strftime('%d.%m.%Y') if payment.get('paid_date') else None,
+        'created_at': payment['created_at'].isoformat() if payment.get('created_at') else None,
+    }
+
+
+# ==================== Building reports ====================
+
+STREAM_DEFAULT_BATCH_SIZE = 100
+STREAM_MAX_BATCH_SIZE = 1000
+
+FINANCIAL_FEE_FIELDS = ("elevator_gtp", "elevator_electricity", "common_area_electricity",
+                        "elevator_maintenance", "management_fee", "repair_fund")
+
+
+def stream_batch_size(requested, default=STREAM_DEFAULT_BATCH_SIZE):
+    """Cursor batch size for a streaming RPC: the request's if set, capped"""
+    if requested and requested > 0:
+        return min(requested, STREAM_MAX_BATCH_SIZE)
+    return default
+
+
+def apartments_cursor(db, building_id, batch_size):
+    """A building's apartments by number, fetched batch_size per round trip"""
+    return db.db.apartments.find({"building_id": ObjectId(building_id)}).sort("number", 1).batch_size(batch_size)
+
+
+def build_financial_report_pipeline(building_id):
+    """Apartments of a building joined with their resident and financial record"""
+    return [
+        {"$match": {"building_id": ObjectId(building_id)}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"full_name": 1}}],
+            "as": "user_data"
+        }},
+        {"$unwind": {"path": "$user_data", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "financial_records",
+            "localField": "_id",
+            "foreignField": "apartment_id",
+            "as": "financial_data"
+        }},
+        {"$unwind": {"path": "$financial_data", "preserveNullAndEmptyArrays": True}},
+        {"$sort": {"number": 1}}
+    ]
+
+
+def financial_report_cursor(db, building_id, batch_size=None):
+    """Cursor over the financial report rows of a building"""
+    kwargs = {"batchSize": batch_size} if batch_size else {}
+    return db.db.apartments.aggregate(build_financial_report_pipeline(building_id), **kwargs)
+
+
+def financial_report_fields(row):
+    """FinancialReportEntry fields for one financial report row"""
+    user_data = row.get('user_data', {})
+    financial_data = row.get('financial_data', {})
+    fields = {
+        'apartment_number': row['number'],
+        'type': row['type'] or 'Апартамент',
+        'floor': row['floor'] or 0,
+        'client_name': user_data.get('full_name', 'N/A'),
+        'residents': row['residents'],
+        'total_due': float(financial_data.get('total_due', 0) or 0),
+    }
+    for name in FINANCIAL_FEE_FIELDS:
+        fields[name] = float(financial_data.get(name, 0) or 0)
+    return fields
+
+
+# ==================== User profile ====================
+
+PROFILE_EVENTS_LIMIT = 10
+PROFILE_PAYMENTS_LIMIT = 12
+
+USER_PUBLIC_FIELDS = {"email": 1, "full_name": 1, "phone": 1, "created_at": 1}
+APARTMENT_FIELDS = {"number": 1, "floor": 1, "type": 1, "residents": 1, "building_id": 1}
+BUILDING_FIELDS = {"address": 1, "entrance": 1, "total_apartments": 1, "total_residents": 1}
+PROFILE_FIELDS = {"_id": 0, "account_manager": 1, "balance": 1, "client_number": 1, "contract_end_date": 1}
+
+
+def build_profile_pipeline(user_id, include_activity=False, join_apartment=True, building_id=None, fields=None):
+    """Aggregation that assembles a user's profile in one round trip.
+
+    user -> apartment -> building -> user_profiles are joined with
+    projections, so password_hash and unused fields never leave MongoDB.
+    With include_activity the building's latest events and the user's
+    payments are joined as well (REST profile page). When the apartment and
+    building come from a cache, pass join_apartment=False and the known
+    building_id so only the user-specific data is fetched. A list of ids
+    matches all of those users (batched lookups).
+
+    ``fields`` is a parsed field mask: projections are narrowed to it and
+    lookups for parts it does not select are left out entirely.
+    """
+    pipeline = [
+        {"$match": {"_id": {"$in": user_id} if isinstance(user_id, list) else user_id}},
+        {"$project": mask_projection(mask_subfields(fields, 'user'), USER_PUBLIC_FIELDS)},
+    ]
+    if join_apartment and _profile_needs_apartment(fields, include_activity):
+        pipeline.extend(_profile_apartment_stages(fields))
+    if any(mask_wants(fields, name) for name in PROFILE_FIELDS if name != "_id"):
+        pipeline.extend([
+            {"$lookup": {
+                "from": "user_profiles",
+                "localField": "_id",
+                "foreignField": "user_id",
+                "pipeline": [{"$project": mask_projection(fields, PROFILE_FIELDS, keep=("_id",))}],
+                "as": "profile"
+            }},
+            {"$unwind": {"path": "$profile", "preserveNullAndEmptyArrays": True}},
+        ])
+    if include_activity:
+        if mask_wants(fields, 'events'):
+            events_pipeline = [
+                {"$sort": {"date": -1}},
+                {"$limit": PROFILE_EVENTS_LIMIT},
+                {"$project": {"_id": 0, "date": 1, "title": 1, "description": 1}},
+            ]
+            if join_apartment:
+                events_lookup = {"from": "events", "localField": "building._id", "foreignField": "building_id"}
+            else:
+                events_lookup = {"from": "events"}
+                events_pipeline.insert(0, {"$match": {"building_id": building_id}})
+            if join_apartment or building_id is not None:
+                pipeline.append({"$lookup": {**events_lookup, "pipeline": events_pipeline, "as": "events"}})
+        facets = {}
+        if mask_wants(fields, 'payments'):
+            # First page of the history; the extra row yields its page token
+            facets["recent"] = [
+                {"$sort": dict(PAYMENTS_SORT)},
+                {"$limit": PROFILE_PAYMENTS_LIMIT + 1},
+                {"$project": PAYMENT_FIELDS},
+            ]
+        if mask_wants(fields, 'last_payment'):
+            facets["last_paid"] = [
+                {"$match": {"status": "paid", "paid_date": {"$ne": None}}},
+                {"$sort": dict(PAYMENTS_SORT)},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "amount": 1, "paid_date": 1}},
+            ]
+        if facets:
+            pipeline.append({"$lookup": {
+                "from": "payments",
+                "localField": "_id",
+                "foreignField": "user_id",
+                "pipeline": [{"$facet": facets}],
+                "as": "payments"
+            }})
+        if mask_wants(fields, 'financial_summary'):
+            # Totals over the whole history come from the materialized summary
+            pipeline.append({"$lookup": {
+                "from": BALANCES_COLLECTION,
+                "localField": "_id",
+                "foreignField": "user_id",
+                "pipeline": [{"$group": {
+                    "_id": None,
+                    "total": {"$sum": "$total_amount"},
+                    "pending": {"$sum": "$pending_amount"},
+                    "overdue": {"$sum": "$overdue_amount"},
+                }}],
+                "as": "payment_totals"
+            }})
+    return pipeline
+
+
+def _profile_needs_apartment(fields, include_activity):
+    """Apartment and building are needed for themselves or to find the events"""
+    return (mask_wants(fields, 'apartment') or mask_wants(fields, 'building')
+            or (include_activity and mask_wants(fields, 'events')))
+
+
+def _profile_apartment_stages(fields=None):
+    apartment_fields = mask_projection(mask_subfields(fields, 'apartment'), APARTMENT_FIELDS, keep=("building_id",))
+    building_fields = mask_projection(mask_subfields(fields, 'building'), BUILDING_FIELDS)
+    return [
+        {"$lookup": {
+            "from": "apartments",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$limit": 1}, {"$project": apartment_fields}],
+            "as": "apartment"
+        }},
+        {"$unwind": {"path": "$apartment", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "buildings",
+            "localField": "apartment.building_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": building_fields}],
+            "as": "building"
+        }},
+        {"$unwind": {"path": "$building", "preserveNullAndEmptyArrays": True}},
+    ]
+
+
+def load_profile(db, user_id, include_activity=False, cache=None, fields=None):
+    """Load a user's profile bundle, or None if the user does not exist.
+
+    Returns a dict with ``user``, ``apartment``, ``building`` and
+    ``profile`` (each None when missing; apartment and building are only
+    set together). With include_activity it also has ``events``, the first
+    ``payments`` page with its ``payments_next_page_token``, and a
+    ``payment_summary`` (total, pending, overdue, last_paid) over the
+    whole payment history. Shared by UserServicer.GetProfile and the
+    REST /api/user/profile handler. With a ReadThroughCache the apartment
+    and building are taken from it instead of being joined. With a field
+    mask only the selected parts are loaded; the rest come back empty.
+    """
+    if not isinstance(user_id, ObjectId):
+        user_id = ObjectId(user_id)
+
+    cached = cache is not None and _profile_needs_apartment(fields, include_activity)
+    apartment = building = None
+    if cached:
+        apartment = cache.get_user_apartment(user_id)
+        building = cache.get_building(apartment['building_id']) if apartment else None
+
+    pipeline = _profile_pipeline(user_id, include_activity, cache is not None, building, fields)
+    row = next(db.db.users.aggregate(pipeline), None)
+    return _profile_bundle(row, include_activity, cache is not None, apartment, building)
+
+
+async def load_profile_async(db, user_id, include_activity=False, cache=None, fields=None):
+    """load_profile over an AsyncDatabase (and AsyncReadThroughCache)"""
+    if not isinstance(user_id, ObjectId):
+        user_id = ObjectId(user_id)
+
+    cached = cache is not None and _profile_needs_apartment(fields, include_activity)
+    apartment = building = None
+    if cached:
+        apartment = await cache.get_user_apartment(user_id)
+        building = await cache.get_building(apartment['building_id']) if apartment else None
+
+    pipeline = _profile_pipeline(user_id, include_activity, cache is not None, building, fields)
+    rows = await db.db.users.aggregate(pipeline).to_list(1)
+    return _profile_bundle(rows[0] if rows else None, include_activity, cache is not None, apartment, building)
+
+
+def _profile_pipeline(user_id, include_activity, cached, building, fields):
+    if not cached:
+        return build_profile_pipeline(user_id, include_activity, fields=fields)
+    return build_profile_pipeline(user_id, include_activity, join_apartment=False,
+                                  building_id=building['_id'] if building else None, fields=fields)
+
+
+def _profile_bundle(row, include_activity, cached, apartment, building):
+    if row is None:
+        return None
+
+    if not cached:
+        apartment = row.pop('apartment', None)
+        building = row.pop('building', None)
+    if not (apartment and building):
+        apartment = building = None
+
+    bundle = {
+        'user': row,
+        'apartment': apartment,
+        'building': building,
+        'profile': row.pop('profile', None),
+    }
+    if include_activity:
+        events = row.pop('events', [])
+        bundle['events'] = events if building else []
+        facets = (row.pop('payments', None) or [{}])[0]
+        totals = (row.pop('payment_totals', None) or [{}])[0]
+        last_paid = facets.get('last_paid') or []
+        bundle['payments'], bundle['payments_next_page_token'] = _payments_page(
+            facets.get('recent', []), PROFILE_PAYMENTS_LIMIT)
+        bundle['payment_summary'] = {
+            'total': totals.get('total', 0.0),
+            'pending': totals.get('pending', 0.0),
+            'overdue': totals.get('overdue', 0.0),
+            'last_paid': last_paid[0] if last_paid else None,
+        }
+    return bundle
+
+
+# ==================== Batched lookups ====================
+
+BATCH_MAX_IDS = 500
+BATCH_EVENTS_DEFAULT_LIMIT = 10
+BATCH_EVENTS_MAX_LIMIT = 50
+
+
+def parse_batch_ids(ids, name='ids'):
+    """Split requested ids into (ObjectIds, invalid ids), both in request order.
+
+    ``ids`` is a list or a comma-separated string. Duplicates are dropped.
+    """
+    if isinstance(ids, str):
+        ids = ids.split(',')
+    ids = [value.strip() for value in ids if value and value.strip()]
+    if not ids:
+        raise QueryError(f"Missing {name}")
+    if len(ids) > BATCH_MAX_IDS:
+        raise QueryError(f"Too many {name}: {len(ids)} (max {BATCH_MAX_IDS})")
+
+    object_ids, invalid = [], []
+    for value in dict.fromkeys(ids):
+        try:
+            object_ids.append(ObjectId(value))
+        except (InvalidId, TypeError):
+            invalid.append(value)
+    return object_ids, invalid
+
+
+def in_request_order(object_ids, invalid, found):
+    """(found values in request order, missing ids) for a batched lookup"""
+    values = [found[object_id] for object_id in object_ids if found.get(object_id) is not None]
+    missing = [str(object_id) for object_id in object_ids if found.get(object_id) is None]
+    return values, invalid + missing
+
+
+def build_batch_events_pipeline(building_ids, limit=BATCH_EVENTS_DEFAULT_LIMIT):
+    """Latest ``limit`` events of each building, grouped per building.
+
+    Ranked with $setWindowFields over the (building_id, date) index so
+    only the kept events reach the $group.
+    """
+    return [
+        {"$match": {"building_id": {"$in": building_ids}}},
+        {"$setWindowFields": {
+            "partitionBy": "$building_id",
+            "sortBy": {"date": -1},
+            "output": {"rank": {"$documentNumber": {}}},
+        }},
+        {"$match": {"rank": {"$lte": limit}}},
+        {"$sort": {"building_id": 1, "date": -1}},
+        {"$group": {
+            "_id": "$building_id",
+            "events": {"$push": {"_id": "$_id", "building_id": "$building_id", "date": "$date",
+                                 "title": "$title", "description": "$description"}},
+        }},
+    ]
+
+
+def building_projection(fields):
+    """Projection of a masked building read, or None (whole, cacheable documents) without a mask"""
+    return None if fields is None else mask_projection(fields, BUILDING_FIELDS)
+
+
+def apartment_projection(fields):
+    """Projection of a masked apartment read, or None without a mask"""
+    return None if fields is None else mask_projection(fields, APARTMENT_FIELDS)
+
+
+def load_buildings(db, building_ids, cache=None, fields=None):
+    """{building_id: building} for the ids that exist, in one $in query.
+
+    ``fields`` (a parsed field mask) narrows the projection of the query;
+    with a cache, hits are whole documents and only the misses are read
+    with it.
+    """
+    if cache is not None:
+        return cache.get_buildings(building_ids, building_projection(fields))
+    cursor = db.db.buildings.find({"_id": {"$in": building_ids}}, mask_projection(fields, BUILDING_FIELDS))
+    return {doc['_id']: doc for doc in cursor}
+
+
+async def load_buildings_async(db, building_ids, cache=None, fields=None):
+    """load_buildings over an AsyncDatabase (and AsyncReadThroughCache)"""
+    if cache is not None:
+        return await cache.get_buildings(building_ids, building_projection(fields))
+    cursor = db.db.buildings.find({"_id": {"$in": building_ids}}, mask_projection(fields, BUILDING_FIELDS))
+    return {doc['_id']: doc async for doc in cursor}
+
+
+def load_profiles(db, user_ids, fields=None):
+    """{user_id: profile bundle} for the users that exist, in one aggregation.
+
+    Bundles have the shape of load_profile without activity.
+    """
+    rows = db.db.users.aggregate(build_profile_pipeline(list(user_ids), fields=fields))
+    return {row['_id']: _profile_bundle(row, False, False, None, None) for row in rows}
+
+
+async def load_profiles_async(db, user_ids, fields=None):
+    """load_profiles over an AsyncDatabase"""
+    rows = db.db.users.aggregate(build_profile_pipeline(list(user_ids), fields=fields))
+    return {row['_id']: _profile_bundle(row, False, False, None, None) async for row in rows}
+
+
+def load_events_for_buildings(db, building_ids, limit=BATCH_EVENTS_DEFAULT_LIMIT, cache=None):
+    """{building_id: latest events} for the requested buildings that exist.
+
+    The ids are resolved like load_buildings (cache hits are free, misses
+    share one $in query reading only _id), then the events of the existing
+    buildings come from one aggregation. Nonexistent buildings are left
+    out, so callers can report them as missing.
+    """
+    buildings = load_buildings(db, building_ids, cache, fields={})
+    existing = [building_id for building_id in building_ids if building_id in buildings]
+    events = {building_id: [] for building_id in existing}
+    if existing:
+        for row in db.db.events.aggregate(build_batch_events_pipeline(existing, limit)):
+            events[row['_id']] = row['events']
+    return events
+
+
+async def load_events_for_buildings_async(db, building_ids, limit=BATCH_EVENTS_DEFAULT_LIMIT, cache=None):
+    """load_events_for_buildings over an AsyncDatabase (and AsyncReadThroughCache)"""
+    buildings = await load_buildings_async(db, building_ids, cache, fields={})
+    existing = [building_id for building_id in building_ids if building_id in buildings]
+    events = {building_id: [] for building_id in existing}
+    if existing:
+        async for row in db.db.events.aggregate(build_batch_events_pipeline(existing, limit)):
+            events[row['_id']] = row['events']
+    return events
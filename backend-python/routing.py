@@ -0,0 +1,126 @@
+from urllib.parse import parse_qsl
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def _to_objectid(value):
+    return ObjectId(value)
+
+
+def _to_int(value):
+    return int(value)
+
+
+# Converters for typed path parameters: {name:type}
+PARAM_CONVERTERS = {
+    'str': str,
+    'int': _to_int,
+    'objectid': _to_objectid,
+}
+
+
+class InvalidPathParameter(ValueError):
+    """Raised when a typed path parameter fails conversion"""
+
+    def __init__(self, name, value):
+        super().__init__(f"Invalid {name}: {value!r}")
+        self.name = name
+        self.value = value
+
+
+class RouteMatch:
+    """Result of a route lookup"""
+
+    __slots__ = ('handler', 'params', 'query', 'allowed_methods', 'pattern')
+
+    def __init__(self, handler, params, query, allowed_methods, pattern=None):
+        self.handler = handler
+        self.params = params
+        self.query = query
+        self.allowed_methods = allowed_methods
+        # Registered pattern, e.g. for per-route metrics without path parameter values
+        self.pattern = pattern
+
+
+class _Node:
+    __slots__ = ('static', 'param', 'handlers', 'pattern')
+
+    def __init__(self):
+        self.static = {}
+        # (name, converter, child node) for a {param} segment
+        self.param = None
+        self.handlers = {}
+        self.pattern = None
+
+
+class Router:
+    """Segment-trie router with typed path parameters.
+
+    Patterns are split into segments once at registration; a lookup walks
+    one trie level per path segment, so the cost does not grow with the
+    number of registered routes. Static segments take precedence over
+    parameters, e.g. ``/api/building/me/apartments`` wins over
+    ``/api/building/{building_id:objectid}/apartments``. There is no
+    backtracking, so a static segment must register every route below it.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, method, pattern, handler):
+        """Register handler for method + pattern (e.g. '/api/building/{building_id:objectid}')"""
+        node = self._root
+        for segment in self._split(pattern):
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, type_name = segment[1:-1].partition(':')
+                converter = PARAM_CONVERTERS[type_name or 'str']
+                if node.param is None:
+                    node.param = (name, converter, _Node())
+                elif node.param[0] != name or node.param[1] is not converter:
+                    raise ValueError(f"Conflicting path parameter {segment} in {pattern}")
+                node = node.param[2]
+            else:
+                node = node.static.setdefault(segment, _Node())
+
+        if method in node.handlers:
+            raise ValueError(f"Route already registered: {method} {pattern}")
+        node.handlers[method] = handler
+        node.pattern = pattern
+
+    def match(self, method, target):
+        """Resolve a request target to a RouteMatch, or None when no path matches.
+
+        Raises InvalidPathParameter when the path matches but a typed
+        parameter does not convert. A match whose ``handler`` is None means
+        the path exists but not for this method.
+        """
+        path, _, query_string = target.partition('?')
+
+        node = self._root
+        raw_params = []
+        for segment in self._split(path):
+            child = node.static.get(segment)
+            if child is None:
+                if node.param is None or not segment:
+                    return None
+                name, converter, child = node.param
+                raw_params.append((name, converter, segment))
+            node = child
+
+        if not node.handlers:
+            return None
+
+        params = {}
+        for name, converter, value in raw_params:
+            try:
+                params[name] = converter(value)
+            except (InvalidId, TypeError, ValueError):
+                raise InvalidPathParameter(name, value)
+
+        query = dict(parse_qsl(query_string, keep_blank_values=True)) if query_string else {}
+        return RouteMatch(node.handlers.get(method), params, query, tuple(node.handlers), node.pattern)
+
+    @staticmethod
+    def _split(path):
+        path = path.strip('/')
+        return path.split('/') if path else []
@@ -0,0 +1,421 @@
+"""
+Synthetic DomUnity dataset, from the demo seed up to capacity-test scale
+
+Generates Bulgarian residential buildings with their apartments,
+residents, profiles, monthly payments, current financial records, events
+and maintenance. Documents are produced one building at a time and
+written with batched insert_many, so memory stays flat at 100k
+apartments and beyond. Every user gets the same bcrypt hash, computed
+once. The same seed and as-of date always give the same data, ObjectIds
+included.
+
+The first building keeps the demo accounts (admin@domunity.bg,
+ivan.ivanov@example.com, m.georgieva@example.com and
+petar.petrov@example.com, password test123). On first start the server
+seeds an empty database with SAMPLE_BUILDINGS x SAMPLE_APARTMENTS.
+
+Usage:
+    python sample_data.py --buildings 2500 --apartments 40 --months 24 --dry-run
+    python sample_data.py --buildings 2500 --apartments 40 --months 24 --seed 7 [--drop]
+"""
+import os
+import sys
+import time
+import random
+import struct
+import calendar
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+import bcrypt
+import bson
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUILDINGS = 1
+DEFAULT_APARTMENTS = 6
+DEFAULT_MONTHS = 3
+DEFAULT_OCCUPANCY = 0.85
+DEFAULT_BATCH_SIZE = 1000
+DEMO_PASSWORD = 'test123'
+
+# Collections written by insert_dataset, in insertion order
+DATASET_COLLECTIONS = ('buildings', 'users', 'apartments', 'user_profiles', 'payments', 'financial_records',
+                       'events', 'maintenance_records')
+
+# email, full name, phone, role, is_active; residents take the first apartments of the first building
+DEMO_USERS = (
+    ('ivan.ivanov@example.com', 'Иван Иванов', '+359 888 123 456', 'user', True),
+    ('m.georgieva@example.com', 'Мария Георгиева', '+359 888 234 567', 'user', True),
+    ('petar.petrov@example.com', 'Петър Петров', '+359 888 345 678', 'user', False),
+    ('admin@domunity.bg', 'Админ ДомУнити', '+359 888 000 000', 'admin', True),
+)
+DEMO_ADDRESS = ('ж.к. Младост 3, бл. 325', 'Б')
+# The demo residents live in the first apartments of building 0
+DEMO_RESIDENTS = sum(1 for user in DEMO_USERS if user[3] != 'admin')
+
+MONTHS_BG = ('Януари', 'Февруари', 'Март', 'Април', 'Май', 'Юни', 'Юли', 'Август', 'Септември',
+             'Октомври', 'Ноември', 'Декември')
+MALE_NAMES = ('Георги', 'Иван', 'Димитър', 'Петър', 'Николай', 'Христо', 'Стефан', 'Тодор', 'Васил',
+              'Александър', 'Йордан', 'Стоян', 'Атанас', 'Красимир', 'Мартин')
+FEMALE_NAMES = ('Мария', 'Иванка', 'Елена', 'Йорданка', 'Пенка', 'Даниела', 'Десислава', 'Гергана',
+                'Надежда', 'Цветелина', 'Виктория', 'Росица', 'Петя', 'Симона', 'Николета')
+# Male forms; the female form adds 'а'
+SURNAMES = ('Иванов', 'Георгиев', 'Димитров', 'Петров', 'Николов', 'Христов', 'Стоянов', 'Тодоров',
+            'Илиев', 'Василев', 'Атанасов', 'Ангелов', 'Маринов', 'Колев', 'Йорданов', 'Попов')
+EMAIL_DOMAINS = ('abv.bg', 'gmail.com', 'mail.bg', 'yahoo.com', 'dir.bg')
+MANAGERS = ('Мария Петрова', 'Николай Стоянов', 'Елена Маринова', 'Георги Колев')
+# City, districts, street names
+CITIES = (
+    ('София', ('ж.к. Младост 1', 'ж.к. Младост 3', 'ж.к. Люлин 5', 'ж.к. Надежда 2', 'ж.к. Дружба 1',
+               'ж.к. Стрелбище', 'кв. Лозенец'), ('ул. Цар Симеон', 'бул. Витоша', 'ул. Шипка')),
+    ('Пловдив', ('ж.к. Тракия', 'кв. Кършияка', 'кв. Кючук Париж'), ('ул. Капитан Райчо', 'бул. Руски')),
+    ('Варна', ('ж.к. Чайка', 'ж.к. Владиславово', 'кв. Левски'), ('ул. Драгоман', 'бул. Приморски')),
+    ('Бургас', ('ж.к. Славейков', 'ж.к. Изгрев', 'ж.к. Меден рудник'), ('ул. Александровска',)),
+)
+ENTRANCES = 'АБВГДЕ'
+APARTMENT_TYPES = (('Апартамент', 0.9), ('Мезонет', 0.04), ('Ателие', 0.04), ('Офис', 0.02))
+FEES = (('elevator_gtp', 1.5), ('elevator_electricity', 2.5), ('common_area_electricity', 2.0),
+        ('elevator_maintenance', 4.0), ('management_fee', 6.0), ('repair_fund', 5.0))
+EVENTS = (
+    ('Общо събрание', 'Общо събрание на входа от 19:00 ч. във входното фоайе.'),
+    ('Планирана профилактика', 'Планирана профилактика на асансьора от 10:00 до 13:00 ч.'),
+    ('Напомняне за такса', 'Изпратено напомняне за месечна такса за поддръжка.'),
+    ('Спиране на водата', 'Планирано спиране на водата от 9:00 до 15:00 ч. поради ремонт.'),
+    ('Почистване на мазетата', 'Молим собствениците да освободят общите части на мазетата.'),
+    ('Дезинсекция', 'Дезинсекция на общите части от 11:00 ч.'),
+)
+MAINTENANCE = (
+    ('Почистване и дезинфекция на входа', 20.0),
+    ('Профилактика на асансьора', 60.0),
+    ('Смяна на осветление в стълбището', 35.0),
+    ('Ремонт на входната врата', 120.0),
+    ('Боядисване на стълбището', 450.0),
+    ('Подмяна на пощенски кутии', 280.0),
+)
+_LATIN = dict(zip('абвгдежзийклмнопрстуфхцчшщъьюя',
+                  ['a', 'b', 'v', 'g', 'd', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm', 'n', 'o', 'p', 'r', 's',
+                   't', 'u', 'f', 'h', 'ts', 'ch', 'sh', 'sht', 'a', 'y', 'yu', 'ya']))
+
+
+def transliterate(text):
+    return ''.join(_LATIN.get(char, char) for char in text.lower())
+
+
+class DatasetSpec:
+    """Size, seed and as-of date of a generated dataset"""
+
+    def __init__(self, buildings=DEFAULT_BUILDINGS, apartments=DEFAULT_APARTMENTS, months=DEFAULT_MONTHS,
+                 seed=0, as_of=None, occupancy=DEFAULT_OCCUPANCY, password=DEMO_PASSWORD, bcrypt_rounds=12):
+        if buildings < 1 or months < 0:
+            raise ValueError("Need at least one building, and months must not be negative")
+        if apartments < DEMO_RESIDENTS:
+            raise ValueError(f"Need at least {DEMO_RESIDENTS} apartments per building for the demo residents, "
+                             f"got {apartments}")
+        if not 0.0 <= occupancy <= 1.0:
+            raise ValueError(f"occupancy must be between 0 and 1, got {occupancy}")
+        self.buildings = buildings
+        self.apartments = apartments
+        self.months = months
+        self.seed = seed
+        # Payments run up to this month; fixed, it makes a seed reproducible across days
+        self.as_of = as_of or date.today()
+        self.occupancy = occupancy
+        self.password = password
+        self.bcrypt_rounds = bcrypt_rounds
+
+    @classmethod
+    def from_env(cls):
+        """Build the spec from SAMPLE_BUILDINGS / SAMPLE_APARTMENTS / SAMPLE_MONTHS / SAMPLE_SEED"""
+        return cls(
+            buildings=int(os.getenv('SAMPLE_BUILDINGS', DEFAULT_BUILDINGS)),
+            apartments=int(os.getenv('SAMPLE_APARTMENTS', DEFAULT_APARTMENTS)),
+            months=int(os.getenv('SAMPLE_MONTHS', DEFAULT_MONTHS)),
+            seed=int(os.getenv('SAMPLE_SEED', 0)),
+        )
+
+
+class _ObjectIds:
+    """Sequential ObjectIds derived from the seed: the same seed gives the same ids"""
+
+    def __init__(self, rng, moment):
+        self.timestamp = calendar.timegm(moment.timetuple())
+        self.middle = rng.getrandbits(40).to_bytes(5, 'big')
+        self.count = 0
+
+    def __call__(self):
+        # 2^24 ids per second of the timestamp, as a driver would generate them
+        seconds, counter = divmod(self.count, 1 << 24)
+        self.count += 1
+        return ObjectId(struct.pack('>I', self.timestamp + seconds) + self.middle + counter.to_bytes(3, 'big'))
+
+
+class DatasetGenerator:
+    """Produces the documents of a DatasetSpec building by building"""
+
+    def __init__(self, spec, password_hash):
+        self.spec = spec
+        self.password_hash = password_hash
+        self.rng = random.Random(spec.seed)
+        self.as_of = datetime(spec.as_of.year, spec.as_of.month, spec.as_of.day)
+        self.new_id = _ObjectIds(self.rng, self.as_of)
+        self.users = 0
+
+    def buildings(self):
+        """Yield {collection: documents} for every building (the first one also has the admin)"""
+        for index in range(self.spec.buildings):
+            yield self._building(index)
+
+    def _user(self, role='user'):
+        rng = self.rng
+        self.users += 1
+        female = rng.random() < 0.5
+        first = rng.choice(FEMALE_NAMES if female else MALE_NAMES)
+        last = rng.choice(SURNAMES) + ('а' if female else '')
+        return {
+            '_id': self.new_id(),
+            # The running number keeps emails unique (users.email has a unique index)
+            'email': f'{transliterate(first)}.{transliterate(last)}{self.users}@{rng.choice(EMAIL_DOMAINS)}',
+            'password_hash': self.password_hash,
+            'full_name': f'{first} {last}',
+            'phone': f'+359 8{rng.choice("789")}{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(100, 999)}',
+            'role': role,
+            'is_active': rng.random() < 0.95,
+            'created_at': self.as_of - timedelta(days=rng.randint(30, 3 * 365)),
+        }
+
+    def _demo_user(self, email, full_name, phone, role, is_active):
+        return {'_id': self.new_id(), 'email': email, 'password_hash': self.password_hash, 'full_name': full_name,
+                'phone': phone, 'role': role, 'is_active': is_active, 'created_at': self.as_of}
+
+    def _address(self, index):
+        if index == 0:
+            return DEMO_ADDRESS
+        city, districts, streets = self.rng.choice(CITIES)
+        if self.rng.random() < 0.7:
+            address = f'{self.rng.choice(districts)}, бл. {self.rng.randint(1, 450)}'
+        else:
+            address = f'{self.rng.choice(streets)} {self.rng.randint(1, 120)}'
+        return (address if city == 'София' else f'гр. {city}, {address}'), self.rng.choice(ENTRANCES)
+
+    def _building(self, index):
+        rng = self.rng
+        spec = self.spec
+        building_id = self.new_id()
+        address, entrance = self._address(index)
+        docs = {name: [] for name in DATASET_COLLECTIONS}
+        demo = [self._demo_user(*user) for user in DEMO_USERS] if index == 0 else []
+        docs['users'].extend(user for user in demo if user['role'] == 'admin')
+        demo_residents = [user for user in demo if user['role'] != 'admin']
+        per_floor = rng.choice((2, 3, 4))
+        total_residents = 0
+
+        for number in range(1, spec.apartments + 1):
+            residents = rng.choice((1, 2, 2, 3, 3, 4, 5))
+            floor = (number - 1) // per_floor + 1
+            apartment = {
+                '_id': self.new_id(),
+                'building_id': building_id,
+                'number': number,
+                'floor': floor,
+                'type': rng.choices([kind for kind, _ in APARTMENT_TYPES],
+                                    [weight for _, weight in APARTMENT_TYPES])[0],
+                'residents': residents,
+                'user_id': None,
+            }
+            if demo_residents:
+                user = demo_residents.pop(0)
+            elif rng.random() < spec.occupancy:
+                user = self._user()
+            else:
+                user = None
+            if user is not None:
+                apartment['user_id'] = user['_id']
+                total_residents += residents
+                docs['users'].append(user)
+                docs['user_profiles'].append({
+                    '_id': self.new_id(),
+                    'user_id': user['_id'],
+                    'account_manager': rng.choice(MANAGERS),
+                    'balance': 0.0,
+                    'client_number': f'{rng.randint(10000000, 99999999)}',
+                    'contract_end_date': datetime(self.as_of.year + rng.randint(0, 2), 12, 31),
+                })
+                payments = self._payments(apartment, user['_id'])
+                docs['payments'].extend(payments)
+                docs['user_profiles'][-1]['balance'] = -round(
+                    sum(payment['amount'] for payment in payments if payment['status'] != 'paid'), 2)
+            docs['apartments'].append(apartment)
+            docs['financial_records'].append(self._financial_record(apartment))
+
+        docs['buildings'].append({
+            '_id': building_id,
+            'address': address,
+            'entrance': entrance,
+            'total_apartments': spec.apartments,
+            'total_residents': total_residents,
+        })
+        for title, description in rng.sample(EVENTS, rng.randint(2, len(EVENTS))):
+            docs['events'].append({'_id': self.new_id(), 'building_id': building_id,
+                                   'date': self.as_of - timedelta(days=rng.randint(0, 120)),
+                                   'title': title, 'description': description})
+        for description, cost in rng.sample(MAINTENANCE, rng.randint(2, 4)):
+            days = rng.randint(-60, 365)
+            docs['maintenance_records'].append({
+                '_id': self.new_id(), 'building_id': building_id,
+                'date': self.as_of - timedelta(days=days),
+                'description': description,
+                'cost': round(cost * rng.uniform(0.8, 1.3), 2),
+                'status': 'planned' if days < 0 else 'completed',
+            })
+        return docs
+
+    def _payments(self, apartment, user_id):
+        """The apartment's monthly fee for the last spec.months months, newest first"""
+        rng = self.rng
+        # A few residents fall behind for months at a time
+        late_payer = rng.random() < 0.06
+        base = 12.0 + 4.5 * apartment['residents'] + (3.0 if apartment['floor'] > 1 else 0.0)
+        payments = []
+        for age in range(self.spec.months):
+            year, month = divmod(self.as_of.year * 12 + self.as_of.month - 1 - age, 12)
+            created = datetime(year, month + 1, rng.randint(1, 5))
+            if age == 0:
+                status = 'paid' if rng.random() < 0.35 else 'pending'
+            elif late_payer and age <= 3:
+                status = 'overdue'
+            else:
+                status = 'overdue' if rng.random() < 0.02 else 'paid'
+            payments.append({
+                '_id': self.new_id(),
+                'user_id': user_id,
+                'apartment_id': apartment['_id'],
+                'amount': round(base * rng.uniform(0.9, 1.15), 2),
+                'period': f'{MONTHS_BG[month]} {year}',
+                'status': status,
+                'paid_date': created + timedelta(days=rng.randint(0, 20)) if status == 'paid' else None,
+                'created_at': created,
+            })
+        return payments
+
+    def _financial_record(self, apartment):
+        """This month's fee breakdown of the apartment (elevator fees are not charged on the ground floor)"""
+        share = apartment['residents'] / 2
+        fees = {}
+        for name, base in FEES:
+            charged = apartment['floor'] > 1 or not name.startswith('elevator')
+            fees[name] = round(base * share * self.rng.uniform(0.9, 1.1), 2) if charged else 0.0
+        return {
+            '_id': self.new_id(),
+            'apartment_id': apartment['_id'],
+            'period': self.as_of.strftime('%Y-%m'),
+            **fees,
+            'total_due': round(sum(fees.values()), 2),
+        }
+
+
+def hash_password(spec):
+    """The one bcrypt hash every generated user shares"""
+    return bcrypt.hashpw(spec.password.encode('utf-8'), bcrypt.gensalt(rounds=spec.bcrypt_rounds)).decode('utf-8')
+
+
+def insert_dataset(database, spec, batch_size=DEFAULT_BATCH_SIZE, password_hash=None):
+    """Write the dataset into ``database`` (a pymongo Database) with batched insert_many.
+
+    Returns the number of documents inserted per collection.
+    """
+    generator = DatasetGenerator(spec, password_hash or hash_password(spec))
+    pending = {name: [] for name in DATASET_COLLECTIONS}
+    counts = dict.fromkeys(DATASET_COLLECTIONS, 0)
+
+    def flush(name):
+        if pending[name]:
+            database[name].insert_many(pending[name], ordered=False)
+            counts[name] += len(pending[name])
+            pending[name] = []
+
+    for index, building in enumerate(generator.buildings()):
+        for name, documents in building.items():
+            pending[name].extend(documents)
+            if len(pending[name]) >= batch_size:
+                flush(name)
+        if (index + 1) % 1000 == 0:
+            logger.info(f"  {index + 1}/{spec.buildings} buildings generated")
+    for name in DATASET_COLLECTIONS:
+        flush(name)
+    return counts
+
+
+def estimate(spec, sample_buildings=20):
+    """Expected documents and BSON bytes per collection, from a sample of generated buildings.
+
+    Nothing is hashed or written; index sizes are not included.
+    """
+    sample = DatasetSpec(min(spec.buildings, sample_buildings), spec.apartments, spec.months, spec.seed,
+                         spec.as_of, spec.occupancy)
+    # Same length as a real bcrypt hash
+    generator = DatasetGenerator(sample, '$2b$12$' + '.' * 53)
+    documents = dict.fromkeys(DATASET_COLLECTIONS, 0)
+    size = dict.fromkeys(DATASET_COLLECTIONS, 0)
+    for building in generator.buildings():
+        for name, docs in building.items():
+            documents[name] += len(docs)
+            size[name] += sum(len(bson.encode(doc)) for doc in docs)
+    scale = spec.buildings / sample.buildings
+    result = {}
+    for name in DATASET_COLLECTIONS:
+        count = round(documents[name] * scale)
+        result[name] = {'documents': count, 'bytes': round(size[name] * scale)}
+    result['total'] = {'documents': sum(item['documents'] for item in result.values()),
+                       'bytes': sum(item['bytes'] for item in result.values())}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buildings', type=int, default=DEFAULT_BUILDINGS)
+    parser.add_argument('--apartments', type=int, default=DEFAULT_APARTMENTS, help='apartments per building')
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS, help='months of payments per resident')
+    parser.add_argument('--occupancy', type=float, default=DEFAULT_OCCUPANCY, help='share of apartments with a resident')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--as-of', type=date.fromisoformat, help='last payment month, YYYY-MM-DD (default today)')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only print the estimated size')
+    parser.add_argument('--drop', action='store_true', help='drop the dataset collections first')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)8s] %(message)s')
+    try:
+        spec = DatasetSpec(args.buildings, args.apartments, args.months, args.seed, args.as_of, args.occupancy,
+                           bcrypt_rounds=args.bcrypt_rounds)
+    except ValueError as e:
+        parser.error(str(e))
+    sizes = estimate(spec)
+    for name, size in sizes.items():
+        logger.info(f"  {name:20s} {size['documents']:>12,} documents  {size['bytes'] / 2 ** 20:>10,.1f} MiB")
+    if args.dry_run:
+        return
+
+    from db import Database
+    from balances import rebuild_balances
+
+    database = Database(sample_data=False)
+    try:
+        if args.drop:
+            for name in DATASET_COLLECTIONS + ('apartment_balances',):
+                database.db.drop_collection(name)
+            database._init_schema()
+        elif database.db.buildings.estimated_document_count():
+            sys.exit("The database already has buildings: use --drop to replace them")
+        started = time.perf_counter()
+        counts = insert_dataset(database.db, spec, args.batch_size)
+        logger.info(f"✓ Inserted {sum(counts.values()):,} documents in {time.perf_counter() - started:.1f}s")
+        rebuild_balances(database)
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
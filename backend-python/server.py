@@ -1,27 +1,20 @@
 import os
 import sys
+import signal
 import logging
 import time
 from concurrent import futures
 from datetime import datetime, timedelta
 import grpc
 from grpc_reflection.v1alpha import reflection
-import bcrypt
-import jwt
-from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
 import json
 from bson import ObjectId
 
-# Configure logging with extensive detail
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)8s] [%(name)20s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from log_config import configure_logging, ACCESS_LOG
+
+# LOG_LEVEL / LOG_QUEUE_SIZE / ACCESS_LOG_SAMPLE_RATE; records are written by a background thread
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -36,22 +29,44 @@ except ImportError as e:
     sys.exit(1)
 
 from db import Database
+from http_server import create_http_server, KeepAliveRequestHandler
+from routing import Router, InvalidPathParameter
+from queries import (QueryError, ResidentsPage, parse_residents_query, load_profile,
+                     parse_payment_options, parse_payments_query, load_payment_history, format_payment,
+                     STREAM_DEFAULT_BATCH_SIZE, stream_batch_size, apartments_cursor,
+                     financial_report_cursor, financial_report_fields,
+                     parse_bool, parse_limit, BATCH_EVENTS_DEFAULT_LIMIT, BATCH_EVENTS_MAX_LIMIT, parse_batch_ids, in_request_order,
+                     load_buildings, load_profiles, load_events_for_buildings,
+                     parse_field_mask, trim_fields, PROFILE_MASK_FIELDS, PROFILE_PAGE_MASK_FIELDS,
+                     BUILDING_MASK_FIELDS, APARTMENT_MASK_FIELDS,
+                     building_projection, apartment_projection)
+from passwords import PasswordHasher, PasswordPoolBusy
+from auth import (JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION_HOURS, encode_token, decode_token,
+                  TokenVerifier, AuthInterceptor, bearer_token, resolve_user_id, resolve_user_id_or_abort)
+from cache import ReadThroughCache
+from singleflight import SingleFlight
+from building_grid import BuildingGrid
+from messages import (building_message, apartment_message, masked_message, profile_message, event_message,
+                      payment_message)
+from grpc_config import GrpcServerConfig, MethodLimits, MethodLimitInterceptor, MetricsInterceptor
+from supervisor import Supervisor, process_count
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_IN_FLIGHT, observe_http
+from tracing import RequestTracker, TracingConfig, configure_tracing, tracing_config, set_plan_capture
+from explain import PlanCapture
+from profiling import (PROFILER, ProfilerBusy, render_collapsed, DEFAULT_PROFILE_SECONDS, DEFAULT_SAMPLE_INTERVAL_MS,
+                       DEFAULT_TOP_ALLOCATIONS, MAX_TRACEBACK_FRAMES)
 
-# JWT Configuration
-JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
-JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_HOURS = 24
+# Streamed REST responses are flushed in chunks of roughly this size
+STREAM_CHUNK_BYTES = 64 * 1024
 
 class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, password_hasher):
         self.db = db
+        self.password_hasher = password_hasher
         logger.info("AuthServicer initialized")
     
     def Login(self, request, context):
-        logger.info("=" * 80)
-        logger.info("LOGIN REQUEST")
-        logger.info(f"Email: {request.email}")
-        logger.info("=" * 80)
+        logger.debug("LOGIN REQUEST for: %s", request.email)
         
         try:
             user = self.db.db.users.find_one({"email": request.email})
@@ -63,21 +78,21 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
                     message="Invalid email or password"
                 )
             
-            # Verify password
-            if bcrypt.checkpw(request.password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+            # Verify password (off-thread, in the password process pool)
+            if self.password_hasher.verify(request.password, user['password_hash']):
                 # Generate tokens
-                access_token = jwt.encode({
+                access_token = encode_token({
                     'user_id': str(user['_id']),
                     'email': user['email'],
                     'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-                }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+                })
                 
-                refresh_token = jwt.encode({
+                refresh_token = encode_token({
                     'user_id': str(user['_id']),
                     'exp': datetime.utcnow() + timedelta(days=30)
-                }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+                })
                 
-                logger.info(f"✓ Login successful for user: {user['email']}")
+                logger.debug("✓ Login successful for user: %s", user['email'])
                 
                 return domunity_pb2.LoginResponse(
                     success=True,
@@ -99,6 +114,9 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
                     message="Invalid email or password"
                 )
                 
+        except PasswordPoolBusy as e:
+            logger.warning(f"Login rejected, password pool busy: {e}")
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many concurrent logins, please retry")
         except Exception as e:
             logger.error(f"✗ Login error: {e}", exc_info=True)
             return domunity_pb2.LoginResponse(
@@ -107,19 +125,15 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
             )
     
     def Register(self, request, context):
-        logger.info("=" * 80)
-        logger.info("REGISTER REQUEST")
-        logger.info(f"Email: {request.email}")
-        logger.info(f"Full name: {request.full_name}")
-        logger.info("=" * 80)
+        logger.debug("REGISTER REQUEST for: %s (%s)", request.email, request.full_name)
         
         try:
             # Hash password
-            password_hash = bcrypt.hashpw(request.password.encode('utf-8'), bcrypt.gensalt())
+            password_hash = self.password_hasher.hash(request.password)
             
             result = self.db.db.users.insert_one({
                 "email": request.email,
-                "password_hash": password_hash.decode('utf-8'),
+                "password_hash": password_hash,
                 "full_name": request.full_name,
                 "phone": request.phone,
                 "role": "user",
@@ -130,7 +144,7 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
             user_id = result.inserted_id
             self.db.commit()
             
-            logger.info(f"✓ User registered successfully: {request.email} (ID: {user_id})")
+            logger.debug("✓ User registered successfully: %s (ID: %s)", request.email, user_id)
             
             return domunity_pb2.RegisterResponse(
                 success=True,
@@ -138,6 +152,9 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
                 user_id=str(user_id)
             )
             
+        except PasswordPoolBusy as e:
+            logger.warning(f"Registration rejected, password pool busy: {e}")
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many concurrent requests, please retry")
         except Exception as e:
             self.db.rollback()
             logger.error(f"✗ Registration error: {e}", exc_info=True)
@@ -147,17 +164,17 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
             )
     
     def RefreshToken(self, request, context):
-        logger.info("REFRESH TOKEN REQUEST")
+        logger.debug("REFRESH TOKEN REQUEST")
         
         try:
-            payload = jwt.decode(request.refresh_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            payload = decode_token(request.refresh_token)
             
-            access_token = jwt.encode({
+            access_token = encode_token({
                 'user_id': payload['user_id'],
                 'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-            }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+            })
             
-            logger.info(f"✓ Token refreshed for user_id: {payload['user_id']}")
+            logger.debug("✓ Token refreshed for user_id: %s", payload['user_id'])
             
             return domunity_pb2.RefreshTokenResponse(
                 success=True,
@@ -169,7 +186,7 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
             return domunity_pb2.RefreshTokenResponse(success=False)
     
     def ForgotPassword(self, request, context):
-        logger.info(f"FORGOT PASSWORD REQUEST for: {request.email}")
+        logger.debug("FORGOT PASSWORD REQUEST for: %s", request.email)
         
         # In production, send password reset email
         return domunity_pb2.ForgotPasswordResponse(
@@ -178,103 +195,48 @@ class AuthServicer(domunity_pb2_grpc.AuthServiceServicer):
         )
 
 class UserServicer(domunity_pb2_grpc.UserServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, cache=None, grid=None):
         self.db = db
+        self.cache = cache or ReadThroughCache(db)
+        self.grid = grid
         logger.info("UserServicer initialized")
     
     def GetProfile(self, request, context):
-        logger.info(f"GET PROFILE REQUEST for user_id: {request.user_id}")
+        logger.debug("GET PROFILE REQUEST for user_id: %s", request.user_id)
+        user_id = resolve_user_id_or_abort(request.user_id, context)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, PROFILE_MASK_FIELDS)
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         
         try:
-            # Get user
-            user = self.db.db.users.find_one({"_id": ObjectId(request.user_id)})
+            bundle = load_profile(self.db, user_id, cache=self.cache, fields=fields)
             
-            if not user:
-                logger.warning(f"User not found: {request.user_id}")
+            if not bundle:
+                logger.warning(f"User not found: {user_id}")
                 context.abort(grpc.StatusCode.NOT_FOUND, "User not found")
             
-            # Get user's apartment and building
-            apartment_doc = self.db.db.apartments.find_one({"user_id": ObjectId(request.user_id)})
-            
-            building_doc = None
-            if apartment_doc:
-                building_doc = self.db.db.buildings.find_one({"_id": apartment_doc['building_id']})
-            
-            apartment_building = None
-            if apartment_doc and building_doc:
-                # Merge for compatibility with existing logic if needed, 
-                # but we'll manually map below anyway
-                apartment_building = {**apartment_doc, **building_doc}
-                apartment_building['id'] = building_doc['_id']
-                apartment_building['apartment_id'] = apartment_doc['_id']
-            
-            # Get user profile
-            profile = self.db.db.user_profiles.find_one({"user_id": ObjectId(request.user_id)})
-            
-            building = None
-            apartment = None
-            account_manager = ""
-            balance = 0.0
-            client_number = ""
-            contract_end_date = ""
-            
-            if apartment_building:
-                building = domunity_pb2.Building(
-                    id=str(apartment_building['id']),
-                    address=apartment_building['address'],
-                    entrance=apartment_building['entrance'] or '',
-                    total_apartments=apartment_building['total_apartments'],
-                    total_residents=apartment_building['total_residents']
-                )
-                
-                apartment = domunity_pb2.Apartment(
-                    id=str(apartment_building['apartment_id']),
-                    building_id=str(apartment_building['building_id']),
-                    number=apartment_building['number'],
-                    floor=apartment_building['floor'] or 0,
-                    type=apartment_building['type'] or '',
-                    residents=apartment_building['residents']
-                )
-            
-            if profile:
-                account_manager = profile['account_manager'] or ''
-                balance = float(profile['balance']) if profile['balance'] else 0.0
-                client_number = profile['client_number'] or ''
-                contract_end_date = str(profile['contract_end_date']) if profile['contract_end_date'] else ''
-            
-            logger.info(f"✓ Profile retrieved for user: {user['email']}")
-            
-            return domunity_pb2.UserProfile(
-                user=domunity_pb2.User(
-                    id=str(user['_id']),
-                    email=user['email'],
-                    full_name=user['full_name'] or '',
-                    phone=user['phone'] or '',
-                    created_at=str(user.get('created_at', ''))
-                ),
-                building=building,
-                apartment=apartment,
-                account_manager=account_manager,
-                balance=balance,
-                client_number=client_number,
-                contract_end_date=contract_end_date
-            )
+            logger.debug("✓ Profile retrieved for user_id: %s", user_id)
+            return masked_message(profile_message(bundle), request.read_mask.paths)
             
         except Exception as e:
             logger.error(f"✗ GetProfile error: {e}", exc_info=True)
             context.abort(grpc.StatusCode.INTERNAL, str(e))
     
     def UpdateProfile(self, request, context):
-        logger.info(f"UPDATE PROFILE REQUEST for user_id: {request.user_id}")
+        logger.debug("UPDATE PROFILE REQUEST for user_id: %s", request.user_id)
+        user_id = resolve_user_id_or_abort(request.user_id, context)
         
         try:
             self.db.db.users.update_one(
-                {"_id": ObjectId(request.user_id)},
+                {"_id": ObjectId(user_id)},
                 {"$set": {"full_name": request.full_name, "phone": request.phone}}
             )
+            if self.grid:
+                self.grid.invalidate_user(user_id)
             
             self.db.commit()
-            logger.info(f"✓ Profile updated for user_id: {request.user_id}")
+            logger.debug("✓ Profile updated for user_id: %s", user_id)
             
             return domunity_pb2.UpdateProfileResponse(
                 success=True,
@@ -288,114 +250,137 @@ class UserServicer(domunity_pb2_grpc.UserServiceServicer):
                 success=False,
                 message=str(e)
             )
+    
+    def GetProfiles(self, request, context):
+        logger.debug("GET PROFILES REQUEST for %s users", len(request.user_ids))
+        try:
+            user_ids, invalid = parse_batch_ids(request.user_ids, 'user_ids')
+            fields = parse_field_mask(request.read_mask.paths, PROFILE_MASK_FIELDS)
+            for user_id in user_ids:
+                resolve_user_id(str(user_id))
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except PermissionError as e:
+            context.abort(grpc.StatusCode.PERMISSION_DENIED, str(e))
+        
+        try:
+            bundles, missing = in_request_order(user_ids, invalid, load_profiles(self.db, user_ids, fields))
+        except Exception as e:
+            logger.error(f"✗ GetProfiles error: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        
+        logger.debug("✓ Retrieved %s profiles, %s missing", len(bundles), len(missing))
+        return domunity_pb2.GetProfilesResponse(
+            profiles=[masked_message(profile_message(bundle), request.read_mask.paths) for bundle in bundles],
+            missing_ids=missing
+        )
 
 class BuildingServicer(domunity_pb2_grpc.BuildingServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, cache=None, stream_batch_size=STREAM_DEFAULT_BATCH_SIZE):
         self.db = db
+        self.cache = cache or ReadThroughCache(db)
+        self.stream_batch_size = stream_batch_size
         logger.info("BuildingServicer initialized")
     
     def GetBuilding(self, request, context):
-        logger.info(f"GET BUILDING REQUEST for building_id: {request.building_id}")
+        logger.debug("GET BUILDING REQUEST for building_id: %s", request.building_id)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, BUILDING_MASK_FIELDS)
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         
         try:
-            building = self.db.db.buildings.find_one({"_id": ObjectId(request.building_id)})
+            building = self.cache.get_building(request.building_id, building_projection(fields))
             
             if not building:
                 context.abort(grpc.StatusCode.NOT_FOUND, "Building not found")
             
-            return domunity_pb2.Building(
-                id=str(building['_id']),
-                address=building['address'],
-                entrance=building['entrance'] or '',
-                total_apartments=building['total_apartments'],
-                total_residents=building['total_residents']
-            )
+            return masked_message(building_message(building), request.read_mask.paths)
             
         except Exception as e:
             logger.error(f"✗ GetBuilding error: {e}", exc_info=True)
             context.abort(grpc.StatusCode.INTERNAL, str(e))
     
+    def GetBuildings(self, request, context):
+        logger.debug("GET BUILDINGS REQUEST for %s buildings", len(request.building_ids))
+        try:
+            building_ids, invalid = parse_batch_ids(request.building_ids, 'building_ids')
+            fields = parse_field_mask(request.read_mask.paths, BUILDING_MASK_FIELDS)
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        
+        try:
+            buildings, missing = in_request_order(
+                building_ids, invalid, load_buildings(self.db, building_ids, self.cache, fields))
+        except Exception as e:
+            logger.error(f"✗ GetBuildings error: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        
+        logger.debug("✓ Retrieved %s buildings, %s missing", len(buildings), len(missing))
+        return domunity_pb2.GetBuildingsResponse(
+            buildings=[masked_message(building_message(building), request.read_mask.paths)
+                       for building in buildings],
+            missing_ids=missing
+        )
+    
     def ListApartments(self, request, context):
-        logger.info(f"LIST APARTMENTS REQUEST for building_id: {request.building_id}")
+        logger.debug("LIST APARTMENTS REQUEST for building_id: %s", request.building_id)
+        try:
+            fields = parse_field_mask(request.read_mask.paths, APARTMENT_MASK_FIELDS)
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         
         try:
-            apartments_cursor = self.db.db.apartments.find(
-                {"building_id": ObjectId(request.building_id)}
-            ).sort("number", 1)
-            
-            apartments = []
-            for apt in apartments_cursor:
-                apartments.append(domunity_pb2.Apartment(
-                    id=str(apt['_id']),
-                    building_id=str(apt['building_id']),
-                    number=apt['number'],
-                    floor=apt['floor'] or 0,
-                    type=apt['type'] or '',
-                    residents=apt['residents']
-                ))
-            
-            logger.info(f"✓ Retrieved {len(apartments)} apartments")
+            projection = apartment_projection(fields)
+            apartments = [masked_message(apartment_message(apt), request.read_mask.paths)
+                          for apt in self.cache.get_apartments(request.building_id, projection)]
+            
+            logger.debug("✓ Retrieved %s apartments", len(apartments))
             return domunity_pb2.ListApartmentsResponse(apartments=apartments)
             
         except Exception as e:
             logger.error(f"✗ ListApartments error: {e}", exc_info=True)
             context.abort(grpc.StatusCode.INTERNAL, str(e))
+    
+    def StreamApartments(self, request, context):
+        """Yield apartments as the cursor produces them, then a summary"""
+        logger.debug("STREAM APARTMENTS REQUEST for building_id: %s", request.building_id)
+        
+        count = 0
+        residents = 0
+        try:
+            batch_size = stream_batch_size(request.batch_size, self.stream_batch_size)
+            for apt in apartments_cursor(self.db, request.building_id, batch_size):
+                count += 1
+                residents += apt['residents'] or 0
+                yield domunity_pb2.ApartmentStreamMessage(apartment=apartment_message(apt))
+        except Exception as e:
+            logger.error(f"✗ StreamApartments error after {count} apartments: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        
+        logger.debug("✓ Streamed %s apartments", count)
+        yield domunity_pb2.ApartmentStreamMessage(
+            summary=domunity_pb2.ApartmentStreamSummary(count=count, total_residents=residents))
 
 class FinancialServicer(domunity_pb2_grpc.FinancialServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, stream_batch_size=STREAM_DEFAULT_BATCH_SIZE):
         self.db = db
+        self.stream_batch_size = stream_batch_size
         logger.info("FinancialServicer initialized")
     
     def GetFinancialReport(self, request, context):
-        logger.info(f"GET FINANCIAL REPORT REQUEST for building_id: {request.building_id}")
+        logger.debug("GET FINANCIAL REPORT REQUEST for building_id: %s", request.building_id)
         
         try:
-            pipeline = [
-                {"$match": {"building_id": ObjectId(request.building_id)}},
-                {"$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user_data"
-                }},
-                {"$unwind": {"path": "$user_data", "preserveNullAndEmptyArrays": True}},
-                {"$lookup": {
-                    "from": "financial_records",
-                    "localField": "_id",
-                    "foreignField": "apartment_id",
-                    "as": "financial_data"
-                }},
-                {"$unwind": {"path": "$financial_data", "preserveNullAndEmptyArrays": True}},
-                {"$sort": {"number": 1}}
-            ]
-            
-            cursor_results = self.db.db.apartments.aggregate(pipeline)
-            
             entries = []
             total = 0.0
             
-            for row in cursor_results:
-                user_data = row.get('user_data', {})
-                financial_data = row.get('financial_data', {})
-                total_due = float(financial_data.get('total_due', 0) or 0)
-                total += total_due
-                
-                entries.append(domunity_pb2.FinancialReportEntry(
-                    apartment_number=row['number'],
-                    type=row['type'] or 'Апартамент',
-                    floor=row['floor'] or 0,
-                    client_name=user_data.get('full_name', 'N/A'),
-                    residents=row['residents'],
-                    elevator_gtp=float(financial_data.get('elevator_gtp', 0) or 0),
-                    elevator_electricity=float(financial_data.get('elevator_electricity', 0) or 0),
-                    common_area_electricity=float(financial_data.get('common_area_electricity', 0) or 0),
-                    elevator_maintenance=float(financial_data.get('elevator_maintenance', 0) or 0),
-                    management_fee=float(financial_data.get('management_fee', 0) or 0),
-                    repair_fund=float(financial_data.get('repair_fund', 0) or 0),
-                    total_due=total_due
-                ))
-            
-            logger.info(f"✓ Retrieved financial report with {len(entries)} entries")
+            for row in financial_report_cursor(self.db, request.building_id):
+                fields = financial_report_fields(row)
+                total += fields['total_due']
+                entries.append(domunity_pb2.FinancialReportEntry(**fields))
+            
+            logger.debug("✓ Retrieved financial report with %s entries", len(entries))
             
             return domunity_pb2.FinancialReport(
                 entries=entries,
@@ -406,47 +391,108 @@ class FinancialServicer(domunity_pb2_grpc.FinancialServiceServicer):
             logger.error(f"✗ GetFinancialReport error: {e}", exc_info=True)
             context.abort(grpc.StatusCode.INTERNAL, str(e))
     
+    def StreamFinancialReport(self, request, context):
+        """Yield report entries as the cursor produces them, then the total"""
+        logger.debug("STREAM FINANCIAL REPORT REQUEST for building_id: %s", request.building_id)
+        
+        count = 0
+        total = 0.0
+        try:
+            batch_size = stream_batch_size(request.batch_size, self.stream_batch_size)
+            for row in financial_report_cursor(self.db, request.building_id, batch_size):
+                fields = financial_report_fields(row)
+                count += 1
+                total += fields['total_due']
+                yield domunity_pb2.FinancialReportMessage(entry=domunity_pb2.FinancialReportEntry(**fields))
+        except Exception as e:
+            logger.error(f"✗ StreamFinancialReport error after {count} entries: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        
+        logger.debug("✓ Streamed financial report with %s entries", count)
+        yield domunity_pb2.FinancialReportMessage(
+            summary=domunity_pb2.FinancialReportSummary(entries=count, total_balance=total))
+    
     def GetPaymentHistory(self, request, context):
-        logger.info(f"GET PAYMENT HISTORY REQUEST for user_id: {request.user_id}")
+        logger.debug("GET PAYMENT HISTORY REQUEST for user_id: %s", request.user_id)
+        user_id = resolve_user_id_or_abort(request.user_id, context)
+        
+        try:
+            options = parse_payment_options(request.page_size, request.page_token, request.statuses,
+                                            request.from_date, request.to_date)
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        
+        try:
+            payments, next_page_token = load_payment_history(self.db, user_id, **options)
+        except Exception as e:
+            logger.error(f"✗ GetPaymentHistory error: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
         
-        # Mock data for now - in production, would query payments table
-        return domunity_pb2.PaymentHistory(payments=[])
+        logger.debug("✓ Retrieved %s payments", len(payments))
+        return domunity_pb2.PaymentHistory(
+            payments=[payment_message(p) for p in payments],
+            next_page_token=next_page_token or ''
+        )
 
 class EventServicer(domunity_pb2_grpc.EventServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, flights=None, cache=None):
         self.db = db
+        self.flights = flights or SingleFlight()
+        # Resolves the ids of ListEventsForBuildings (without one, a $in query on buildings)
+        self.cache = cache
         logger.info("EventServicer initialized")
     
     def ListEvents(self, request, context):
-        logger.info(f"LIST EVENTS REQUEST for building_id: {request.building_id}")
+        logger.debug("LIST EVENTS REQUEST for building_id: %s", request.building_id)
         
         try:
             cursor = self.db.get_cursor()
             limit = request.limit if request.limit > 0 else 10
+            building_id = ObjectId(request.building_id)
+            
+            # Residents of a building tend to open the events feed together
+            events_docs = self.flights.do(
+                ('ListEvents', building_id, limit),
+                lambda: list(self.db.db.events.find({"building_id": building_id}).sort("date", -1).limit(limit)))
             
-            events_cursor = self.db.db.events.find(
-                {"building_id": ObjectId(request.building_id)}
-            ).sort("date", -1).limit(limit)
-            
-            events = []
-            for event in events_cursor:
-                events.append(domunity_pb2.Event(
-                    id=str(event['_id']),
-                    date=str(event['date']),
-                    title=event['title'] or '',
-                    description=event['description'] or '',
-                    building_id=str(event['building_id'])
-                ))
-            
-            logger.info(f"✓ Retrieved {len(events)} events")
+            events = [event_message(event) for event in events_docs]
+            
+            logger.debug("✓ Retrieved %s events", len(events))
             return domunity_pb2.ListEventsResponse(events=events)
             
         except Exception as e:
             logger.error(f"✗ ListEvents error: {e}", exc_info=True)
             context.abort(grpc.StatusCode.INTERNAL, str(e))
     
+    def ListEventsForBuildings(self, request, context):
+        logger.debug("LIST EVENTS FOR BUILDINGS REQUEST for %s buildings", len(request.building_ids))
+        try:
+            building_ids, invalid = parse_batch_ids(request.building_ids, 'building_ids')
+        except QueryError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        limit = min(request.limit, BATCH_EVENTS_MAX_LIMIT) if request.limit > 0 else BATCH_EVENTS_DEFAULT_LIMIT
+        
+        try:
+            events = load_events_for_buildings(self.db, building_ids, limit, self.cache)
+        except Exception as e:
+            logger.error(f"✗ ListEventsForBuildings error: {e}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        
+        missing = invalid + [str(building_id) for building_id in building_ids if building_id not in events]
+        logger.debug("✓ Retrieved events for %s buildings, %s missing", len(events), len(missing))
+        return domunity_pb2.ListEventsForBuildingsResponse(
+            buildings=[
+                domunity_pb2.BuildingEvents(
+                    building_id=str(building_id),
+                    events=[event_message(event) for event in events[building_id]]
+                )
+                for building_id in building_ids if building_id in events
+            ],
+            missing_ids=missing
+        )
+    
     def CreateEvent(self, request, context):
-        logger.info(f"CREATE EVENT REQUEST for building_id: {request.building_id}")
+        logger.debug("CREATE EVENT REQUEST for building_id: %s", request.building_id)
         
         try:
             result = self.db.db.events.insert_one({
@@ -460,7 +506,7 @@ class EventServicer(domunity_pb2_grpc.EventServiceServicer):
             event_id = result.inserted_id
             self.db.commit()
             
-            logger.info(f"✓ Event created with ID: {event_id}")
+            logger.debug("✓ Event created with ID: %s", event_id)
             
             return domunity_pb2.CreateEventResponse(
                 success=True,
@@ -482,7 +528,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
         logger.info("ContactServicer initialized")
     
     def SendContactForm(self, request, context):
-        logger.info(f"CONTACT FORM REQUEST from: {request.email}")
+        logger.debug("CONTACT FORM REQUEST from: %s", request.email)
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -495,7 +541,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
             })
             
             self.db.commit()
-            logger.info("✓ Contact form saved")
+            logger.debug("✓ Contact form saved")
             
             return domunity_pb2.ContactFormResponse(
                 success=True,
@@ -511,7 +557,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
             )
     
     def RequestOffer(self, request, context):
-        logger.info(f"OFFER REQUEST from: {request.email}")
+        logger.debug("OFFER REQUEST from: %s", request.email)
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -524,7 +570,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
             })
             
             self.db.commit()
-            logger.info("✓ Offer request saved")
+            logger.debug("✓ Offer request saved")
             
             return domunity_pb2.OfferResponse(
                 success=True,
@@ -540,7 +586,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
             )
     
     def RequestPresentation(self, request, context):
-        logger.info(f"PRESENTATION REQUEST from: {request.email}")
+        logger.debug("PRESENTATION REQUEST from: %s", request.email)
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -553,7 +599,7 @@ class ContactServicer(domunity_pb2_grpc.ContactServiceServicer):
             })
             
             self.db.commit()
-            logger.info("✓ Presentation request saved")
+            logger.debug("✓ Presentation request saved")
             
             return domunity_pb2.PresentationResponse(
                 success=True,
@@ -590,7 +636,7 @@ class HealthServicer(domunity_pb2_grpc.HealthServiceServicer):
 
 # ==================== HTTP REST API Server ====================
 
-class APIHandler(BaseHTTPRequestHandler):
+class APIHandler(KeepAliveRequestHandler):
     """HTTP handler for REST API endpoints and health checks"""
     
     # Class-level references to servicers (set in serve())
@@ -598,91 +644,299 @@ class APIHandler(BaseHTTPRequestHandler):
     user_servicer = None
     contact_servicer = None
     db = None
+    password_hasher = None
+    token_verifier = None
+    cache = None
+    grid = None
+    flights = None
+    grpc_config = None
+    method_limits = None
+    plan_capture = None
+    routes = None  # Router, built below the class
     
     def log_message(self, format, *args):
         """Suppress default HTTP server logging"""
         pass
     
-    def _send_json_response(self, status_code, data):
-        """Send JSON response with CORS headers"""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
+    def _send_cors_headers(self):
+        """Send CORS headers shared by every response"""
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Requested-With')
         self.send_header('Access-Control-Max-Age', '3600')
+    
+    def _send_json_response(self, status_code, data, headers=None):
+        """Send JSON response with CORS headers"""
+        self._send_json_bytes(status_code, json.dumps(data).encode(), headers)
+    
+    def _send_json_bytes(self, status_code, body, headers=None):
+        """Send an already serialized JSON body with CORS headers"""
+        self._send_body(status_code, body, 'application/json', headers)
+    
+    def _send_body(self, status_code, body, content_type, headers=None):
+        """Send a complete body of any content type with CORS headers"""
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        self._send_cors_headers()
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json_stream(self, status_code, list_key, items, trailer=None):
+        """Stream {list_key: [...items], **trailer()} using chunked encoding.
+        
+        The first item is fetched before any header is written, so query
+        errors still surface as a normal 500. ``trailer`` is called after the
+        items are exhausted (e.g. for a next-page cursor).
+        """
+        iterator = iter(items)
+        first = next(iterator, None)
+        
+        if self.request_version != 'HTTP/1.1':
+            # HTTP/1.0 clients cannot receive chunked bodies
+            data = {list_key: ([first] if first is not None else []) + list(iterator)}
+            if trailer:
+                data.update(trailer())
+            self._send_json_response(status_code, data)
+            return
+        
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self._send_cors_headers()
+        self.send_header('Transfer-Encoding', 'chunked')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        
+        buffer = bytearray(b'{' + json.dumps(list_key).encode() + b': [')
+        try:
+            if first is not None:
+                buffer += json.dumps(first).encode()
+                for item in iterator:
+                    buffer += b', ' + json.dumps(item).encode()
+                    if len(buffer) >= STREAM_CHUNK_BYTES:
+                        self.send_chunk(bytes(buffer))
+                        buffer.clear()
+            buffer += b']'
+            if trailer:
+                for key, value in trailer().items():
+                    buffer += b', ' + json.dumps(key).encode() + b': ' + json.dumps(value).encode()
+            buffer += b'}'
+            self.send_chunk(bytes(buffer))
+            self.end_chunks()
+        except Exception as e:
+            # Headers are gone; drop the connection so the client sees a truncated body
+            logger.error(f"API stream error: {e}", exc_info=True)
+            self.close_connection = True
+    
+    def _read_body(self):
+        """Read the raw request body once (later calls return the cached bytes)"""
+        if getattr(self, '_body', None) is None:
+            content_length = int(self.headers.get('Content-Length', 0))
+            self._body = self.rfile.read(content_length) if content_length > 0 else b''
+        return self._body
     
     def _read_json_body(self):
         """Read and parse JSON body from request"""
-        content_length = int(self.headers.get('Content-Length', 0))
-        if content_length > 0:
-            body = self.rfile.read(content_length)
+        body = self._read_body()
+        if body:
             return json.loads(body.decode('utf-8'))
         return {}
     
     def _get_user_id_from_token(self):
-        """Extract user ID from Authorization header"""
-        auth_header = self.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]
-            try:
-                payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-                return payload.get('user_id')
-            except Exception as e:
-                logger.warning(f"Token decode failed: {e}")
-        return None
+        """Extract user ID from Authorization header (verified tokens are cached)"""
+        self.identity = self.token_verifier.verify(bearer_token(self.headers.get('Authorization', '')))
+        return self.identity.user_id if self.identity else None
+    
+    def _get_user_building_id(self, user_id):
+        """Return the building ObjectId of the user's apartment, or None"""
+        apt = self.cache.get_user_apartment(user_id)
+        return apt['building_id'] if apt else None
+    
+    def send_response(self, code, message=None):
+        """Send the status line, remembering the code for the request metrics"""
+        self.status_code = code
+        super().send_response(code, message)
     
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
-        logger.info(f"API: Received OPTIONS request for {self.path}")
+        logger.debug("API: Received OPTIONS request for %s", self.path)
         self.send_response(204)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Requested-With')
-        self.send_header('Access-Control-Max-Age', '3600')
+        self._send_cors_headers()
         self.send_header('Content-Length', '0')
         self.end_headers()
     
     def do_GET(self):
         """Handle GET requests"""
-        if self.path == '/health':
-            self._handle_health()
-        elif self.path == '/api/user/profile':
-            self._handle_get_profile()
-        elif self.path == '/api/user/apartment':
-            self._handle_get_apartment()
-        elif self.path == '/api/admin/residents':
-            self._handle_get_residents()
-        elif self.path.startswith('/api/building/') and '/apartments' in self.path:
-            self._handle_get_building_apartments()
-        elif self.path.startswith('/api/building/') and '/maintenance' in self.path:
-            self._handle_get_maintenance()
-        else:
-            self._send_json_response(404, {'error': 'Not found'})
+        self._dispatch('GET')
     
     def do_POST(self):
         """Handle POST requests"""
+        self._body = None
         try:
-            if self.path == '/api/auth/login':
-                self._handle_login()
-            elif self.path == '/api/auth/register':
-                self._handle_register()
-            elif self.path == '/api/auth/refresh':
-                self._handle_refresh_token()
-            elif self.path == '/api/contact/form':
-                self._handle_contact_form()
-            elif self.path == '/api/contact/offer':
-                self._handle_offer()
-            elif self.path == '/api/contact/presentation':
-                self._handle_presentation()
-            else:
-                self._send_json_response(404, {'error': 'Not found'})
+            self._dispatch('POST')
+        finally:
+            # Consume any unread body so the next request on this connection parses cleanly
+            self._read_body()
+    
+    def _require_admin(self):
+        """Send 401/403 and return False unless the caller is an admin"""
+        if not self._get_user_id_from_token():
+            self._send_json_response(401, {'error': 'Unauthorized'})
+            return False
+        if not self.identity.is_admin:
+            self._send_json_response(403, {'error': 'Admin access required'})
+            return False
+        return True
+    
+    def _handle_get_admin_config(self):
+        """Handle effective server configuration (admin only)"""
+        if not self._require_admin():
+            return
+        
+        http_server = self.server
+        tracing = tracing_config()
+        self._send_json_response(200, {
+            'grpc': self.grpc_config.as_dict() if self.grpc_config else {},
+            'grpc_method_limits': self.method_limits.stats() if self.method_limits else {},
+            'http': {
+                'workers': getattr(http_server, 'max_workers', None),
+                'backlog': getattr(http_server, 'request_queue_size', None),
+                'max_queue': getattr(http_server, 'max_queue', None),
+                'idle_timeout': getattr(http_server, 'idle_timeout', None),
+                'max_requests_per_connection': getattr(http_server, 'max_requests_per_connection', None),
+            },
+            'password_pool': {
+                'workers': self.password_hasher.max_workers,
+                'max_pending': self.password_hasher.max_pending,
+                'timeout': self.password_hasher.timeout,
+            } if self.password_hasher else {},
+            'cache': {
+                'max_entries': self.cache.store.max_entries,
+                'ttl': self.cache.store.ttl,
+            } if self.cache else {},
+            'tracing': {
+                'slow_request_ms': tracing.slow_request_ms,
+                'max_traced_commands': tracing.max_commands,
+                'record_bytes': tracing.record_bytes,
+            },
+            'explain': self.plan_capture.stats() if self.plan_capture else {},
+        })
+    
+    def _handle_get_slow_aggregations(self):
+        """Handle the latest explained slow aggregates (admin only)"""
+        if not self._require_admin():
+            return
+        if self.plan_capture is None:
+            self._send_json_response(200, {'enabled': False, 'aggregations': []})
+            return
+        
+        try:
+            limit = parse_limit(self.query.get('limit'), 20, 100)
+            with_plan = parse_bool(self.query.get('plan') or 'false', 'plan')
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        
+        try:
+            rows = self.plan_capture.recent(limit, with_plan=with_plan)
+        except Exception as e:
+            logger.error(f"API GetSlowAggregations error: {e}", exc_info=True)
+            self._send_json_response(500, {'error': str(e)})
+            return
+        for row in rows:
+            row['id'] = str(row.pop('_id'))
+            row['captured_at'] = row['captured_at'].isoformat()
+        self._send_json_response(200, {'enabled': self.plan_capture.enabled, **self.plan_capture.stats(),
+                                       'aggregations': rows})
+    
+    def _handle_profile_cpu(self):
+        """Sample every thread's stack for ?seconds= and return collapsed stacks (admin only)"""
+        if not self._require_admin():
+            return
+        
+        try:
+            seconds = float(self.query.get('seconds') or DEFAULT_PROFILE_SECONDS)
+            interval_ms = float(self.query.get('interval_ms') or DEFAULT_SAMPLE_INTERVAL_MS)
+            idle = parse_bool(self.query.get('idle') or 'false', 'idle')
+            by_thread = parse_bool(self.query.get('threads') or 'false', 'threads')
+            output = self.query.get('format', 'json')
+            if output not in ('json', 'collapsed'):
+                raise QueryError(f"Invalid format: {output!r}")
+            logger.info(f"Admin CPU profile: {seconds}s every {interval_ms} ms")
+            profile = PROFILER.sample_cpu(seconds, interval_ms, idle=idle, by_thread=by_thread)
+        except (ValueError, QueryError) as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        except ProfilerBusy as e:
+            self._send_json_response(409, {'error': str(e)})
+            return
+        
+        collapsed = render_collapsed(profile.pop('stacks'))
+        if output == 'collapsed':
+            self._send_body(200, collapsed.encode(), 'text/plain; charset=utf-8')
+        else:
+            self._send_json_response(200, {**profile, 'collapsed': collapsed})
+    
+    def _handle_profile_memory(self):
+        """Trace allocations for ?seconds= and return the top allocation sites (admin only)"""
+        if not self._require_admin():
+            return
+        
+        try:
+            seconds = float(self.query.get('seconds') or DEFAULT_PROFILE_SECONDS)
+            top = parse_limit(self.query.get('top'), DEFAULT_TOP_ALLOCATIONS, 200)
+            frames = parse_limit(self.query.get('frames'), 1, MAX_TRACEBACK_FRAMES)
+            logger.info(f"Admin memory profile: {seconds}s, {frames} frames")
+            profile = PROFILER.trace_memory(seconds, top, frames)
+        except (ValueError, QueryError) as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        except ProfilerBusy as e:
+            self._send_json_response(409, {'error': str(e)})
+            return
+        self._send_json_response(200, profile)
+    
+    def _dispatch(self, method):
+        """Handle the request, recording its latency, status code and Mongo round trips (metrics and access log)"""
+        self.status_code = None
+        self.route_pattern = 'unmatched'
+        tracker = RequestTracker(HTTP_IN_FLIGHT, (method,)).start()
+        try:
+            self._route(method)
+        finally:
+            elapsed = tracker.stop(self.route_pattern)
+            code = self.status_code or 500
+            observe_http(method, self.route_pattern, code, elapsed)
+            ACCESS_LOG.http(method, self.path, self.route_pattern, code, elapsed, tracker)
+    
+    def _route(self, method):
+        """Route the request through the precompiled route table"""
+        try:
+            route = self.routes.match(method, self.path)
+        except InvalidPathParameter as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        
+        if route is None:
+            self._send_json_response(404, {'error': 'Not found'})
+            return
+        if route.handler is None:
+            self._send_json_response(405, {'error': 'Method not allowed', 'allowed': list(route.allowed_methods)})
+            return
+        
+        self.query = route.query
+        self.route_pattern = route.pattern
+        try:
+            route.handler(self, **route.params)
         except Exception as e:
             logger.error(f"API error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
     
+    def _handle_metrics(self):
+        """Prometheus metrics of this process"""
+        self._send_body(200, REGISTRY.render().encode(), METRICS_CONTENT_TYPE)
+    
     def _handle_health(self):
         """Health check endpoint"""
         try:
@@ -697,13 +951,18 @@ class APIHandler(BaseHTTPRequestHandler):
             'database': db_status,
             'timestamp': datetime.utcnow().isoformat() + 'Z',
             'service': 'domunity-backend-python',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'http': self.server.stats() if hasattr(self.server, 'stats') else {},
+            'password_pool': self.password_hasher.stats() if self.password_hasher else {},
+            'cache': self.cache.stats() if self.cache else {},
+            'building_grid': self.grid.stats() if self.grid else {},
+            'single_flight': self.flights.stats() if self.flights else {}
         })
     
     def _handle_login(self):
         """Handle login request"""
         data = self._read_json_body()
-        logger.info(f"API: Login request for {data.get('email')}")
+        logger.debug("API: Login request for %s", data.get('email'))
         
         try:
             user = self.db.db.users.find_one({"email": data.get('email')})
@@ -712,19 +971,19 @@ class APIHandler(BaseHTTPRequestHandler):
                 self._send_json_response(401, {'success': False, 'message': 'Invalid email or password'})
                 return
             
-            if bcrypt.checkpw(data.get('password', '').encode('utf-8'), user['password_hash'].encode('utf-8')):
-                access_token = jwt.encode({
+            if self.password_hasher.verify(data.get('password', ''), user['password_hash']):
+                access_token = encode_token({
                     'user_id': str(user['_id']),
                     'email': user['email'],
                     'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-                }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+                })
                 
-                refresh_token = jwt.encode({
+                refresh_token = encode_token({
                     'user_id': str(user['_id']),
                     'exp': datetime.utcnow() + timedelta(days=30)
-                }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+                })
                 
-                logger.info(f"✓ API: Login successful for {user['email']}")
+                logger.debug("✓ API: Login successful for %s", user['email'])
                 self._send_json_response(200, {
                     'success': True,
                     'message': 'Login successful',
@@ -739,6 +998,10 @@ class APIHandler(BaseHTTPRequestHandler):
                 })
             else:
                 self._send_json_response(401, {'success': False, 'message': 'Invalid email or password'})
+        except PasswordPoolBusy as e:
+            logger.warning(f"API Login rejected, password pool busy: {e}")
+            self._send_json_response(429, {'success': False, 'message': 'Too many concurrent logins, please retry'},
+                                     headers={'Retry-After': '1'})
         except Exception as e:
             logger.error(f"API Login error: {e}", exc_info=True)
             self._send_json_response(500, {'success': False, 'message': str(e)})
@@ -746,14 +1009,14 @@ class APIHandler(BaseHTTPRequestHandler):
     def _handle_register(self):
         """Handle registration request"""
         data = self._read_json_body()
-        logger.info(f"API: Register request for {data.get('email')}")
+        logger.debug("API: Register request for %s", data.get('email'))
         
         try:
-            password_hash = bcrypt.hashpw(data.get('password', '').encode('utf-8'), bcrypt.gensalt())
+            password_hash = self.password_hasher.hash(data.get('password', ''))
             
             result = self.db.db.users.insert_one({
                 "email": data.get('email'),
-                "password_hash": password_hash.decode('utf-8'),
+                "password_hash": password_hash,
                 "full_name": data.get('full_name', ''),
                 "phone": data.get('phone', ''),
                 "role": "user",
@@ -764,12 +1027,16 @@ class APIHandler(BaseHTTPRequestHandler):
             user_id = result.inserted_id
             self.db.commit()
             
-            logger.info(f"✓ API: User registered with ID {user_id}")
+            logger.debug("✓ API: User registered with ID %s", user_id)
             self._send_json_response(201, {
                 'success': True,
                 'message': 'Registration successful',
                 'user_id': str(user_id)
             })
+        except PasswordPoolBusy as e:
+            logger.warning(f"API Register rejected, password pool busy: {e}")
+            self._send_json_response(429, {'success': False, 'message': 'Too many concurrent requests, please retry'},
+                                     headers={'Retry-After': '1'})
         except Exception as e:
             self.db.rollback()
             logger.error(f"API Register error: {e}", exc_info=True)
@@ -783,12 +1050,12 @@ class APIHandler(BaseHTTPRequestHandler):
         data = self._read_json_body()
         
         try:
-            payload = jwt.decode(data.get('refresh_token', ''), JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            payload = decode_token(data.get('refresh_token', ''))
             
-            access_token = jwt.encode({
+            access_token = encode_token({
                 'user_id': payload['user_id'],
                 'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-            }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+            })
             
             self._send_json_response(200, {'success': True, 'access_token': access_token})
         except Exception as e:
@@ -804,82 +1071,34 @@ class APIHandler(BaseHTTPRequestHandler):
             return
         
         try:
-            user = self.db.db.users.find_one({"_id": ObjectId(user_id)})
+            fields = parse_field_mask(self.query.get('fields', ''), PROFILE_PAGE_MASK_FIELDS)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        if fields and 'payments' in fields:
+            fields['payments_next_page_token'] = None
+        
+        try:
+            bundle = load_profile(self.db, user_id, include_activity=True, cache=self.cache, fields=fields)
             
-            if not user:
+            if not bundle:
                 self._send_json_response(404, {'error': 'User not found'})
                 return
             
-            # Get apartment and building
-            apartment_doc = self.db.db.apartments.find_one({"user_id": ObjectId(user_id)})
+            response = profile_json(bundle)
             
-            building_doc = None
-            if apartment_doc:
-                building_doc = self.db.db.buildings.find_one({"_id": apartment_doc['building_id']})
-            
-            apartment_building = None
-            if apartment_doc and building_doc:
-                apartment_building = {**apartment_doc, **building_doc}
-                apartment_building['apartment_id'] = apartment_doc['_id']
-                apartment_building['building_id'] = building_doc['_id']
-            
-            # Get user profile
-            profile = self.db.db.user_profiles.find_one({"user_id": ObjectId(user_id)})
-            
-            response = {
-                'user': {
-                    'id': str(user['_id']),
-                    'email': user['email'],
-                    'full_name': user['full_name'] or '',
-                    'phone': user['phone'] or ''
-                }
-            }
-            
-            if apartment_building:
-                response['building'] = {
-                    'id': str(apartment_building['building_id']),
-                    'address': apartment_building['address'],
-                    'entrance': apartment_building['entrance'] or '',
-                    'total_apartments': apartment_building['total_apartments'],
-                    'total_residents': apartment_building['total_residents']
-                }
-                response['apartment'] = {
-                    'id': str(apartment_building['apartment_id']),
-                    'number': apartment_building['number'],
-                    'floor': apartment_building['floor'] or 0,
-                    'type': apartment_building['type'] or '',
-                    'residents': apartment_building['residents']
-                }
-                
-                # Get events for the building
-                events_cursor = self.db.db.events.find(
-                    {"building_id": apartment_building['building_id']}
-                ).sort("date", -1).limit(10)
+            if 'building' in response:
                 events = []
-                for event in events_cursor:
+                for event in bundle['events']:
                     events.append({
                         'date': event['date'].strftime('%d.%m.%Y') if event['date'] else '',
                         'text': event['description'] or event['title'] or ''
                     })
                 response['events'] = events
             
-            if profile:
-                response['account_manager'] = profile['account_manager'] or ''
-                response['balance'] = float(profile['balance']) if profile['balance'] else 0.0
-                response['client_number'] = profile['client_number'] or ''
-                response['contract_end_date'] = str(profile['contract_end_date']) if profile['contract_end_date'] else ''
-            
-            # Get payments for user
-            payments_cursor = self.db.db.payments.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("created_at", -1)
+            # Only the latest page of payments; older pages via /api/user/payments
             payments = []
-            total_pending = 0.0
-            total_overdue = 0.0
-            yearly_total = 0.0
-            last_payment = None
-            
-            for payment in payments_cursor:
+            for payment in bundle['payments']:
                 amount = float(payment['amount'])
                 payments.append({
                     'period': payment['period'],
@@ -887,30 +1106,22 @@ class APIHandler(BaseHTTPRequestHandler):
                     'status': payment['status'],
                     'paid_date': payment['paid_date'].strftime('%d.%m.%Y') if payment['paid_date'] else None
                 })
-                
-                yearly_total += amount
-                
-                if payment['status'] == 'pending':
-                    total_pending += amount
-                elif payment['status'] == 'overdue':
-                    total_overdue += amount
-                
-                # Track last paid payment
-                if payment['status'] == 'paid' and payment['paid_date'] and last_payment is None:
-                    last_payment = {
-                        'date': payment['paid_date'].strftime('%d.%m.%Y'),
-                        'amount': f"{amount:.2f} лв."
-                    }
             
+            summary = bundle['payment_summary']
+            last_paid = summary['last_paid']
             response['payments'] = payments
-            response['last_payment'] = last_payment
+            response['payments_next_page_token'] = bundle['payments_next_page_token']
+            response['last_payment'] = {
+                'date': last_paid['paid_date'].strftime('%d.%m.%Y'),
+                'amount': f"{float(last_paid['amount']):.2f} лв."
+            } if last_paid else None
             response['financial_summary'] = {
-                'current_month_debt': f"{total_pending:.2f} лв.",
-                'overdue_amount': f"{total_overdue:.2f} лв.",
-                'yearly_total': f"{yearly_total:.2f} лв."
+                'current_month_debt': f"{float(summary['pending']):.2f} лв.",
+                'overdue_amount': f"{float(summary['overdue']):.2f} лв.",
+                'yearly_total': f"{float(summary['total']):.2f} лв."
             }
             
-            self._send_json_response(200, response)
+            self._send_json_response(200, trim_fields(response, fields))
         except Exception as e:
             logger.error(f"API GetProfile error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
@@ -918,7 +1129,7 @@ class APIHandler(BaseHTTPRequestHandler):
     def _handle_contact_form(self):
         """Handle contact form submission"""
         data = self._read_json_body()
-        logger.info(f"API: Contact form from {data.get('email')}")
+        logger.debug("API: Contact form from %s", data.get('email'))
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -931,7 +1142,7 @@ class APIHandler(BaseHTTPRequestHandler):
             })
             
             self.db.commit()
-            logger.info("✓ API: Contact form saved")
+            logger.debug("✓ API: Contact form saved")
             self._send_json_response(200, {'success': True, 'message': 'Your message has been sent successfully'})
         except Exception as e:
             self.db.rollback()
@@ -941,7 +1152,7 @@ class APIHandler(BaseHTTPRequestHandler):
     def _handle_offer(self):
         """Handle offer request"""
         data = self._read_json_body()
-        logger.info(f"API: Offer request from {data.get('email')}")
+        logger.debug("API: Offer request from %s", data.get('email'))
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -954,7 +1165,7 @@ class APIHandler(BaseHTTPRequestHandler):
             })
             
             self.db.commit()
-            logger.info("✓ API: Offer request saved")
+            logger.debug("✓ API: Offer request saved")
             self._send_json_response(200, {'success': True, 'message': 'Your offer request has been received'})
         except Exception as e:
             self.db.rollback()
@@ -964,7 +1175,7 @@ class APIHandler(BaseHTTPRequestHandler):
     def _handle_presentation(self):
         """Handle presentation request"""
         data = self._read_json_body()
-        logger.info(f"API: Presentation request from {data.get('email')}")
+        logger.debug("API: Presentation request from %s", data.get('email'))
         
         try:
             self.db.db.contact_requests.insert_one({
@@ -977,7 +1188,7 @@ class APIHandler(BaseHTTPRequestHandler):
             })
             
             self.db.commit()
-            logger.info("✓ API: Presentation request saved")
+            logger.debug("✓ API: Presentation request saved")
             self._send_json_response(200, {'success': True, 'message': 'Your presentation request has been received'})
         except Exception as e:
             self.db.rollback()
@@ -985,66 +1196,19 @@ class APIHandler(BaseHTTPRequestHandler):
             self._send_json_response(500, {'success': False, 'message': str(e)})
     
     def _handle_get_residents(self):
-        """Handle get all residents (admin endpoint)"""
-        user_id = self._get_user_id_from_token()
+        """Handle get all residents (admin only)"""
+        if not self._require_admin():
+            return
         
-        if not user_id:
-            self._send_json_response(401, {'error': 'Unauthorized'})
+        try:
+            options = parse_residents_query(self.query)
+            page = ResidentsPage(self.db, **options)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
             return
         
         try:
-            pipeline = [
-                {"$lookup": {
-                    "from": "apartments",
-                    "localField": "_id",
-                    "foreignField": "user_id",
-                    "as": "apartment_data"
-                }},
-                {"$unwind": {"path": "$apartment_data", "preserveNullAndEmptyArrays": True}},
-                {"$lookup": {
-                    "from": "buildings",
-                    "localField": "apartment_data.building_id",
-                    "foreignField": "_id",
-                    "as": "building_data"
-                }},
-                {"$unwind": {"path": "$building_data", "preserveNullAndEmptyArrays": True}},
-                {"$lookup": {
-                    "from": "user_profiles",
-                    "localField": "_id",
-                    "foreignField": "user_id",
-                    "as": "profile_data"
-                }},
-                {"$unwind": {"path": "$profile_data", "preserveNullAndEmptyArrays": True}},
-                {"$sort": {"_id": 1}}
-            ]
-            
-            residents_cursor = self.db.db.users.aggregate(pipeline)
-            
-            residents = []
-            for row in residents_cursor:
-                # Calculate total debt from payments
-                debt_agg = self.db.db.payments.aggregate([
-                    {"$match": {"user_id": row['_id'], "status": {"$in": ["pending", "overdue"]}}},
-                    {"$group": {"_id": None, "total_debt": {"$sum": "$amount"}}}
-                ])
-                debt_result = next(debt_agg, {"total_debt": 0.0})
-                
-                residents.append({
-                    'id': str(row['_id']),
-                    'name': row.get('full_name', ''),
-                    'email': row['email'],
-                    'building': row.get('building_data', {}).get('address', ''),
-                    'entrance': row.get('building_data', {}).get('entrance', ''),
-                    'apartment': str(row.get('apartment_data', {}).get('number', '')),
-                    'clientNumber': row.get('profile_data', {}).get('client_number', ''),
-                    'residentsCount': row.get('apartment_data', {}).get('residents', 0),
-                    'balance': float(row.get('profile_data', {}).get('balance', 0.0)),
-                    'totalDebt': float(debt_result['total_debt']),
-                    'role': row.get('role', 'user'),
-                    'isActive': row.get('is_active', True),
-                })
-            
-            self._send_json_response(200, {'residents': residents})
+            self._send_json_stream(200, 'residents', page, lambda: {'next_cursor': page.next_cursor})
         except Exception as e:
             logger.error(f"API GetResidents error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
@@ -1081,13 +1245,11 @@ class APIHandler(BaseHTTPRequestHandler):
                 self._send_json_response(404, {'error': 'No apartment found for user'})
                 return
             
-            # Get payments for this user
-            payments_cursor = self.db.db.payments.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("created_at", -1)
+            # Latest page of payments for this user (older pages via /api/user/payments)
+            payments_page, next_page_token = load_payment_history(self.db, user_id)
             
             payments = []
-            for p in payments_cursor:
+            for p in payments_page:
                 # Parse period into month/year
                 period_parts = p['period'].split(' ') if p['period'] else ['', '']
                 payments.append({
@@ -1125,6 +1287,7 @@ class APIHandler(BaseHTTPRequestHandler):
                     'clientNumber': apt_data.get('profile', {}).get('client_number', ''),
                 },
                 'payments': payments,
+                'paymentsNextPageToken': next_page_token,
                 'maintenance': maintenance,
             }
             
@@ -1133,7 +1296,31 @@ class APIHandler(BaseHTTPRequestHandler):
             logger.error(f"API GetApartment error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
     
-    def _handle_get_building_apartments(self):
+    def _handle_get_payments(self):
+        """Handle paginated payment history (page_size, page_token, status, from, to)"""
+        user_id = self._get_user_id_from_token()
+        
+        if not user_id:
+            self._send_json_response(401, {'error': 'Unauthorized'})
+            return
+        
+        try:
+            options = parse_payments_query(self.query)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        
+        try:
+            payments, next_page_token = load_payment_history(self.db, user_id, **options)
+            self._send_json_response(200, {
+                'payments': [format_payment(p) for p in payments],
+                'next_page_token': next_page_token,
+            })
+        except Exception as e:
+            logger.error(f"API GetPayments error: {e}", exc_info=True)
+            self._send_json_response(500, {'error': str(e)})
+    
+    def _handle_get_building_apartments(self, building_id=None):
         """Handle get all apartments in a building (for Entrance page)"""
         user_id = self._get_user_id_from_token()
         
@@ -1142,87 +1329,20 @@ class APIHandler(BaseHTTPRequestHandler):
             return
         
         try:
-            # Extract building ID from path: /api/building/{id}/apartments
-            parts = self.path.split('/')
-            building_id = int(parts[3]) if len(parts) > 3 else None
-            
-            if not building_id:
-                # Get building from user's apartment
-                apt = self.db.db.apartments.find_one({"user_id": ObjectId(user_id)})
-                if apt:
-                    building_id = apt['building_id']
-                else:
+            if building_id is None:
+                # /api/building/me/apartments: use the caller's building
+                building_id = self._get_user_building_id(user_id)
+                if building_id is None:
                     self._send_json_response(404, {'error': 'No building found'})
                     return
-            else:
-                building_id = ObjectId(building_id)
-            
-            # Get building info
-            building = self.db.db.buildings.find_one({"_id": building_id})
-            
-            # Get all apartments with their payment status
-            # This is complex in Mongo without subqueries, we'll use aggregation
-            pipeline = [
-                {"$match": {"building_id": building_id}},
-                {"$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user"
-                }},
-                {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
-                {"$lookup": {
-                    "from": "payments",
-                    "localField": "_id",
-                    "foreignField": "apartment_id",
-                    "as": "payments"
-                }},
-                {"$sort": {"floor": -1, "number": 1}}
-            ]
-            
-            apt_cursor = self.db.db.apartments.aggregate(pipeline)
-            
-            # Group by floor
-            floors_dict = {}
-            for apt in apt_cursor:
-                # Calculate amount_due and status from the joined payments
-                payments = apt.get('payments', [])
-                amount_due = sum(p['amount'] for p in payments if p['status'] in ['pending', 'overdue'])
-                
-                status = 'paid'
-                if any(p['status'] == 'overdue' for p in payments):
-                    status = 'overdue'
-                elif any(p['status'] == 'pending' for p in payments):
-                    status = 'pending'
-                
-                floor_num = apt.get('floor') or 1
-                if floor_num not in floors_dict:
-                    floors_dict[floor_num] = []
-                
-                full_name = apt.get('user', {}).get('full_name', '')
-                floors_dict[floor_num].append({
-                    'number': apt['number'],
-                    'family': full_name.split(' ')[0] + 'и' if full_name else 'Неизвестни',
-                    'amount': float(amount_due),
-                    'status': status,
-                })
-            
-            floors = [{'floor': f, 'apartments': apts} for f, apts in sorted(floors_dict.items(), reverse=True)]
-            
-            response = {
-                'building': {
-                    'address': building['address'] if building else '',
-                    'entrance': building['entrance'] if building else '',
-                },
-                'floors': floors,
-            }
             
-            self._send_json_response(200, response)
+            # Pre-serialized snapshot, rebuilt only after a relevant write
+            self._send_json_bytes(200, self.grid.get_json(building_id))
         except Exception as e:
             logger.error(f"API GetBuildingApartments error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
     
-    def _handle_get_maintenance(self):
+    def _handle_get_maintenance(self, building_id=None):
         """Handle get maintenance records for a building"""
         user_id = self._get_user_id_from_token()
         
@@ -1231,20 +1351,19 @@ class APIHandler(BaseHTTPRequestHandler):
             return
         
         try:
-            # Extract building ID from path
-            parts = self.path.split('/')
-            building_id = int(parts[3]) if len(parts) > 3 else None
-            
-            if not building_id:
-                self._send_json_response(400, {'error': 'Building ID required'})
-                return
+            if building_id is None:
+                # /api/building/me/maintenance: use the caller's building
+                building_id = self._get_user_building_id(user_id)
+                if building_id is None:
+                    self._send_json_response(404, {'error': 'No building found'})
+                    return
             
-            maintenance_cursor = self.db.db.maintenance_records.find(
-                {"building_id": ObjectId(building_id)}
-            ).sort("date", -1)
+            maintenance_docs = self.flights.do(
+                ('maintenance', building_id),
+                lambda: list(self.db.db.maintenance_records.find({"building_id": building_id}).sort("date", -1)))
             
             maintenance = []
-            for m in maintenance_cursor:
+            for m in maintenance_docs:
                 maintenance.append({
                     'date': m['date'].strftime('%d.%m.%Y') if m['date'] else '',
                     'description': m['description'] or '',
@@ -1256,12 +1375,176 @@ class APIHandler(BaseHTTPRequestHandler):
         except Exception as e:
             logger.error(f"API GetMaintenance error: {e}", exc_info=True)
             self._send_json_response(500, {'error': str(e)})
+    
+    def _handle_get_buildings(self):
+        """Handle batched building lookup: ?ids=<id>,<id>,..."""
+        if not self._get_user_id_from_token():
+            self._send_json_response(401, {'error': 'Unauthorized'})
+            return
+        
+        try:
+            building_ids, invalid = parse_batch_ids(self.query.get('ids', ''))
+            fields = parse_field_mask(self.query.get('fields', ''), BUILDING_MASK_FIELDS)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        
+        try:
+            buildings, missing = in_request_order(
+                building_ids, invalid, load_buildings(self.db, building_ids, self.cache, fields))
+            self._send_json_response(200, {
+                'buildings': [trim_fields(building_json(building), fields) for building in buildings],
+                'missing': missing,
+            })
+        except Exception as e:
+            logger.error(f"API GetBuildings error: {e}", exc_info=True)
+            self._send_json_response(500, {'error': str(e)})
+    
+    def _handle_get_buildings_events(self):
+        """Handle batched events lookup: ?ids=<id>,...&limit=<per building>"""
+        if not self._get_user_id_from_token():
+            self._send_json_response(401, {'error': 'Unauthorized'})
+            return
+        
+        try:
+            building_ids, invalid = parse_batch_ids(self.query.get('ids', ''))
+            limit = parse_limit(self.query.get('limit'), BATCH_EVENTS_DEFAULT_LIMIT, BATCH_EVENTS_MAX_LIMIT)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        
+        try:
+            events = load_events_for_buildings(self.db, building_ids, limit, self.cache)
+            self._send_json_response(200, {
+                'buildings': [{
+                    'building_id': str(building_id),
+                    'events': [{
+                        'id': str(event['_id']),
+                        'date': event['date'].strftime('%d.%m.%Y') if event['date'] else '',
+                        'title': event['title'] or '',
+                        'description': event['description'] or '',
+                    } for event in events[building_id]],
+                } for building_id in building_ids if building_id in events],
+                'missing': invalid + [str(building_id) for building_id in building_ids if building_id not in events],
+            })
+        except Exception as e:
+            logger.error(f"API GetBuildingsEvents error: {e}", exc_info=True)
+            self._send_json_response(500, {'error': str(e)})
+    
+    def _handle_get_profiles(self):
+        """Handle batched profile lookup: ?ids=<id>,... (others' profiles need admin)"""
+        if not self._get_user_id_from_token():
+            self._send_json_response(401, {'error': 'Unauthorized'})
+            return
+        
+        try:
+            user_ids, invalid = parse_batch_ids(self.query.get('ids', ''))
+            fields = parse_field_mask(self.query.get('fields', ''), PROFILE_MASK_FIELDS)
+            for user_id in user_ids:
+                resolve_user_id(str(user_id), self.identity)
+        except QueryError as e:
+            self._send_json_response(400, {'error': str(e)})
+            return
+        except PermissionError as e:
+            self._send_json_response(403, {'error': str(e)})
+            return
+        
+        try:
+            bundles, missing = in_request_order(user_ids, invalid, load_profiles(self.db, user_ids, fields))
+            self._send_json_response(200, {
+                'profiles': [trim_fields(profile_json(bundle), fields) for bundle in bundles],
+                'missing': missing,
+            })
+        except Exception as e:
+            logger.error(f"API GetProfiles error: {e}", exc_info=True)
+            self._send_json_response(500, {'error': str(e)})
+
+
+def building_json(building):
+    """Building document -> REST shape"""
+    return {
+        'id': str(building['_id']),
+        'address': building.get('address') or '',
+        'entrance': building.get('entrance') or '',
+        'total_apartments': building.get('total_apartments') or 0,
+        'total_residents': building.get('total_residents') or 0
+    }
+
+
+def profile_json(bundle):
+    """load_profile bundle -> REST shape (user, building/apartment, contract details)"""
+    user = bundle['user']
+    apartment = bundle['apartment']
+    building = bundle['building']
+    profile = bundle['profile']
+    
+    response = {
+        'user': {
+            'id': str(user['_id']),
+            'email': user.get('email') or '',
+            'full_name': user.get('full_name') or '',
+            'phone': user.get('phone') or ''
+        }
+    }
+    
+    if apartment and building:
+        response['building'] = building_json(building)
+        response['apartment'] = {
+            'id': str(apartment['_id']),
+            'number': apartment.get('number') or 0,
+            'floor': apartment.get('floor') or 0,
+            'type': apartment.get('type') or '',
+            'residents': apartment.get('residents') or 0
+        }
+    
+    if profile:
+        response['account_manager'] = profile.get('account_manager') or ''
+        response['balance'] = float(profile['balance']) if profile.get('balance') else 0.0
+        response['client_number'] = profile.get('client_number') or ''
+        response['contract_end_date'] = str(profile['contract_end_date']) if profile.get('contract_end_date') else ''
+    return response
+
+
+# Route table: compiled once at import, matched per request by path segment
+APIHandler.routes = Router()
+APIHandler.routes.add('GET', '/health', APIHandler._handle_health)
+APIHandler.routes.add('GET', '/metrics', APIHandler._handle_metrics)
+APIHandler.routes.add('GET', '/api/user/profile', APIHandler._handle_get_profile)
+APIHandler.routes.add('GET', '/api/user/apartment', APIHandler._handle_get_apartment)
+APIHandler.routes.add('GET', '/api/user/payments', APIHandler._handle_get_payments)
+APIHandler.routes.add('GET', '/api/admin/residents', APIHandler._handle_get_residents)
+APIHandler.routes.add('GET', '/api/admin/config', APIHandler._handle_get_admin_config)
+APIHandler.routes.add('GET', '/api/admin/slow-aggregations', APIHandler._handle_get_slow_aggregations)
+APIHandler.routes.add('GET', '/api/profiles', APIHandler._handle_get_profiles)
+APIHandler.routes.add('GET', '/api/buildings', APIHandler._handle_get_buildings)
+APIHandler.routes.add('GET', '/api/buildings/events', APIHandler._handle_get_buildings_events)
+APIHandler.routes.add('GET', '/api/building/me/apartments', APIHandler._handle_get_building_apartments)
+APIHandler.routes.add('GET', '/api/building/me/maintenance', APIHandler._handle_get_maintenance)
+APIHandler.routes.add('GET', '/api/building/{building_id:objectid}/apartments', APIHandler._handle_get_building_apartments)
+APIHandler.routes.add('GET', '/api/building/{building_id:objectid}/maintenance', APIHandler._handle_get_maintenance)
+APIHandler.routes.add('POST', '/api/auth/login', APIHandler._handle_login)
+APIHandler.routes.add('POST', '/api/auth/register', APIHandler._handle_register)
+APIHandler.routes.add('POST', '/api/auth/refresh', APIHandler._handle_refresh_token)
+APIHandler.routes.add('POST', '/api/contact/form', APIHandler._handle_contact_form)
+APIHandler.routes.add('POST', '/api/contact/offer', APIHandler._handle_offer)
+APIHandler.routes.add('POST', '/api/contact/presentation', APIHandler._handle_presentation)
+APIHandler.routes.add('POST', '/api/admin/profile/cpu', APIHandler._handle_profile_cpu)
+APIHandler.routes.add('POST', '/api/admin/profile/memory', APIHandler._handle_profile_memory)
 
 
-def start_http_api_server(port, db):
+def start_http_api_server(port, db, password_hasher, token_verifier, cache, grid,
+                          grpc_config=None, method_limits=None, reuse_port=False, plan_capture=None):
     """Start HTTP API server in a separate thread"""
     APIHandler.db = db
-    server = HTTPServer(('0.0.0.0', port), APIHandler)
+    APIHandler.cache = cache
+    APIHandler.grid = grid
+    APIHandler.flights = cache.flights
+    APIHandler.password_hasher = password_hasher
+    APIHandler.token_verifier = token_verifier
+    APIHandler.grpc_config = grpc_config
+    APIHandler.method_limits = method_limits
+    APIHandler.plan_capture = plan_capture
+    server = create_http_server(port, APIHandler, reuse_port=reuse_port)
     logger.info(f"✓ HTTP REST API server started on port {port}")
     logger.info(f"  Health endpoint: http://0.0.0.0:{port}/health")
     logger.info(f"  API endpoints: http://0.0.0.0:{port}/api/*")
@@ -1271,7 +1554,12 @@ def start_http_api_server(port, db):
     thread.start()
     return server
 
-def serve():
+def serve(reuse_port=False):
+    """Run the gRPC and REST servers in this process until SIGTERM/SIGINT.
+
+    With reuse_port the ports are bound with SO_REUSEPORT, so several
+    worker processes can serve them (see main()).
+    """
     logger.info("=" * 80)
     logger.info("DOMUNITY gRPC + REST API SERVER (Python)")
     logger.info("=" * 80)
@@ -1286,6 +1574,26 @@ def serve():
     logger.info(f"  HTTP_PORT: {os.getenv('PORT', '8080')}")
     logger.info("=" * 80)
     
+    # gRPC serving mode, capacity and transport settings (GRPC_* variables)
+    try:
+        grpc_config = GrpcServerConfig.from_env()
+    except ValueError as e:
+        logger.error(f"✗ Invalid gRPC configuration: {e}")
+        sys.exit(1)
+    grpc_config.reuse_port = reuse_port
+    method_limits = MethodLimits(grpc_config.method_limits)
+    logger.info("\ngRPC Server Configuration:")
+    for name, value in grpc_config.as_dict().items():
+        logger.info(f"  {name}: {value}")
+    
+    # Slow-request threshold and Mongo command tracing (SLOW_REQUEST_MS, MONGO_TRACE_*)
+    try:
+        tracing = configure_tracing(TracingConfig.from_env())
+    except ValueError as e:
+        logger.error(f"✗ Invalid tracing configuration: {e}")
+        sys.exit(1)
+    logger.info(f"  Slow request threshold: {tracing.slow_request_ms} ms")
+    
     # Initialize database FIRST (needed for both HTTP API and gRPC)
     try:
         db = Database()
@@ -1294,23 +1602,40 @@ def serve():
         logger.error(f"✗ Database initialization failed: {e}")
         sys.exit(1)
     
+    # Slow aggregates over EXPLAIN_BUDGET_MS are explained in the background
+    try:
+        plan_capture = PlanCapture.from_env(db)
+    except ValueError as e:
+        logger.error(f"✗ Invalid explain configuration: {e}")
+        sys.exit(1)
+    set_plan_capture(plan_capture)
+    if plan_capture.enabled:
+        logger.info(f"  Slow aggregate explain: over {plan_capture.budget_ms} ms, "
+                    f"sample rate {plan_capture.sample_rate}")
+    
+    # bcrypt runs in its own process pool, shared by both transports
+    password_hasher = PasswordHasher.from_env()
+    logger.info(f"  Password pool: {password_hasher.max_workers} workers, {password_hasher.max_pending} pending max")
+    
+    # One token cache for both transports
+    token_verifier = TokenVerifier(db, JWT_SECRET, JWT_ALGORITHM,
+                                   max_entries=int(os.getenv('TOKEN_CACHE_SIZE', '10000')))
+    
+    # Buildings and apartments are read-mostly: one shared read-through cache
+    # Identical concurrent reads share one query on both transports
+    flights = SingleFlight()
+    cache = ReadThroughCache.from_env(db, flights)
+    # Entrance-page grids, invalidated by payment/apartment/user writes
+    grid = BuildingGrid(db, cache, ttl=cache.store.ttl)
+    
     # Start HTTP REST API server
     http_port = int(os.getenv('HTTP_PORT', os.getenv('PORT', '8080')))
-    http_server = start_http_api_server(http_port, db)
-    
-    # Create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    http_server = start_http_api_server(http_port, db, password_hasher, token_verifier, cache, grid,
+                                        grpc_config, method_limits, reuse_port, plan_capture)
     
-    # Add servicers
-    domunity_pb2_grpc.add_AuthServiceServicer_to_server(AuthServicer(db), server)
-    domunity_pb2_grpc.add_UserServiceServicer_to_server(UserServicer(db), server)
-    domunity_pb2_grpc.add_BuildingServiceServicer_to_server(BuildingServicer(db), server)
-    domunity_pb2_grpc.add_FinancialServiceServicer_to_server(FinancialServicer(db), server)
-    domunity_pb2_grpc.add_EventServiceServicer_to_server(EventServicer(db), server)
-    domunity_pb2_grpc.add_ContactServiceServicer_to_server(ContactServicer(db), server)
-    domunity_pb2_grpc.add_HealthServiceServicer_to_server(HealthServicer(db), server)
+    if not grpc_config.auth_required:
+        logger.warning("gRPC token verification is DISABLED (GRPC_AUTH_REQUIRED=false)")
     
-    # Enable reflection
     SERVICE_NAMES = (
         domunity_pb2.DESCRIPTOR.services_by_name['AuthService'].full_name,
         domunity_pb2.DESCRIPTOR.services_by_name['UserService'].full_name,
@@ -1321,34 +1646,107 @@ def serve():
         domunity_pb2.DESCRIPTOR.services_by_name['HealthService'].full_name,
         reflection.SERVICE_NAME,
     )
+    grpc_port = grpc_config.port
+    # Mongo cursor batch size of the streaming RPCs (overridable per request)
+    batch_size = grpc_config.stream_batch_size
+    
+    if grpc_config.mode == 'async':
+        import asyncio
+        from aio_server import serve_async
+        
+        _log_started(grpc_port, http_port, SERVICE_NAMES, grpc_config.mode)
+        try:
+            asyncio.run(serve_async(grpc_config, SERVICE_NAMES, password_hasher, token_verifier, cache.store,
+                                    grid=grid, method_limits=method_limits))
+        except KeyboardInterrupt:
+            logger.info("Shutting down server...")
+        finally:
+            http_server.drain(grpc_config.shutdown_grace)
+            password_hasher.shutdown()
+            plan_capture.shutdown()
+            db.close()
+        return
+    
+    # Create gRPC server
+    # Metrics first, so calls rejected by auth or method limits are counted too
+    interceptors = [MetricsInterceptor()]
+    if grpc_config.auth_required:
+        interceptors.append(AuthInterceptor(token_verifier))
+    interceptors.append(MethodLimitInterceptor(method_limits))
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=grpc_config.workers),
+        interceptors=interceptors,
+        options=grpc_config.options(),
+        maximum_concurrent_rpcs=grpc_config.max_concurrent_rpcs,
+        compression=grpc_config.compression_algorithm
+    )
+    
+    # Add servicers
+    domunity_pb2_grpc.add_AuthServiceServicer_to_server(AuthServicer(db, password_hasher), server)
+    domunity_pb2_grpc.add_UserServiceServicer_to_server(UserServicer(db, cache, grid), server)
+    domunity_pb2_grpc.add_BuildingServiceServicer_to_server(BuildingServicer(db, cache, batch_size), server)
+    domunity_pb2_grpc.add_FinancialServiceServicer_to_server(FinancialServicer(db, batch_size), server)
+    domunity_pb2_grpc.add_EventServiceServicer_to_server(EventServicer(db, flights, cache), server)
+    domunity_pb2_grpc.add_ContactServiceServicer_to_server(ContactServicer(db), server)
+    domunity_pb2_grpc.add_HealthServiceServicer_to_server(HealthServicer(db), server)
+    
+    # Enable reflection
     reflection.enable_server_reflection(SERVICE_NAMES, server)
     
     # Start server
-    grpc_port = os.getenv('GRPC_PORT', '50051')
     server.add_insecure_port(f'0.0.0.0:{grpc_port}')
     server.start()
+    _log_started(grpc_port, http_port, SERVICE_NAMES, f"threaded, {grpc_config.workers} workers")
+    
+    # SIGTERM (supervisor, container stop) drains like Ctrl+C
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    try:
+        while not stopping.wait(3600):
+            pass
+    except KeyboardInterrupt:
+        pass
     
+    logger.info("\n" + "=" * 80)
+    logger.info(f"Shutting down server (grace {grpc_config.shutdown_grace}s)...")
+    logger.info("=" * 80)
+    grpc_stopped = server.stop(grpc_config.shutdown_grace)
+    http_server.drain(grpc_config.shutdown_grace)
+    grpc_stopped.wait()
+    password_hasher.shutdown()
+    plan_capture.shutdown()
+    db.close()
+
+def main():
+    """Serve in this process, or in SERVER_PROCESSES workers under a Supervisor"""
+    try:
+        processes = process_count(os.getenv('SERVER_PROCESSES'))
+        grace = GrpcServerConfig.from_env().shutdown_grace
+    except ValueError as e:
+        logger.error(f"✗ Invalid server configuration: {e}")
+        sys.exit(1)
+    
+    if processes == 1:
+        serve()
+        return
+    
+    # Each worker runs its own password pool: split the CPUs between them
+    if not os.getenv('PASSWORD_WORKERS'):
+        os.environ['PASSWORD_WORKERS'] = str(max(1, (os.cpu_count() or 1) // processes))
+    Supervisor(processes, serve, args=(True,), drain_seconds=grace + 5).run()
+
+def _log_started(grpc_port, http_port, service_names, grpc_mode):
     logger.info("=" * 80)
     logger.info(f"✓ SERVERS STARTED SUCCESSFULLY")
     logger.info("=" * 80)
-    logger.info(f"\ngRPC Server: 0.0.0.0:{grpc_port}")
+    logger.info(f"\ngRPC Server: 0.0.0.0:{grpc_port} ({grpc_mode})")
     logger.info(f"HTTP REST API: 0.0.0.0:{http_port}/api/*")
     logger.info(f"Health Check: 0.0.0.0:{http_port}/health")
     logger.info("\nRegistered gRPC Services:")
-    for service_name in SERVICE_NAMES:
+    for service_name in service_names:
         if service_name != reflection.SERVICE_NAME:
             logger.info(f"  • {service_name}")
     logger.info("=" * 80)
-    
-    try:
-        while True:
-            time.sleep(86400)
-    except KeyboardInterrupt:
-        logger.info("\n" + "=" * 80)
-        logger.info("Shutting down server...")
-        logger.info("=" * 80)
-        server.stop(0)
-        db.close()
 
 if __name__ == '__main__':
-    serve()
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Stats:
+    """Executed and saved call counters, per endpoint (the first key element)"""
+
+    def __init__(self):
+        self._executions = {}
+        self._saved = {}
+
+    def executed(self, key):
+        self._executions[key[0]] = self._executions.get(key[0], 0) + 1
+
+    def saved(self, key):
+        self._saved[key[0]] = self._saved.get(key[0], 0) + 1
+
+    def snapshot(self, in_flight):
+        return {
+            'in_flight': in_flight,
+            'executions': sum(self._executions.values()),
+            'saved': sum(self._saved.values()),
+            'saved_by_endpoint': dict(self._saved),
+        }
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent identical reads.
+
+    Callers pass a key of (endpoint, *parameters) and a zero-argument
+    function. The first caller for a key runs it; callers arriving while it
+    runs wait and receive the same result (or exception) instead of issuing
+    the same database query again. Nothing is kept once the call finishes,
+    so this never serves stale data - it only collapses simultaneous work.
+
+    Results are shared between threads and must not be mutated.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats.executed(key)
+            else:
+                self._stats.saved(key)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return self._stats.snapshot(len(self._calls))
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop (grpc.aio servicers).
+
+    The shared call runs as its own task, so a caller that is cancelled
+    (e.g. the client went away) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = _Stats()
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._stats.executed(key)
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self._stats.saved(key)
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Shared call %s failed: %s", key[0], task.exception())
+
+    def stats(self):
+        return self._stats.snapshot(len(self._calls))
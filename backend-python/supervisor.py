@@ -0,0 +1,160 @@
+"""
+Multi-process serving mode (SERVER_PROCESSES > 1)
+
+A single CPython process runs the gRPC servicers, the REST handlers, JSON
+encoding and protobuf building under one GIL. In this mode a supervisor
+starts N worker processes instead. Each worker is a complete server with
+its own Database client, caches and password pool, and all of them bind
+the gRPC and HTTP ports with SO_REUSEPORT, so the kernel spreads incoming
+connections across them.
+
+The caches are per process. A write invalidates the cache of the worker
+that handled it; the other workers see the change after CACHE_TTL at the
+latest.
+"""
+import os
+import time
+import signal
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+# A worker that exits sooner than this after starting is crash-looping: back off
+STABLE_AFTER_SECONDS = 10.0
+
+
+def process_count(value):
+    """SERVER_PROCESSES value -> number of worker processes ('auto' = one per CPU)"""
+    if value in (None, ''):
+        return 1
+    if str(value).lower() == 'auto':
+        return os.cpu_count() or 1
+    count = int(value)
+    if count < 1:
+        raise ValueError(f"SERVER_PROCESSES must be at least 1, got {count}")
+    return count
+
+
+def _run_worker(target, args):
+    # Own process group: the worker's password pool processes are reaped with it
+    os.setpgid(0, 0)
+    target(*args)
+
+
+def _kill_group(pid):
+    """SIGKILL whatever is left of a dead or stuck worker's process group"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Supervisor:
+    """Starts the worker processes, restarts the ones that die and drains them on exit.
+
+    Workers run ``target(*args)`` in processes started with 'spawn' (forking
+    a process that already runs gRPC threads is unsafe). A worker that exits
+    while the supervisor is running is restarted after DEFAULT_RESTART_DELAY,
+    doubled up to MAX_RESTART_DELAY while it keeps dying right after start.
+    On SIGTERM/SIGINT every worker gets SIGTERM and ``drain_seconds`` to
+    finish its in-flight requests before it is killed. Each worker leads its
+    own process group, so the processes it started die with it.
+    """
+
+    def __init__(self, processes, target, args=(), drain_seconds=15.0, context=None):
+        self.processes = processes
+        self.target = target
+        self.args = args
+        self.drain_seconds = drain_seconds
+        self._context = context or multiprocessing.get_context('spawn')
+        self._workers = {}
+        self._started_at = {}
+        self._delays = {}
+        self._restart_at = {}
+        self._restarts = 0
+        self._stopping = False
+
+    def start(self):
+        """Start every worker"""
+        for slot in range(self.processes):
+            self._start(slot)
+
+    def _start(self, slot):
+        process = self._context.Process(target=_run_worker, args=(self.target, self.args),
+                                        name=f'domunity-worker-{slot}')
+        process.start()
+        self._workers[slot] = process
+        self._started_at[slot] = time.monotonic()
+        logger.info(f"✓ Worker {slot} started (pid {process.pid})")
+
+    def stop(self, *_):
+        """Ask run() to drain the workers and return (safe from a signal handler)"""
+        self._stopping = True
+
+    def run(self):
+        """Supervise the workers until SIGTERM/SIGINT, then drain them"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.start()
+        logger.info(f"✓ Supervisor running {self.processes} workers (pid {os.getpid()})")
+        while not self._stopping:
+            self.check()
+        self.shutdown()
+
+    def check(self, timeout=0.5):
+        """Wait up to ``timeout`` for a worker to exit and restart the ones that are due"""
+        alive = [process.sentinel for slot, process in self._workers.items() if slot not in self._restart_at]
+        if alive:
+            wait(alive, timeout)
+        else:
+            time.sleep(timeout)
+
+        now = time.monotonic()
+        for slot, process in self._workers.items():
+            if slot in self._restart_at or process.is_alive():
+                continue
+            _kill_group(process.pid)
+            uptime = now - self._started_at[slot]
+            if uptime < STABLE_AFTER_SECONDS:
+                delay = min(self._delays.get(slot, DEFAULT_RESTART_DELAY / 2) * 2, MAX_RESTART_DELAY)
+            else:
+                delay = DEFAULT_RESTART_DELAY
+            self._delays[slot] = delay
+            self._restart_at[slot] = now + delay
+            logger.error(f"✗ Worker {slot} (pid {process.pid}) exited with code {process.exitcode} "
+                         f"after {uptime:.1f}s, restarting in {delay:.1f}s")
+
+        for slot, restart_at in list(self._restart_at.items()):
+            if now >= restart_at and not self._stopping:
+                del self._restart_at[slot]
+                self._restarts += 1
+                self._start(slot)
+
+    def shutdown(self):
+        """SIGTERM every worker and wait up to drain_seconds before killing the stragglers"""
+        logger.info(f"Draining {len(self._workers)} workers (up to {self.drain_seconds}s)...")
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.drain_seconds
+        for process in self._workers.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+        for slot, process in self._workers.items():
+            if process.is_alive():
+                logger.warning(f"Worker {slot} (pid {process.pid}) did not drain in time, killing it")
+                process.kill()
+                process.join()
+            _kill_group(process.pid)
+        logger.info("✓ All workers stopped")
+
+    def stats(self):
+        return {
+            'processes': self.processes,
+            'alive': sum(1 for process in self._workers.values() if process.is_alive()),
+            'restarts': self._restarts,
+            'pids': [process.pid for process in self._workers.values()],
+        }
@@ -154,5 +154,2283 @@ class TestInputValidation(unittest.TestCase):
             self.assertTrue(re.match(phone_pattern, phone), f"{phone} should be valid")
 
 
+class TestPooledHTTPServer(unittest.TestCase):
+    """Test the bounded worker pool HTTP front-end"""
+    
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler
+        from http_server import PooledHTTPServer
+        
+        self.release = threading.Event()
+        release = self.release
+        
+        class BlockingHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                release.wait(5)
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+        
+        self.server = PooledHTTPServer(('127.0.0.1', 0), BlockingHandler, max_workers=1, backlog=8, max_queue=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.server.server_address[1]
+    
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_rejects_with_503_when_saturated(self):
+        """Test that connections beyond workers + queue get 503"""
+        import http.client
+        import time
+        
+        busy = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        busy.request('GET', '/')
+        
+        deadline = time.time() + 5
+        while self.server.stats()['active'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        rejected = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        rejected.request('GET', '/')
+        response = rejected.getresponse()
+        self.assertEqual(response.status, 503)
+        self.assertIn('busy', response.read().decode())
+        
+        self.release.set()
+        self.assertEqual(busy.getresponse().status, 200)
+        self.assertEqual(self.server.stats()['rejected'], 1)
+    
+    def test_drain_finishes_in_flight_requests(self):
+        """Test drain() stops accepting but lets the running request complete"""
+        import http.client
+        import threading
+        import time
+        
+        busy = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        busy.request('GET', '/')
+        deadline = time.time() + 5
+        while self.server.stats()['active'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        drained = threading.Thread(target=self.server.drain, args=(5,))
+        drained.start()
+        time.sleep(0.1)
+        self.assertTrue(drained.is_alive())
+        self.release.set()
+        self.assertEqual(busy.getresponse().status, 200)
+        drained.join(5)
+        self.assertFalse(drained.is_alive())
+        self.assertEqual(self.server.stats()['active'], 0)
+    
+    def test_reuse_port_lets_servers_share_a_port(self):
+        """Test two listeners can bind one port with SO_REUSEPORT (SERVER_PROCESSES)"""
+        from http.server import BaseHTTPRequestHandler
+        from http_server import PooledHTTPServer
+        
+        first = PooledHTTPServer(('127.0.0.1', 0), BaseHTTPRequestHandler, reuse_port=True)
+        try:
+            second = PooledHTTPServer(('127.0.0.1', first.server_address[1]), BaseHTTPRequestHandler, reuse_port=True)
+            second.server_close()
+        finally:
+            first.server_close()
+
+
+class TestKeepAliveRequestHandler(unittest.TestCase):
+    """Test HTTP/1.1 persistent connections and per-connection limits"""
+    
+    def setUp(self):
+        import threading
+        from http_server import PooledHTTPServer, KeepAliveRequestHandler
+        
+        class EchoHandler(KeepAliveRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                body = self.path.encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self.server = PooledHTTPServer(('127.0.0.1', 0), EchoHandler, max_workers=2,
+                                       idle_timeout=5, max_requests_per_connection=3)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.server.server_address[1]
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_connection_reused_until_limit(self):
+        """Test that one connection serves requests until max_requests_per_connection"""
+        import http.client
+        import time
+        
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        for i in range(3):
+            conn.request('GET', f'/r{i}')
+            response = conn.getresponse()
+            self.assertEqual(response.read(), f'/r{i}'.encode())
+            self.assertEqual(response.version, 11)
+        
+        # The third response carries Connection: close
+        self.assertEqual(response.getheader('Connection'), 'close')
+        conn.close()
+        
+        deadline = time.time() + 5
+        while self.server.stats()['completed'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        stats = self.server.stats()
+        self.assertEqual(stats['accepted'], 1)
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['reused_requests'], 2)
+        self.assertEqual(stats['closed_at_request_limit'], 1)
+    
+    def test_nagle_disabled(self):
+        """Test accepted sockets set TCP_NODELAY so keep-alive responses are not held back"""
+        import socket
+        import http.client
+        from http_server import KeepAliveRequestHandler
+        
+        seen = []
+        original = KeepAliveRequestHandler.setup
+        
+        def setup(handler):
+            original(handler)
+            seen.append(handler.connection.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        
+        with patch.object(KeepAliveRequestHandler, 'setup', setup):
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+            conn.request('GET', '/nodelay')
+            conn.getresponse().read()
+            conn.close()
+        self.assertTrue(seen and seen[0])
+    
+    def test_idle_connections_release_workers(self):
+        """Test idle keep-alive connections are parked instead of holding the pool's workers"""
+        import http.client
+        import time
+        
+        connections = [http.client.HTTPConnection('127.0.0.1', self.port, timeout=2) for _ in range(6)]
+        for round_number in range(2):
+            for i, conn in enumerate(connections):
+                conn.request('GET', f'/c{i}/{round_number}')
+                self.assertEqual(conn.getresponse().read(), f'/c{i}/{round_number}'.encode())
+        
+        deadline = time.time() + 5
+        while (self.server.stats()['idle'] < 6 or self.server.stats()['active']) and time.time() < deadline:
+            time.sleep(0.01)
+        stats = self.server.stats()
+        self.assertEqual(stats['accepted'], 6)
+        self.assertEqual(stats['idle'], 6)
+        self.assertEqual(stats['active'], 0)
+        for conn in connections:
+            conn.close()
+    
+    def test_parked_connection_rejected_when_saturated(self):
+        """Test a parked connection's next request gets 503 instead of queueing behind a full pool"""
+        import http.client
+        import threading
+        import time
+        from http_server import PooledHTTPServer
+        
+        release = threading.Event()
+        handler_class = self.server.RequestHandlerClass
+        
+        class BlockingEchoHandler(handler_class):
+            def do_GET(self):
+                if self.path == '/block':
+                    release.wait(5)
+                super().do_GET()
+        
+        server = PooledHTTPServer(('127.0.0.1', 0), BlockingEchoHandler, max_workers=1, max_queue=0, idle_timeout=5)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            parked = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+            parked.request('GET', '/first')
+            self.assertEqual(parked.getresponse().read(), b'/first')
+            deadline = time.time() + 5
+            while (server.stats()['idle'] < 1 or server.stats()['active']) and time.time() < deadline:
+                time.sleep(0.01)
+            
+            busy = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+            busy.request('GET', '/block')
+            while server.stats()['active'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            
+            parked.request('GET', '/second')
+            response = parked.getresponse()
+            self.assertEqual(response.status, 503)
+            self.assertEqual(response.getheader('Connection'), 'close')
+            response.read()
+            
+            release.set()
+            self.assertEqual(busy.getresponse().read(), b'/block')
+            self.assertEqual(server.stats()['rejected'], 1)
+            parked.close()
+            busy.close()
+        finally:
+            release.set()
+            server.shutdown()
+            server.server_close()
+    
+    def test_pipelined_requests_served_from_buffer(self):
+        """Test requests already buffered on the connection are answered without waiting for the socket"""
+        import socket
+        
+        with socket.create_connection(('127.0.0.1', self.port), timeout=2) as sock:
+            sock.sendall(b'GET /one HTTP/1.1\r\nHost: x\r\n\r\nGET /two HTTP/1.1\r\nHost: x\r\n\r\n')
+            received = b''
+            while b'/two' not in received:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                received += chunk
+        self.assertIn(b'/one', received)
+        self.assertIn(b'/two', received)
+    
+    def test_idle_timeout_closes_parked_connection(self):
+        """Test a parked connection is closed once idle_timeout passes"""
+        import socket
+        import threading
+        import time
+        from http_server import PooledHTTPServer
+        
+        server = PooledHTTPServer(('127.0.0.1', 0), self.server.RequestHandlerClass, max_workers=1, idle_timeout=0.2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with socket.create_connection(server.server_address, timeout=2) as sock:
+                sock.sendall(b'GET /idle HTTP/1.1\r\nHost: x\r\n\r\n')
+                received = b''
+                while not received.endswith(b'/idle'):
+                    received += sock.recv(4096)
+                started = time.time()
+                self.assertEqual(sock.recv(4096), b'')
+                self.assertLess(time.time() - started, 1.5)
+            
+            stats = server.stats()
+            self.assertEqual(stats['idle'], 0)
+            self.assertEqual(stats['idle_timeouts'], 1)
+            self.assertEqual(stats['completed'], 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestRouter(unittest.TestCase):
+    """Test the table-driven REST router"""
+    
+    def setUp(self):
+        from routing import Router
+        self.router = Router()
+        self.router.add('GET', '/health', 'health')
+        self.router.add('GET', '/api/building/me/apartments', 'my_apartments')
+        self.router.add('GET', '/api/building/{building_id:objectid}/apartments', 'apartments')
+        self.router.add('GET', '/api/building/{building_id:objectid}/maintenance', 'maintenance')
+        self.router.add('POST', '/api/auth/login', 'login')
+    
+    def test_static_route(self):
+        """Test exact path match"""
+        match = self.router.match('GET', '/health')
+        self.assertEqual(match.handler, 'health')
+        self.assertEqual(match.params, {})
+    
+    def test_typed_objectid_parameter(self):
+        """Test ObjectId path parameter is converted once"""
+        from bson import ObjectId
+        building_id = '65ba3f7e8b234a5d6c7e8f90'
+        match = self.router.match('GET', f'/api/building/{building_id}/maintenance')
+        self.assertEqual(match.handler, 'maintenance')
+        self.assertEqual(match.params, {'building_id': ObjectId(building_id)})
+        # Metrics label the request with the pattern, not the concrete path
+        self.assertEqual(match.pattern, '/api/building/{building_id:objectid}/maintenance')
+    
+    def test_invalid_objectid_raises(self):
+        """Test malformed ObjectId is rejected"""
+        from routing import InvalidPathParameter
+        with self.assertRaises(InvalidPathParameter):
+            self.router.match('GET', '/api/building/1/apartments')
+    
+    def test_static_segment_wins_over_parameter(self):
+        """Test /me/ resolves to the static route"""
+        match = self.router.match('GET', '/api/building/me/apartments')
+        self.assertEqual(match.handler, 'my_apartments')
+    
+    def test_query_string_parsed(self):
+        """Test query parameters are parsed"""
+        match = self.router.match('GET', '/health?verbose=1&x=')
+        self.assertEqual(match.query, {'verbose': '1', 'x': ''})
+    
+    def test_method_not_allowed_and_not_found(self):
+        """Test unknown method on a known path and unknown paths"""
+        match = self.router.match('GET', '/api/auth/login')
+        self.assertIsNone(match.handler)
+        self.assertEqual(match.allowed_methods, ('POST',))
+        self.assertIsNone(self.router.match('GET', '/api/unknown'))
+        self.assertIsNone(self.router.match('GET', '/api/building'))
+    
+    def test_duplicate_route_rejected(self):
+        """Test registering the same route twice fails"""
+        with self.assertRaises(ValueError):
+            self.router.add('GET', '/health', 'again')
+
+
+class CountingCollection:
+    """Fake collection that records every database call"""
+    
+    def __init__(self, name, calls, rows):
+        self.name = name
+        self.calls = calls
+        self.rows = rows
+    
+    def _record(self, op, *args, **kwargs):
+        self.calls.append((self.name, op, args, kwargs))
+        return iter(list(self.rows.get(self.name, [])))
+    
+    def aggregate(self, *args, **kwargs):
+        return self._record('aggregate', *args, **kwargs)
+    
+    def find(self, *args, **kwargs):
+        return CountingCursor(self._record('find', *args, **kwargs))
+    
+    def find_one(self, *args, **kwargs):
+        return next(self._record('find_one', *args, **kwargs), None)
+    
+    def find_one_and_update(self, *args, **kwargs):
+        return next(self._record('find_one_and_update', *args, **kwargs), None)
+    
+    def update_one(self, *args, **kwargs):
+        self._record('update_one', *args, **kwargs)
+    
+    def insert_one(self, *args, **kwargs):
+        self._record('insert_one', *args, **kwargs)
+        return Mock(inserted_id=args[0].get('_id'))
+
+
+class CountingCursor:
+    """Iterator with the chainable cursor modifiers the code under test uses"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def sort(self, *args, **kwargs):
+        return self
+    
+    def limit(self, *args, **kwargs):
+        return self
+    
+    def batch_size(self, size):
+        self.size = size
+        return self
+    
+    def __iter__(self):
+        return self.rows
+
+
+class CountingDatabase:
+    """Fake Database exposing .db.<collection> and recording round trips"""
+    
+    def __init__(self, rows=None):
+        self.calls = []
+        self.rows = rows or {}
+        database = self
+        
+        class _Db:
+            def __getattr__(self, name):
+                return CountingCollection(name, database.calls, database.rows)
+            
+            def __getitem__(self, name):
+                return CountingCollection(name, database.calls, database.rows)
+        
+        self.db = _Db()
+
+
+class TestResidentsQuery(unittest.TestCase):
+    """Query-count regression tests for the admin residents endpoint"""
+    
+    def _rows(self, count):
+        from bson import ObjectId
+        return [{
+            '_id': ObjectId(),
+            'full_name': f'Resident {i}',
+            'email': f'resident{i}@example.com',
+            'role': 'user',
+            'is_active': True,
+            'total_debt': 10.0 * i,
+            'apartment_data': {'number': i, 'residents': 2},
+            'building_data': {'address': 'ж.к. Младост 3', 'entrance': 'Б'},
+            'profile_data': {'client_number': str(i), 'balance': 0.0},
+        } for i in range(count)]
+    
+    def test_single_round_trip_per_page(self):
+        """Test a page of residents costs exactly one aggregation"""
+        from queries import ResidentsPage
+        db = CountingDatabase({'users': self._rows(50)})
+        
+        residents = list(ResidentsPage(db, limit=100))
+        
+        self.assertEqual(len(residents), 50)
+        self.assertEqual([(c[0], c[1]) for c in db.calls], [('users', 'aggregate')])
+        self.assertEqual(residents[3]['totalDebt'], 30.0)
+    
+    def test_next_cursor_resumes_after_last_row(self):
+        """Test keyset cursor is emitted when more rows exist"""
+        from queries import ResidentsPage, decode_cursor, build_residents_pipeline
+        rows = self._rows(3)
+        page = ResidentsPage(CountingDatabase({'users': rows}), sort='debt', limit=2)
+        
+        self.assertEqual(len(list(page)), 2)
+        self.assertEqual(decode_cursor(page.next_cursor), [10.0, str(rows[1]['_id'])])
+        
+        pipeline = build_residents_pipeline(sort='debt', after=decode_cursor(page.next_cursor), limit=2)
+        keyset = [stage for stage in pipeline if '$match' in stage and '$or' in stage['$match']]
+        self.assertEqual(len(keyset), 1)
+    
+    def test_pages_before_joining_when_possible(self):
+        """Test $limit runs before the $lookups when sorting on user fields"""
+        from queries import build_residents_pipeline
+        pipeline = build_residents_pipeline(sort='name', limit=20)
+        stages = [next(iter(stage)) for stage in pipeline]
+        self.assertLess(stages.index('$limit'), stages.index('$lookup'))
+        
+        filtered = [next(iter(stage)) for stage in build_residents_pipeline(min_debt=0, limit=20)]
+        self.assertGreater(filtered.index('$limit'), filtered.index('$lookup'))
+    
+    def test_invalid_parameters_rejected(self):
+        """Test bad query parameters raise QueryError"""
+        from queries import parse_residents_query, build_residents_pipeline, QueryError
+        for query in ({'sort': 'password'}, {'order': 'up'}, {'building': '1'},
+                      {'active': 'maybe'}, {'min_debt': 'x'}, {'cursor': '!!'}):
+            with self.assertRaises(QueryError):
+                build_residents_pipeline(**parse_residents_query(query))
+    
+    def test_endpoint_streams_with_one_query(self):
+        """Test GET /api/admin/residents issues one query and streams the page"""
+        import json
+        import threading
+        import http.client
+        import server
+        from auth import TokenVerifier
+        from http_server import PooledHTTPServer
+        
+        rows = self._rows(4)
+        # The token's user is the first row: make it the admin
+        rows[0]['role'] = 'admin'
+        db = CountingDatabase({'users': rows})
+        server.APIHandler.db = db
+        server.APIHandler.token_verifier = TokenVerifier(db, server.JWT_SECRET, server.JWT_ALGORITHM)
+        httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            token = jwt.encode({'user_id': '65ba3f7e8b234a5d6c7e8f90', 'exp': datetime.utcnow() + timedelta(hours=1)},
+                               server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+            conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+            conn.request('GET', '/api/admin/residents?limit=3', headers={'Authorization': f'Bearer {token}'})
+            conn.getresponse().read()
+            # First request: token user lookup + the residents aggregation
+            self.assertEqual(len(db.calls), 2)
+            
+            conn.request('GET', '/api/admin/residents?limit=3', headers={'Authorization': f'Bearer {token}'})
+            response = conn.getresponse()
+            body = json.loads(response.read())
+            conn.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(len(body['residents']), 3)
+        self.assertIsNotNone(body['next_cursor'])
+        # Second request: verified token is cached, only the aggregation runs
+        self.assertEqual(len(db.calls), 3)
+        self.assertEqual(db.calls[-1][:2], ('users', 'aggregate'))
+    
+    def test_endpoint_requires_admin(self):
+        """Test a resident's token gets 403 and no residents query runs"""
+        import threading
+        import http.client
+        import server
+        from auth import TokenVerifier
+        from http_server import PooledHTTPServer
+        
+        db = CountingDatabase({'users': self._rows(4)})
+        token = jwt.encode({'user_id': '65ba3f7e8b234a5d6c7e8f90', 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+        with patch.multiple(server.APIHandler, db=db,
+                            token_verifier=TokenVerifier(db, server.JWT_SECRET, server.JWT_ALGORITHM)):
+            httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+                statuses = []
+                for headers in ({'Authorization': f'Bearer {token}'}, {}):
+                    conn.request('GET', '/api/admin/residents?limit=3', headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    statuses.append(response.status)
+                conn.close()
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+        
+        self.assertEqual(statuses, [403, 401])
+        self.assertEqual([call[:2] for call in db.calls], [('users', 'find_one')])
+
+
+class TestProfileLoader(unittest.TestCase):
+    """Test the shared single-aggregation profile loader"""
+    
+    def test_one_round_trip_without_password_hash(self):
+        """Test the profile is assembled in one aggregation with projections"""
+        from bson import ObjectId
+        from queries import load_profile, build_profile_pipeline
+        
+        building_id = ObjectId()
+        row = {
+            '_id': ObjectId(), 'email': 'ivan.ivanov@example.com', 'full_name': 'Иван Иванов', 'phone': '',
+            'apartment': {'_id': ObjectId(), 'building_id': building_id, 'number': 25, 'floor': 5,
+                          'type': 'Апартамент', 'residents': 3},
+            'building': {'_id': building_id, 'address': 'ж.к. Младост 3', 'entrance': 'Б',
+                         'total_apartments': 24, 'total_residents': 38},
+            'profile': {'balance': 0.0, 'client_number': '12356787'},
+            'events': [{'title': 'Общо събрание'}],
+            'payments': [{
+                'recent': [{'_id': ObjectId(), 'amount': 30.0, 'status': 'pending', 'created_at': datetime(2025, 11, 1)}],
+                'last_paid': [],
+            }],
+            'payment_totals': [{'total': 30.0, 'pending': 30.0, 'overdue': 0.0}],
+        }
+        db = CountingDatabase({'users': [row]})
+        
+        bundle = load_profile(db, str(row['_id']), include_activity=True)
+        
+        self.assertEqual(len(db.calls), 1)
+        self.assertEqual(bundle['building']['address'], 'ж.к. Младост 3')
+        self.assertEqual(bundle['events'], [{'title': 'Общо събрание'}])
+        self.assertNotIn('events', bundle['user'])
+        self.assertEqual(len(bundle['payments']), 1)
+        self.assertIsNone(bundle['payments_next_page_token'])
+        self.assertEqual(bundle['payment_summary']['pending'], 30.0)
+        self.assertIsNone(bundle['payment_summary']['last_paid'])
+        
+        projection = build_profile_pipeline(row['_id'])[1]['$project']
+        self.assertNotIn('password_hash', projection)
+        self.assertTrue(all(value == 1 for value in projection.values()))
+    
+    def test_missing_user_returns_none(self):
+        """Test unknown user id yields None"""
+        from bson import ObjectId
+        from queries import load_profile
+        self.assertIsNone(load_profile(CountingDatabase(), ObjectId()))
+
+    def test_cached_apartment_and_building_are_not_joined(self):
+        """Test a cache supplies apartment/building and the aggregation skips their lookups"""
+        from bson import ObjectId
+        from cache import ReadThroughCache
+        from queries import load_profile
+        
+        user_id, building_id = ObjectId(), ObjectId()
+        db = CountingDatabase({
+            'users': [{'_id': user_id, 'email': 'a@b.bg', 'events': [], 'payments': []}],
+            'apartments': [{'_id': ObjectId(), 'user_id': user_id, 'building_id': building_id, 'number': 3}],
+            'buildings': [{'_id': building_id, 'address': 'ж.к. Младост 3'}],
+        })
+        cache = ReadThroughCache(db)
+        
+        load_profile(db, user_id, include_activity=True, cache=cache)
+        db.calls.clear()
+        bundle = load_profile(db, user_id, include_activity=True, cache=cache)
+        
+        self.assertEqual(bundle['building']['address'], 'ж.к. Младост 3')
+        self.assertEqual([call[:2] for call in db.calls], [('users', 'aggregate')])
+        lookups = [stage['$lookup']['from'] for stage in db.calls[0][2][0] if '$lookup' in stage]
+        self.assertEqual(lookups, ['user_profiles', 'events', 'payments', 'apartment_balances'])
+
+
+class TestFieldMasks(unittest.TestCase):
+    """Test field masks narrow the profile aggregation and the responses"""
+    
+    def _lookups(self, pipeline):
+        return {stage['$lookup']['from']: stage['$lookup'] for stage in pipeline if '$lookup' in stage}
+    
+    def test_parse_groups_paths(self):
+        """Test paths are grouped by top-level field and a bare field selects all of it"""
+        from queries import parse_field_mask, PROFILE_MASK_FIELDS, BUILDING_MASK_FIELDS
+        
+        self.assertIsNone(parse_field_mask([], PROFILE_MASK_FIELDS))
+        self.assertIsNone(parse_field_mask('', PROFILE_MASK_FIELDS))
+        self.assertEqual(parse_field_mask('balance, user.email,user.full_name', PROFILE_MASK_FIELDS),
+                         {'balance': None, 'user': {'email': None, 'full_name': None}})
+        self.assertEqual(parse_field_mask(['user.email', 'user', 'user.phone'], PROFILE_MASK_FIELDS), {'user': None})
+        self.assertEqual(parse_field_mask(['address'], BUILDING_MASK_FIELDS), {'address': None})
+    
+    def test_parse_rejects_unknown_paths(self):
+        """Test unknown fields and subfields raise QueryError"""
+        from queries import QueryError, parse_field_mask, PROFILE_MASK_FIELDS, BUILDING_MASK_FIELDS
+        
+        for paths in (['password_hash'], ['user.password_hash'], ['balance.amount'], ['events']):
+            with self.assertRaises(QueryError):
+                parse_field_mask(paths, PROFILE_MASK_FIELDS)
+        with self.assertRaises(QueryError):
+            parse_field_mask(['building.address'], BUILDING_MASK_FIELDS)
+    
+    def test_balance_only_skips_apartment_and_building(self):
+        """Test a balance-only mask joins user_profiles alone with a one-field projection"""
+        from bson import ObjectId
+        from queries import build_profile_pipeline, parse_field_mask, PROFILE_MASK_FIELDS
+        
+        fields = parse_field_mask(['balance'], PROFILE_MASK_FIELDS)
+        pipeline = build_profile_pipeline(ObjectId(), fields=fields)
+        
+        self.assertEqual(pipeline[1]['$project'], {"_id": 1})
+        lookups = self._lookups(pipeline)
+        self.assertEqual(list(lookups), ['user_profiles'])
+        self.assertEqual(lookups['user_profiles']['pipeline'], [{"$project": {"_id": 0, "balance": 1}}])
+    
+    def test_subfields_narrow_projections(self):
+        """Test user/building subfields become projections and user_profiles is not joined"""
+        from bson import ObjectId
+        from queries import build_profile_pipeline, parse_field_mask, PROFILE_MASK_FIELDS
+        
+        fields = parse_field_mask(['user.full_name', 'building.address'], PROFILE_MASK_FIELDS)
+        pipeline = build_profile_pipeline(ObjectId(), fields=fields)
+        
+        self.assertEqual(pipeline[1]['$project'], {"full_name": 1})
+        lookups = self._lookups(pipeline)
+        self.assertEqual(list(lookups), ['apartments', 'buildings'])
+        self.assertEqual(lookups['apartments']['pipeline'][-1], {"$project": {"building_id": 1}})
+        self.assertEqual(lookups['buildings']['pipeline'], [{"$project": {"address": 1}}])
+    
+    def test_page_mask_skips_unselected_activity(self):
+        """Test the REST profile page only joins the activity it was asked for"""
+        from bson import ObjectId
+        from queries import build_profile_pipeline, parse_field_mask, PROFILE_PAGE_MASK_FIELDS
+        
+        fields = parse_field_mask('events,last_payment', PROFILE_PAGE_MASK_FIELDS)
+        lookups = self._lookups(build_profile_pipeline(ObjectId(), include_activity=True, fields=fields))
+        
+        self.assertEqual(list(lookups), ['apartments', 'buildings', 'events', 'payments'])
+        self.assertEqual(list(lookups['payments']['pipeline'][0]['$facet']), ['last_paid'])
+    
+    def test_cache_not_consulted_for_unselected_apartment(self):
+        """Test a mask without apartment/building does not touch the cache"""
+        from bson import ObjectId
+        from queries import load_profile, parse_field_mask, PROFILE_MASK_FIELDS
+        
+        user_id = ObjectId()
+        db = CountingDatabase({'users': [{'_id': user_id, 'email': 'a@b.bg'}]})
+        cache = Mock()
+        
+        bundle = load_profile(db, user_id, cache=cache, fields=parse_field_mask(['user.email'], PROFILE_MASK_FIELDS))
+        
+        self.assertEqual(bundle['user']['email'], 'a@b.bg')
+        self.assertIsNone(bundle['building'])
+        cache.get_user_apartment.assert_not_called()
+        self.assertEqual([call[:2] for call in db.calls], [('users', 'aggregate')])
+    
+    def test_masked_building_reads_narrow_cache_misses(self):
+        """Test a masked miss reads only the selected fields and is not cached; a hit serves the whole document"""
+        from bson import ObjectId
+        from cache import ReadThroughCache
+        from queries import (load_buildings, parse_field_mask, building_projection, apartment_projection,
+                             BUILDING_MASK_FIELDS, APARTMENT_MASK_FIELDS)
+        
+        building_id = ObjectId()
+        db = CountingDatabase({
+            'buildings': [{'_id': building_id, 'address': 'ж.к. Младост 3', 'entrance': 'Б'}],
+            'apartments': [{'_id': ObjectId(), 'building_id': building_id, 'number': 1}],
+        })
+        cache = ReadThroughCache(db)
+        fields = parse_field_mask(['address'], BUILDING_MASK_FIELDS)
+        
+        load_buildings(db, [building_id], cache, fields)
+        cache.get_building(building_id, building_projection(fields))
+        cache.get_apartments(building_id, apartment_projection(parse_field_mask(['number'], APARTMENT_MASK_FIELDS)))
+        self.assertEqual([call[2][1] for call in db.calls], [{'address': 1}, {'address': 1}, {'number': 1}])
+        self.assertEqual(cache.stats()['entries'], 0)
+        
+        db.calls.clear()
+        cache.get_building(building_id)
+        self.assertEqual(db.calls[0][2][1], None)
+        self.assertEqual(load_buildings(db, [building_id], cache, fields)[building_id]['entrance'], 'Б')
+        self.assertEqual(len(db.calls), 1)
+        self.assertIsNone(building_projection(None))
+    
+    def test_trim_fields(self):
+        """Test REST responses keep only the selected keys, nested ones included"""
+        from queries import trim_fields
+        
+        response = {'user': {'id': '1', 'email': 'a@b.bg'}, 'balance': 12.5, 'events': []}
+        self.assertIs(trim_fields(response, None), response)
+        self.assertEqual(trim_fields(response, {'user': {'email': None}, 'balance': None}),
+                         {'user': {'email': 'a@b.bg'}, 'balance': 12.5})
+
+
+class TestApartmentBalances(unittest.TestCase):
+    """Test the incrementally maintained apartment_balances summary"""
+    
+    def test_status_change_moves_amount_between_buckets(self):
+        """Test pending -> paid removes the amount from pending and keeps the total"""
+        from balances import _merge, _payment_delta
+        delta = _merge(_payment_delta('pending', 30.0, -1), _payment_delta('paid', 30.0, 1))
+        self.assertEqual(delta, {'total_amount': 0.0, 'payments_count': 0,
+                                 'pending_amount': -30.0, 'pending_count': -1})
+    
+    def test_record_payment_upserts_balance(self):
+        """Test a new payment is inserted and folded into its apartment balance"""
+        from bson import ObjectId
+        from balances import record_payment
+        db = CountingDatabase()
+        payment = {'_id': ObjectId(), 'apartment_id': ObjectId(), 'user_id': ObjectId(),
+                   'amount': 45.5, 'status': 'overdue'}
+        
+        self.assertEqual(record_payment(db, payment), payment['_id'])
+        
+        self.assertEqual([call[:2] for call in db.calls],
+                         [('payments', 'insert_one'), ('apartment_balances', 'update_one')])
+        query, update = db.calls[1][2]
+        self.assertEqual(query, {'_id': payment['apartment_id']})
+        self.assertTrue(db.calls[1][3]['upsert'])
+        counters = update[0]['$set']
+        self.assertEqual(counters['overdue_amount']['$add'][1], 45.5)
+        self.assertEqual(counters['pending_amount']['$add'][1], 0)
+        self.assertNotIn('last_paid_date', counters)
+    
+    def test_update_payment_status(self):
+        """Test a status change updates the balance once and a no-op change not at all"""
+        from bson import ObjectId
+        from balances import update_payment_status
+        payment = {'_id': ObjectId(), 'apartment_id': ObjectId(), 'user_id': ObjectId(),
+                   'amount': 30.0, 'status': 'pending'}
+        db = CountingDatabase({'payments': [payment]})
+        
+        update_payment_status(db, payment['_id'], 'paid', paid_date=datetime(2025, 12, 1))
+        update_payment_status(db, payment['_id'], 'pending')
+        
+        self.assertEqual([call[:2] for call in db.calls], [
+            ('payments', 'find_one_and_update'), ('apartment_balances', 'update_one'),
+            ('payments', 'find_one_and_update'),
+        ])
+        counters = db.calls[1][2][1][0]['$set']
+        self.assertEqual(counters['pending_amount']['$add'][1], -30.0)
+        self.assertEqual(counters['last_paid_date'], {'$max': ['$last_paid_date', datetime(2025, 12, 1)]})
+    
+    def test_rebuild_writes_collection_with_out(self):
+        """Test the rebuild is one aggregation over payments ending in $out"""
+        from balances import build_rebuild_pipeline
+        pipeline = build_rebuild_pipeline()
+        self.assertEqual(pipeline[-1], {'$out': 'apartment_balances'})
+        self.assertEqual(pipeline[1]['$group']['_id'], '$apartment_id')
+    
+    def test_debt_reads_do_not_scan_payments(self):
+        """Test the residents debt join reads the summary instead of payments"""
+        from queries import build_residents_pipeline
+        lookups = [stage['$lookup']['from'] for stage in build_residents_pipeline() if '$lookup' in stage]
+        self.assertIn('apartment_balances', lookups)
+        self.assertNotIn('payments', lookups)
+
+
+class TestPaymentHistory(unittest.TestCase):
+    """Test keyset-paginated payment history"""
+    
+    def _payments(self, count):
+        from bson import ObjectId
+        return [{'_id': ObjectId(), 'amount': 30.0, 'status': 'paid', 'period': f'{i}',
+                 'created_at': datetime(2025, 12, 1) - timedelta(days=30 * i)} for i in range(count)]
+    
+    def test_page_and_token(self):
+        """Test a page is bounded and its token resumes after the last row"""
+        from bson import ObjectId
+        from queries import load_payment_history, parse_payment_options, PAYMENTS_SORT
+        
+        rows = self._payments(4)
+        db = CountingDatabase({'payments': rows})
+        user_id = ObjectId()
+        
+        payments, token = load_payment_history(db, user_id, page_size=3)
+        self.assertEqual(payments, rows[:3])
+        self.assertIsNotNone(token)
+        
+        options = parse_payment_options(page_token=token, statuses=['pending', 'overdue'],
+                                        date_from='2020-01-01', page_size='3')
+        load_payment_history(db, user_id, **options)
+        query, projection = db.calls[-1][2]
+        self.assertEqual(query['user_id'], user_id)
+        self.assertEqual(query['status'], {'$in': ['pending', 'overdue']})
+        self.assertEqual(query['created_at'], {'$gte': datetime(2020, 1, 1)})
+        self.assertEqual(query['$or'][1], {'created_at': rows[2]['created_at'], '_id': {'$lt': rows[2]['_id']}})
+        self.assertNotIn('user_id', projection)
+        self.assertEqual(PAYMENTS_SORT[0], ('created_at', -1))
+    
+    def test_last_page_has_no_token(self):
+        """Test the final page reports no next token"""
+        from bson import ObjectId
+        from queries import load_payment_history
+        payments, token = load_payment_history(CountingDatabase({'payments': self._payments(2)}), ObjectId(), page_size=3)
+        self.assertEqual(len(payments), 2)
+        self.assertIsNone(token)
+    
+    def test_invalid_parameters(self):
+        """Test bad statuses, dates and tokens are rejected"""
+        from queries import QueryError, parse_payments_query
+        self.assertEqual(parse_payments_query({'status': 'paid,pending'})['statuses'], ['paid', 'pending'])
+        self.assertEqual(parse_payments_query({'page_size': '100000'})['page_size'], 120)
+        for query in ({'status': 'refunded'}, {'from': '15.01.2025'}, {'page_token': 'garbage'}):
+            with self.assertRaises(QueryError):
+                parse_payments_query(query)
+
+
+class TestReadThroughCache(unittest.TestCase):
+    """Test the building/apartment cache and its invalidation"""
+    
+    def test_lru_and_ttl(self):
+        """Test entries are evicted by size and expire after the TTL"""
+        from cache import LRUCache
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        
+        expiring = LRUCache(ttl=0)
+        expiring.put('a', 1)
+        self.assertIsNone(expiring.get('a'))
+        self.assertEqual(expiring.stats()['expirations'], 1)
+    
+    def test_read_through_and_write_invalidation(self):
+        """Test repeated reads hit the cache and our own writes invalidate it"""
+        from bson import ObjectId
+        from cache import ReadThroughCache
+        
+        building_id, user_id = ObjectId(), ObjectId()
+        apartment = {'_id': ObjectId(), 'building_id': building_id, 'user_id': user_id, 'number': 1}
+        db = CountingDatabase({'buildings': [{'_id': building_id}], 'apartments': [apartment]})
+        cache = ReadThroughCache(db)
+        
+        for _ in range(3):
+            cache.get_building(str(building_id))
+            cache.get_apartments(building_id)
+            cache.get_user_apartment(user_id)
+        self.assertEqual(len(db.calls), 3)
+        self.assertEqual(cache.stats()['hits'], 6)
+        
+        cache.update_apartment(apartment['_id'], {'$set': {'residents': 4}})
+        cache.get_apartments(building_id)
+        cache.get_user_apartment(user_id)
+        cache.get_building(building_id)
+        self.assertEqual([call[1] for call in db.calls[3:]], ['find_one_and_update', 'find', 'find_one'])
+        
+        cache.update_building(building_id, {'$set': {'address': 'new'}})
+        cache.get_building(building_id)
+        self.assertEqual([call[1] for call in db.calls[6:]], ['update_one', 'find_one'])
+
+
+class TestBuildingGrid(unittest.TestCase):
+    """Test the precomputed Entrance-page grid snapshots"""
+    
+    def _grid(self):
+        from bson import ObjectId
+        from cache import ReadThroughCache
+        from building_grid import BuildingGrid
+        
+        self.building_id, self.user_id = ObjectId(), ObjectId()
+        self.apartment = {'_id': ObjectId(), 'building_id': self.building_id, 'user_id': self.user_id,
+                          'number': 7, 'floor': 2, 'user': {'full_name': 'Иван Иванов'},
+                          'balance': [{'amount_due': 45.0, 'status': 'overdue'}]}
+        self.db = CountingDatabase({
+            'buildings': [{'_id': self.building_id, 'address': 'ж.к. Младост 3', 'entrance': 'Б'}],
+            'apartments': [self.apartment],
+        })
+        return BuildingGrid(self.db, ReadThroughCache(self.db))
+    
+    def _aggregations(self):
+        return sum(1 for call in self.db.calls if call[1] == 'aggregate')
+    
+    def test_snapshot_served_until_invalidated(self):
+        """Test the grid is built once, served as bytes, and rebuilt after writes"""
+        import json
+        grid = self._grid()
+        
+        body = grid.get_json(str(self.building_id))
+        self.assertIs(grid.get_json(self.building_id), body)
+        self.assertEqual(self._aggregations(), 1)
+        data = json.loads(body)
+        self.assertEqual(data['building']['entrance'], 'Б')
+        self.assertEqual(data['floors'], [{'floor': 2, 'apartments': [
+            {'number': 7, 'family': 'Ивани', 'amount': 45.0, 'status': 'overdue'}]}])
+        
+        grid.invalidate_user(self.user_id)
+        grid.get_json(self.building_id)
+        grid.invalidate_payment(self.apartment['_id'])
+        grid.get_json(self.building_id)
+        grid.cache.update_apartment(self.apartment['_id'], {'$set': {'residents': 4}})
+        grid.get_json(self.building_id)
+        self.assertEqual(self._aggregations(), 4)
+        
+        from bson import ObjectId
+        grid.invalidate_user(ObjectId())
+        grid.invalidate_payment(ObjectId())
+        grid.get_json(self.building_id)
+        self.assertEqual(self._aggregations(), 4)
+    
+    def test_concurrent_misses_coalesced(self):
+        """Test parallel requests for a cold building run a single rebuild"""
+        import threading
+        grid = self._grid()
+        aggregate = CountingCollection.aggregate
+        
+        def slow_aggregate(collection, *args, **kwargs):
+            import time
+            time.sleep(0.05)
+            return aggregate(collection, *args, **kwargs)
+        
+        with patch.object(CountingCollection, 'aggregate', slow_aggregate):
+            threads = [threading.Thread(target=grid.get_json, args=(self.building_id,)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(self._aggregations(), 1)
+        self.assertEqual(grid.cache.flights.stats()['saved_by_endpoint'], {'building_grid': 7})
+    
+    def test_build_racing_an_invalidation_is_not_stored(self):
+        """Test a snapshot built across a write is served but rebuilt next time"""
+        grid = self._grid()
+        aggregate = CountingCollection.aggregate
+        
+        def aggregate_then_write(collection, *args, **kwargs):
+            rows = aggregate(collection, *args, **kwargs)
+            grid.invalidate_payment(self.apartment['_id'])
+            return rows
+        
+        with patch.object(CountingCollection, 'aggregate', aggregate_then_write):
+            grid.get_json(self.building_id)
+        grid.get_json(self.building_id)
+        self.assertEqual(self._aggregations(), 2)
+
+
+class TestStreamingRPCs(unittest.TestCase):
+    """Test the server-streaming apartment and financial report RPCs"""
+    
+    def _report_rows(self):
+        from bson import ObjectId
+        return [{'_id': ObjectId(), 'number': i, 'type': None, 'floor': 1, 'residents': 2,
+                 'user_data': {'full_name': f'Resident {i}'},
+                 'financial_data': {'total_due': 10.0 * i, 'repair_fund': 1.5}} for i in range(1, 4)]
+    
+    def test_batch_size_default_and_cap(self):
+        """Test the request batch size overrides the default and is capped"""
+        from queries import stream_batch_size, STREAM_MAX_BATCH_SIZE
+        self.assertEqual(stream_batch_size(0, 50), 50)
+        self.assertEqual(stream_batch_size(25, 50), 25)
+        self.assertEqual(stream_batch_size(10 ** 6), STREAM_MAX_BATCH_SIZE)
+    
+    def test_financial_report_fields(self):
+        """Test report rows map to entry fields with zero defaults"""
+        from queries import financial_report_fields
+        fields = financial_report_fields(self._report_rows()[1])
+        self.assertEqual(fields['type'], 'Апартамент')
+        self.assertEqual(fields['client_name'], 'Resident 2')
+        self.assertEqual((fields['total_due'], fields['repair_fund'], fields['management_fee']), (20.0, 1.5, 0.0))
+    
+    def test_cursors_fetch_in_batches(self):
+        """Test both stream cursors pass the batch size to MongoDB"""
+        from bson import ObjectId
+        from queries import apartments_cursor, financial_report_cursor
+        db = CountingDatabase({'apartments': self._report_rows()})
+        
+        self.assertEqual(apartments_cursor(db, ObjectId(), 2).size, 2)
+        self.assertEqual(len(list(financial_report_cursor(db, str(ObjectId()), 64))), 3)
+        self.assertEqual(db.calls[-1][3], {'batchSize': 64})
+        financial_report_cursor(db, ObjectId())
+        self.assertEqual(db.calls[-1][3], {})
+
+
+class TestBatchedLookups(unittest.TestCase):
+    """Test the multi-id lookups behind GetBuildings/GetProfiles/ListEventsForBuildings"""
+    
+    def test_parse_batch_ids(self):
+        """Test ids keep request order, drop duplicates and split out malformed ones"""
+        from bson import ObjectId
+        from queries import parse_batch_ids, QueryError, BATCH_MAX_IDS
+        a, b = ObjectId(), ObjectId()
+        
+        self.assertEqual(parse_batch_ids(f'{b}, nope,{a},{b}'), ([b, a], ['nope']))
+        self.assertEqual(parse_batch_ids([str(a)]), ([a], []))
+        with self.assertRaises(QueryError):
+            parse_batch_ids('')
+        with self.assertRaises(QueryError):
+            parse_batch_ids([str(ObjectId()) for _ in range(BATCH_MAX_IDS + 1)])
+    
+    def test_in_request_order_reports_misses(self):
+        """Test found values follow the request and misses include malformed ids"""
+        from bson import ObjectId
+        from queries import in_request_order
+        a, b, c = ObjectId(), ObjectId(), ObjectId()
+        values, missing = in_request_order([a, b, c], ['bad'], {c: 'C', a: 'A'})
+        self.assertEqual(values, ['A', 'C'])
+        self.assertEqual(missing, ['bad', str(b)])
+    
+    def test_profiles_in_one_aggregation(self):
+        """Test many profiles are assembled by a single $in aggregation"""
+        from bson import ObjectId
+        from queries import load_profiles
+        ids = [ObjectId() for _ in range(3)]
+        db = CountingDatabase({'users': [{'_id': user_id, 'email': f'{i}@b.bg'} for i, user_id in enumerate(ids)]})
+        
+        bundles = load_profiles(db, ids)
+        
+        self.assertEqual(len(db.calls), 1)
+        self.assertEqual(db.calls[0][2][0][0], {'$match': {'_id': {'$in': ids}}})
+        self.assertEqual(bundles[ids[2]]['user']['email'], '2@b.bg')
+        self.assertIsNone(bundles[ids[0]]['building'])
+    
+    def test_events_for_buildings_in_one_aggregation(self):
+        """Test events are grouped per building, buildings without events get [] and unknown ones are left out"""
+        from bson import ObjectId
+        from queries import load_events_for_buildings
+        a, b, unknown = ObjectId(), ObjectId(), ObjectId()
+        db = CountingDatabase({
+            'buildings': [{'_id': a}, {'_id': b}],
+            'events': [{'_id': a, 'events': [{'title': 'Общо събрание'}]}],
+        })
+        
+        events = load_events_for_buildings(db, [a, unknown, b], limit=5)
+        
+        self.assertEqual(events, {a: [{'title': 'Общо събрание'}], b: []})
+        self.assertEqual([call[:2] for call in db.calls], [('buildings', 'find'), ('events', 'aggregate')])
+        self.assertEqual(db.calls[0][2], ({'_id': {'$in': [a, unknown, b]}}, {'_id': 1}))
+        pipeline = db.calls[1][2][0]
+        self.assertEqual(pipeline[0], {'$match': {'building_id': {'$in': [a, b]}}})
+        self.assertEqual(pipeline[2], {'$match': {'rank': {'$lte': 5}}})
+    
+    def test_events_endpoint_reports_nonexistent_buildings(self):
+        """Test GET /api/buildings/events lists well-formed ids of missing buildings with the malformed ones"""
+        import json
+        import threading
+        import http.client
+        from bson import ObjectId
+        import server
+        from auth import TokenVerifier
+        from cache import ReadThroughCache
+        from http_server import PooledHTTPServer
+        
+        user_id, building_id, unknown = ObjectId(), ObjectId(), ObjectId()
+        db = CountingDatabase({
+            'users': [{'_id': user_id, 'role': 'user'}],
+            'buildings': [{'_id': building_id, 'address': 'ж.к. Младост 3'}],
+            'events': [{'_id': building_id, 'events': []}],
+        })
+        token = jwt.encode({'user_id': str(user_id), 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+        
+        with patch.multiple(server.APIHandler, db=db, cache=ReadThroughCache(db),
+                            token_verifier=TokenVerifier(db, server.JWT_SECRET, server.JWT_ALGORITHM)):
+            httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+                conn.request('GET', f'/api/buildings/events?ids={building_id},{unknown},nope',
+                             headers={'Authorization': f'Bearer {token}'})
+                response = conn.getresponse()
+                body = json.loads(response.read())
+                conn.close()
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+        
+        self.assertEqual(response.status, 200)
+        self.assertEqual([entry['building_id'] for entry in body['buildings']], [str(building_id)])
+        self.assertEqual(body['missing'], ['nope', str(unknown)])
+    
+    def test_cached_buildings_fetch_only_misses(self):
+        """Test get_buildings serves cached entries and fetches the rest with one $in"""
+        from bson import ObjectId
+        from cache import ReadThroughCache
+        a, b, unknown = ObjectId(), ObjectId(), ObjectId()
+        db = CountingDatabase({'buildings': [{'_id': a}, {'_id': b}]})
+        cache = ReadThroughCache(db)
+        cache.get_building(a)
+        
+        self.assertEqual(set(cache.get_buildings([a, b, unknown])), {a, b})
+        self.assertEqual(db.calls[-1][2][0], {'_id': {'$in': [b, unknown]}})
+        cache.get_buildings([a, b, unknown])
+        self.assertEqual(len(db.calls), 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test coalescing of identical concurrent reads"""
+    
+    def _run_concurrently(self, flights, key, fn, count=5):
+        import threading
+        results, errors = [], []
+        
+        def call():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Test waiters receive the leader's result and are counted as saved"""
+        import threading
+        from singleflight import SingleFlight
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        
+        def query():
+            calls.append(1)
+            release.wait(1)
+            return ['event']
+        
+        threading.Timer(0.1, release.set).start()
+        results, errors = self._run_concurrently(flights, ('ListEvents', 'b1', 10), query)
+        
+        self.assertEqual((len(calls), errors), (1, []))
+        self.assertEqual(results, [['event']] * 5)
+        stats = flights.stats()
+        self.assertEqual((stats['executions'], stats['saved'], stats['in_flight']), (1, 4, 0))
+        
+        # Nothing is kept once the call has finished
+        flights.do(('ListEvents', 'b1', 10), query)
+        self.assertEqual(len(calls), 2)
+    
+    def test_errors_reach_every_waiter(self):
+        """Test a failing shared call raises in all callers"""
+        import threading
+        from singleflight import SingleFlight
+        release = threading.Event()
+        
+        def failing():
+            release.wait(1)
+            raise RuntimeError('mongo down')
+        
+        threading.Timer(0.1, release.set).start()
+        results, errors = self._run_concurrently(SingleFlight(), ('maintenance', 'b1'), failing, count=3)
+        self.assertEqual(results, [])
+        self.assertEqual([str(e) for e in errors], ['mongo down'] * 3)
+    
+    def test_async_waiters_survive_leader_cancellation(self):
+        """Test cancelling the first caller does not cancel the shared query"""
+        import asyncio
+        from singleflight import AsyncSingleFlight
+        
+        async def scenario():
+            flights = AsyncSingleFlight()
+            calls = []
+            
+            async def query():
+                calls.append(1)
+                await asyncio.sleep(0.05)
+                return 'building'
+            
+            leader = asyncio.ensure_future(flights.do(('building', 1), query))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flights.do(('building', 1), query))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower, calls, flights.stats()
+        
+        result, calls, stats = asyncio.run(scenario())
+        self.assertEqual((result, len(calls)), ('building', 1))
+        self.assertEqual(stats['saved_by_endpoint'], {'building': 1})
+
+
+class TestGrpcServerConfig(unittest.TestCase):
+    """Test the gRPC server configuration surface and per-method limits"""
+    
+    def test_from_env(self):
+        """Test GRPC_* variables override the defaults and method limits merge"""
+        import grpc
+        from grpc_config import GrpcServerConfig
+        env = {
+            'GRPC_MODE': 'async', 'GRPC_WORKERS': '32', 'GRPC_MAX_CONCURRENT_RPCS': '200',
+            'GRPC_KEEPALIVE_TIME_MS': '30000', 'GRPC_MAX_RECEIVE_MESSAGE_BYTES': '1048576',
+            'GRPC_COMPRESSION': 'gzip', 'SHUTDOWN_GRACE_SECONDS': '2.5',
+            'GRPC_METHOD_LIMITS': 'FinancialService/GetFinancialReport=2,FinancialService/StreamFinancialReport=0',
+        }
+        with patch.dict(os.environ, env):
+            config = GrpcServerConfig.from_env()
+        
+        self.assertEqual((config.mode, config.workers, config.max_concurrent_rpcs), ('async', 32, 200))
+        self.assertEqual(config.compression_algorithm, grpc.Compression.Gzip)
+        self.assertEqual(config.method_limits, {'/domunity.FinancialService/GetFinancialReport': 2})
+        options = dict(config.options())
+        self.assertEqual(options['grpc.keepalive_time_ms'], 30000)
+        self.assertEqual(options['grpc.max_receive_message_length'], 1048576)
+        self.assertEqual(options['grpc.so_reuseport'], 0)
+        self.assertEqual(config.shutdown_grace, 2.5)
+        self.assertEqual(config.as_dict()['workers'], None)
+    
+    def test_invalid_settings_rejected(self):
+        """Test malformed limits, modes and compression names raise ValueError"""
+        from grpc_config import GrpcServerConfig, parse_method_limits
+        for value in ('GetFinancialReport=2', 'FinancialService/GetFinancialReport', 'FinancialService/X=many'):
+            with self.assertRaises(ValueError):
+                parse_method_limits(value)
+        with self.assertRaises(ValueError):
+            GrpcServerConfig(compression='brotli')
+        with self.assertRaises(ValueError):
+            GrpcServerConfig(mode='forking')
+    
+    def test_interceptor_rejects_over_limit(self):
+        """Test calls beyond a method's limit end with RESOURCE_EXHAUSTED"""
+        import grpc
+        from types import SimpleNamespace
+        from grpc_config import MethodLimits, MethodLimitInterceptor
+        
+        class Aborted(Exception):
+            pass
+        
+        class Context:
+            def abort(self, code, details):
+                raise Aborted(code)
+        
+        limits = MethodLimits({'/domunity.FinancialService/GetFinancialReport': 1})
+        interceptor = MethodLimitInterceptor(limits)
+        nested = []
+        
+        def behavior(request, context):
+            # A second call while this one runs is over the limit
+            try:
+                call('/domunity.FinancialService/GetFinancialReport')
+            except Aborted as e:
+                nested.append(e.args[0])
+            return 'report'
+        
+        def call(method):
+            details = SimpleNamespace(method=method, invocation_metadata=())
+            handler = interceptor.intercept_service(lambda d: grpc.unary_unary_rpc_method_handler(behavior), details)
+            return handler.unary_unary(None, Context())
+        
+        self.assertEqual(call('/domunity.FinancialService/GetFinancialReport'), 'report')
+        self.assertEqual(nested, [grpc.StatusCode.RESOURCE_EXHAUSTED])
+        stats = limits.stats()['/domunity.FinancialService/GetFinancialReport']
+        self.assertEqual((stats['in_flight'], stats['peak_in_flight'], stats['rejected']), (0, 1, 1))
+        # Methods without a limit are not wrapped
+        details = SimpleNamespace(method='/domunity.HealthService/Check', invocation_metadata=())
+        handler = grpc.unary_unary_rpc_method_handler(behavior)
+        self.assertIs(interceptor.intercept_service(lambda d: handler, details), handler)
+    
+    def test_admin_config_endpoint(self):
+        """Test GET /api/admin/config shows the effective config to admins only"""
+        import json
+        import threading
+        import http.client
+        from bson import ObjectId
+        import server
+        from auth import TokenVerifier
+        from grpc_config import GrpcServerConfig, MethodLimits
+        from http_server import PooledHTTPServer
+        
+        user_id = ObjectId()
+        config = GrpcServerConfig(workers=16)
+        server.APIHandler.grpc_config = config
+        server.APIHandler.method_limits = MethodLimits(config.method_limits)
+        server.APIHandler.password_hasher = None
+        server.APIHandler.cache = None
+        httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        token = jwt.encode({'user_id': str(user_id), 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+        
+        def get(role):
+            db = CountingDatabase({'users': [{'_id': user_id, 'role': role}]})
+            server.APIHandler.token_verifier = TokenVerifier(db, server.JWT_SECRET, server.JWT_ALGORITHM)
+            conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+            conn.request('GET', '/api/admin/config', headers={'Authorization': f'Bearer {token}'})
+            response = conn.getresponse()
+            body = json.loads(response.read())
+            conn.close()
+            return response.status, body
+        
+        try:
+            denied = get('user')
+            status, body = get('admin')
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        
+        self.assertEqual(denied[0], 403)
+        self.assertEqual(status, 200)
+        self.assertEqual(body['grpc']['workers'], 16)
+        self.assertEqual(body['http']['workers'], 2)
+        self.assertEqual(body['grpc_method_limits']['/domunity.FinancialService/GetFinancialReport']['limit'], 4)
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Prometheus metrics and their REST/gRPC wiring"""
+    
+    def test_histogram_render(self):
+        """Test cumulative buckets, _sum/_count, the derived counter and label escaping"""
+        from metrics import MetricsRegistry
+        registry = MetricsRegistry()
+        histogram = registry.histogram('t_seconds', 'Test latency', ('route',), buckets=(0.1, 1.0))
+        registry.count_of(histogram, 't_total', 'Test requests')
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, ('/a"b',))
+        
+        text = registry.render()
+        self.assertIn('# TYPE t_seconds histogram', text)
+        self.assertIn('t_seconds_bucket{route="/a\\"b",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{route="/a\\"b",le="1"} 3', text)
+        self.assertIn('t_seconds_bucket{route="/a\\"b",le="+Inf"} 4', text)
+        self.assertIn('t_seconds_sum{route="/a\\"b"} 4.05', text)
+        self.assertIn('t_seconds_count{route="/a\\"b"} 4', text)
+        self.assertIn('# TYPE t_total counter', text)
+        self.assertIn('t_total{route="/a\\"b"} 4', text)
+        self.assertEqual(histogram.count(('/a"b',)), 4)
+        with self.assertRaises(ValueError):
+            registry.counter('t_total', 'Duplicate')
+    
+    def test_shards_merge_across_threads(self):
+        """Test values recorded on different threads are summed by a scrape"""
+        import threading
+        from metrics import Counter
+        counter = Counter('t_events_total', 'Test events', ('kind',))
+        threads = [threading.Thread(target=lambda: [counter.inc(('a',)) for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value(('a',)), 4000)
+    
+    def test_interceptor_records_status_code(self):
+        """Test MetricsInterceptor records OK and the code of an aborted call"""
+        import grpc
+        from types import SimpleNamespace
+        from grpc_config import MetricsInterceptor
+        from metrics import GRPC_REQUESTS
+        
+        class Context:
+            def __init__(self):
+                self._code = None
+            
+            def abort(self, code, details):
+                self._code = code
+                raise Exception(details)
+            
+            def code(self):
+                return self._code
+        
+        def behavior(request, context):
+            if request == 'bad':
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'bad request')
+            return 'ok'
+        
+        method = '/domunity.TestService/Call'
+        interceptor = MetricsInterceptor()
+        details = SimpleNamespace(method=method, invocation_metadata=())
+        handler = interceptor.intercept_service(lambda d: grpc.unary_unary_rpc_method_handler(behavior), details)
+        
+        self.assertEqual(handler.unary_unary('good', Context()), 'ok')
+        with self.assertRaises(Exception):
+            handler.unary_unary('bad', Context())
+        self.assertEqual(GRPC_REQUESTS.value((method, 'OK')), 1)
+        self.assertEqual(GRPC_REQUESTS.value((method, 'INVALID_ARGUMENT')), 1)
+    
+    def test_metrics_endpoint(self):
+        """Test GET /metrics serves the text format and records routes by pattern"""
+        import time
+        import threading
+        import http.client
+        import server
+        from http_server import PooledHTTPServer
+        
+        httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        
+        def get(path):
+            conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+            conn.request('GET', path)
+            response = conn.getresponse()
+            body = response.read().decode()
+            conn.close()
+            return response, body
+        
+        try:
+            get('/api/no-such-route')
+            # A request is recorded after its response is sent: scrape until both show up
+            deadline = time.time() + 5
+            while True:
+                response, body = get('/metrics')
+                if 'route="/metrics"' in body and 'code="404"' in body or time.time() > deadline:
+                    break
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader('Content-Type').startswith('text/plain; version=0.0.4'))
+        self.assertIn('domunity_http_requests_total{method="GET",route="unmatched",code="404"}', body)
+        self.assertIn('domunity_http_request_duration_seconds_bucket{method="GET",route="/metrics",code="200"', body)
+        self.assertIn('# TYPE domunity_grpc_request_duration_seconds histogram', body)
+
+
+class TestLogging(unittest.TestCase):
+    """Test the queued logging setup and the sampled access log"""
+    
+    def tearDown(self):
+        from log_config import LoggingConfig, configure_logging
+        configure_logging(LoggingConfig(queue_size=0), stream=sys.stderr)
+    
+    def test_queue_formats_on_listener_thread(self):
+        """Test queued records keep their arguments and are all written by stop_logging()"""
+        import io
+        import logging
+        from log_config import LoggingConfig, configure_logging, stop_logging
+        
+        stream = io.StringIO()
+        configure_logging(LoggingConfig(level='DEBUG', queue_size=100), stream=stream)
+        test_logger = logging.getLogger('test.queue')
+        test_logger.debug("request for %s", 'a@b.c')
+        test_logger.info("done in %d ms", 5)
+        stop_logging()
+        
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith('request for a@b.c'))
+        self.assertIn('[   DEBUG]', lines[0])
+        self.assertTrue(lines[1].endswith('done in 5 ms'))
+    
+    def test_full_queue_drops_and_counts(self):
+        """Test a full queue drops records instead of blocking"""
+        import queue
+        import logging
+        from log_config import DroppingQueueHandler
+        from metrics import LOG_RECORDS_DROPPED
+        
+        records = queue.Queue(1)
+        handler = DroppingQueueHandler(records)
+        before = LOG_RECORDS_DROPPED.value()
+        for i in range(3):
+            handler.handle(logging.LogRecord('test', logging.INFO, __file__, 1, "record %d", (i,), None))
+        
+        self.assertEqual(records.qsize(), 1)
+        self.assertEqual(records.get().getMessage(), 'record 0')
+        self.assertEqual(LOG_RECORDS_DROPPED.value() - before, 2)
+    
+    def test_access_log_sampling(self):
+        """Test sampled-out requests are skipped but failures are always logged"""
+        from types import SimpleNamespace
+        from log_config import AccessLog
+        
+        tracker = SimpleNamespace(slow=False, mongo_round_trips=2, mongo_seconds=0.004, mongo_documents=7)
+        slow = SimpleNamespace(slow=True, mongo_round_trips=1, mongo_seconds=0.6, mongo_documents=0)
+        access = AccessLog(sample_rate=0.0)
+        with self.assertLogs('access', level='INFO') as logs:
+            access.http('GET', '/api/building/1?token=x', '/api/building/{building_id}', 200, 0.01, tracker)
+            access.rpc('/domunity.UserService/GetProfile', 'OK', 0.01, tracker)
+            access.http('GET', '/api/building/1?token=x', '/api/building/{building_id}', 500, 0.0125, tracker)
+            access.rpc('/domunity.UserService/GetProfile', 'NOT_FOUND', 0.002, tracker)
+            access.rpc('/domunity.FinancialService/GetFinancialReport', 'OK', 0.7, slow)
+        
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn('http method=GET path=/api/building/1 route=/api/building/{building_id} code=500 ms=12.50 '
+                      'mongo=2 mongo_ms=4.00 docs=7 slow=False', logs.output[0])
+        self.assertIn('grpc method=/domunity.UserService/GetProfile code=NOT_FOUND', logs.output[1])
+        self.assertIn('GetFinancialReport code=OK ms=700.00 mongo=1 mongo_ms=600.00 docs=0 slow=True', logs.output[2])
+        
+        with self.assertLogs('access', level='INFO') as logs:
+            AccessLog(sample_rate=1.0).http('GET', '/health', '/health', 200, 0.001, tracker)
+        self.assertEqual(len(logs.output), 1)
+    
+    def test_config_from_env(self):
+        """Test LOG_* variables are read and validated"""
+        from log_config import LoggingConfig
+        env = {'LOG_LEVEL': 'warning', 'LOG_QUEUE_SIZE': '0', 'ACCESS_LOG_SAMPLE_RATE': '0.1'}
+        with patch.dict(os.environ, env):
+            config = LoggingConfig.from_env()
+        self.assertEqual((config.level, config.queue_size, config.access_sample_rate), ('WARNING', 0, 0.1))
+        with self.assertRaises(ValueError):
+            LoggingConfig(level='LOUD')
+        with self.assertRaises(ValueError):
+            LoggingConfig(access_sample_rate=2)
+
+
+class TestTracing(unittest.TestCase):
+    """Test per-request MongoDB command tracing and slow-request flagging"""
+    
+    def setUp(self):
+        from tracing import CommandTracer, tracing_config
+        self.tracer = CommandTracer()
+        self.previous = tracing_config()
+        self.request_id = 0
+    
+    def tearDown(self):
+        from tracing import configure_tracing
+        configure_tracing(self.previous)
+    
+    def _run(self, name, command, documents=0, micros=1000):
+        """Send one command through the listener the way pymongo does"""
+        from types import SimpleNamespace
+        self.request_id += 1
+        self.tracer.started(SimpleNamespace(command_name=name, command=command, request_id=self.request_id))
+        reply = {'cursor': {'firstBatch': [{'_id': i} for i in range(documents)], 'id': 0}, 'ok': 1.0}
+        self.tracer.succeeded(SimpleNamespace(command_name=name, request_id=self.request_id,
+                                              duration_micros=micros, reply=reply))
+        return reply
+    
+    def test_commands_attributed_to_request(self):
+        """Test count, time and documents of a request's commands are totalled and recorded per handler"""
+        from metrics import Gauge, MONGO_ROUND_TRIPS, MONGO_SECONDS, MONGO_DOCUMENTS
+        from tracing import RequestTracker, current_request
+        in_flight = Gauge('t_traced_in_flight', 'Test in flight')
+        before = (MONGO_ROUND_TRIPS.count(('traced',)), MONGO_SECONDS.count(('traced',)),
+                  MONGO_DOCUMENTS.count(('traced',)))
+        
+        tracker = RequestTracker(in_flight).start()
+        self.assertIs(current_request(), tracker)
+        self.assertEqual(in_flight.value(), 1)
+        self._run('find', {'find': 'users', 'filter': {'email': 'a@b.c'}}, documents=1, micros=1500)
+        self._run('aggregate', {'aggregate': 'apartments', 'pipeline': [{'$match': {'floor': 2}}]},
+                  documents=3, micros=2500)
+        tracker.stop('traced')
+        self._run('find', {'find': 'users'}, documents=5)
+        
+        self.assertIsNone(current_request())
+        self.assertEqual(in_flight.value(), 0)
+        self.assertEqual((tracker.mongo_round_trips, tracker.mongo_documents), (2, 4))
+        self.assertAlmostEqual(tracker.mongo_seconds, 0.004)
+        self.assertEqual([c.collection for c in tracker.commands], ['users', 'apartments'])
+        self.assertFalse(tracker.slow)
+        after = (MONGO_ROUND_TRIPS.count(('traced',)), MONGO_SECONDS.count(('traced',)),
+                 MONGO_DOCUMENTS.count(('traced',)))
+        self.assertEqual(after, tuple(count + 1 for count in before))
+    
+    def test_slow_request_logged_with_pipeline(self):
+        """Test a request over SLOW_REQUEST_MS is counted and logged with its pipeline"""
+        import time
+        from metrics import Gauge, SLOW_REQUESTS
+        from tracing import RequestTracker, TracingConfig, configure_tracing
+        configure_tracing(TracingConfig(slow_request_ms=1))
+        before = SLOW_REQUESTS.value(('slow-handler',))
+        
+        tracker = RequestTracker(Gauge('t_slow_in_flight', 'Test in flight')).start()
+        self._run('aggregate', {'aggregate': 'payments', 'pipeline': [{'$match': {'status': 'paid'}}],
+                                'lsid': {'id': 'session'}}, documents=2, micros=1200)
+        time.sleep(0.002)
+        with self.assertLogs('tracing', level='WARNING') as logs:
+            tracker.stop('slow-handler')
+        
+        self.assertTrue(tracker.slow)
+        self.assertEqual(SLOW_REQUESTS.value(('slow-handler',)), before + 1)
+        message = logs.output[0]
+        self.assertIn('Slow request slow-handler', message)
+        self.assertIn('aggregate payments (1.2 ms, 2 docs) {"pipeline": [{"$match": {"status": "paid"}}]}', message)
+        self.assertNotIn('lsid', message)
+    
+    def test_command_cap_and_reply_bytes(self):
+        """Test only MONGO_TRACE_MAX_COMMANDS commands are kept and reply bytes are opt-in"""
+        import bson
+        from metrics import Gauge
+        from tracing import RequestTracker, TracingConfig, configure_tracing, _Commands
+        configure_tracing(TracingConfig(max_commands=1, record_bytes=True))
+        
+        tracker = RequestTracker(Gauge('t_cap_in_flight', 'Test in flight')).start()
+        first = self._run('find', {'find': 'events', 'filter': {}}, documents=2)
+        second = self._run('find', {'find': 'events', 'filter': {}}, documents=1)
+        tracker.stop('capped')
+        
+        self.assertEqual(len(tracker.commands), 1)
+        self.assertIn('... 1 more', str(_Commands(tracker)))
+        self.assertEqual(tracker.mongo_bytes, len(bson.encode(first)) + len(bson.encode(second)))
+    
+    def test_config_from_env(self):
+        """Test SLOW_REQUEST_MS / MONGO_TRACE_* are read and validated"""
+        from tracing import TracingConfig
+        env = {'SLOW_REQUEST_MS': '250', 'MONGO_TRACE_MAX_COMMANDS': '5', 'MONGO_TRACE_BYTES': 'true'}
+        with patch.dict(os.environ, env):
+            config = TracingConfig.from_env()
+        self.assertEqual((config.slow_request_ms, config.max_commands, config.record_bytes), (250.0, 5, True))
+        with self.assertRaises(ValueError):
+            TracingConfig(slow_request_ms=-1)
+
+
+class TestPlanCapture(unittest.TestCase):
+    """Test the slow-aggregation detector and its explain-plan summaries"""
+    
+    # Classic layout: $cursor stage, then a $lookup that scanned financial_records
+    CLASSIC_EXPLAIN = {
+        'explainVersion': '1',
+        'stages': [
+            {'$cursor': {
+                'queryPlanner': {'namespace': 'domunity.apartments',
+                                 'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}},
+                'executionStats': {'nReturned': 4, 'totalDocsExamined': 4, 'totalKeysExamined': 4},
+            }, 'nReturned': 4},
+            {'$lookup': {'from': 'financial_records', 'as': 'records'}, 'totalDocsExamined': 396,
+             'totalKeysExamined': 0, 'collectionScans': 4, 'nReturned': 4},
+        ],
+    }
+    # Slot-based engine: the whole pipeline is one plan with an EQ_LOOKUP
+    SBE_EXPLAIN = {
+        'explainVersion': '2',
+        'queryPlanner': {'namespace': 'domunity.users',
+                         'winningPlan': {'queryPlan': {
+                             'stage': 'EQ_LOOKUP', 'foreignCollection': 'domunity.payments',
+                             'strategy': 'NestedLoopJoin',
+                             'inputStage': {'stage': 'COLLSCAN'}}}},
+        'executionStats': {'nReturned': 10, 'totalDocsExamined': 1010, 'totalKeysExamined': 0},
+    }
+    
+    def tearDown(self):
+        from tracing import set_plan_capture
+        set_plan_capture(None)
+    
+    def _capture(self, explain=None, **options):
+        """PlanCapture over a fake Database whose explain returns ``explain``"""
+        from explain import PlanCapture
+        from types import SimpleNamespace
+        stored = []
+        database = MagicMock()
+        database.command.return_value = dict(explain or self.CLASSIC_EXPLAIN, ok=1.0, serverInfo={})
+        database.slow_aggregations.insert_one.side_effect = stored.append
+        fake_db = SimpleNamespace(client={'domunity': database}, db=database)
+        capture = PlanCapture(fake_db, **{'budget_ms': 100, **options})
+        return capture, database, stored
+    
+    def test_summarize_classic_lookup(self):
+        """Test docs examined, ratio and the scanned $lookup collection of a classic explain"""
+        from explain import summarize_plan
+        summary = summarize_plan(self.CLASSIC_EXPLAIN)
+        self.assertEqual(summary['docs_examined'], 400)
+        self.assertEqual(summary['docs_returned'], 4)
+        self.assertEqual(summary['examined_ratio'], 100.0)
+        self.assertEqual(summary['collscans'], ['financial_records'])
+    
+    def test_summarize_sbe_nested_loop_join(self):
+        """Test a NestedLoopJoin EQ_LOOKUP and a COLLSCAN are both reported as scans"""
+        from explain import summarize_plan
+        summary = summarize_plan(self.SBE_EXPLAIN)
+        self.assertEqual((summary['docs_examined'], summary['docs_returned']), (1010, 10))
+        self.assertEqual(summary['collscans'], ['payments', 'users'])
+    
+    def test_offer_cooldown_sampling_and_writes(self):
+        """Test one explain per pipeline shape per cooldown, sampling, and $out/$merge being skipped"""
+        capture, _, _ = self._capture(cooldown=600)
+        capture._thread = MagicMock()  # keep offers queued
+        first = {'aggregate': 'payments', 'pipeline': [{'$match': {'user_id': 1}}]}
+        same_shape = {'aggregate': 'payments', 'pipeline': [{'$match': {'user_id': 2}}]}
+        other = {'aggregate': 'payments', 'pipeline': [{'$match': {'status': 'paid'}}]}
+        
+        self.assertTrue(capture.offer('domunity', first, 0.2, 'GET /api/user/payments'))
+        self.assertFalse(capture.offer('domunity', same_shape, 0.2, 'GET /api/user/payments'))
+        self.assertTrue(capture.offer('domunity', other, 0.2, 'GET /api/user/payments'))
+        merge = {'aggregate': 'payments', 'pipeline': [{'$group': {'_id': '$user_id'}}, {'$merge': 'totals'}]}
+        self.assertFalse(capture.offer('domunity', merge, 0.2, 'rebuild'))
+        self.assertEqual(capture.stats()['pending'], 2)
+        
+        sampled_out, _, _ = self._capture(sample_rate=0.0)
+        self.assertFalse(sampled_out.offer('domunity', first, 0.2, 'GET /api/user/payments'))
+    
+    def test_capture_stores_flagged_summary(self):
+        """Test explain runs with executionStats and a scan of financial_records is flagged"""
+        import json
+        from metrics import AGGREGATION_PLANS
+        capture, database, stored = self._capture()
+        before = AGGREGATION_PLANS.value(('apartments', 'true'))
+        command = {'aggregate': 'apartments', 'pipeline': [{'$match': {'building_id': 1}}],
+                   'allowDiskUse': True, 'lsid': {'id': 'session'}}
+        
+        with self.assertLogs('explain', level='WARNING'):
+            capture.capture('domunity', 'apartments', command, 0.25, 'GetBuildingApartments')
+        
+        sent = database.command.call_args[0][0]
+        self.assertEqual(sent['verbosity'], 'executionStats')
+        self.assertEqual(sent['explain'], {'aggregate': 'apartments', 'pipeline': command['pipeline'],
+                                           'cursor': {}, 'allowDiskUse': True})
+        record = stored[0]
+        self.assertEqual(record['flagged'], ['financial_records'])
+        self.assertEqual((record['examined_ratio'], record['duration_ms']), (100.0, 250.0))
+        self.assertNotIn('serverInfo', json.loads(record['plan']))
+        self.assertEqual(AGGREGATION_PLANS.value(('apartments', 'true')), before + 1)
+    
+    def test_slow_aggregate_offered_when_request_stops(self):
+        """Test the tracer hands aggregates over the budget to the capture under the request's handler"""
+        from types import SimpleNamespace
+        from metrics import Gauge
+        from tracing import CommandTracer, RequestTracker, set_plan_capture
+        capture = MagicMock(enabled=True, is_slow=lambda seconds: seconds >= 0.1)
+        set_plan_capture(capture)
+        tracer = CommandTracer()
+        
+        tracker = RequestTracker(Gauge('t_explain_in_flight', 'Test in flight')).start()
+        for request_id, micros in ((1, 150000), (2, 2000)):
+            command = {'aggregate': 'payments', 'pipeline': [{'$match': {'n': request_id}}]}
+            tracer.started(SimpleNamespace(command_name='aggregate', command=command, request_id=request_id))
+            tracer.succeeded(SimpleNamespace(command_name='aggregate', request_id=request_id,
+                                             database_name='domunity', duration_micros=micros,
+                                             reply={'cursor': {'firstBatch': []}, 'ok': 1.0}))
+        capture.offer.assert_not_called()
+        tracker.stop('GET /api/user/payments')
+        
+        capture.offer.assert_called_once_with(
+            'domunity', {'aggregate': 'payments', 'pipeline': [{'$match': {'n': 1}}]}, 0.15, 'GET /api/user/payments')
+        self.assertEqual(tracer._aggregates, {})
+
+
+class TestProfiler(unittest.TestCase):
+    """Test on-demand CPU sampling and allocation tracing"""
+    
+    def _busy(self, stop):
+        """Spin until ``stop`` is set (the function the CPU profile should find)"""
+        while not stop.is_set():
+            sum(range(1000))
+    
+    def test_cpu_samples_busy_thread_and_skips_idle(self):
+        """Test a spinning thread shows up in the collapsed stacks and a waiting one does not"""
+        import threading
+        from profiling import Profiler, render_collapsed
+        stop = threading.Event()
+        busy = threading.Thread(target=self._busy, args=(stop,), name='busy worker')
+        idle = threading.Thread(target=stop.wait, name='idle-worker')
+        busy.start()
+        idle.start()
+        try:
+            profile = Profiler().sample_cpu(0.3, interval_ms=5, by_thread=True)
+        finally:
+            stop.set()
+            busy.join()
+            idle.join()
+        
+        self.assertGreater(profile['rounds'], 5)
+        collapsed = render_collapsed(profile['stacks'])
+        busy_lines = [line for line in collapsed.splitlines() if line.startswith('busy_worker;')]
+        self.assertTrue(busy_lines)
+        self.assertIn('_busy (test_unit.py:', busy_lines[0])
+        self.assertTrue(busy_lines[0].rsplit(' ', 1)[1].isdigit())
+        self.assertNotIn('idle-worker', collapsed)
+    
+    def test_one_profile_at_a_time(self):
+        """Test a second profile is refused while one runs, and bad durations are rejected"""
+        import threading
+        import time
+        from profiling import Profiler, ProfilerBusy
+        profiler = Profiler()
+        running = threading.Thread(target=profiler.sample_cpu, args=(0.5,))
+        running.start()
+        time.sleep(0.1)
+        try:
+            with self.assertRaises(ProfilerBusy):
+                profiler.trace_memory(0.1)
+        finally:
+            running.join()
+        with self.assertRaises(ValueError):
+            profiler.sample_cpu(0)
+        with self.assertRaises(ValueError):
+            profiler.sample_cpu(1, interval_ms=0.1)
+    
+    def test_memory_top_sites(self):
+        """Test allocations made during the window are reported by source line and tracing is stopped"""
+        import threading
+        import time
+        import tracemalloc
+        from profiling import Profiler
+        kept = []
+        
+        def allocate():
+            time.sleep(0.05)
+            kept.extend(bytearray(10000) for _ in range(100))
+        
+        worker = threading.Thread(target=allocate)
+        worker.start()
+        profile = Profiler().trace_memory(0.3, top=5)
+        worker.join()
+        
+        self.assertFalse(tracemalloc.is_tracing())
+        top = profile['top'][0]
+        self.assertTrue(top['site'].endswith(f'test_unit.py:{allocate.__code__.co_firstlineno + 2}'))
+        self.assertGreaterEqual(top['size_bytes'], 1000000)
+        self.assertGreaterEqual(profile['peak_bytes'], top['size_bytes'])
+    
+    def test_profile_endpoint_admin_only(self):
+        """Test POST /api/admin/profile/cpu returns collapsed stacks to admins only"""
+        import threading
+        import http.client
+        from bson import ObjectId
+        import server
+        from auth import TokenVerifier
+        from http_server import PooledHTTPServer
+        
+        user_id = ObjectId()
+        httpd = PooledHTTPServer(('127.0.0.1', 0), server.APIHandler, max_workers=2)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        token = jwt.encode({'user_id': str(user_id), 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+        
+        def post(role, query):
+            db = CountingDatabase({'users': [{'_id': user_id, 'role': role}]})
+            server.APIHandler.token_verifier = TokenVerifier(db, server.JWT_SECRET, server.JWT_ALGORITHM)
+            conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=5)
+            conn.request('POST', f'/api/admin/profile/cpu?{query}', headers={'Authorization': f'Bearer {token}'})
+            response = conn.getresponse()
+            body = response.read().decode()
+            conn.close()
+            return response.status, response.getheader('Content-Type'), body
+        
+        try:
+            denied = post('user', 'seconds=0.2')
+            invalid = post('admin', 'seconds=600')
+            status, content_type, body = post('admin', 'seconds=0.2&idle=true&format=collapsed')
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        
+        self.assertEqual(denied[0], 403)
+        self.assertEqual(invalid[0], 400)
+        self.assertEqual(status, 200)
+        self.assertTrue(content_type.startswith('text/plain'))
+        self.assertIn('serve_forever (socketserver.py:', body)
+
+
+class TestSampleData(unittest.TestCase):
+    """Test the synthetic dataset generator"""
+    
+    def _spec(self, **options):
+        from datetime import date
+        from sample_data import DatasetSpec
+        return DatasetSpec(**{'buildings': 3, 'apartments': 8, 'months': 4, 'seed': 5, 'as_of': date(2026, 3, 10),
+                              **options})
+    
+    def test_same_seed_same_documents(self):
+        """Test a seed and as-of date reproduce every document, ObjectIds included"""
+        from sample_data import DatasetGenerator
+        first = list(DatasetGenerator(self._spec(), 'hash').buildings())
+        again = list(DatasetGenerator(self._spec(), 'hash').buildings())
+        other = list(DatasetGenerator(self._spec(seed=6), 'hash').buildings())
+        
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+    
+    def test_demo_accounts_and_consistency(self):
+        """Test the demo accounts, unique emails and references between the collections"""
+        from sample_data import DatasetGenerator, DATASET_COLLECTIONS
+        docs = {name: [] for name in DATASET_COLLECTIONS}
+        for building in DatasetGenerator(self._spec(occupancy=0.5), 'hash').buildings():
+            for name, documents in building.items():
+                docs[name].extend(documents)
+        
+        emails = [user['email'] for user in docs['users']]
+        self.assertEqual(len(emails), len(set(emails)))
+        self.assertIn('admin@domunity.bg', emails)
+        self.assertEqual(docs['buildings'][0]['address'], 'ж.к. Младост 3, бл. 325')
+        first_apartment = docs['apartments'][0]
+        ivan = next(user for user in docs['users'] if user['email'] == 'ivan.ivanov@example.com')
+        self.assertEqual(first_apartment['user_id'], ivan['_id'])
+        self.assertEqual({user['password_hash'] for user in docs['users']}, {'hash'})
+        
+        self.assertEqual(len(docs['apartments']), 24)
+        self.assertEqual(len(docs['financial_records']), 24)
+        occupied = [apartment for apartment in docs['apartments'] if apartment['user_id']]
+        self.assertEqual(len(docs['payments']), 4 * len(occupied))
+        self.assertEqual(len(docs['user_profiles']), len(occupied))
+        self.assertEqual({payment['period'] for payment in docs['payments']},
+                         {'Март 2026', 'Февруари 2026', 'Януари 2026', 'Декември 2025'})
+        for building in docs['buildings']:
+            residents = sum(a['residents'] for a in occupied if a['building_id'] == building['_id'])
+            self.assertEqual(building['total_residents'], residents)
+    
+    def test_insert_in_batches_with_one_hash(self):
+        """Test documents are written with batched insert_many and bcrypt runs once"""
+        from collections import defaultdict
+        import sample_data
+        database = defaultdict(MagicMock)
+        
+        with patch.object(sample_data.bcrypt, 'hashpw', return_value=b'hashed') as hashpw:
+            counts = sample_data.insert_dataset(database, self._spec(), batch_size=10)
+        
+        hashpw.assert_called_once()
+        self.assertEqual(counts['apartments'], 24)
+        batches = [call.args[0] for call in database['payments'].insert_many.call_args_list]
+        self.assertEqual(sum(len(batch) for batch in batches), counts['payments'])
+        self.assertTrue(all(len(batch) <= 10 + 8 * 4 for batch in batches))
+        self.assertGreater(len(batches), 1)
+    
+    def test_dry_run_estimate(self):
+        """Test the estimate scales the sampled buildings to the requested size"""
+        from sample_data import estimate
+        small = estimate(self._spec(buildings=20))
+        large = estimate(self._spec(buildings=2000))
+        
+        self.assertEqual(large['apartments']['documents'], 16000)
+        self.assertAlmostEqual(large['payments']['documents'] / small['payments']['documents'], 100, delta=1)
+        self.assertEqual(large['total']['documents'], sum(
+            item['documents'] for name, item in large.items() if name != 'total'))
+        self.assertGreater(large['total']['bytes'], 0)
+        with self.assertRaises(ValueError):
+            self._spec(occupancy=1.5)
+        with self.assertRaises(ValueError):
+            self._spec(apartments=2)
+
+
+class TestSupervisor(unittest.TestCase):
+    """Test the multi-process serving supervisor"""
+    
+    def test_process_count(self):
+        """Test SERVER_PROCESSES parsing"""
+        from supervisor import process_count
+        self.assertEqual(process_count(None), 1)
+        self.assertEqual(process_count('3'), 3)
+        self.assertEqual(process_count('auto'), os.cpu_count() or 1)
+        with self.assertRaises(ValueError):
+            process_count('0')
+    
+    def test_restarts_crashed_worker_with_backoff(self):
+        """Test a worker that keeps exiting is restarted after a growing delay"""
+        import time
+        import supervisor
+        
+        with patch.object(supervisor, 'DEFAULT_RESTART_DELAY', 0.05):
+            workers = supervisor.Supervisor(1, os._exit, args=(3,), drain_seconds=1)
+            workers.start()
+            try:
+                deadline = time.monotonic() + 30
+                while workers.stats()['restarts'] < 2 and time.monotonic() < deadline:
+                    workers.check(0.1)
+            finally:
+                workers.shutdown()
+        
+        self.assertGreaterEqual(workers.stats()['restarts'], 2)
+        self.assertGreater(workers._delays[0], 0.05)
+    
+    def test_shutdown_terminates_workers(self):
+        """Test shutdown() SIGTERMs every worker and waits for it"""
+        import signal
+        import time
+        from supervisor import Supervisor
+        
+        workers = Supervisor(2, time.sleep, args=(60,), drain_seconds=5)
+        workers.start()
+        workers.check(0.1)
+        self.assertEqual(workers.stats()['alive'], 2)
+        workers.shutdown()
+        
+        self.assertEqual(workers.stats()['alive'], 0)
+        self.assertEqual(workers.stats()['restarts'], 0)
+        for process in workers._workers.values():
+            self.assertEqual(process.exitcode, -signal.SIGTERM)
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """Test the bcrypt process pool and its admission control"""
+    
+    def test_hash_and_verify_in_worker_process(self):
+        """Test hashing and verification through the process pool"""
+        from passwords import PasswordHasher
+        hasher = PasswordHasher(max_workers=1)
+        try:
+            password_hash = hasher.hash('test123')
+            self.assertTrue(hasher.verify('test123', password_hash))
+            self.assertFalse(hasher.verify('wrong', password_hash))
+            self.assertEqual(hasher.stats()['completed'], 3)
+        finally:
+            hasher.shutdown()
+    
+    def test_rejects_when_saturated(self):
+        """Test calls beyond workers + pending fail fast"""
+        import threading
+        from concurrent import futures
+        from passwords import PasswordHasher, PasswordPoolBusy
+        
+        release = threading.Event()
+        hasher = PasswordHasher(max_workers=1, max_pending=0, executor=futures.ThreadPoolExecutor(1))
+        blocker = threading.Thread(target=hasher._submit, args=(release.wait, 5))
+        blocker.start()
+        try:
+            while hasher.stats()['in_flight'] < 1:
+                release.wait(0.01)
+            with self.assertRaises(PasswordPoolBusy):
+                hasher.verify('test123', bcrypt.hashpw(b'test123', bcrypt.gensalt(4)).decode())
+            self.assertEqual(hasher.stats()['rejected'], 1)
+        finally:
+            release.set()
+            blocker.join()
+            hasher.shutdown()
+    
+    def test_queue_wait_not_counted_as_busy(self):
+        """Test time spent waiting for a worker is reported apart from the time workers are busy"""
+        import time
+        import threading
+        from concurrent import futures
+        from passwords import PasswordHasher
+        
+        hasher = PasswordHasher(max_workers=1, max_pending=1, executor=futures.ThreadPoolExecutor(1))
+        calls = [threading.Thread(target=hasher._submit, args=(time.sleep, 0.2)) for _ in range(2)]
+        try:
+            for call in calls:
+                call.start()
+            for call in calls:
+                call.join()
+            stats = hasher.stats()
+            self.assertEqual(stats['completed'], 2)
+            self.assertAlmostEqual(stats['avg_call_ms'], 200, delta=50)
+            # The second call queued behind the first: ~200 ms over two calls
+            self.assertGreaterEqual(stats['avg_wait_ms'], 75)
+        finally:
+            hasher.shutdown()
+
+
+class TestTokenVerifier(unittest.TestCase):
+    """Test the verified-token cache and identity resolution"""
+    
+    def setUp(self):
+        from bson import ObjectId
+        from auth import TokenVerifier
+        self.user_id = ObjectId()
+        self.db = CountingDatabase({'users': [{'_id': self.user_id, 'email': 'a@b.bg', 'role': 'user'}]})
+        self.verifier = TokenVerifier(self.db, 'test-secret', 'HS256', max_entries=2)
+    
+    def _token(self, **extra):
+        payload = {'user_id': str(self.user_id), 'exp': datetime.utcnow() + timedelta(hours=1), **extra}
+        return jwt.encode(payload, 'test-secret', algorithm='HS256')
+    
+    def test_cached_after_first_verification(self):
+        """Test a token is decoded and its user looked up only once"""
+        token = self._token()
+        first = self.verifier.verify(token)
+        second = self.verifier.verify(token)
+        
+        self.assertIs(first, second)
+        self.assertEqual(first.role, 'user')
+        self.assertEqual(len(self.db.calls), 1)
+        self.assertEqual(self.verifier.stats()['hits'], 1)
+    
+    def test_invalid_and_expired_tokens_rejected(self):
+        """Test bad signatures and expired tokens are not accepted"""
+        forged = jwt.encode({'user_id': str(self.user_id)}, 'other-secret', algorithm='HS256')
+        expired = self._token(exp=datetime.utcnow() - timedelta(seconds=1))
+        self.assertIsNone(self.verifier.verify(forged))
+        self.assertIsNone(self.verifier.verify(expired))
+        self.assertIsNone(self.verifier.verify(None))
+    
+    def test_inactive_user_still_verified(self):
+        """Test the cache accepts the same users as login does, inactive ones included"""
+        self.db.rows['users'][0]['is_active'] = False
+        self.assertEqual(self.verifier.verify(self._token()).user_id, str(self.user_id))
+    
+    def test_lru_bound(self):
+        """Test the cache never exceeds max_entries"""
+        for i in range(4):
+            self.verifier.verify(self._token(n=i))
+        self.assertEqual(self.verifier.stats()['entries'], 2)
+        self.assertEqual(self.verifier.stats()['evictions'], 2)
+    
+    def test_resolve_user_id(self):
+        """Test users may only act on themselves unless admin"""
+        from auth import Identity, resolve_user_id
+        user = Identity('u1', 'a@b.bg', 'user', 0)
+        admin = Identity('a1', 'admin@b.bg', 'admin', 0)
+        self.assertEqual(resolve_user_id('', user), 'u1')
+        self.assertEqual(resolve_user_id('u1', user), 'u1')
+        self.assertEqual(resolve_user_id('u2', admin), 'u2')
+        with self.assertRaises(PermissionError):
+            resolve_user_id('u2', user)
+    
+    def test_sync_interceptor_verifies_in_behavior(self):
+        """Test the sync interceptor leaves verification to the worker thread that runs the RPC"""
+        import grpc
+        from types import SimpleNamespace
+        from auth import AuthInterceptor, current_identity
+        
+        class Aborted(Exception):
+            pass
+        
+        class Context:
+            def abort(self, code, details):
+                raise Aborted(code)
+        
+        def behavior(request, context):
+            return current_identity().user_id
+        
+        def stream(request, context):
+            yield current_identity().user_id
+        
+        interceptor = AuthInterceptor(self.verifier)
+        
+        def intercept(method, metadata=(), handler=grpc.unary_unary_rpc_method_handler(behavior)):
+            details = SimpleNamespace(method=method, invocation_metadata=metadata)
+            return interceptor.intercept_service(lambda details: handler, details)
+        
+        public = grpc.unary_unary_rpc_method_handler(behavior)
+        self.assertIs(intercept('/domunity.HealthService/Check', handler=public), public)
+        authorization = (('authorization', f'Bearer {self._token()}'),)
+        handler = intercept('/domunity.BuildingService/GetBuilding', authorization)
+        streaming = intercept('/domunity.BuildingService/StreamApartments', authorization,
+                              grpc.unary_stream_rpc_method_handler(stream))
+        self.assertEqual(self.db.calls, [])
+        
+        self.assertEqual(handler.unary_unary(None, Context()), str(self.user_id))
+        self.assertEqual(list(streaming.unary_stream(None, Context())), [str(self.user_id)])
+        self.assertEqual(len(self.db.calls), 1)
+        with self.assertRaises(Aborted) as denied:
+            intercept('/domunity.BuildingService/GetBuilding').unary_unary(None, Context())
+        self.assertEqual(denied.exception.args[0], grpc.StatusCode.UNAUTHENTICATED)
+    
+    def test_user_lookup_errors_are_not_auth_failures(self):
+        """Test a database error while verifying surfaces as INTERNAL, not as an invalid token"""
+        import grpc
+        from types import SimpleNamespace
+        from auth import AuthInterceptor
+        
+        class Aborted(Exception):
+            pass
+        
+        class Context:
+            def abort(self, code, details):
+                raise Aborted(code)
+        
+        class FailingUsers:
+            def find_one(self, *args, **kwargs):
+                raise TimeoutError('server selection timeout')
+        
+        self.db.db = SimpleNamespace(users=FailingUsers())
+        token = self._token()
+        with self.assertRaises(TimeoutError):
+            self.verifier.verify(token)
+        self.assertEqual(self.verifier.stats()['entries'], 0)
+        
+        interceptor = AuthInterceptor(self.verifier)
+        details = SimpleNamespace(method='/domunity.BuildingService/GetBuilding',
+                                  invocation_metadata=(('authorization', f'Bearer {token}'),))
+        handler = interceptor.intercept_service(
+            lambda details: grpc.unary_unary_rpc_method_handler(lambda request, context: None), details)
+        with self.assertRaises(Aborted) as failed:
+            handler.unary_unary(None, Context())
+        self.assertEqual(failed.exception.args[0], grpc.StatusCode.INTERNAL)
+
+
+class AsyncCountingCollection:
+    """Awaitable counterpart of CountingCollection (motor-style API)"""
+    
+    def __init__(self, name, calls, rows):
+        self.name = name
+        self.calls = calls
+        self.rows = rows
+    
+    async def find_one(self, *args, **kwargs):
+        self.calls.append((self.name, 'find_one', args, kwargs))
+        return next(iter(self.rows.get(self.name, [])), None)
+
+
+class TestAsyncServing(unittest.TestCase):
+    """Test the grpc.aio servicers and interceptor"""
+    
+    def _db(self, rows):
+        db = CountingDatabase(rows)
+        
+        class _Db:
+            def __getattr__(self, name):
+                return AsyncCountingCollection(name, db.calls, db.rows)
+        
+        db.db = _Db()
+        return db
+    
+    def test_async_cache_shares_store_with_sync_cache(self):
+        """Test building reads are cached and visible to both serving modes"""
+        import asyncio
+        from bson import ObjectId
+        from cache import ReadThroughCache, AsyncReadThroughCache
+        
+        building_id = ObjectId()
+        db = self._db({'buildings': [{'_id': building_id, 'address': 'ж.к. Младост 3'}]})
+        sync_cache = ReadThroughCache(CountingDatabase())
+        async_cache = AsyncReadThroughCache(db, sync_cache.store)
+        
+        async def read_twice():
+            await async_cache.get_building(building_id)
+            return await async_cache.get_building(str(building_id))
+        
+        self.assertEqual(asyncio.run(read_twice())['address'], 'ж.к. Младост 3')
+        self.assertEqual(len(db.calls), 1)
+        self.assertEqual(sync_cache.get_building(building_id)['address'], 'ж.к. Младост 3')
+        
+        sync_cache.invalidate_building(building_id)
+        asyncio.run(async_cache.get_building(building_id))
+        self.assertEqual(len(db.calls), 2)
+    
+    def test_verify_async(self):
+        """Test password checks can be awaited through the process pool"""
+        import asyncio
+        from passwords import PasswordHasher
+        hasher = PasswordHasher(max_workers=1)
+        try:
+            async def check():
+                password_hash = await hasher.hash_async('test123')
+                return await hasher.verify_async('test123', password_hash), await hasher.verify_async('x', password_hash)
+            self.assertEqual(asyncio.run(check()), (True, False))
+        finally:
+            hasher.shutdown()
+    
+    def test_async_interceptor(self):
+        """Test public RPCs pass and protected ones need a valid token"""
+        import asyncio
+        import grpc
+        from types import SimpleNamespace
+        from bson import ObjectId
+        from auth import AsyncAuthInterceptor, TokenVerifier, current_identity
+        
+        class Aborted(Exception):
+            pass
+        
+        class Context:
+            async def abort(self, code, details):
+                raise Aborted(code)
+        
+        async def behavior(request, context):
+            return current_identity().user_id
+        
+        user_id = ObjectId()
+        verifier = TokenVerifier(CountingDatabase({'users': [{'_id': user_id, 'role': 'user'}]}), 'test-secret', 'HS256')
+        interceptor = AsyncAuthInterceptor(verifier)
+        token = jwt.encode({'user_id': str(user_id), 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           'test-secret', algorithm='HS256')
+        
+        async def call(method, metadata=()):
+            async def continuation(details):
+                return grpc.unary_unary_rpc_method_handler(behavior)
+            details = SimpleNamespace(method=method, invocation_metadata=metadata)
+            handler = await interceptor.intercept_service(continuation, details)
+            if handler.unary_unary is behavior:
+                return 'public'
+            return await handler.unary_unary(None, Context())
+        
+        async def run():
+            public = await call('/domunity.HealthService/Check')
+            with self.assertRaises(Aborted) as denied:
+                await call('/domunity.BuildingService/GetBuilding')
+            authed = [await call('/domunity.BuildingService/GetBuilding', (('authorization', f'Bearer {token}'),))
+                      for _ in range(2)]
+            return public, denied.exception.args[0], authed
+        
+        public, denied_code, authed = asyncio.run(run())
+        self.assertEqual(public, 'public')
+        self.assertEqual(denied_code, grpc.StatusCode.UNAUTHENTICATED)
+        self.assertEqual(authed, [str(user_id)] * 2)
+        self.assertEqual(verifier.stats()['hits'], 1)
+
 if __name__ == '__main__':
     unittest.main()
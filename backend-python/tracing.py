@@ -0,0 +1,274 @@
+"""
+Per-request MongoDB command tracing
+
+Every REST request and RPC runs under a RequestTracker (see
+APIHandler._dispatch and grpc_config.MetricsInterceptor). While it runs it
+is the current request of its thread or task; motor copies the context
+into its executor threads. CommandTracer, a pymongo CommandListener on
+both clients, attributes every command to it: count, time in MongoDB,
+documents returned and, with MONGO_TRACE_BYTES, the BSON size of the
+replies.
+
+When the tracker stops, the totals go to the per-handler metrics and the
+access log line. A request slower than SLOW_REQUEST_MS is flagged: it is
+counted in domunity_slow_requests_total and logged at WARNING with the
+filters and pipelines of the commands it ran.
+"""
+import os
+import time
+import logging
+import contextvars
+import bson
+from bson import json_util
+from pymongo import monitoring
+
+from metrics import (MONGO_COMMANDS, MONGO_COMMAND_SECONDS, MONGO_ROUND_TRIPS, MONGO_SECONDS, MONGO_DOCUMENTS,
+                     MONGO_BYTES, SLOW_REQUESTS)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_REQUEST_MS = 500.0
+# Commands kept per request for the slow-request log; the rest are only counted
+DEFAULT_MAX_TRACED_COMMANDS = 20
+# Longest rendering of one command in the slow-request log
+MAX_COMMAND_CHARS = 1000
+
+# Command fields worth showing; documents to insert, session ids and cluster times are left out
+_SHOWN_FIELDS = ('filter', 'pipeline', 'sort', 'projection', 'limit', 'skip', 'hint', 'query', 'key',
+                 'updates', 'deletes', 'batchSize')
+
+
+class TracingConfig:
+    """Slow-request threshold and how much of each command is traced"""
+
+    def __init__(self, slow_request_ms=DEFAULT_SLOW_REQUEST_MS, max_commands=DEFAULT_MAX_TRACED_COMMANDS,
+                 record_bytes=False):
+        if slow_request_ms < 0 or max_commands < 0:
+            raise ValueError("SLOW_REQUEST_MS and MONGO_TRACE_MAX_COMMANDS must not be negative")
+        self.slow_request_ms = slow_request_ms
+        self.max_commands = max_commands
+        self.record_bytes = record_bytes
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from SLOW_REQUEST_MS / MONGO_TRACE_MAX_COMMANDS / MONGO_TRACE_BYTES"""
+        return cls(
+            slow_request_ms=float(os.getenv('SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)),
+            max_commands=int(os.getenv('MONGO_TRACE_MAX_COMMANDS', DEFAULT_MAX_TRACED_COMMANDS)),
+            # Re-encoding every reply costs about half as much CPU as decoding it
+            record_bytes=os.getenv('MONGO_TRACE_BYTES', 'false').lower() in ('true', '1', 'yes'),
+        )
+
+
+_config = TracingConfig()
+
+
+def configure_tracing(config):
+    """Use ``config`` for every request from now on (SLOW_REQUEST_MS=0 disables slow flagging)"""
+    global _config
+    _config = config
+    return config
+
+
+def tracing_config():
+    return _config
+
+
+# explain.PlanCapture for slow aggregates, or None
+_plan_capture = None
+
+
+def set_plan_capture(capture):
+    """Hand slow aggregates to ``capture`` (None stops it)"""
+    global _plan_capture
+    _plan_capture = capture if capture is not None and capture.enabled else None
+
+
+# Tracker of the REST request or RPC being handled on this thread/task
+_current_request = contextvars.ContextVar('current_request', default=None)
+
+
+def current_request():
+    """RequestTracker of the request being handled, or None"""
+    return _current_request.get()
+
+
+class TracedCommand:
+    """One MongoDB command of a request, kept for the slow-request log"""
+
+    __slots__ = ('name', 'command', 'seconds', 'documents', 'failure')
+
+    def __init__(self, name, command):
+        self.name = name
+        # A reference, not a copy: it is only rendered if the request turns out slow
+        self.command = command
+        self.seconds = None
+        self.documents = 0
+        self.failure = None
+
+    @property
+    def collection(self):
+        target = self.command.get(self.name)
+        return target if isinstance(target, str) else self.command.get('collection', '')
+
+    def describe(self):
+        fields = {key: self.command[key] for key in _SHOWN_FIELDS if key in self.command}
+        if 'documents' in self.command:
+            fields['documents'] = len(self.command['documents'])
+        spec = json_util.dumps(fields)
+        if len(spec) > MAX_COMMAND_CHARS:
+            spec = spec[:MAX_COMMAND_CHARS] + '...'
+        took = 'unfinished' if self.seconds is None else f'{self.seconds * 1000:.1f} ms'
+        outcome = f'failed: {self.failure}' if self.failure else f'{self.documents} docs'
+        return f'{self.name} {self.collection} ({took}, {outcome}) {spec}'
+
+
+class _Commands:
+    """Renders a request's commands only when the log record is formatted"""
+
+    __slots__ = ('tracker',)
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def __str__(self):
+        commands = self.tracker.commands or ()
+        lines = [f'\n  {command.describe()}' for command in commands]
+        untraced = self.tracker.mongo_round_trips - len(commands)
+        if untraced > 0:
+            lines.append(f'\n  ... {untraced} more')
+        return ''.join(lines)
+
+
+class RequestTracker:
+    """Times one REST request or RPC and traces the MongoDB commands it sends"""
+
+    __slots__ = ('in_flight', 'labels', 'started', 'slow', 'mongo_round_trips', 'mongo_seconds',
+                 'mongo_documents', 'mongo_bytes', 'commands', 'slow_aggregates', '_token')
+
+    def __init__(self, in_flight, labels=()):
+        self.in_flight = in_flight
+        self.labels = labels
+        self.slow = False
+        self.mongo_round_trips = 0
+        self.mongo_seconds = 0.0
+        self.mongo_documents = 0
+        self.mongo_bytes = 0
+        self.commands = None
+        # (database, command, seconds) of aggregates over EXPLAIN_BUDGET_MS
+        self.slow_aggregates = None
+
+    def start(self):
+        self.in_flight.inc(self.labels)
+        self._token = _current_request.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self, handler):
+        """Return the elapsed seconds and record the request's Mongo totals under ``handler``"""
+        elapsed = time.perf_counter() - self.started
+        try:
+            _current_request.reset(self._token)
+        except ValueError:
+            # An abandoned stream can be closed from another context
+            pass
+        self.in_flight.dec(self.labels)
+        labels = (handler,)
+        MONGO_ROUND_TRIPS.observe(self.mongo_round_trips, labels)
+        if self.mongo_round_trips:
+            MONGO_SECONDS.observe(self.mongo_seconds, labels)
+            MONGO_DOCUMENTS.observe(self.mongo_documents, labels)
+            if _config.record_bytes:
+                MONGO_BYTES.observe(self.mongo_bytes, labels)
+        threshold = _config.slow_request_ms
+        if threshold and elapsed * 1000 >= threshold:
+            self.slow = True
+            SLOW_REQUESTS.inc(labels)
+            logger.warning("Slow request %s: %.1f ms, %d Mongo commands taking %.1f ms, %d docs:%s",
+                           handler, elapsed * 1000, self.mongo_round_trips, self.mongo_seconds * 1000,
+                           self.mongo_documents, _Commands(self))
+        if self.slow_aggregates and _plan_capture is not None:
+            for database_name, command, seconds in self.slow_aggregates:
+                _plan_capture.offer(database_name, command, seconds, handler)
+        return elapsed
+
+
+def _returned_documents(reply):
+    cursor = reply.get('cursor')
+    if not cursor:
+        return 0
+    batch = cursor.get('firstBatch')
+    if batch is None:
+        batch = cursor.get('nextBatch', ())
+    return len(batch)
+
+
+class CommandTracer(monitoring.CommandListener):
+    """Counts MongoDB commands per command name and traces them into the current request"""
+
+    def __init__(self):
+        # request_id -> TracedCommand, from 'started' to 'succeeded'/'failed'
+        self._traced = {}
+        # request_id -> aggregate command, while slow aggregates are being explained
+        self._aggregates = {}
+
+    def started(self, event):
+        MONGO_COMMANDS.inc((event.command_name,))
+        if event.command_name == 'aggregate' and _plan_capture is not None:
+            self._aggregates[event.request_id] = event.command
+        tracker = _current_request.get()
+        if tracker is None:
+            return
+        tracker.mongo_round_trips += 1
+        commands = tracker.commands
+        if commands is None:
+            commands = tracker.commands = []
+        if len(commands) < _config.max_commands:
+            traced = TracedCommand(event.command_name, event.command)
+            commands.append(traced)
+            self._traced[event.request_id] = traced
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, (event.command_name,))
+        traced = self._traced.pop(event.request_id, None)
+        tracker = _current_request.get()
+        if self._aggregates:
+            self._slow_aggregate(event, seconds, tracker)
+        if tracker is None:
+            return
+        documents = _returned_documents(event.reply)
+        tracker.mongo_seconds += seconds
+        tracker.mongo_documents += documents
+        if _config.record_bytes:
+            tracker.mongo_bytes += len(bson.encode(event.reply))
+        if traced is not None:
+            traced.seconds = seconds
+            traced.documents = documents
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, (event.command_name,))
+        traced = self._traced.pop(event.request_id, None)
+        self._aggregates.pop(event.request_id, None)
+        tracker = _current_request.get()
+        if tracker is None:
+            return
+        tracker.mongo_seconds += seconds
+        if traced is not None:
+            traced.seconds = seconds
+            traced.failure = event.failure.get('errmsg', event.failure)
+
+    def _slow_aggregate(self, event, seconds, tracker):
+        command = self._aggregates.pop(event.request_id, None)
+        capture = _plan_capture
+        if command is None or capture is None or not capture.is_slow(seconds):
+            return
+        if tracker is None:
+            # Not part of a request (startup, maintenance jobs): explain it right away
+            capture.offer(event.database_name, command, seconds, 'background')
+            return
+        # Offered when the request finishes, under its route or RPC name
+        if tracker.slow_aggregates is None:
+            tracker.slow_aggregates = []
+        tracker.slow_aggregates.append((event.database_name, command, seconds))
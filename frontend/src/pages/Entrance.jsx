@@ -21,7 +21,7 @@ const Entrance = () => {
 
         const fetchBuilding = async () => {
             try {
-                const data = await getBuildingApartments(1);
+                const data = await getBuildingApartments();
                 if (data.error) {
                     setError(data.error);
                     return;
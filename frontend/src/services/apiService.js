@@ -117,8 +117,10 @@ export const logout = () => {
 };
 
 // User API
-export const getProfile = async () => {
-    const { data } = await apiRequest('/api/user/profile', {
+// Optional fields (e.g. ['balance']) limits the response to those paths
+export const getProfile = async (fields) => {
+    const query = fields ? `?${new URLSearchParams({ fields: fields.join(',') })}` : '';
+    const { data } = await apiRequest(`/api/user/profile${query}`, {
         method: 'GET',
     });
 
@@ -180,11 +182,25 @@ export const healthCheck = async () => {
 };
 
 // Admin API
-export const getAdminResidents = async () => {
-    const { data } = await apiRequest('/api/admin/residents', {
-        method: 'GET',
-    });
-    return data;
+// The endpoint is cursor-paginated; follow next_cursor until every page is loaded
+export const getAdminResidents = async (params = {}) => {
+    const residents = [];
+    let cursor = null;
+    do {
+        const query = new URLSearchParams({ limit: '1000', ...params });
+        if (cursor) {
+            query.set('cursor', cursor);
+        }
+        const { data } = await apiRequest(`/api/admin/residents?${query}`, {
+            method: 'GET',
+        });
+        if (!data.residents) {
+            return data;
+        }
+        residents.push(...data.residents);
+        cursor = data.next_cursor;
+    } while (cursor);
+    return { residents };
 };
 
 // Apartment API
@@ -195,21 +211,58 @@ export const getApartmentDetails = async () => {
     return data;
 };
 
+// Payment history, newest first; pass back next_page_token to load the next page
+export const getPaymentHistory = async (params = {}) => {
+    const query = new URLSearchParams(params);
+    const { data } = await apiRequest(`/api/user/payments?${query}`, {
+        method: 'GET',
+    });
+    return data;
+};
+
 // Building API
-export const getBuildingApartments = async (buildingId = 1) => {
+export const getBuildingApartments = async (buildingId = 'me') => {
     const { data } = await apiRequest(`/api/building/${buildingId}/apartments`, {
         method: 'GET',
     });
     return data;
 };
 
-export const getMaintenanceRecords = async (buildingId = 1) => {
+export const getMaintenanceRecords = async (buildingId = 'me') => {
     const { data } = await apiRequest(`/api/building/${buildingId}/maintenance`, {
         method: 'GET',
     });
     return data;
 };
 
+// Batched lookups: one request for many ids; unknown ids come back in `missing`
+export const getBuildings = async (ids) => {
+    const query = new URLSearchParams({ ids: ids.join(',') });
+    const { data } = await apiRequest(`/api/buildings?${query}`, {
+        method: 'GET',
+    });
+    return data;
+};
+
+export const getBuildingsEvents = async (ids, limit) => {
+    const query = new URLSearchParams({ ids: ids.join(',') });
+    if (limit) {
+        query.set('limit', limit);
+    }
+    const { data } = await apiRequest(`/api/buildings/events?${query}`, {
+        method: 'GET',
+    });
+    return data;
+};
+
+export const getProfiles = async (ids) => {
+    const query = new URLSearchParams({ ids: ids.join(',') });
+    const { data } = await apiRequest(`/api/profiles?${query}`, {
+        method: 'GET',
+    });
+    return data;
+};
+
 const apiService = {
     login,
     register,
@@ -225,8 +278,12 @@ const apiService = {
     healthCheck,
     getAdminResidents,
     getApartmentDetails,
+    getPaymentHistory,
     getBuildingApartments,
     getMaintenanceRecords,
+    getBuildings,
+    getBuildingsEvents,
+    getProfiles,
 };
 
 export default apiService;